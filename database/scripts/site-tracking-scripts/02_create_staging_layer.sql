@@ -263,15 +263,11 @@ END;
 $$ LANGUAGE plpgsql IMMUTABLE;
 
 -- Helper function for URL decoding (simplified version)
+-- Plain SQL so set-based callers get it inlined
 CREATE OR REPLACE FUNCTION staging.url_decode(p_encoded_text TEXT)
 RETURNS TEXT AS $$
-BEGIN
-    IF p_encoded_text IS NULL THEN
-        RETURN NULL;
-    END IF;
-    
     -- Basic URL decoding - replace common encoded characters
-    RETURN replace(
+    SELECT replace(
         replace(
             replace(
                 replace(p_encoded_text, '%20', ' '),
@@ -281,8 +277,7 @@ BEGIN
         ),
         '%23', '#'
     );
-END;
-$$ LANGUAGE plpgsql IMMUTABLE;
+$$ LANGUAGE sql IMMUTABLE;
 
 -- Function to get staging processing statistics
 CREATE OR REPLACE FUNCTION staging.get_processing_stats(
@@ -320,6 +315,9 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- Batch processing function for raw events
+-- Set-based: validates and enriches the whole batch with set operations instead of one
+-- staging.validate_and_enrich_event() call per row. Rows are claimed with
+-- FOR UPDATE SKIP LOCKED so several workers can drain the queue concurrently.
 CREATE OR REPLACE FUNCTION staging.process_raw_events_batch(
     p_tenant_hk BYTEA DEFAULT NULL,
     p_batch_size INTEGER DEFAULT 100
@@ -329,35 +327,206 @@ CREATE OR REPLACE FUNCTION staging.process_raw_events_batch(
     batch_id VARCHAR(100)
 ) AS $$
 DECLARE
-    v_raw_event RECORD;
+    v_batch_row RECORD;
     v_processed_count INTEGER := 0;
     v_error_count INTEGER := 0;
     v_batch_id VARCHAR(100);
 BEGIN
     -- Generate batch ID
     v_batch_id := 'STAGING_BATCH_' || to_char(CURRENT_TIMESTAMP, 'YYYYMMDD_HH24MISS') || '_' || 
-                  substring(encode(util.hash_binary(CURRENT_TIMESTAMP::text), 'hex'), 1, 8);
-    
-    -- Process pending raw events
-    FOR v_raw_event IN 
-        SELECT raw_event_id 
-        FROM raw.site_tracking_events_r r
-        WHERE r.processing_status = 'PENDING'
-        AND (p_tenant_hk IS NULL OR r.tenant_hk = p_tenant_hk)
-        ORDER BY r.received_timestamp
-        LIMIT p_batch_size
-    LOOP
-        BEGIN
-            PERFORM staging.validate_and_enrich_event(v_raw_event.raw_event_id);
-            v_processed_count := v_processed_count + 1;
-            
-        EXCEPTION WHEN OTHERS THEN
-            v_error_count := v_error_count + 1;
-            -- Continue processing other events
-        END;
-    END LOOP;
+                  substring(encode(util.hash_binary(clock_timestamp()::text), 'hex'), 1, 8);
+    
+    DROP TABLE IF EXISTS pg_temp.raw_staging_batch;
+    CREATE TEMP TABLE raw_staging_batch (
+        raw_event_id INTEGER PRIMARY KEY,
+        tenant_hk BYTEA NOT NULL,
+        received_timestamp TIMESTAMP WITH TIME ZONE,
+        user_agent TEXT,
+        event_data JSONB,
+        error_message TEXT
+    ) ON COMMIT DROP;
+    
+    -- Claim pending raw events; rows locked by another worker are skipped
+    INSERT INTO raw_staging_batch
+    SELECT 
+        r.raw_event_id,
+        r.tenant_hk,
+        r.received_timestamp,
+        r.user_agent,
+        r.raw_payload,
+        -- Failures the per-row insert would hit, caught up front
+        CASE 
+            WHEN r.raw_payload->>'evt_type' IS NULL 
+                THEN 'Missing evt_type (event_type is required in staging)'
+            WHEN r.raw_payload->>'scroll_depth' IS NOT NULL 
+                AND (r.raw_payload->>'scroll_depth' !~ '^\s*[+-]?[0-9]{1,3}(\.[0-9]*)?\s*$')
+                THEN 'Invalid scroll_depth: ' || LEFT(r.raw_payload->>'scroll_depth', 50)
+            WHEN r.raw_payload->>'time_on_page' IS NOT NULL 
+                AND (r.raw_payload->>'time_on_page' !~ '^\s*[+-]?[0-9]{1,9}\s*$')
+                THEN 'Invalid time_on_page: ' || LEFT(r.raw_payload->>'time_on_page', 50)
+        END
+    FROM raw.site_tracking_events_r r
+    WHERE r.processing_status = 'PENDING'
+    AND (p_tenant_hk IS NULL OR r.tenant_hk = p_tenant_hk)
+    ORDER BY r.received_timestamp
+    LIMIT p_batch_size
+    FOR UPDATE OF r SKIP LOCKED;
+    
+    GET DIAGNOSTICS v_processed_count = ROW_COUNT;
+    
+    IF v_processed_count = 0 THEN
+        RETURN QUERY SELECT 0, 0, v_batch_id;
+        RETURN;
+    END IF;
+    
+    BEGIN
+        -- Validation, device parsing, UTM extraction and quality scoring for the whole batch
+        -- (same rules as staging.validate_and_enrich_event)
+        INSERT INTO staging.site_tracking_events_s (
+            raw_event_id, tenant_hk, event_type, session_id, user_id,
+            page_url, page_title, referrer_url, element_id, element_class, element_text,
+            scroll_depth, time_on_page, device_type, browser_name, operating_system,
+            screen_resolution, viewport_size, utm_source, utm_medium, utm_campaign,
+            utm_term, utm_content, event_timestamp, validation_status, 
+            enrichment_status, quality_score, validation_errors, enrichment_data,
+            record_source
+        )
+        SELECT 
+            b.raw_event_id, b.tenant_hk, b.event_data->>'evt_type',
+            b.event_data->>'session_id', b.event_data->>'user_id',
+            b.event_data->>'page_url', b.event_data->>'page_title', b.event_data->>'referrer',
+            b.event_data->>'element_id', b.event_data->>'element_class', b.event_data->>'element_text',
+            COALESCE((b.event_data->>'scroll_depth')::DECIMAL, 0),
+            COALESCE((b.event_data->>'time_on_page')::INTEGER, 0),
+            CASE 
+                WHEN b.user_agent ~* 'mobile|android|iphone' THEN 'mobile'
+                WHEN b.user_agent ~* 'tablet|ipad' THEN 'tablet'  
+                ELSE 'desktop'
+            END,
+            CASE 
+                WHEN b.user_agent ~* 'chrome' THEN 'Chrome'
+                WHEN b.user_agent ~* 'firefox' THEN 'Firefox'
+                WHEN b.user_agent ~* 'safari' THEN 'Safari'
+                WHEN b.user_agent ~* 'edge' THEN 'Edge'
+                ELSE 'Unknown'
+            END,
+            CASE 
+                WHEN b.user_agent ~* 'windows' THEN 'Windows'
+                WHEN b.user_agent ~* 'mac os' THEN 'macOS'
+                WHEN b.user_agent ~* 'linux' THEN 'Linux'
+                WHEN b.user_agent ~* 'android' THEN 'Android'
+                WHEN b.user_agent ~* 'ios|iphone|ipad' THEN 'iOS'
+                ELSE 'Unknown'
+            END,
+            b.event_data->>'screen_resolution', b.event_data->>'viewport_size',
+            utm.utm_source, utm.utm_medium, utm.utm_campaign, utm.utm_term, utm.utm_content,
+            COALESCE((b.event_data->>'timestamp')::TIMESTAMP WITH TIME ZONE, b.received_timestamp),
+            CASE 
+                WHEN q.error_count > 3 OR q.quality_score < 0.3 THEN 'INVALID'
+                WHEN q.suspicious_url THEN 'SUSPICIOUS'
+                ELSE 'VALID'
+            END,
+            'ENRICHED', q.quality_score, q.validation_errors,
+            jsonb_build_object(
+                'processing_version', '1.0',
+                'enrichment_timestamp', CURRENT_TIMESTAMP,
+                'user_agent_parsed', true,
+                'utm_parsed', true,
+                'batch_id', v_batch_id
+            ),
+            'site_tracker'
+        FROM raw_staging_batch b
+        -- All five UTM parameters from one scan of the URL (first occurrence wins)
+        CROSS JOIN LATERAL (
+            SELECT 
+                staging.url_decode((array_agg(m.match[2] ORDER BY m.ord) FILTER (WHERE lower(m.match[1]) = 'utm_source'))[1]) AS utm_source,
+                staging.url_decode((array_agg(m.match[2] ORDER BY m.ord) FILTER (WHERE lower(m.match[1]) = 'utm_medium'))[1]) AS utm_medium,
+                staging.url_decode((array_agg(m.match[2] ORDER BY m.ord) FILTER (WHERE lower(m.match[1]) = 'utm_campaign'))[1]) AS utm_campaign,
+                staging.url_decode((array_agg(m.match[2] ORDER BY m.ord) FILTER (WHERE lower(m.match[1]) = 'utm_term'))[1]) AS utm_term,
+                staging.url_decode((array_agg(m.match[2] ORDER BY m.ord) FILTER (WHERE lower(m.match[1]) = 'utm_content'))[1]) AS utm_content
+            FROM regexp_matches(
+                b.event_data->>'page_url', 
+                '[?&](utm_source|utm_medium|utm_campaign|utm_term|utm_content)=([^&]+)', 
+                'gi'
+            ) WITH ORDINALITY AS m(match, ord)
+        ) utm
+        CROSS JOIN LATERAL (
+            SELECT 
+                array_length(v.errors, 1) AS error_count,
+                COALESCE(v.errors, ARRAY[]::TEXT[]) AS validation_errors,
+                v.suspicious_url,
+                (1.0
+                    - CASE WHEN NOT (b.event_data ? 'evt_type') THEN 0.3 ELSE 0 END
+                    - CASE WHEN NOT (b.event_data ? 'timestamp') THEN 0.2 ELSE 0 END
+                    - CASE WHEN NOT (b.event_data ? 'page_url') THEN 0.2 ELSE 0 END
+                    - CASE WHEN v.suspicious_url THEN 0.3 ELSE 0 END
+                )::DECIMAL(3,2) AS quality_score
+            FROM (
+                SELECT 
+                    COALESCE(LENGTH(b.event_data->>'page_url') > 2000, false) AS suspicious_url,
+                    array_remove(ARRAY[
+                        CASE WHEN NOT (b.event_data ? 'evt_type') THEN 'Missing evt_type' END,
+                        CASE WHEN NOT (b.event_data ? 'timestamp') THEN 'Missing timestamp' END,
+                        CASE WHEN NOT (b.event_data ? 'page_url') THEN 'Missing page_url' END,
+                        CASE WHEN LENGTH(b.event_data->>'page_url') > 2000 THEN 'Suspicious URL length' END
+                    ], NULL) AS errors
+            ) v
+        ) q
+        WHERE b.error_message IS NULL;
+        
+        UPDATE raw.site_tracking_events_r r
+        SET processing_status = 'PROCESSED'
+        FROM raw_staging_batch b
+        WHERE r.raw_event_id = b.raw_event_id
+        AND b.error_message IS NULL;
+        
+    EXCEPTION WHEN OTHERS THEN
+        -- Something the up-front checks did not catch (e.g. an unparseable timestamp or an
+        -- over-long field) rolled the bulk insert back; redo this batch row by row so only
+        -- the offending rows fail
+        FOR v_batch_row IN 
+            SELECT b.raw_event_id FROM raw_staging_batch b 
+            WHERE b.error_message IS NULL 
+            ORDER BY b.raw_event_id
+        LOOP
+            BEGIN
+                PERFORM staging.validate_and_enrich_event(v_batch_row.raw_event_id);
+            EXCEPTION WHEN OTHERS THEN
+                UPDATE raw_staging_batch 
+                SET error_message = SQLERRM 
+                WHERE raw_event_id = v_batch_row.raw_event_id;
+            END;
+        END LOOP;
+    END;
+    
+    -- Per-row error capture: failed rows leave the PENDING queue with their error
+    UPDATE raw.site_tracking_events_r r
+    SET processing_status = 'ERROR',
+        error_message = b.error_message,
+        retry_count = r.retry_count + 1
+    FROM raw_staging_batch b
+    WHERE r.raw_event_id = b.raw_event_id
+    AND b.error_message IS NOT NULL;
+    
+    GET DIAGNOSTICS v_error_count = ROW_COUNT;
+    
+    -- One business-layer notification per tenant per batch instead of per row
+    PERFORM pg_notify('process_to_business_layer', jsonb_build_object(
+        'batch_id', v_batch_id,
+        'tenant_hk', encode(t.tenant_hk, 'hex'),
+        'event_count', t.event_count,
+        'timestamp', CURRENT_TIMESTAMP
+    )::text)
+    FROM (
+        SELECT b.tenant_hk, COUNT(*) AS event_count 
+        FROM raw_staging_batch b 
+        WHERE b.error_message IS NULL 
+        GROUP BY b.tenant_hk
+    ) t;
     
-    RETURN QUERY SELECT v_processed_count, v_error_count, v_batch_id;
+    DROP TABLE IF EXISTS pg_temp.raw_staging_batch;
+    
+    RETURN QUERY SELECT v_processed_count - v_error_count, v_error_count, v_batch_id;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -376,7 +545,15 @@ SELECT 'Staging layer for universal site tracking created successfully!' as stat
 -- =====================================================
 
 -- Function to process staging events to business layer
-CREATE OR REPLACE FUNCTION staging.process_staging_to_business()
+-- Set-based: each call claims up to p_batch_size VALID rows and loads hubs, links and
+-- the event satellite with one INSERT ... ON CONFLICT per table. Rows that would break a
+-- hub/satellite constraint are caught up front and reported per row; anything else that
+-- fails the bulk load makes the batch fall back to row-by-row so only offending rows fail.
+DROP FUNCTION IF EXISTS staging.process_staging_to_business();
+
+CREATE OR REPLACE FUNCTION staging.process_staging_to_business(
+    p_batch_size INTEGER DEFAULT 5000
+)
 RETURNS TABLE (
     processed_count INTEGER,
     success_count INTEGER,
@@ -384,113 +561,258 @@ RETURNS TABLE (
     processing_summary JSONB
 ) AS $$
 DECLARE
-    v_staging_record RECORD;
+    v_batch_row RECORD;
     v_processed_count INTEGER := 0;
     v_success_count INTEGER := 0;
     v_error_count INTEGER := 0;
-    v_event_hk BYTEA;
-    v_session_hk BYTEA;
-    v_visitor_hk BYTEA;
-    v_page_hk BYTEA;
-    v_event_bk VARCHAR(255);
-    v_session_bk VARCHAR(255);
-    v_visitor_bk VARCHAR(255);
     v_error_details JSONB := '[]'::JSONB;
+    v_load_date TIMESTAMP WITH TIME ZONE := util.current_load_date();
+    v_record_source VARCHAR(100) := 'staging_processor';
+    v_processing_mode TEXT := 'set_based';
+    v_fallback_reason TEXT;
+    v_started_at TIMESTAMP WITH TIME ZONE := clock_timestamp();
 BEGIN
-    RAISE NOTICE '🚀 Processing staging events to business layer...';
-    
-    -- Process staging records that haven't been moved to business
-    FOR v_staging_record IN 
-        SELECT * 
-        FROM staging.site_tracking_events_s 
-        WHERE validation_status = 'VALID'
-        AND (processed_to_business IS NULL OR processed_to_business = FALSE)
-        ORDER BY processed_timestamp ASC
-    LOOP
-        v_processed_count := v_processed_count + 1;
-        
+    DROP TABLE IF EXISTS pg_temp.staging_business_batch;
+    CREATE TEMP TABLE staging_business_batch (
+        staging_event_id INTEGER PRIMARY KEY,
+        tenant_hk BYTEA NOT NULL,
+        event_bk VARCHAR(255),
+        session_bk TEXT,
+        visitor_bk TEXT,
+        page_bk TEXT,
+        event_hk BYTEA,
+        session_hk BYTEA,
+        visitor_hk BYTEA,
+        page_hk BYTEA,
+        event_timestamp TIMESTAMP WITH TIME ZONE,
+        event_data JSONB,
+        error_message TEXT
+    ) ON COMMIT DROP;
+    
+    -- Claim the batch: fresh rows first, rows that failed a previous load last;
+    -- concurrent runs skip rows another run has locked
+    INSERT INTO staging_business_batch
+    SELECT 
+        k.staging_event_id,
+        k.tenant_hk,
+        k.event_bk,
+        k.session_bk,
+        k.visitor_bk,
+        k.page_bk,
+        util.hash_binary(k.event_bk || encode(k.tenant_hk, 'hex')),
+        util.hash_binary(k.session_bk || encode(k.tenant_hk, 'hex')),
+        util.hash_binary(k.visitor_bk || encode(k.tenant_hk, 'hex')),
+        util.hash_binary(k.page_bk || encode(k.tenant_hk, 'hex')),
+        k.event_timestamp,
+        k.event_data,
+        -- Same constraints the hub and satellite tables enforce
+        CASE 
+            WHEN k.session_bk !~ '^(sess_|session_)[a-zA-Z0-9_-]+$' OR LENGTH(k.session_bk) > 255 
+                THEN 'Invalid session business key: ' || LEFT(k.session_bk, 100)
+            WHEN k.visitor_bk !~ '^visitor_[a-zA-Z0-9]+$' OR LENGTH(k.visitor_bk) > 255 
+                THEN 'Invalid visitor business key: ' || LEFT(k.visitor_bk, 100)
+            WHEN LENGTH(TRIM(k.page_bk)) = 0 OR LENGTH(k.page_bk) > 500 
+                THEN 'Invalid page business key (empty or longer than 500 characters)'
+            WHEN LENGTH(k.event_data->>'page_url') > 500 
+                THEN 'page_url exceeds 500 characters'
+            WHEN LENGTH(k.event_data->>'page_title') > 255 
+                THEN 'page_title exceeds 255 characters'
+        END
+    FROM (
+        SELECT 
+            s.staging_event_id,
+            s.tenant_hk,
+            s.event_timestamp,
+            -- Business keys in the same formats the row-by-row processor used
+            'evt_staging_' || s.staging_event_id::text AS event_bk,
+            'sess_' || COALESCE(s.session_id, 'staging_' || s.staging_event_id::text) AS session_bk,
+            'visitor_' || COALESCE(
+                LOWER(REGEXP_REPLACE(s.user_id, '[^a-zA-Z0-9]', '', 'g')), 
+                'anonymous' || s.staging_event_id::text
+            ) AS visitor_bk,
+            business.normalize_page_url(s.page_url)::text AS page_bk,
+            jsonb_build_object(
+                'event_timestamp', s.event_timestamp,
+                'event_type', s.event_type,
+                'event_category', 'user_interaction',
+                'event_action', 'click',
+                'page_url', s.page_url,
+                'page_title', s.page_title,
+                'custom_properties', jsonb_build_object(
+                    'staging_event_id', s.staging_event_id,
+                    'quality_score', s.quality_score,
+                    'device_type', s.device_type,
+                    'browser_name', s.browser_name
+                )
+            ) AS event_data
+        FROM staging.site_tracking_events_s s
+        WHERE s.validation_status = 'VALID'
+        AND s.processed_to_business IS NOT TRUE
+        ORDER BY (s.processing_notes LIKE 'BUSINESS_LOAD_ERROR:%') IS TRUE, s.processed_timestamp ASC
+        LIMIT p_batch_size
+        FOR UPDATE OF s SKIP LOCKED
+    ) k;
+    
+    GET DIAGNOSTICS v_processed_count = ROW_COUNT;
+    
+    IF v_processed_count > 0 THEN
         BEGIN
-            -- Create business keys with correct formats
-            v_event_bk := 'evt_staging_' || v_staging_record.staging_event_id::text;
-            v_session_bk := 'sess_' || COALESCE(v_staging_record.session_id, 'staging_' || v_staging_record.staging_event_id::text);
-            v_visitor_bk := 'visitor_' || COALESCE(
-                LOWER(REGEXP_REPLACE(v_staging_record.user_id, '[^a-zA-Z0-9]', '', 'g')), 
-                'anonymous' || v_staging_record.staging_event_id::text
-            );
+            -- Hubs
+            INSERT INTO business.site_event_h (site_event_hk, site_event_bk, tenant_hk, load_date, record_source)
+            SELECT event_hk, event_bk, tenant_hk, v_load_date, v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (site_event_hk) DO NOTHING;
             
-            -- Create/get business hubs using existing functions
-            v_event_hk := business.get_or_create_site_event_hk(
-                v_event_bk, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            INSERT INTO business.site_session_h (site_session_hk, site_session_bk, tenant_hk, load_date, record_source)
+            SELECT DISTINCT ON (session_hk) session_hk, session_bk, tenant_hk, v_load_date, v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (site_session_hk) DO NOTHING;
             
-            v_session_hk := business.get_or_create_site_session_hk(
-                v_session_bk, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            INSERT INTO business.site_visitor_h (site_visitor_hk, site_visitor_bk, tenant_hk, load_date, record_source)
+            SELECT DISTINCT ON (visitor_hk) visitor_hk, visitor_bk, tenant_hk, v_load_date, v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (site_visitor_hk) DO NOTHING;
             
-            v_visitor_hk := business.get_or_create_site_visitor_hk(
-                v_visitor_bk, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            INSERT INTO business.site_page_h (site_page_hk, site_page_bk, tenant_hk, load_date, record_source)
+            SELECT DISTINCT ON (page_hk) page_hk, page_bk, tenant_hk, v_load_date, v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (site_page_hk) DO NOTHING;
             
-            v_page_hk := business.get_or_create_site_page_hk(
-                v_staging_record.page_url, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            -- Links (hash keys built exactly as business.get_or_create_*_link() build them)
+            INSERT INTO business.event_session_l (
+                link_event_session_hk, site_event_hk, site_session_hk, tenant_hk, load_date, record_source
+            )
+            SELECT 
+                util.hash_binary(encode(event_hk, 'hex') || encode(session_hk, 'hex') || encode(tenant_hk, 'hex')),
+                event_hk, session_hk, tenant_hk, v_load_date, v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (link_event_session_hk) DO NOTHING;
             
-            -- Create business links using existing functions
-            PERFORM business.get_or_create_event_session_link(
-                v_event_hk, v_session_hk, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            INSERT INTO business.event_page_l (
+                link_event_page_hk, site_event_hk, site_page_hk, tenant_hk, load_date, record_source
+            )
+            SELECT 
+                util.hash_binary(encode(event_hk, 'hex') || encode(page_hk, 'hex') || encode(tenant_hk, 'hex')),
+                event_hk, page_hk, tenant_hk, v_load_date, v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (link_event_page_hk) DO NOTHING;
             
-            PERFORM business.get_or_create_event_page_link(
-                v_event_hk, v_page_hk, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            INSERT INTO business.session_visitor_l (
+                link_session_visitor_hk, site_session_hk, site_visitor_hk, tenant_hk, load_date, record_source
+            )
+            SELECT DISTINCT ON (link_hk) link_hk, session_hk, visitor_hk, tenant_hk, v_load_date, v_record_source
+            FROM (
+                SELECT 
+                    util.hash_binary(encode(session_hk, 'hex') || encode(visitor_hk, 'hex') || encode(tenant_hk, 'hex')) AS link_hk,
+                    session_hk, visitor_hk, tenant_hk
+                FROM staging_business_batch
+                WHERE error_message IS NULL
+            ) l
+            ON CONFLICT (link_session_visitor_hk) DO NOTHING;
             
-            PERFORM business.get_or_create_session_visitor_link(
-                v_session_hk, v_visitor_hk, v_staging_record.tenant_hk, 'staging_processor'
-            );
+            -- Event satellite (same columns and hash_diff as business.insert_event_details())
+            INSERT INTO business.site_event_details_s (
+                site_event_hk, load_date, hash_diff,
+                event_timestamp, event_type, event_category, event_action,
+                event_currency, page_url, page_title,
+                personalization_applied, custom_properties, record_source
+            )
+            SELECT 
+                event_hk, v_load_date, util.hash_binary(event_data::text),
+                event_timestamp,
+                event_data->>'event_type',
+                event_data->>'event_category',
+                event_data->>'event_action',
+                'USD',
+                event_data->>'page_url',
+                event_data->>'page_title',
+                false,
+                event_data->'custom_properties',
+                v_record_source
+            FROM staging_business_batch
+            WHERE error_message IS NULL
+            ON CONFLICT (site_event_hk, load_date) DO NOTHING;
             
-            -- Create event satellite using existing function
-            PERFORM business.insert_event_details(
-                v_event_hk,
-                jsonb_build_object(
-                    'event_timestamp', v_staging_record.event_timestamp,
-                    'event_type', v_staging_record.event_type,
-                    'event_category', 'user_interaction',
-                    'event_action', 'click',
-                    'page_url', v_staging_record.page_url,
-                    'page_title', v_staging_record.page_title,
-                    'custom_properties', jsonb_build_object(
-                        'staging_event_id', v_staging_record.staging_event_id,
-                        'quality_score', v_staging_record.quality_score,
-                        'device_type', v_staging_record.device_type,
-                        'browser_name', v_staging_record.browser_name
-                    )
-                ),
-                'staging_processor'
-            );
-            
-            -- Mark staging record as processed
-            UPDATE staging.site_tracking_events_s 
+            -- Mark staging records as processed
+            UPDATE staging.site_tracking_events_s s
             SET processed_to_business = TRUE,
                 business_processing_timestamp = CURRENT_TIMESTAMP
-            WHERE staging_event_id = v_staging_record.staging_event_id;
-            
-            v_success_count := v_success_count + 1;
+            FROM staging_business_batch b
+            WHERE s.staging_event_id = b.staging_event_id
+            AND b.error_message IS NULL;
             
-            RAISE NOTICE '✅ SUCCESS: staging_event_id % → business', v_staging_record.staging_event_id;
+            GET DIAGNOSTICS v_success_count = ROW_COUNT;
             
         EXCEPTION WHEN OTHERS THEN
-            v_error_count := v_error_count + 1;
-            v_error_details := v_error_details || jsonb_build_object(
-                'staging_event_id', v_staging_record.staging_event_id,
-                'error_message', SQLERRM
-            );
+            -- The bulk load was rolled back (e.g. a business key already owned by another
+            -- tenant); redo the batch row by row so only the offending rows fail
+            v_processing_mode := 'row_by_row_fallback';
+            v_fallback_reason := SQLERRM;
+            v_success_count := 0;
             
-            RAISE NOTICE '❌ ERROR: staging_event_id % failed - %', v_staging_record.staging_event_id, SQLERRM;
+            FOR v_batch_row IN 
+                SELECT * FROM staging_business_batch 
+                WHERE error_message IS NULL 
+                ORDER BY staging_event_id
+            LOOP
+                BEGIN
+                    PERFORM business.get_or_create_site_event_hk(v_batch_row.event_bk, v_batch_row.tenant_hk, v_record_source);
+                    PERFORM business.get_or_create_site_session_hk(v_batch_row.session_bk, v_batch_row.tenant_hk, v_record_source);
+                    PERFORM business.get_or_create_site_visitor_hk(v_batch_row.visitor_bk, v_batch_row.tenant_hk, v_record_source);
+                    PERFORM business.get_or_create_site_page_hk(v_batch_row.event_data->>'page_url', v_batch_row.tenant_hk, v_record_source);
+                    
+                    PERFORM business.get_or_create_event_session_link(
+                        v_batch_row.event_hk, v_batch_row.session_hk, v_batch_row.tenant_hk, v_record_source
+                    );
+                    PERFORM business.get_or_create_event_page_link(
+                        v_batch_row.event_hk, v_batch_row.page_hk, v_batch_row.tenant_hk, v_record_source
+                    );
+                    PERFORM business.get_or_create_session_visitor_link(
+                        v_batch_row.session_hk, v_batch_row.visitor_hk, v_batch_row.tenant_hk, v_record_source
+                    );
+                    
+                    PERFORM business.insert_event_details(v_batch_row.event_hk, v_batch_row.event_data, v_record_source);
+                    
+                    UPDATE staging.site_tracking_events_s 
+                    SET processed_to_business = TRUE,
+                        business_processing_timestamp = CURRENT_TIMESTAMP
+                    WHERE staging_event_id = v_batch_row.staging_event_id;
+                    
+                    v_success_count := v_success_count + 1;
+                    
+                EXCEPTION WHEN OTHERS THEN
+                    UPDATE staging_business_batch 
+                    SET error_message = SQLERRM 
+                    WHERE staging_event_id = v_batch_row.staging_event_id;
+                END;
+            END LOOP;
         END;
-    END LOOP;
+        
+        -- Per-row error capture: report failures and push them behind fresh rows next run
+        UPDATE staging.site_tracking_events_s s
+        SET processing_notes = 'BUSINESS_LOAD_ERROR: ' || b.error_message
+        FROM staging_business_batch b
+        WHERE s.staging_event_id = b.staging_event_id
+        AND b.error_message IS NOT NULL;
+        
+        SELECT 
+            COUNT(*),
+            COALESCE(jsonb_agg(jsonb_build_object(
+                'staging_event_id', b.staging_event_id,
+                'error_message', b.error_message
+            ) ORDER BY b.staging_event_id), '[]'::JSONB)
+        INTO v_error_count, v_error_details
+        FROM staging_business_batch b
+        WHERE b.error_message IS NOT NULL;
+    END IF;
     
-    RAISE NOTICE '🎯 Processing complete: % processed, % success, % errors', 
-                 v_processed_count, v_success_count, v_error_count;
+    DROP TABLE IF EXISTS pg_temp.staging_business_batch;
     
     RETURN QUERY SELECT 
         v_processed_count,
@@ -501,6 +823,11 @@ BEGIN
             'success_count', v_success_count,
             'error_count', v_error_count,
             'error_details', v_error_details,
+            'batch_size', p_batch_size,
+            'batch_full', v_processed_count >= p_batch_size,
+            'processing_mode', v_processing_mode,
+            'fallback_reason', v_fallback_reason,
+            'duration_ms', ROUND(EXTRACT(EPOCH FROM clock_timestamp() - v_started_at)::numeric * 1000, 2),
             'processing_timestamp', CURRENT_TIMESTAMP
         );
 END;
@@ -517,8 +844,13 @@ ADD COLUMN IF NOT EXISTS business_processing_timestamp TIMESTAMP WITH TIME ZONE;
 CREATE INDEX IF NOT EXISTS idx_site_tracking_events_s_processed_to_business 
 ON staging.site_tracking_events_s(processed_to_business);
 
+-- Partial index for the batch claim in staging.process_staging_to_business()
+CREATE INDEX IF NOT EXISTS idx_site_tracking_events_s_business_pending 
+ON staging.site_tracking_events_s(processed_timestamp) 
+WHERE validation_status = 'VALID' AND processed_to_business IS NOT TRUE;
+
 COMMENT ON FUNCTION staging.process_staging_to_business IS 
-'Processes validated staging events to business layer using existing business hub/link/satellite functions. Bridges the gap between staging and business layers.';
+'Processes validated staging events to business layer in batches of p_batch_size: hubs, links and the event satellite are loaded with one INSERT ... ON CONFLICT per table, with per-row error capture. Bridges the gap between staging and business layers.';
 
 -- Updated success message
 SELECT 'Staging layer for universal site tracking created successfully! (WITH staging-to-business processor)' as status; 
\ No newline at end of file
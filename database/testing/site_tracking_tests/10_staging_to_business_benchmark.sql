@@ -0,0 +1,281 @@
+-- ============================================================================
+-- STAGING -> BUSINESS BENCHMARK
+-- Set-based vs row-by-row staging.process_staging_to_business()
+-- ============================================================================
+-- Purpose: Compare events/sec of the set-based processor against the previous
+--          row-by-row implementation on synthetic staging rows
+-- Usage:   psql -f 10_staging_to_business_benchmark.sql
+--          (row count: SET bench.row_count below; default 100000)
+-- Safety:  Everything runs in one transaction and is rolled back at the end
+-- ============================================================================
+
+BEGIN;
+
+SET LOCAL bench.row_count = '100000';
+SET LOCAL bench.batch_size = '5000';
+SET LOCAL client_min_messages = warning;  -- the row-by-row version raises a NOTICE per row
+
+-- Previous implementation, kept only for this comparison
+CREATE OR REPLACE FUNCTION pg_temp.process_staging_to_business_row_by_row()
+RETURNS TABLE (
+    processed_count INTEGER,
+    success_count INTEGER,
+    error_count INTEGER,
+    processing_summary JSONB
+) AS $$
+DECLARE
+    v_staging_record RECORD;
+    v_processed_count INTEGER := 0;
+    v_success_count INTEGER := 0;
+    v_error_count INTEGER := 0;
+    v_event_hk BYTEA;
+    v_session_hk BYTEA;
+    v_visitor_hk BYTEA;
+    v_page_hk BYTEA;
+    v_event_bk VARCHAR(255);
+    v_session_bk VARCHAR(255);
+    v_visitor_bk VARCHAR(255);
+    v_error_details JSONB := '[]'::JSONB;
+BEGIN
+    RAISE NOTICE '🚀 Processing staging events to business layer...';
+    
+    -- Process staging records that haven't been moved to business
+    FOR v_staging_record IN 
+        SELECT * 
+        FROM staging.site_tracking_events_s 
+        WHERE validation_status = 'VALID'
+        AND (processed_to_business IS NULL OR processed_to_business = FALSE)
+        ORDER BY processed_timestamp ASC
+    LOOP
+        v_processed_count := v_processed_count + 1;
+        
+        BEGIN
+            -- Create business keys with correct formats
+            v_event_bk := 'evt_staging_' || v_staging_record.staging_event_id::text;
+            v_session_bk := 'sess_' || COALESCE(v_staging_record.session_id, 'staging_' || v_staging_record.staging_event_id::text);
+            v_visitor_bk := 'visitor_' || COALESCE(
+                LOWER(REGEXP_REPLACE(v_staging_record.user_id, '[^a-zA-Z0-9]', '', 'g')), 
+                'anonymous' || v_staging_record.staging_event_id::text
+            );
+            
+            -- Create/get business hubs using existing functions
+            v_event_hk := business.get_or_create_site_event_hk(
+                v_event_bk, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            v_session_hk := business.get_or_create_site_session_hk(
+                v_session_bk, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            v_visitor_hk := business.get_or_create_site_visitor_hk(
+                v_visitor_bk, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            v_page_hk := business.get_or_create_site_page_hk(
+                v_staging_record.page_url, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            -- Create business links using existing functions
+            PERFORM business.get_or_create_event_session_link(
+                v_event_hk, v_session_hk, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            PERFORM business.get_or_create_event_page_link(
+                v_event_hk, v_page_hk, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            PERFORM business.get_or_create_session_visitor_link(
+                v_session_hk, v_visitor_hk, v_staging_record.tenant_hk, 'staging_processor'
+            );
+            
+            -- Create event satellite using existing function
+            PERFORM business.insert_event_details(
+                v_event_hk,
+                jsonb_build_object(
+                    'event_timestamp', v_staging_record.event_timestamp,
+                    'event_type', v_staging_record.event_type,
+                    'event_category', 'user_interaction',
+                    'event_action', 'click',
+                    'page_url', v_staging_record.page_url,
+                    'page_title', v_staging_record.page_title,
+                    'custom_properties', jsonb_build_object(
+                        'staging_event_id', v_staging_record.staging_event_id,
+                        'quality_score', v_staging_record.quality_score,
+                        'device_type', v_staging_record.device_type,
+                        'browser_name', v_staging_record.browser_name
+                    )
+                ),
+                'staging_processor'
+            );
+            
+            -- Mark staging record as processed
+            UPDATE staging.site_tracking_events_s 
+            SET processed_to_business = TRUE,
+                business_processing_timestamp = CURRENT_TIMESTAMP
+            WHERE staging_event_id = v_staging_record.staging_event_id;
+            
+            v_success_count := v_success_count + 1;
+            
+            RAISE NOTICE '✅ SUCCESS: staging_event_id % → business', v_staging_record.staging_event_id;
+            
+        EXCEPTION WHEN OTHERS THEN
+            v_error_count := v_error_count + 1;
+            v_error_details := v_error_details || jsonb_build_object(
+                'staging_event_id', v_staging_record.staging_event_id,
+                'error_message', SQLERRM
+            );
+            
+            RAISE NOTICE '❌ ERROR: staging_event_id % failed - %', v_staging_record.staging_event_id, SQLERRM;
+        END;
+    END LOOP;
+    
+    RAISE NOTICE '🎯 Processing complete: % processed, % success, % errors', 
+                 v_processed_count, v_success_count, v_error_count;
+    
+    RETURN QUERY SELECT 
+        v_processed_count,
+        v_success_count, 
+        v_error_count,
+        jsonb_build_object(
+            'processed_count', v_processed_count,
+            'success_count', v_success_count,
+            'error_count', v_error_count,
+            'error_details', v_error_details,
+            'processing_timestamp', CURRENT_TIMESTAMP
+        );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TEMP TABLE bench_results (
+    implementation TEXT,
+    row_count INTEGER,
+    calls INTEGER,
+    success_count INTEGER,
+    error_count INTEGER,
+    elapsed_ms NUMERIC
+) ON COMMIT DROP;
+
+-- Synthetic rows: one raw + one VALID staging row per event; sessions, visitors and
+-- pages repeat so hubs and links see realistic ON CONFLICT traffic.
+-- p_prefix keeps the two runs' business keys disjoint so both do the same work.
+CREATE OR REPLACE FUNCTION pg_temp.bench_seed_staging(p_prefix TEXT, p_row_count INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_tenant_hk BYTEA;
+    v_inserted INTEGER;
+BEGIN
+    SELECT tenant_hk INTO v_tenant_hk FROM auth.tenant_h ORDER BY load_date ASC LIMIT 1;
+    
+    WITH raw_rows AS (
+        INSERT INTO raw.site_tracking_events_r (
+            tenant_hk, client_ip, user_agent, raw_payload, batch_id, processing_status, record_source
+        )
+        SELECT 
+            v_tenant_hk,
+            '10.0.0.1'::inet,
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0',
+            jsonb_build_object('evt_type', 'page_view', 'bench_seq', g),
+            'BENCH_' || p_prefix,
+            'PROCESSED',
+            'bench'
+        FROM generate_series(1, p_row_count) g
+        RETURNING raw_event_id
+    ), numbered AS (
+        SELECT raw_event_id, row_number() OVER (ORDER BY raw_event_id) AS n FROM raw_rows
+    )
+    INSERT INTO staging.site_tracking_events_s (
+        raw_event_id, tenant_hk, event_type, session_id, user_id, page_url, page_title,
+        device_type, browser_name, operating_system, event_timestamp, validation_status,
+        enrichment_status, quality_score, record_source
+    )
+    SELECT 
+        raw_event_id,
+        v_tenant_hk,
+        (ARRAY['page_view', 'click', 'scroll', 'form_submit'])[1 + n % 4],
+        p_prefix || '_session_' || (n % (p_row_count / 20 + 1)),
+        p_prefix || '_user_' || (n % (p_row_count / 50 + 1)),
+        'https://bench.example.com/' || p_prefix || '/page/' || (n % 500) || '?utm_source=bench&utm_medium=cpc',
+        'Bench page ' || (n % 500),
+        'desktop', 'Chrome', 'Windows',
+        CURRENT_TIMESTAMP - (n || ' seconds')::interval,
+        'VALID', 'ENRICHED', 1.0, 'bench'
+    FROM numbered;
+    
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+    RETURN v_inserted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Park real pending rows so only synthetic rows are processed (rolled back at the end)
+UPDATE staging.site_tracking_events_s
+SET processed_to_business = TRUE
+WHERE validation_status = 'VALID'
+AND processed_to_business IS NOT TRUE;
+
+-- ----------------------------------------------------------------------------
+-- Run 1: set-based, called in batches until the queue is empty
+-- ----------------------------------------------------------------------------
+DO $$
+DECLARE
+    v_row_count INTEGER := current_setting('bench.row_count')::INTEGER;
+    v_batch_size INTEGER := current_setting('bench.batch_size')::INTEGER;
+    v_result RECORD;
+    v_calls INTEGER := 0;
+    v_success INTEGER := 0;
+    v_errors INTEGER := 0;
+    v_started TIMESTAMP WITH TIME ZONE;
+BEGIN
+    PERFORM pg_temp.bench_seed_staging('setb', v_row_count);
+    
+    v_started := clock_timestamp();
+    LOOP
+        SELECT * INTO v_result FROM staging.process_staging_to_business(v_batch_size);
+        v_calls := v_calls + 1;
+        v_success := v_success + v_result.success_count;
+        v_errors := v_errors + v_result.error_count;
+        EXIT WHEN v_result.processed_count < v_batch_size;
+    END LOOP;
+    
+    INSERT INTO bench_results VALUES (
+        'set_based (batch ' || v_batch_size || ')', v_row_count, v_calls, v_success, v_errors,
+        EXTRACT(EPOCH FROM clock_timestamp() - v_started)::numeric * 1000
+    );
+END $$;
+
+-- ----------------------------------------------------------------------------
+-- Run 2: previous row-by-row implementation, one call over the whole queue
+-- ----------------------------------------------------------------------------
+DO $$
+DECLARE
+    v_row_count INTEGER := current_setting('bench.row_count')::INTEGER;
+    v_result RECORD;
+    v_started TIMESTAMP WITH TIME ZONE;
+BEGIN
+    PERFORM pg_temp.bench_seed_staging('rowb', v_row_count);
+    
+    v_started := clock_timestamp();
+    SELECT * INTO v_result FROM pg_temp.process_staging_to_business_row_by_row();
+    
+    INSERT INTO bench_results VALUES (
+        'row_by_row', v_row_count, 1, v_result.success_count, v_result.error_count,
+        EXTRACT(EPOCH FROM clock_timestamp() - v_started)::numeric * 1000
+    );
+END $$;
+
+-- ----------------------------------------------------------------------------
+-- Results
+-- ----------------------------------------------------------------------------
+SELECT 
+    '📊 STAGING -> BUSINESS BENCHMARK' as benchmark,
+    implementation,
+    row_count,
+    calls,
+    success_count,
+    error_count,
+    ROUND(elapsed_ms, 0) as elapsed_ms,
+    ROUND(success_count / NULLIF(elapsed_ms / 1000, 0), 0) as events_per_sec,
+    ROUND(MAX(elapsed_ms) OVER () / NULLIF(elapsed_ms, 0), 1) as speedup_vs_slowest
+FROM bench_results
+ORDER BY elapsed_ms;
+
+ROLLBACK;
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Resource ID Extraction Benchmarks
+=================================
+
+Compares ResourceIdExtractor with the previous per-value re.match walk on
+tracking batches of realistic size.
+
+Usage (from onevault_api/):
+    python -m app.middleware.extraction_benchmark                  # 10, 50, 100 KB bodies
+    python -m app.middleware.extraction_benchmark --sizes-kb 25 --runs 500
+
+The previous walk ran seven uncompiled patterns against every string and
+emitted a "key:value" candidate for each one; the extractor indexes patterns
+by prefix and only emits identifiers.
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Set
+
+from .resource_extractor import ResourceExtractionConfig, ResourceIdExtractor
+from .tenant_resolver import TenantResolverMiddleware
+
+DEFAULT_SIZES_KB = [10, 50, 100]
+
+
+def legacy_extract(patterns: Dict[str, str], data: Dict[str, Any], resource_ids: Set[str], prefix: str = ""):
+    """The walk TenantResolverMiddleware used before the compiled extractor"""
+    for key, value in data.items():
+        full_key = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, str):
+            for pattern_name, pattern in patterns.items():
+                if re.match(pattern, value):
+                    resource_ids.add(f"{pattern_name}:{value}")
+            resource_ids.add(f"{full_key}:{value}")
+        elif isinstance(value, dict):
+            legacy_extract(patterns, value, resource_ids, full_key)
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                if isinstance(item, dict):
+                    legacy_extract(patterns, item, resource_ids, f"{full_key}[{i}]")
+                elif isinstance(item, str):
+                    resource_ids.add(f"{full_key}[{i}]:{item}")
+
+
+def make_event(rng: random.Random, i: int) -> Dict[str, Any]:
+    """One site tracking event as the storefront script sends it"""
+    return {
+        'event_type': rng.choice(['page_view', 'add_to_cart', 'product_view', 'scroll', 'click']),
+        'page_url': f"https://shop.example.com/products/{rng.randrange(5000)}?utm_source=newsletter&ref={i}",
+        'referrer': 'https://www.google.com/search?q=horse+tack+saddles',
+        'timestamp': f"2025-01-01T12:{i % 60:02d}:{rng.randrange(60):02d}Z",
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36',
+        'event_data': {
+            'session_id': f"sess_{rng.getrandbits(64):016x}",
+            'visitor': {'user_bk': f"user_{rng.randrange(200)}", 'segment': 'returning', 'locale': 'en-US'},
+            'product': {
+                'asset_bk': f"asset_{rng.randrange(5000)}",
+                'name': 'Leather trail saddle with padded seat',
+                'category': 'saddles/trail',
+                'price': round(rng.uniform(20, 900), 2),
+                'variants': ['brown', 'black', 'chestnut'],
+            },
+            'viewport': {'width': 1440, 'height': 900},
+            'scroll_depth': rng.randrange(100),
+            'labels': ['summer-sale', 'free-shipping', 'featured'],
+        },
+    }
+
+
+def make_body(size_kb: int, seed: int = 0) -> Dict[str, Any]:
+    """Tracking batch of roughly size_kb kilobytes of JSON"""
+    rng = random.Random(seed)
+    events = []
+    size = 0
+    while size < size_kb * 1024:
+        event = make_event(rng, len(events))
+        events.append(event)
+        size += len(json.dumps(event))
+    return {'events': events}
+
+
+def _time_runs(runs: int, fn: Callable[[], Set[str]]) -> Dict[str, float]:
+    fn()
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    elapsed = time.perf_counter() - started
+    return {'us_per_body': elapsed / runs * 1e6, 'ids': len(result)}
+
+
+def benchmark_size(size_kb: int, runs: int) -> List[Dict[str, Any]]:
+    """Time both extractors on one body size"""
+    body = make_body(size_kb)
+    patterns = TenantResolverMiddleware().resource_patterns
+    # Large enough that the comparison measures the walk, not the limits
+    extractor = ResourceIdExtractor(patterns, ResourceExtractionConfig(max_ids=1_000_000))
+
+    def run_legacy():
+        resource_ids = set()
+        legacy_extract(patterns, body, resource_ids)
+        return resource_ids
+
+    return [
+        {'extractor': 'legacy', 'events': len(body['events']), **_time_runs(runs, run_legacy)},
+        {'extractor': 'compiled', 'events': len(body['events']),
+         **_time_runs(runs, lambda: extractor.extract(body, path='/api/v1/track'))},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resource ID extraction benchmarks")
+    parser.add_argument('--sizes-kb', type=int, nargs='+', default=DEFAULT_SIZES_KB)
+    parser.add_argument('--runs', type=int, default=200, help="extractions per body size")
+    args = parser.parse_args()
+
+    print("📊 Resource ID extraction benchmarks")
+    print(f"{'body KB':>8}{'events':>8}  {'extractor':<10}{'us/body':>12}{'candidate ids':>15}")
+    for size_kb in args.sizes_kb:
+        for result in benchmark_size(size_kb, args.runs):
+            print(f"{size_kb:>8}{result['events']:>8}  {result['extractor']:<10}"
+                  f"{result['us_per_body']:>12.1f}{result['ids']:>15,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ while providing parallel validation and fail-safe operation.
 """
 
 import asyncio
+import hashlib
 import time
 from typing import Optional, Dict, Any, List
 from fastapi import Request, Response
@@ -16,7 +17,8 @@ from datetime import datetime, timezone
 import json
 
 from ..config.zero_trust_config import ZeroTrustConfig
-from ..utils.database import get_db_connection
+from ..utils.database import get_db_connection_context
+from ..utils.shared_cache import get_shared_cache
 from .zero_trust_middleware import ExistingInfrastructureZeroTrustMiddleware
 
 logger = logging.getLogger(__name__)
@@ -47,8 +49,9 @@ class ProductionZeroTrustMiddleware:
             'start_time': time.time(),
             'request_times': []
         }
-        self.cache = {}
         self.cache_ttl = 300  # 5 minutes
+        # Two-tier cache: per-worker L1 plus shared L2 when SHARED_CACHE_REDIS_URL is set
+        self.cache = get_shared_cache("phase1_context", default_ttl_seconds=self.cache_ttl)
         
         logger.info("🛡️ Phase 1 Zero Trust Gateway initialized in FAIL-SAFE mode")
     
@@ -106,8 +109,9 @@ class ProductionZeroTrustMiddleware:
             # Perform validation using existing infrastructure
             validation_result = await self._validate_using_existing_infrastructure(context)
             
-            # Cache the result
-            self._store_in_cache(cache_key, validation_result)
+            # Cache the result, tagged by token so revocation reaches every worker
+            tags = [self._token_tag(context['api_key'])] if context.get('api_key') else []
+            self._store_in_cache(cache_key, validation_result, tags)
             
             # Update success rate
             if validation_result.get('success', False):
@@ -136,34 +140,27 @@ class ProductionZeroTrustMiddleware:
             context.get('ip_address', ''),
             context.get('endpoint', ''),
             context.get('method', ''),
-            context.get('api_key', '')[:10] if context.get('api_key') else ''
+            # Keys may be shared through L2, so never embed raw key material
+            self._token_tag(context['api_key']) if context.get('api_key') else ''
         ]
         return '_'.join(key_parts)
     
+    @staticmethod
+    def _token_tag(token: str) -> str:
+        """Invalidation tag for results derived from one token"""
+        return f"token:{hashlib.sha256(token.encode()).hexdigest()[:16]}"
+    
     def _get_from_cache(self, key: str) -> Optional[Dict[str, Any]]:
         """Get result from cache if not expired"""
-        if key in self.cache:
-            cached_item = self.cache[key]
-            if time.time() - cached_item['timestamp'] < self.cache_ttl:
-                return cached_item['data']
-            else:
-                # Remove expired item
-                del self.cache[key]
-        return None
+        return self.cache.get(key)
     
-    def _store_in_cache(self, key: str, data: Dict[str, Any]):
-        """Store result in cache"""
-        self.cache[key] = {
-            'data': data,
-            'timestamp': time.time()
-        }
-        
-        # Simple cache size management
-        if len(self.cache) > 1000:
-            # Remove oldest entries
-            oldest_keys = sorted(self.cache.keys(), key=lambda k: self.cache[k]['timestamp'])[:100]
-            for old_key in oldest_keys:
-                del self.cache[old_key]
+    def _store_in_cache(self, key: str, data: Dict[str, Any], tags: Optional[List[str]] = None):
+        """Store result in cache (LRU-bounded, expires after cache_ttl)"""
+        self.cache.set(key, data, ttl=self.cache_ttl, tags=tags or [])
+    
+    def invalidate_token(self, token: str) -> int:
+        """Drop cached results for a revoked token in every worker"""
+        return self.cache.invalidate_tags([self._token_tag(token)])
     
     async def _validate_using_existing_infrastructure(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -221,6 +218,7 @@ class ProductionZeroTrustMiddleware:
             'uptime_seconds': round(self.stats['uptime_seconds'], 2),
             'config_version': self.stats['config_version'],
             'cache_size': len(self.cache),
+            'cache': self.cache.get_stats(),
             'status': 'ACTIVE'
         }
     
@@ -254,9 +252,9 @@ class ProductionZeroTrustMiddleware:
     async def _test_database_connection(self) -> bool:
         """Test database connection"""
         try:
-            # Simple connection test
-            conn = await get_db_connection()
-            await conn.close()
+            # Simple round trip on a pooled connection
+            async with get_db_connection_context() as conn:
+                await conn.fetchval("SELECT 1")
             return True
         except Exception as e:
             logger.error(f"❌ Database connection test failed: {e}")
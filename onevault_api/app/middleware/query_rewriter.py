@@ -11,11 +11,23 @@ SECURITY PRINCIPLE: No query executes without tenant context
 - All UPDATE/DELETE queries get tenant_hk filtering
 - SQL injection attempts are blocked by parameter validation
 - Query patterns are analyzed for security compliance
+
+Rewrite plans are cached per query text (bounded LRU, QUERY_REWRITE_PLAN_CACHE_SIZE):
+the rewritten SQL, how many tenant_hk parameters are spliced before and after
+the caller's parameters, and the security verdict. The application sends the
+same few hundred templates repeatedly, so most queries skip parsing entirely.
+Only surrounding whitespace is normalized; collapsing inner whitespace would be
+unsafe across string literals and line comments.
 """
 
 import logging
+import os
 import re
 import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple, Any
 
@@ -23,8 +35,38 @@ import sqlparse
 from sqlparse.sql import Statement, IdentifierList, Identifier, Function
 from sqlparse.tokens import Keyword, DML
 
+from .sql_lexer import QueryShape, analyze_sql, count_placeholders
+
 logger = logging.getLogger(__name__)
 
+# Stand-in passed through the rewriters to learn where tenant_hk is spliced
+_TENANT_SLOT = object()
+
+# Filter the SELECT rewrite adds to the WHERE clause
+SELECT_TENANT_FILTER = "EXISTS (SELECT 1 FROM auth.tenant_h th WHERE th.tenant_hk = %s)"
+
+@dataclass(frozen=True)
+class RewritePlan:
+    """Cached outcome of rewriting one query template"""
+    rewritten_query: Optional[str]      # None when the query is rejected or not cacheable
+    param_count: int = 0                # %s placeholders in the original query
+    tenant_positions: Tuple[int, ...] = ()  # caller params preceding each spliced tenant_hk
+    error: Optional[str] = None         # security verdict for rejected queries
+    rewritten: bool = False
+
+    @property
+    def cacheable(self) -> bool:
+        return self.rewritten_query is not None or self.error is not None
+
+    def apply(self, tenant_hk: bytes, params: Optional[Tuple]) -> Tuple[str, Tuple]:
+        """Rewritten query and parameters for one execution"""
+        if self.error is not None:
+            raise ValueError(self.error)
+        new_params = list(params or ())
+        for spliced, position in enumerate(self.tenant_positions):
+            new_params.insert(position + spliced, tenant_hk)
+        return self.rewritten_query, tuple(new_params)
+
 class QueryRewriterMiddleware:
     """
     Automatic Tenant Filtering Middleware
@@ -36,7 +78,7 @@ class QueryRewriterMiddleware:
     4. Preventing cross-tenant data access via SQL manipulation
     """
     
-    def __init__(self):
+    def __init__(self, plan_cache_size: Optional[int] = None):
         # Tables that require tenant filtering
         self.tenant_tables = {
             'auth.tenant_h', 'auth.user_h', 'auth.session_h', 'auth.role_h',
@@ -71,6 +113,24 @@ class QueryRewriterMiddleware:
             'api.track_site_event', 'api.ai_secure_chat', 'util.hash_binary',
             'util.current_load_date', 'staging.auto_process_if_needed'
         }
+        
+        # Rewrite plans keyed by normalized query text (LRU)
+        if plan_cache_size is None:
+            plan_cache_size = int(os.getenv('QUERY_REWRITE_PLAN_CACHE_SIZE', '1024'))
+        self.plan_cache_size = plan_cache_size
+        self._plans: "OrderedDict[str, RewritePlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'queries_processed': 0,
+            'queries_rewritten': 0,
+            'security_violations_blocked': 0,
+            'plan_cache_hits': 0,
+            'plan_cache_misses': 0,
+            'plan_cache_evictions': 0,
+            'fast_path_rewrites': 0,
+            'sqlparse_fallbacks': 0,
+            'total_rewriting_time_ms': 0.0,
+        }
     
     def rewrite_query_with_tenant_filter(self, original_query: str, tenant_hk: bytes, 
                                        params: Optional[Tuple] = None) -> Tuple[str, Tuple]:
@@ -85,41 +145,173 @@ class QueryRewriterMiddleware:
         Returns:
             Tuple[str, Tuple]: (rewritten_query, updated_parameters)
         """
+        started = time.perf_counter()
+        plan = self._get_plan(original_query)
+        
+        with self._lock:
+            self._stats['queries_processed'] += 1
+            self._stats['total_rewriting_time_ms'] += (time.perf_counter() - started) * 1000
+            if plan.error is not None:
+                self._stats['security_violations_blocked'] += 1
+            elif plan.rewritten:
+                self._stats['queries_rewritten'] += 1
+        
+        if not plan.cacheable or (plan.error is None and len(params or ()) != plan.param_count):
+            # Plan could not be expressed as a splice, or params don't match the placeholders
+            return self._rewrite_uncached(original_query, tenant_hk, params)
+        return plan.apply(tenant_hk, params)
+    
+    def _get_plan(self, original_query: str) -> RewritePlan:
+        """Cached rewrite plan for a query, compiling it on a miss"""
+        key = original_query.strip()
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self._stats['plan_cache_hits'] += 1
+                return plan
+            self._stats['plan_cache_misses'] += 1
+        
+        plan = self._compile_plan(key)
+        if not plan.cacheable:
+            return plan
+        
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.plan_cache_size:
+                self._plans.popitem(last=False)
+                self._stats['plan_cache_evictions'] += 1
+        return plan
+    
+    def _compile_plan(self, query: str) -> RewritePlan:
+        """Rewrite once with stand-in parameters and record where tenant_hk lands"""
+        param_count = count_placeholders(query)
+        slots = tuple(object() for _ in range(param_count))
+        try:
+            rewritten_query, new_params = self._rewrite_uncached(query, _TENANT_SLOT, slots)
+        except ValueError as e:
+            return RewritePlan(rewritten_query=None, error=str(e))
+        
+        tenant_positions = []
+        seen = 0
+        for param in new_params:
+            if param is _TENANT_SLOT:
+                tenant_positions.append(seen)
+            elif seen < param_count and param is slots[seen]:
+                seen += 1
+            else:
+                return RewritePlan(rewritten_query=None)
+        if seen != param_count:
+            return RewritePlan(rewritten_query=None)
+        
+        return RewritePlan(
+            rewritten_query=rewritten_query,
+            param_count=param_count,
+            tenant_positions=tuple(tenant_positions),
+            rewritten=rewritten_query != query or bool(tenant_positions)
+        )
+    
+    def _rewrite_uncached(self, original_query: str, tenant_hk: bytes,
+                          params: Optional[Tuple] = None) -> Tuple[str, Tuple]:
+        """Rewrite a query without the plan cache: lexer fast path, sqlparse fallback"""
         try:
             # Step 1: Security validation
             self._validate_query_security(original_query)
             
-            # Step 2: Parse the SQL query
-            parsed = sqlparse.parse(original_query)[0]
-            query_type = self._get_query_type(parsed)
-            
-            # Step 3: Check if query needs tenant filtering
-            tables_accessed = self._extract_tables_from_query(parsed)
-            needs_filtering = any(table in self.tenant_tables for table in tables_accessed)
-            
-            if not needs_filtering:
-                # Query doesn't access tenant-specific tables
-                return original_query, params or ()
+            # Step 2: Single-pass analysis for the SQL subset we emit
+            shape = analyze_sql(original_query.strip())
+            with self._lock:
+                self._stats['fast_path_rewrites' if shape is not None else 'sqlparse_fallbacks'] += 1
+            if shape is not None:
+                return self._rewrite_from_shape(original_query, shape, tenant_hk, params)
             
-            # Step 4: Rewrite based on query type
-            if query_type == 'SELECT':
-                return self._rewrite_select_query(original_query, parsed, tenant_hk, params)
-            elif query_type == 'UPDATE':
-                return self._rewrite_update_query(original_query, parsed, tenant_hk, params)
-            elif query_type == 'DELETE':
-                return self._rewrite_delete_query(original_query, parsed, tenant_hk, params)
-            elif query_type == 'INSERT':
-                return self._rewrite_insert_query(original_query, parsed, tenant_hk, params)
-            else:
-                # Unknown query type - pass through with warning
-                logger.warning(f"Unknown query type for rewriting: {query_type}")
-                return original_query, params or ()
+            return self._rewrite_with_sqlparse(original_query, tenant_hk, params)
                 
         except Exception as e:
             logger.error(f"Query rewriting failed: {e}")
             # Fail secure - don't execute potentially unsafe queries
             raise ValueError(f"Query security validation failed: {str(e)}")
     
+    def _rewrite_from_shape(self, original_query: str, shape: QueryShape,
+                            tenant_hk: bytes, params: Optional[Tuple]) -> Tuple[str, Tuple]:
+        """
+        Rewrite using the lexer's analysis
+        
+        Tables are found at any depth and with aliases; the filter goes into
+        the top-level WHERE and tenant_hk is spliced at the parameter position
+        of the placeholder it adds.
+        """
+        if not any(table in self.tenant_tables for table in shape.tables):
+            # Query doesn't access tenant-specific tables
+            return original_query, params or ()
+        
+        query_str = original_query.strip()
+        
+        if shape.query_type == 'SELECT':
+            tenant_filter = SELECT_TENANT_FILTER
+        elif shape.query_type in ('UPDATE', 'DELETE'):
+            if shape.target_table not in self.tenant_tables:
+                return original_query, params or ()
+            tenant_filter = f"{shape.target_alias or shape.target_name}.tenant_hk = %s"
+        elif shape.query_type == 'INSERT':
+            if shape.target_table in self.tenant_tables:
+                logger.info(f"INSERT query detected for tenant table {shape.target_table} - ensure tenant_hk is included")
+            return original_query, params or ()
+        else:
+            # Unknown query type - pass through with warning
+            logger.warning(f"Unknown query type for rewriting: {shape.query_type}")
+            return original_query, params or ()
+        
+        if shape.where_end is not None:
+            # Add tenant filter to existing WHERE clause
+            insert_at = shape.where_end
+            rewritten_query = f"{query_str[:insert_at]} {tenant_filter} AND{query_str[insert_at:]}"
+        elif shape.query_type == 'DELETE':
+            # Require explicit WHERE clause for DELETE operations
+            raise ValueError("DELETE queries must include explicit WHERE clause for security")
+        else:
+            # Add WHERE clause before GROUP BY, ORDER BY, LIMIT, RETURNING, ...
+            insert_at = shape.tail_start if shape.tail_start is not None else len(query_str)
+            before = query_str[:insert_at].strip()
+            after = query_str[insert_at:].strip()
+            rewritten_query = f"{before} WHERE {tenant_filter}"
+            if after:
+                rewritten_query += f" {after}"
+        
+        new_params = list(params or ())
+        new_params.insert(shape.placeholders_before(insert_at), tenant_hk)
+        return rewritten_query, tuple(new_params)
+    
+    def _rewrite_with_sqlparse(self, original_query: str, tenant_hk: bytes,
+                               params: Optional[Tuple] = None) -> Tuple[str, Tuple]:
+        """Fallback rewrite for queries outside the lexer's subset"""
+        # Parse the SQL query
+        parsed = sqlparse.parse(original_query)[0]
+        query_type = self._get_query_type(parsed)
+        
+        # Check if query needs tenant filtering
+        tables_accessed = self._extract_tables_from_query(parsed)
+        needs_filtering = any(table in self.tenant_tables for table in tables_accessed)
+        
+        if not needs_filtering:
+            # Query doesn't access tenant-specific tables
+            return original_query, params or ()
+        
+        # Rewrite based on query type
+        if query_type == 'SELECT':
+            return self._rewrite_select_query(original_query, parsed, tenant_hk, params)
+        elif query_type == 'UPDATE':
+            return self._rewrite_update_query(original_query, parsed, tenant_hk, params)
+        elif query_type == 'DELETE':
+            return self._rewrite_delete_query(original_query, parsed, tenant_hk, params)
+        elif query_type == 'INSERT':
+            return self._rewrite_insert_query(original_query, parsed, tenant_hk, params)
+        else:
+            # Unknown query type - pass through with warning
+            logger.warning(f"Unknown query type for rewriting: {query_type}")
+            return original_query, params or ()
+    
     def _validate_query_security(self, query: str):
         """Validate query doesn't contain dangerous patterns"""
         query_upper = query.upper()
@@ -193,7 +385,7 @@ class QueryRewriterMiddleware:
         if re.search(r'\bWHERE\b', query_str, re.IGNORECASE):
             # Add tenant filter to existing WHERE clause
             where_pattern = r'(\bWHERE\b)'
-            replacement = r'\1 EXISTS (SELECT 1 FROM auth.tenant_h th WHERE th.tenant_hk = %s) AND'
+            replacement = rf'\1 {SELECT_TENANT_FILTER} AND'
             rewritten_query = re.sub(where_pattern, replacement, query_str, flags=re.IGNORECASE)
         else:
             # Add WHERE clause with tenant filter
@@ -207,7 +399,7 @@ class QueryRewriterMiddleware:
             before = query_str[:insert_pos].strip()
             after = query_str[insert_pos:].strip()
             
-            rewritten_query = f"{before} WHERE EXISTS (SELECT 1 FROM auth.tenant_h th WHERE th.tenant_hk = %s)"
+            rewritten_query = f"{before} WHERE {SELECT_TENANT_FILTER}"
             if after:
                 rewritten_query += f" {after}"
         
@@ -337,10 +529,39 @@ class QueryRewriterMiddleware:
     
     def get_rewriting_stats(self) -> Dict[str, Any]:
         """Get query rewriting statistics for monitoring"""
-        # This would track statistics in a real implementation
+        with self._lock:
+            stats = dict(self._stats)
+            cached_plans = len(self._plans)
+        
+        processed = stats.pop('queries_processed')
+        total_ms = stats.pop('total_rewriting_time_ms')
+        lookups = stats['plan_cache_hits'] + stats['plan_cache_misses']
         return {
-            "queries_processed": 0,
-            "queries_rewritten": 0,
-            "security_violations_blocked": 0,
-            "average_rewriting_time_ms": 0
-        } 
\ No newline at end of file
+            "queries_processed": processed,
+            "queries_rewritten": stats['queries_rewritten'],
+            "security_violations_blocked": stats['security_violations_blocked'],
+            "average_rewriting_time_ms": total_ms / processed if processed else 0,
+            "plan_cache_hits": stats['plan_cache_hits'],
+            "plan_cache_misses": stats['plan_cache_misses'],
+            "plan_cache_hit_rate": stats['plan_cache_hits'] / lookups if lookups else 0.0,
+            "plan_cache_evictions": stats['plan_cache_evictions'],
+            "plan_cache_size": cached_plans,
+            "plan_cache_max_size": self.plan_cache_size,
+            "fast_path_rewrites": stats['fast_path_rewrites'],
+            "sqlparse_fallbacks": stats['sqlparse_fallbacks']
+        }
+    
+    def clear_plan_cache(self):
+        """Drop cached rewrite plans (e.g. after changing tenant_tables)"""
+        with self._lock:
+            self._plans.clear()
+
+# Global rewriter instance (shares the plan cache across database wrappers)
+_query_rewriter: Optional[QueryRewriterMiddleware] = None
+
+def get_query_rewriter() -> QueryRewriterMiddleware:
+    """Get global query rewriter instance (singleton pattern)"""
+    global _query_rewriter
+    if _query_rewriter is None:
+        _query_rewriter = QueryRewriterMiddleware()
+    return _query_rewriter
@@ -0,0 +1,457 @@
+"""
+Rate Limiting Middleware
+========================
+
+In-process GCRA (generic cell rate algorithm) limiter keyed by API token,
+tenant and client IP. Over-limit requests get a 429 with Retry-After before
+any middleware or handler touches the database, replacing the per-request
+api.check_rate_limit() round trip.
+
+Each key stores one timestamp, its theoretical arrival time (TAT). A request
+is allowed if the TAT it would push forward stays within the burst tolerance.
+All keys for a request are checked together and only charged if every one
+allows it, so a request denied by the IP limit does not consume token quota.
+
+Limits:
+- Token and IP limits come from RATE_LIMIT_* environment variables
+- The tenant limit is the customer's integrations.api.rateLimit (requests per
+  minute) when the customer config has one, else RATE_LIMIT_TENANT_PER_MINUTE
+- Customer limits are loaded off the request path and cached, for customers
+  in the customer config only; other X-Customer-ID values get no tenant limit
+  and never trigger a load
+- The IP limit is off by default (RATE_LIMIT_IP_PER_MINUTE=0). Behind the
+  platform load balancer request.client is the proxy, so every client would
+  share one bucket. Enable it only once the real client address is known:
+  run uvicorn with --proxy-headers --forwarded-allow-ips=<proxy addresses>,
+  or set RATE_LIMIT_TRUST_FORWARDED_FOR=true when the proxy overwrites
+  X-Forwarded-For
+- A rejected token charges RATE_LIMIT_REJECTED_TOKEN_COST to the token,
+  tenant and IP keys of its request (on_credentials_rejected), so rotating
+  the token does not reset a guesser's quota
+
+With RATE_LIMIT_SHARED=true and a shared cache Redis URL, TATs live in L2 and
+are updated by one Lua script per request, so the limit holds across
+workers. L2 errors fall back to the per-process limiter.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from ..core.config_simple import customer_config_manager
+from ..phase1_zero_trust.cache_engine import LRUTTLCache
+from ..utils.shared_cache import get_shared_cache_backend
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one per limit. ARGV: now_ms, cost, then (interval_ms, burst) per key.
+# Returns {allowed, retry_after_ms, remaining, index of the limiting key}
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local new_tats = {}
+local remaining = -1
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[1 + 2 * i])
+    local burst = tonumber(ARGV[2 + 2 * i])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + interval * cost
+    local allow_at = new_tat - interval * burst
+    if now < allow_at then
+        return {0, tostring(allow_at - now), 0, i}
+    end
+    new_tats[i] = new_tat
+    local left = math.floor((now - allow_at) / interval + 1e-9)
+    if remaining < 0 or left < remaining then remaining = left end
+end
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], tostring(new_tats[i]), 'PX', math.max(math.ceil(new_tats[i] - now), 1))
+end
+return {1, '0', remaining, 0}
+"""
+
+# KEYS: one per limit. ARGV: now_ms, cost, then interval_ms per key.
+# Pushes every TAT forward unconditionally (penalties).
+GCRA_CHARGE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[2 + i])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    tat = tat + interval * cost
+    redis.call('SET', KEYS[i], tostring(tat), 'PX', math.max(math.ceil(tat - now), 1))
+end
+return #KEYS
+"""
+
+
+@dataclass
+class RateLimitConfig:
+    """Rate limiter settings"""
+    enabled: bool = True
+    token_per_minute: int = 600
+    tenant_per_minute: int = 3000        # default when the customer config has no rateLimit
+    ip_per_minute: int = 0               # off until client IPs are resolved behind the proxy (see above)
+    burst_seconds: float = 10.0          # a key may spend this many seconds of quota at once
+    shared: bool = False                 # keep TATs in the shared cache L2 (cross-worker limits)
+    key_prefix: str = "onevault:ratelimit"
+    max_tracked_keys: int = 100000
+    customer_limit_ttl_seconds: float = 300.0
+    customer_limit_load_timeout_seconds: float = 2.0
+    trust_forwarded_for: bool = False    # use X-Forwarded-For behind a trusted proxy
+    rejected_token_cost: int = 5         # extra charge to the caller's keys when its token is rejected
+
+    @classmethod
+    def from_env(cls, prefix: str = "RATE_LIMIT_") -> "RateLimitConfig":
+        """Build rate limit configuration from environment variables"""
+        defaults = cls()
+        return cls(
+            enabled=os.getenv(f"{prefix}ENABLED", str(defaults.enabled)).lower() == "true",
+            token_per_minute=int(os.getenv(f"{prefix}TOKEN_PER_MINUTE", defaults.token_per_minute)),
+            tenant_per_minute=int(os.getenv(f"{prefix}TENANT_PER_MINUTE", defaults.tenant_per_minute)),
+            ip_per_minute=int(os.getenv(f"{prefix}IP_PER_MINUTE", defaults.ip_per_minute)),
+            burst_seconds=float(os.getenv(f"{prefix}BURST_SECONDS", defaults.burst_seconds)),
+            shared=os.getenv(f"{prefix}SHARED", str(defaults.shared)).lower() == "true",
+            key_prefix=os.getenv(f"{prefix}KEY_PREFIX", defaults.key_prefix),
+            max_tracked_keys=int(os.getenv(f"{prefix}MAX_TRACKED_KEYS", defaults.max_tracked_keys)),
+            customer_limit_ttl_seconds=float(os.getenv(f"{prefix}CUSTOMER_LIMIT_TTL_SECONDS", defaults.customer_limit_ttl_seconds)),
+            customer_limit_load_timeout_seconds=float(
+                os.getenv(f"{prefix}CUSTOMER_LIMIT_LOAD_TIMEOUT_SECONDS", defaults.customer_limit_load_timeout_seconds)
+            ),
+            trust_forwarded_for=os.getenv(f"{prefix}TRUST_FORWARDED_FOR", str(defaults.trust_forwarded_for)).lower() == "true",
+            rejected_token_cost=int(os.getenv(f"{prefix}REJECTED_TOKEN_COST", defaults.rejected_token_cost)),
+        )
+
+
+@dataclass
+class RateLimit:
+    """One limit to check for a request"""
+    scope: str            # 'token', 'tenant' or 'ip'
+    key: str
+    per_minute: int
+    burst_seconds: float
+
+    @property
+    def interval(self) -> float:
+        """Seconds between requests at the sustained rate"""
+        return 60.0 / self.per_minute
+
+    @property
+    def burst(self) -> float:
+        """Requests that may arrive back to back"""
+        return max(1.0, self.per_minute * self.burst_seconds / 60.0)
+
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of checking every limit for a request"""
+    allowed: bool
+    retry_after: float = 0.0
+    remaining: int = 0
+    limit: Optional[RateLimit] = None   # the limit that denied, or the tightest one
+
+
+class GCRALimiter:
+    """
+    Per-process GCRA state for any number of keys
+
+    TATs live in an LRUTTLCache; an entry expires once its TAT is in the
+    past, which is the same as the key never having been seen.
+    """
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._tats = LRUTTLCache(max_entries=max_keys, default_ttl=60, clock=clock)
+        self._lock = threading.Lock()
+
+    def check(self, limits: List[RateLimit], cost: float = 1) -> RateLimitDecision:
+        """Charge cost to every limit if all of them allow it"""
+        with self._lock:
+            now = self._clock()
+            new_tats = []
+            tightest = None
+            for limit in limits:
+                tat = max(self._tats.get(limit.key) or now, now)
+                new_tat = tat + limit.interval * cost
+                allow_at = new_tat - limit.interval * limit.burst
+                if now < allow_at:
+                    return RateLimitDecision(allowed=False, retry_after=allow_at - now, limit=limit)
+                remaining = int((now - allow_at) / limit.interval + 1e-9)
+                if tightest is None or remaining < tightest[0]:
+                    tightest = (remaining, limit)
+                new_tats.append((limit.key, new_tat))
+
+            for key, new_tat in new_tats:
+                self._tats.set(key, new_tat, ttl=max(new_tat - now, 0.001))
+            if tightest is None:
+                return RateLimitDecision(allowed=True)
+            return RateLimitDecision(allowed=True, remaining=tightest[0], limit=tightest[1])
+
+    def charge(self, limit: RateLimit, cost: float):
+        """Push a key's TAT forward without checking it (penalties)"""
+        with self._lock:
+            now = self._clock()
+            tat = max(self._tats.get(limit.key) or now, now) + limit.interval * cost
+            self._tats.set(limit.key, tat, ttl=max(tat - now, 0.001))
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class RateLimitMiddleware:
+    """
+    Token / tenant / IP rate limiting in front of all database work
+
+    Register as the outermost HTTP middleware so limited requests never
+    reach the zero trust middlewares or the handlers.
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None,
+                 customer_limit_loader: Optional[Callable[[str], Optional[int]]] = None,
+                 backend: Any = None,
+                 is_known_customer: Optional[Callable[[str], bool]] = None):
+        self.config = config or RateLimitConfig.from_env()
+        self.excluded_paths = {
+            '/health', '/health/db', '/docs', '/redoc', '/openapi.json', '/'
+        }
+        self.limiter = GCRALimiter(max_keys=self.config.max_tracked_keys)
+        self._load_customer_limit = customer_limit_loader or load_customer_rate_limit
+        self._is_known_customer = is_known_customer or customer_config_manager.is_valid_customer
+        self._customer_limits = LRUTTLCache(max_entries=10000, default_ttl=self.config.customer_limit_ttl_seconds)
+        self._customer_loads: Dict[str, asyncio.Task] = {}
+        self._backend = backend
+        self._script = None
+        self._charge_script = None
+        self.stats = {
+            'allowed': 0,
+            'limited': 0,
+            'limited_by_scope': {'token': 0, 'tenant': 0, 'ip': 0},
+            'shared_checks': 0,
+            'shared_fallbacks': 0,
+            'penalties': 0,
+            'unknown_customers': 0,
+            'customer_limit_load_failures': 0,
+        }
+        logger.info(f"🛡️ Rate limiter initialized: token={self.config.token_per_minute}/min, "
+                    f"tenant={self.config.tenant_per_minute}/min, ip={self.config.ip_per_minute}/min, "
+                    f"shared={self.config.shared}")
+
+    async def __call__(self, request: Request, call_next):
+        """Reject over-limit requests with 429, otherwise pass through"""
+        if not self.config.enabled or self._should_skip(request):
+            return await call_next(request)
+
+        limits = self.limits_for(request)
+        request.state.rate_limits = limits  # reused by on_credentials_rejected()
+        decision = await self.check(limits)
+        if not decision.allowed:
+            self.stats['limited'] += 1
+            self.stats['limited_by_scope'][decision.limit.scope] += 1
+            retry_after = max(1, math.ceil(decision.retry_after))
+            logger.warning(f"⚠️ Rate limit exceeded ({decision.limit.scope}) on {request.url.path}, "
+                           f"retry after {retry_after}s")
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "detail": "Rate limit exceeded",
+                    "limit_scope": decision.limit.scope,
+                    "retry_after_seconds": retry_after,
+                },
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(decision.limit.per_minute),
+                    "X-RateLimit-Remaining": "0",
+                },
+            )
+
+        self.stats['allowed'] += 1
+        response = await call_next(request)
+        if decision.limit is not None:
+            response.headers["X-RateLimit-Limit"] = str(decision.limit.per_minute)
+            response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
+        return response
+
+    def _should_skip(self, request: Request) -> bool:
+        return request.method == "OPTIONS" or request.url.path in self.excluded_paths
+
+    def _client_ip(self, request: Request) -> Optional[str]:
+        if self.config.trust_forwarded_for:
+            forwarded = request.headers.get('X-Forwarded-For')
+            if forwarded:
+                return forwarded.split(',')[0].strip()
+        return request.client.host if request.client else None
+
+    def _limit(self, scope: str, identity: str, per_minute: int) -> RateLimit:
+        return RateLimit(scope=scope, key=f"{self.config.key_prefix}:{scope}:{identity}",
+                         per_minute=per_minute, burst_seconds=self.config.burst_seconds)
+
+    def limits_for(self, request: Request) -> List[RateLimit]:
+        """The token, tenant and IP limits that apply to a request"""
+        limits = []
+
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header[7:].strip() if auth_header.startswith('Bearer ') else request.headers.get('X-API-Key')
+        if token and self.config.token_per_minute > 0:
+            limits.append(self._limit('token', token_hash(token), self.config.token_per_minute))
+
+        customer_id = request.headers.get('X-Customer-ID')
+        if customer_id and not self._is_known_customer(customer_id):
+            self.stats['unknown_customers'] += 1
+        elif customer_id:
+            tenant_limit = self.customer_limit(customer_id)
+            if tenant_limit > 0:
+                limits.append(self._limit('tenant', customer_id, tenant_limit))
+
+        client_ip = self._client_ip(request)
+        if client_ip and self.config.ip_per_minute > 0:
+            limits.append(self._limit('ip', client_ip, self.config.ip_per_minute))
+
+        return limits
+
+    def customer_limit(self, customer_id: str) -> int:
+        """Customer's requests per minute, loading it in the background on a miss"""
+        cached = self._customer_limits.get(customer_id)
+        if cached is not None:
+            return cached
+        self._schedule_customer_load(customer_id)
+        return self.config.tenant_per_minute
+
+    async def preload_customer_limits(self, customer_ids: Optional[List[str]] = None):
+        """Load every known customer's limit up front (call at startup)"""
+        if customer_ids is None:
+            customer_ids = customer_config_manager.get_all_customer_ids()
+        await asyncio.gather(*(self._refresh_customer_limit(customer_id) for customer_id in customer_ids))
+
+    def _schedule_customer_load(self, customer_id: str):
+        if customer_id in self._customer_loads:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._refresh_customer_limit(customer_id))
+        except RuntimeError:
+            return  # no event loop (called outside a request); use the default for now
+        self._customer_loads[customer_id] = task
+        task.add_done_callback(lambda done, customer_id=customer_id: self._customer_loads.pop(customer_id, None))
+
+    async def _refresh_customer_limit(self, customer_id: str):
+        try:
+            limit = await asyncio.wait_for(
+                asyncio.to_thread(self._load_customer_limit, customer_id),
+                timeout=self.config.customer_limit_load_timeout_seconds
+            )
+        except Exception as e:
+            self.stats['customer_limit_load_failures'] += 1
+            logger.warning(f"⚠️ Could not load rate limit for customer {customer_id}: {e!r}")
+            limit = None
+        self._customer_limits.set(customer_id, int(limit) if limit else self.config.tenant_per_minute)
+
+    async def check(self, limits: List[RateLimit], cost: float = 1) -> RateLimitDecision:
+        """Check every limit, in L2 when shared limiting is available"""
+        if not limits:
+            return RateLimitDecision(allowed=True)
+
+        backend = self._shared_backend()
+        if backend is not None:
+            try:
+                decision = await asyncio.to_thread(self._check_shared, backend, limits, cost)
+                self.stats['shared_checks'] += 1
+                return decision
+            except Exception as e:
+                backend.l2_failed(e)
+                self.stats['shared_fallbacks'] += 1
+
+        return self.limiter.check(limits, cost)
+
+    def _shared_backend(self):
+        if not self.config.shared:
+            return None
+        backend = self._backend or get_shared_cache_backend()
+        return backend if backend.l2_available() else None
+
+    def _check_shared(self, backend, limits: List[RateLimit], cost: float) -> RateLimitDecision:
+        if self._script is None:
+            self._script = backend.client.register_script(GCRA_SCRIPT)
+        args = [time.time() * 1000, cost]
+        for limit in limits:
+            args.extend([limit.interval * 1000, limit.burst])
+        allowed, retry_after_ms, remaining, index = self._script(keys=[limit.key for limit in limits], args=args)
+        if int(allowed):
+            return RateLimitDecision(allowed=True, remaining=int(remaining),
+                                     limit=min(limits, key=lambda limit: limit.per_minute))
+        return RateLimitDecision(allowed=False, retry_after=float(retry_after_ms) / 1000,
+                                 limit=limits[int(index) - 1])
+
+    async def charge(self, limits: List[RateLimit], cost: float):
+        """Push every limit's TAT forward without checking it, in the same store check() reads"""
+        if not limits:
+            return
+
+        backend = self._shared_backend()
+        if backend is not None:
+            try:
+                await asyncio.to_thread(self._charge_shared, backend, limits, cost)
+                return
+            except Exception as e:
+                backend.l2_failed(e)
+                self.stats['shared_fallbacks'] += 1
+
+        for limit in limits:
+            self.limiter.charge(limit, cost)
+
+    def _charge_shared(self, backend, limits: List[RateLimit], cost: float):
+        if self._charge_script is None:
+            self._charge_script = backend.client.register_script(GCRA_CHARGE_SCRIPT)
+        args = [time.time() * 1000, cost] + [limit.interval * 1000 for limit in limits]
+        self._charge_script(keys=[limit.key for limit in limits], args=args)
+
+    async def on_credentials_rejected(self, request: Request):
+        """
+        Charge extra quota after a request's token failed validation
+
+        Credential stuffing sends a new token on every guess, so the token
+        key alone would never run dry. The penalty goes to every key the
+        request was checked against: the token, the tenant (known
+        X-Customer-ID) and the client IP when the IP limit is on. Call it from
+        the code that rejects the token, e.g. main.validate_auth_token.
+        """
+        if not self.config.enabled or self.config.rejected_token_cost <= 0:
+            return
+        limits = getattr(request.state, 'rate_limits', None)
+        if limits is None:
+            limits = self.limits_for(request)
+        if not limits:
+            return
+        await self.charge(limits, self.config.rejected_token_cost)
+        self.stats['penalties'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Rate limiting statistics for monitoring"""
+        return {
+            'enabled': self.config.enabled,
+            'shared': self.config.shared,
+            'tracked_keys': len(self.limiter),
+            'customer_limits_cached': len(self._customer_limits),
+            **self.stats,
+            'limited_by_scope': dict(self.stats['limited_by_scope']),
+        }
+
+
+def token_hash(token: str) -> str:
+    """Rate limit key for a token (same short hash the phase1 caches tag tokens with)"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def load_customer_rate_limit(customer_id: str) -> Optional[int]:
+    """Read integrations.api.rateLimit from the customer configuration"""
+    config = customer_config_manager.get_customer_config(customer_id) or {}
+    return (config.get('integrations') or {}).get('api', {}).get('rateLimit')
@@ -0,0 +1,161 @@
+"""
+Resource ID Extraction Engine
+=============================
+
+Finds the resource identifiers in a request body that the tenant resolver
+must verify against the authenticated tenant.
+
+The resource patterns are compiled once and indexed by their literal prefix
+(user_, asset_, sess_, ...), so a string value costs one dict lookup unless
+it starts with a known prefix. Patterns without a literal prefix (email) are
+only tried on values that contain their required character.
+
+Only values that look like identifiers are reported, plus values stored
+under a key that names a resource type (username, user_bk, ...). Other
+strings in large tracking payloads are not emitted as candidates.
+
+Limits fail secure: a body nested deeper than max_depth or carrying more
+than max_ids identifiers raises ResourceExtractionLimitExceeded instead of
+being checked partially.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+# Leading literal such as "user_" in r'user_[a-zA-Z0-9_-]+'
+_LITERAL_PREFIX = re.compile(r'^([A-Za-z0-9]+_)')
+
+# Characters a prefix-less pattern cannot match without
+_REQUIRED_CHARACTERS = {'email': '@'}
+
+# Keys whose value is a resource identifier whatever it looks like
+DEFAULT_ID_KEYS = frozenset({
+    'user_bk', 'username', 'asset_bk', 'transaction_bk', 'session_token', 'email'
+})
+
+# Fields never walked, on any endpoint (their values are not resource ids)
+DEFAULT_SKIP_KEYS = frozenset({'page_url', 'user_agent', 'ip_address', 'timestamp'})
+
+# Extra fields skipped per endpoint prefix, from the endpoint's request schema
+DEFAULT_ENDPOINT_SKIP_KEYS = {
+    '/api/v1/track': frozenset({'event_type', 'referrer', 'screen', 'viewport', 'utm', 'url'}),
+}
+
+
+class ResourceExtractionLimitExceeded(ValueError):
+    """Request body is too deep or carries too many resource identifiers"""
+
+
+@dataclass
+class ResourceExtractionConfig:
+    """Resource ID extraction settings"""
+    max_depth: int = 32
+    max_ids: int = 5000                  # a full 500-event tracking batch stays well under this
+    skip_keys: frozenset = DEFAULT_SKIP_KEYS
+    endpoint_skip_keys: Dict[str, frozenset] = field(default_factory=lambda: dict(DEFAULT_ENDPOINT_SKIP_KEYS))
+
+    @classmethod
+    def from_env(cls, prefix: str = "RESOURCE_EXTRACTION_") -> "ResourceExtractionConfig":
+        """Build extraction configuration from environment variables"""
+        defaults = cls()
+        skip_keys = os.getenv(f"{prefix}SKIP_KEYS")
+        return cls(
+            max_depth=int(os.getenv(f"{prefix}MAX_DEPTH", defaults.max_depth)),
+            max_ids=int(os.getenv(f"{prefix}MAX_IDS", defaults.max_ids)),
+            skip_keys=frozenset(key.strip() for key in skip_keys.split(',') if key.strip())
+            if skip_keys is not None else defaults.skip_keys,
+        )
+
+
+class ResourceIdExtractor:
+    """
+    Compiled resource ID extractor
+
+    Returns entries in the tenant resolver's "type:value" format: one typed
+    entry per matched pattern and one "path:value" entry recording where
+    the identifier was found.
+    """
+
+    def __init__(self, patterns: Dict[str, str], config: Optional[ResourceExtractionConfig] = None,
+                 id_keys: Iterable[str] = DEFAULT_ID_KEYS):
+        self.config = config or ResourceExtractionConfig.from_env()
+        self.id_keys = frozenset(id_keys)
+        self._by_prefix: Dict[str, List[Tuple[str, Pattern]]] = {}
+        self._unprefixed: List[Tuple[str, Pattern, Optional[str]]] = []
+
+        for name, pattern in patterns.items():
+            compiled = re.compile(pattern)
+            literal = _LITERAL_PREFIX.match(pattern)
+            if literal:
+                self._by_prefix.setdefault(literal.group(1), []).append((name, compiled))
+            else:
+                self._unprefixed.append((name, compiled, _REQUIRED_CHARACTERS.get(name)))
+
+    def skip_keys_for(self, path: str) -> Set[str]:
+        """Keys to skip for an endpoint: global skips plus its longest matching prefix"""
+        best_prefix = None
+        for prefix in self.config.endpoint_skip_keys:
+            if path.startswith(prefix) and (best_prefix is None or len(prefix) > len(best_prefix)):
+                best_prefix = prefix
+        if best_prefix is None:
+            return self.config.skip_keys
+        return self.config.skip_keys | self.config.endpoint_skip_keys[best_prefix]
+
+    def match(self, value: str) -> List[str]:
+        """Names of the resource patterns a string matches"""
+        names = []
+        head, separator, _ = value.partition('_')
+        if separator:
+            for name, pattern in self._by_prefix.get(head + '_', ()):
+                if pattern.match(value):
+                    names.append(name)
+        for name, pattern, required in self._unprefixed:
+            if (required is None or required in value) and pattern.match(value):
+                names.append(name)
+        return names
+
+    def extract(self, data: Any, resource_ids: Optional[Set[str]] = None, path: str = "",
+                prefix: str = "") -> Set[str]:
+        """Add every resource identifier in data to resource_ids and return it"""
+        if resource_ids is None:
+            resource_ids = set()
+        self._walk(data, prefix, 0, resource_ids, self.skip_keys_for(path))
+        return resource_ids
+
+    def _walk(self, data: Any, key_path: str, depth: int, resource_ids: Set[str], skip_keys: Set[str]):
+        if depth > self.config.max_depth:
+            raise ResourceExtractionLimitExceeded(
+                f"Request body nested deeper than {self.config.max_depth} levels"
+            )
+
+        # Key paths are only built for identifiers and containers, not every field
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if key in skip_keys:
+                    continue
+                if isinstance(value, str):
+                    self._add_value(resource_ids, key, value, f"{key_path}.{key}" if key_path else key)
+                elif isinstance(value, (dict, list)):
+                    self._walk(value, f"{key_path}.{key}" if key_path else key, depth + 1, resource_ids, skip_keys)
+        elif isinstance(data, list):
+            for i, value in enumerate(data):
+                if isinstance(value, str):
+                    self._add_value(resource_ids, None, value, f"{key_path}[{i}]")
+                elif isinstance(value, (dict, list)):
+                    self._walk(value, f"{key_path}[{i}]", depth + 1, resource_ids, skip_keys)
+
+    def _add_value(self, resource_ids: Set[str], key: Optional[str], value: str, full_key: str):
+        names = self.match(value)
+        if names or key in self.id_keys:
+            self._add(resource_ids, f"{full_key}:{value}")
+            for name in names:
+                self._add(resource_ids, f"{name}:{value}")
+
+    def _add(self, resource_ids: Set[str], resource_id: str):
+        resource_ids.add(resource_id)
+        if len(resource_ids) > self.config.max_ids:
+            raise ResourceExtractionLimitExceeded(
+                f"Request carries more than {self.config.max_ids} resource identifiers"
+            )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Query Rewrite Benchmarks
+========================
+
+Per-query overhead of QueryRewriterMiddleware with and without the rewrite
+plan cache, over the query templates the zero trust database wrapper issues,
+and of the sql_lexer fast path against the sqlparse rewriter it replaces.
+
+Usage (from onevault_api/):
+    python -m app.middleware.rewrite_benchmark
+    python -m app.middleware.rewrite_benchmark --ops 20000
+
+Uncached rewrites pay for sqlparse plus the security regexes on every call;
+cached rewrites are a dict lookup and a parameter splice. The sqlparse and
+fast_path rows time the analysis and rewrite step alone (no security regexes,
+no plan cache), which is what a cache miss costs on top of validation.
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .query_rewriter import QueryRewriterMiddleware
+from .sql_lexer import analyze_sql
+
+TENANT_HK = bytes(range(32))
+
+# Representative templates: hub lookups, joins, updates and pass-through queries
+QUERIES: List[Tuple[str, Tuple]] = [
+    ("SELECT uh.user_hk, uh.user_bk FROM auth.user_h uh WHERE uh.user_bk = %s", ('user_123',)),
+    ("SELECT up.email, up.first_name FROM auth.user_profile_s up "
+     "JOIN auth.user_h uh ON uh.user_hk = up.user_hk WHERE up.email = %s AND up.load_end_date IS NULL",
+     ('a@example.com',)),
+    ("SELECT ah.asset_bk, ads.asset_name FROM business.asset_h ah "
+     "LEFT JOIN business.asset_details_s ads ON ah.asset_hk = ads.asset_hk ORDER BY ah.asset_bk LIMIT %s",
+     (50,)),
+    ("SELECT th.transaction_bk FROM business.transaction_h th GROUP BY th.transaction_bk", ()),
+    ("UPDATE auth.user_profile_s SET first_name = %s WHERE user_hk = %s", ('Ann', b'\x00' * 32)),
+    ("DELETE FROM auth.session_h WHERE session_bk = %s", ('sess_1',)),
+    ("SELECT country_code, country_name FROM ref.country_r", ()),
+    ("SELECT api.track_site_event(%s, %s, %s)", ('1.2.3.4', 'ua', '/')),
+]
+
+
+def _time_ops(label: str, ops: int, fn: Callable[[int], None]) -> Dict[str, float]:
+    started = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    return {'operation': label, 'ops': ops, 'us_per_op': elapsed / ops * 1e6, 'ops_per_sec': ops / elapsed}
+
+
+def _rewrite(rewriter: QueryRewriterMiddleware, i: int):
+    query, params = QUERIES[i % len(QUERIES)]
+    try:
+        rewriter.rewrite_query_with_tenant_filter(query, TENANT_HK, params)
+    except ValueError:
+        pass
+
+
+def run(ops: int) -> List[Dict[str, float]]:
+    """Time uncached and cached rewrites over the query mix"""
+    uncached = QueryRewriterMiddleware(plan_cache_size=1)
+    cached = QueryRewriterMiddleware()
+    for i in range(len(QUERIES)):
+        _rewrite(cached, i)
+
+    def rewrite_uncached(i: int):
+        query, params = QUERIES[i % len(QUERIES)]
+        try:
+            uncached._rewrite_uncached(query, TENANT_HK, params)
+        except ValueError:
+            pass
+
+    def rewrite_sqlparse(i: int):
+        query, params = QUERIES[i % len(QUERIES)]
+        uncached._rewrite_with_sqlparse(query, TENANT_HK, params)
+
+    def rewrite_fast_path(i: int):
+        query, params = QUERIES[i % len(QUERIES)]
+        uncached._rewrite_from_shape(query, analyze_sql(query.strip()), TENANT_HK, params)
+
+    return [
+        _time_ops('uncached', ops, rewrite_uncached),
+        _time_ops('plan_cache_hit', ops, lambda i: _rewrite(cached, i)),
+        _time_ops('sqlparse', ops, rewrite_sqlparse),
+        _time_ops('fast_path', ops, rewrite_fast_path),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query rewrite benchmarks")
+    parser.add_argument('--ops', type=int, default=5_000, help="rewrites per scenario")
+    args = parser.parse_args()
+
+    print(f"📊 Query rewrite benchmarks ({len(QUERIES)} templates)")
+    print(f"{'operation':<18}{'us/query':>10}{'queries/sec':>14}")
+    for result in run(args.ops):
+        print(f"{result['operation']:<18}{result['us_per_op']:>10.2f}{result['ops_per_sec']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+SQL Lexer Fast Path
+===================
+
+Single-pass analyzer for the SQL the application sends through
+QueryRewriterMiddleware. One left-to-right scan finds:
+- The statement type (SELECT, INSERT, UPDATE, DELETE), including after WITH
+- Every FROM/JOIN/UPDATE/INTO/DELETE target at any depth (CTEs, subqueries)
+- The main statement's target table and alias
+- The top-level WHERE keyword and the first trailing clause
+  (GROUP BY, ORDER BY, LIMIT, RETURNING, ...)
+- The offset of every %s placeholder
+
+String literals, quoted identifiers, dollar quotes and comments are skipped
+so keywords inside them are never matched. Anything outside the subset
+(several statements, top-level UNION/INTERSECT/EXCEPT, DML inside a CTE,
+named placeholders, unterminated literals) returns None and the caller
+falls back to the sqlparse rewriter.
+"""
+
+import bisect
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+_IDENTIFIER_CHAIN = re.compile(
+    r'(?:[A-Za-z_][A-Za-z0-9_$]*|"(?:[^"]|"")+")(?:\.(?:[A-Za-z_][A-Za-z0-9_$]*|"(?:[^"]|"")+"))*'
+)
+_DOLLAR_TAG = re.compile(r'\$[A-Za-z_]*\$')
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+DML_KEYWORDS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE'})
+SET_OPERATORS = frozenset({'UNION', 'INTERSECT', 'EXCEPT'})
+
+# Clauses that follow WHERE; a missing WHERE is inserted before the first of these
+TAIL_KEYWORDS = frozenset({'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'OFFSET', 'FETCH',
+                           'WINDOW', 'FOR', 'RETURNING'})
+
+# Keywords that end a comma-separated FROM list
+FROM_LIST_END = frozenset({'WHERE', 'SET', 'VALUES', 'ON', 'USING', 'SELECT'}) | TAIL_KEYWORDS | SET_OPERATORS
+
+# Words that can follow a table name but are never its alias
+NOT_ALIASES = frozenset({
+    'WHERE', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'FULL', 'CROSS', 'NATURAL', 'ON',
+    'USING', 'SET', 'VALUES', 'SELECT', 'DEFAULT', 'LATERAL', 'WITH', 'AS', 'TABLESAMPLE',
+}) | TAIL_KEYWORDS | SET_OPERATORS
+
+
+@dataclass
+class QueryShape:
+    """What the rewriter needs to know about one statement"""
+    query_type: str = 'UNKNOWN'
+    tables: List[str] = field(default_factory=list)   # normalized (lower case, unquoted)
+    target_table: Optional[str] = None                 # UPDATE/DELETE/INSERT target, normalized
+    target_name: Optional[str] = None                  # target as written in the query
+    target_alias: Optional[str] = None
+    where_start: Optional[int] = None                  # span of the top-level WHERE keyword
+    where_end: Optional[int] = None
+    tail_start: Optional[int] = None                   # first top-level trailing clause
+    placeholder_offsets: List[int] = field(default_factory=list)
+
+    def placeholders_before(self, offset: int) -> int:
+        """Number of %s placeholders that start before offset"""
+        return bisect.bisect_left(self.placeholder_offsets, offset)
+
+
+def normalize_identifier(name: str) -> str:
+    """schema.table with quotes removed and unquoted parts lower-cased"""
+    parts = []
+    for part in re.findall(r'"(?:[^"]|"")+"|[^.]+', name):
+        parts.append(part[1:-1].replace('""', '"') if part.startswith('"') else part.lower())
+    return '.'.join(parts)
+
+
+def count_placeholders(query: str) -> int:
+    """Positional %s placeholders as psycopg2 sees them (%% is a literal percent)"""
+    return sum(1 for match in _PLACEHOLDER.finditer(query) if match.group() == '%s')
+
+
+def analyze_sql(query: str) -> Optional[QueryShape]:
+    """Analyze one statement in a single pass; None if it is outside the supported subset"""
+    shape = QueryShape()
+    length = len(query)
+    i = 0
+    depth = 0
+    expect = None                 # 'table' after FROM/JOIN/..., 'alias' after a table name
+    target_pending = False        # next table is the main statement's target
+    from_lists = {}               # depth -> comma continues a FROM list at that depth
+
+    while i < length:
+        c = query[i]
+
+        if c.isspace():
+            i += 1
+            continue
+
+        if c.isalpha() or c == '_' or c == '"':
+            match = _IDENTIFIER_CHAIN.match(query, i)
+            if match is None:
+                return None       # unterminated quoted identifier
+            word = match.group()
+            start, i = i, match.end()
+            upper = word.upper()
+
+            if expect == 'table':
+                if upper in ('ONLY', 'LATERAL'):
+                    continue
+                expect = None
+                j = i
+                while j < length and query[j].isspace():
+                    j += 1
+                if j < length and query[j] == '(' and not (target_pending and shape.query_type == 'INSERT'):
+                    continue      # set-returning function, not a table (INSERT INTO t (cols) is)
+                table = normalize_identifier(word)
+                shape.tables.append(table)
+                if target_pending:
+                    shape.target_table, shape.target_name = table, word
+                expect = 'alias'
+                continue
+
+            if expect == 'alias':
+                expect = None
+                if upper == 'AS':
+                    expect = 'alias'
+                    continue
+                if upper not in NOT_ALIASES:
+                    if target_pending:
+                        shape.target_alias = word
+                    target_pending = False
+                    continue
+            target_pending = False
+
+            if upper in DML_KEYWORDS:
+                if depth > 0 and upper != 'SELECT':
+                    return None   # data-modifying CTE or subquery
+                if depth == 0 and shape.query_type == 'UNKNOWN':
+                    shape.query_type = upper
+                    if upper == 'UPDATE':
+                        expect, target_pending = 'table', True
+                    continue
+
+            if upper == 'FROM' or upper == 'JOIN':
+                expect = 'table'
+                if upper == 'FROM':
+                    from_lists[depth] = True
+                    target_pending = (depth == 0 and shape.query_type == 'DELETE'
+                                      and shape.target_table is None)
+                continue
+
+            if depth == 0 and upper == 'INTO' and shape.query_type == 'INSERT' and shape.target_table is None:
+                expect, target_pending = 'table', True
+                continue
+
+            if depth == 0 and upper == 'USING' and shape.query_type == 'DELETE':
+                expect = 'table'
+                from_lists[depth] = True
+                continue
+
+            if upper in FROM_LIST_END:
+                from_lists[depth] = False
+
+            if depth == 0:
+                if upper in SET_OPERATORS:
+                    return None
+                if upper == 'WHERE':
+                    if shape.where_start is not None:
+                        return None
+                    shape.where_start, shape.where_end = start, i
+                elif upper in TAIL_KEYWORDS and shape.tail_start is None and shape.query_type != 'UNKNOWN':
+                    shape.tail_start = start
+            continue
+
+        # Comments may sit anywhere, even between FROM and the table name
+        if c == '-' and query.startswith('--', i):
+            end = query.find('\n', i)
+            i = length if end < 0 else end + 1
+            continue
+
+        if c == '/' and query.startswith('/*', i):
+            end = query.find('*/', i + 2)
+            if end < 0:
+                return None
+            i = end + 2
+            continue
+
+        # Any other token ends a pending table or alias
+        if c == ',':
+            expect = 'table' if from_lists.get(depth) else None
+            target_pending = False
+            i += 1
+            continue
+        expect = None
+        target_pending = False
+
+        if c == "'":
+            i = _skip_string(query, i)
+            if i < 0:
+                return None
+            continue
+
+        if c == '$':
+            tag = _DOLLAR_TAG.match(query, i)
+            if tag is not None:
+                end = query.find(tag.group(), tag.end())
+                if end < 0:
+                    return None
+                i = end + len(tag.group())
+                continue
+            i += 1
+            continue
+
+        if c == '%':
+            if query.startswith('%s', i):
+                shape.placeholder_offsets.append(i)
+                i += 2
+            elif query.startswith('%%', i):
+                i += 2
+            elif query.startswith('%(', i):
+                return None       # named placeholders cannot be spliced by position
+            else:
+                i += 1
+            continue
+
+        if c == '(':
+            depth += 1
+            i += 1
+            continue
+
+        if c == ')':
+            from_lists.pop(depth, None)
+            depth -= 1
+            if depth < 0:
+                return None
+            i += 1
+            continue
+
+        if c == ';':
+            if not _only_comments_after(query, i + 1):
+                return None       # several statements
+            break
+
+        i += 1
+
+    if depth != 0:
+        return None
+    return shape
+
+
+def _only_comments_after(query: str, i: int) -> bool:
+    """True if only whitespace and comments follow offset i"""
+    length = len(query)
+    while i < length:
+        if query[i].isspace():
+            i += 1
+        elif query.startswith('--', i):
+            end = query.find('\n', i)
+            i = length if end < 0 else end + 1
+        elif query.startswith('/*', i):
+            end = query.find('*/', i + 2)
+            if end < 0:
+                return False
+            i = end + 2
+        else:
+            return False
+    return True
+
+
+def _skip_string(query: str, i: int) -> int:
+    """Offset just past the single-quoted literal starting at i, or -1 if unterminated"""
+    length = len(query)
+    i += 1
+    while True:
+        end = query.find("'", i)
+        if end < 0:
+            return -1
+        if end + 1 < length and query[end + 1] == "'":
+            i = end + 2   # '' escape
+            continue
+        return end + 1
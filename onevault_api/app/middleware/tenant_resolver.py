@@ -17,15 +17,17 @@ SECURITY PRINCIPLE: "Never Trust, Always Verify"
 import hashlib
 import json
 import logging
-import re
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any, Set
 from urllib.parse import parse_qs
 
-import psycopg2
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 
+from ..utils.database import get_db_connection_context
+from ..phase1_zero_trust.single_flight import SingleFlight
+from .resource_extractor import ResourceIdExtractor, ResourceExtractionLimitExceeded
+
 logger = logging.getLogger(__name__)
 
 class TenantResolverMiddleware:
@@ -56,10 +58,21 @@ class TenantResolverMiddleware:
             'email': r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
         }
         
+        # Resource types verified against the tenant; other types are allowed
+        self.validated_resource_types = {
+            'user_bk', 'username', 'asset_bk', 'transaction_bk', 'session_token', 'email'
+        }
+        
+        # Patterns compiled once and indexed by prefix, with depth/count limits
+        self.resource_extractor = ResourceIdExtractor(self.resource_patterns)
+        
         # Sensitive endpoints that require additional validation
         self.sensitive_endpoints = {
             '/api/v1/track', '/api/v1/ai/', '/api/auth_', '/api/ai_'
         }
+        
+        # Concurrent requests with the same API key share one tenant lookup
+        self._api_key_flight = SingleFlight("tenant_api_key")
     
     async def __call__(self, request: Request, call_next):
         """Main middleware entry point - implements zero trust validation"""
@@ -188,37 +201,21 @@ class TenantResolverMiddleware:
             if isinstance(values, str):
                 resource_ids.add(f"{key}:{values}")
         
-        # Extract from request body recursively
-        self._extract_resources_from_dict(body, resource_ids)
+        # Extract from request body (fails secure when the body exceeds the extraction limits)
+        try:
+            self.resource_extractor.extract(body, resource_ids, path=request.url.path)
+        except ResourceExtractionLimitExceeded as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
         # Extract session token from body if not in headers
-        if 'session_token' in body:
+        if isinstance(body, dict) and 'session_token' in body:
             resource_ids.add(f"session_token:{body['session_token']}")
         
         return resource_ids
     
     def _extract_resources_from_dict(self, data: Dict[str, Any], resource_ids: Set[str], prefix: str = ""):
-        """Recursively extract resource IDs from nested dictionary"""
-        for key, value in data.items():
-            full_key = f"{prefix}.{key}" if prefix else key
-            
-            if isinstance(value, str):
-                # Check if value matches any resource pattern
-                for pattern_name, pattern in self.resource_patterns.items():
-                    if re.match(pattern, value):
-                        resource_ids.add(f"{pattern_name}:{value}")
-                
-                # Also add as generic key:value for validation
-                resource_ids.add(f"{full_key}:{value}")
-                
-            elif isinstance(value, dict):
-                self._extract_resources_from_dict(value, resource_ids, full_key)
-            elif isinstance(value, list):
-                for i, item in enumerate(value):
-                    if isinstance(item, dict):
-                        self._extract_resources_from_dict(item, resource_ids, f"{full_key}[{i}]")
-                    elif isinstance(item, str):
-                        resource_ids.add(f"{full_key}[{i}]:{item}")
+        """Extract resource IDs from a nested dictionary using the compiled extractor"""
+        self.resource_extractor.extract(data, resource_ids, prefix=prefix)
     
     async def _resolve_tenant_from_api_key(self, api_key: str) -> bytes:
         """
@@ -227,33 +224,11 @@ class TenantResolverMiddleware:
         SECURITY: This is the core tenant resolution - must be bulletproof
         """
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
             # Hash the API key for lookup
             api_key_hash = hashlib.sha256(api_key.encode()).digest()
-            
-            # Query to resolve tenant from API key with security validation
-            query = """
-            SELECT 
-                th.tenant_hk,
-                th.tenant_bk,
-                ats.expires_at,
-                ats.is_active,
-                ats.created_date
-            FROM auth.api_token_s ats
-            JOIN auth.tenant_h th ON ats.tenant_hk = th.tenant_hk
-            WHERE ats.api_key_hash = %s 
-                AND ats.is_active = true
-                AND ats.expires_at > CURRENT_TIMESTAMP
-                AND ats.load_end_date IS NULL
-            """
-            
-            cursor.execute(query, (api_key_hash,))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
+            result = await self._api_key_flight.do(
+                api_key_hash, lambda: self._fetch_api_key_tenant(api_key_hash)
+            )
             
             if not result:
                 raise HTTPException(
@@ -288,6 +263,31 @@ class TenantResolverMiddleware:
                 detail="Tenant resolution failed"
             )
     
+    async def _fetch_api_key_tenant(self, api_key_hash: bytes):
+        """Look up the tenant row for an API key hash (shared by coalesced callers)"""
+        async with get_db_connection_context() as conn:
+            # Query to resolve tenant from API key with security validation
+            query = """
+            SELECT 
+                th.tenant_hk,
+                th.tenant_bk,
+                ats.expires_at,
+                ats.is_active,
+                ats.created_date
+            FROM auth.api_token_s ats
+            JOIN auth.tenant_h th ON ats.tenant_hk = th.tenant_hk
+            WHERE ats.api_key_hash = %s 
+                AND ats.is_active = true
+                AND ats.expires_at > CURRENT_TIMESTAMP
+                AND ats.load_end_date IS NULL
+            """
+            
+            return await conn.fetchrow(query, api_key_hash)
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Executed vs. coalesced API key lookups"""
+        return self._api_key_flight.get_stats()
+    
     async def _resolve_user_from_session(self, session_token: str, tenant_hk: bytes) -> Optional[bytes]:
         """
         Resolve user from session token and verify belongs to tenant
@@ -295,33 +295,27 @@ class TenantResolverMiddleware:
         SECURITY: User must belong to the authenticated tenant
         """
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to resolve user from session with tenant validation
-            query = """
-            SELECT 
-                uh.user_hk,
-                uh.user_bk,
-                ss.session_status,
-                ss.expires_at,
-                ss.last_activity
-            FROM auth.session_h sh
-            JOIN auth.session_state_s ss ON sh.session_hk = ss.session_hk
-            JOIN auth.user_session_l usl ON sh.session_hk = usl.session_hk
-            JOIN auth.user_h uh ON usl.user_hk = uh.user_hk
-            WHERE sh.session_bk = %s
-                AND uh.tenant_hk = %s
-                AND ss.session_status = 'ACTIVE'
-                AND ss.expires_at > CURRENT_TIMESTAMP
-                AND ss.load_end_date IS NULL
-            """
-            
-            cursor.execute(query, (session_token, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
+            async with get_db_connection_context() as conn:
+                # Query to resolve user from session with tenant validation
+                query = """
+                SELECT 
+                    uh.user_hk,
+                    uh.user_bk,
+                    ss.session_status,
+                    ss.expires_at,
+                    ss.last_activity
+                FROM auth.session_h sh
+                JOIN auth.session_state_s ss ON sh.session_hk = ss.session_hk
+                JOIN auth.user_session_l usl ON sh.session_hk = usl.session_hk
+                JOIN auth.user_h uh ON usl.user_hk = uh.user_hk
+                WHERE sh.session_bk = %s
+                    AND uh.tenant_hk = %s
+                    AND ss.session_status = 'ACTIVE'
+                    AND ss.expires_at > CURRENT_TIMESTAMP
+                    AND ss.load_end_date IS NULL
+                """
+                
+                result = await conn.fetchrow(query, session_token, tenant_hk)
             
             if not result:
                 # Session token provided but invalid or cross-tenant
@@ -349,13 +343,14 @@ class TenantResolverMiddleware:
         Validate all extracted resource IDs belong to the authenticated tenant
         
         SECURITY: This prevents cross-tenant resource access
+        
+        All resources are checked together by one bulk lookup; the first
+        resource that does not belong to the tenant blocks the request.
         """
         if not resource_ids:
             return  # No resources to validate
         
-        from ..services.resource_validator import ResourceValidationService
-        validator = ResourceValidationService()
-        
+        resources = []
         for resource_id in resource_ids:
             if ':' not in resource_id:
                 continue  # Skip malformed resource IDs
@@ -366,47 +361,30 @@ class TenantResolverMiddleware:
             if resource_type in ['page_url', 'user_agent', 'ip_address', 'timestamp']:
                 continue
             
-            # Validate resource based on type
-            is_valid = await self._validate_single_resource(
-                validator, resource_type, resource_value, tenant_hk
-            )
+            if resource_type not in self.validated_resource_types:
+                # For unknown resource types, default to allowing
+                logger.debug(f"Unknown resource type for validation: {resource_type}")
+                continue
             
-            if not is_valid:
+            resources.append((resource_type, resource_value))
+        
+        if not resources:
+            return
+        
+        from ..services.resource_validator import get_resource_validator
+        try:
+            results = await get_resource_validator().bulk_validate_resources(resources, tenant_hk)
+        except Exception as e:
+            logger.error(f"Resource validation error for {len(resources)} resources: {e}")
+            results = {}  # Fail secure
+        
+        for resource_type, resource_value in sorted(resources):
+            if not results.get(f"{resource_type}:{resource_value}", False):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail=f"Resource {resource_type}:{resource_value} not accessible by authenticated tenant"
                 )
     
-    async def _validate_single_resource(self, validator, resource_type: str, resource_value: str, tenant_hk: bytes) -> bool:
-        """Validate a single resource against tenant context"""
-        try:
-            if resource_type == 'user_bk' or resource_type == 'username':
-                return await validator.verify_user_belongs_to_tenant(resource_value, tenant_hk)
-            elif resource_type == 'asset_bk':
-                return await validator.verify_asset_belongs_to_tenant(resource_value, tenant_hk)
-            elif resource_type == 'transaction_bk':
-                return await validator.verify_transaction_belongs_to_tenant(resource_value, tenant_hk)
-            elif resource_type == 'session_token':
-                return await validator.verify_session_belongs_to_tenant(resource_value, tenant_hk)
-            elif resource_type == 'email':
-                return await validator.verify_user_email_belongs_to_tenant(resource_value, tenant_hk)
-            else:
-                # For unknown resource types, default to allowing (logged for review)
-                logger.warning(f"Unknown resource type for validation: {resource_type}")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Resource validation error for {resource_type}:{resource_value}: {e}")
-            return False  # Fail secure
-    
-    def _get_db_connection(self):
-        """Get database connection"""
-        import os
-        database_url = os.getenv('SYSTEM_DATABASE_URL')
-        if not database_url:
-            raise ValueError("SYSTEM_DATABASE_URL environment variable not set")
-        return psycopg2.connect(database_url)
-    
     async def _log_successful_validation(self, request: Request, tenant_hk: bytes, user_hk: Optional[bytes]):
         """Log successful zero trust validation for audit trail"""
         try:
@@ -16,7 +16,7 @@ import ipaddress
 from urllib.parse import unquote
 
 from ..config.zero_trust_config import ZeroTrustConfig
-from ..utils.database import get_db_connection
+from ..utils.database import get_db_connection_context
 
 logger = logging.getLogger(__name__)
 
@@ -185,73 +185,70 @@ class ExistingInfrastructureZeroTrustMiddleware:
             return {'success': False, 'message': 'No authentication token provided'}
         
         try:
-            conn = await get_db_connection()
+            async with get_db_connection_context() as conn:
             
-            # Try API key resolution first (preferred method)
-            if api_key:
-                tenant_result = await conn.fetchrow("""
-                    SELECT 
-                        ats.tenant_hk,
-                        ats.token_name,
-                        ats.is_active,
-                        ats.expires_at,
-                        th.tenant_bk,
-                        tps.tenant_name
-                    FROM auth.api_token_s ats
-                    JOIN auth.api_token_h ath ON ats.api_token_hk = ath.api_token_hk
-                    JOIN auth.tenant_h th ON ats.tenant_hk = th.tenant_hk
-                    LEFT JOIN auth.tenant_profile_s tps ON th.tenant_hk = tps.tenant_hk 
-                        AND tps.load_end_date IS NULL
-                    WHERE ats.token_value = $1 
-                    AND ats.load_end_date IS NULL
-                    AND ats.is_active = true
-                    AND (ats.expires_at IS NULL OR ats.expires_at > CURRENT_TIMESTAMP)
-                """, api_key)
+                # Try API key resolution first (preferred method)
+                if api_key:
+                    tenant_result = await conn.fetchrow("""
+                        SELECT 
+                            ats.tenant_hk,
+                            ats.token_name,
+                            ats.is_active,
+                            ats.expires_at,
+                            th.tenant_bk,
+                            tps.tenant_name
+                        FROM auth.api_token_s ats
+                        JOIN auth.api_token_h ath ON ats.api_token_hk = ath.api_token_hk
+                        JOIN auth.tenant_h th ON ats.tenant_hk = th.tenant_hk
+                        LEFT JOIN auth.tenant_profile_s tps ON th.tenant_hk = tps.tenant_hk 
+                            AND tps.load_end_date IS NULL
+                        WHERE ats.token_value = $1 
+                        AND ats.load_end_date IS NULL
+                        AND ats.is_active = true
+                        AND (ats.expires_at IS NULL OR ats.expires_at > CURRENT_TIMESTAMP)
+                    """, api_key)
                 
-                if tenant_result:
-                    await conn.close()
-                    return {
-                        'success': True,
-                        'tenant_hk': tenant_result['tenant_hk'],
-                        'tenant_bk': tenant_result['tenant_bk'],
-                        'tenant_name': tenant_result['tenant_name'],
-                        'auth_method': 'api_key'
-                    }
+                    if tenant_result:
+                        return {
+                            'success': True,
+                            'tenant_hk': tenant_result['tenant_hk'],
+                            'tenant_bk': tenant_result['tenant_bk'],
+                            'tenant_name': tenant_result['tenant_name'],
+                            'auth_method': 'api_key'
+                        }
             
-            # Try session token resolution (alternative method)
-            if session_token:
-                session_result = await conn.fetchrow("""
-                    SELECT 
-                        sss.tenant_hk,
-                        sss.user_hk,
-                        sss.session_status,
-                        sh.session_bk,
-                        th.tenant_bk,
-                        tps.tenant_name
-                    FROM auth.session_state_s sss
-                    JOIN auth.session_h sh ON sss.session_hk = sh.session_hk
-                    JOIN auth.tenant_h th ON sss.tenant_hk = th.tenant_hk
-                    LEFT JOIN auth.tenant_profile_s tps ON th.tenant_hk = tps.tenant_hk 
-                        AND tps.load_end_date IS NULL
-                    WHERE sss.session_token = $1
-                    AND sss.load_end_date IS NULL
-                    AND sss.session_status = 'ACTIVE'
-                    AND sss.expires_at > CURRENT_TIMESTAMP
-                """, session_token)
+                # Try session token resolution (alternative method)
+                if session_token:
+                    session_result = await conn.fetchrow("""
+                        SELECT 
+                            sss.tenant_hk,
+                            sss.user_hk,
+                            sss.session_status,
+                            sh.session_bk,
+                            th.tenant_bk,
+                            tps.tenant_name
+                        FROM auth.session_state_s sss
+                        JOIN auth.session_h sh ON sss.session_hk = sh.session_hk
+                        JOIN auth.tenant_h th ON sss.tenant_hk = th.tenant_hk
+                        LEFT JOIN auth.tenant_profile_s tps ON th.tenant_hk = tps.tenant_hk 
+                            AND tps.load_end_date IS NULL
+                        WHERE sss.session_token = $1
+                        AND sss.load_end_date IS NULL
+                        AND sss.session_status = 'ACTIVE'
+                        AND sss.expires_at > CURRENT_TIMESTAMP
+                    """, session_token)
                 
-                if session_result:
-                    await conn.close()
-                    return {
-                        'success': True,
-                        'tenant_hk': session_result['tenant_hk'],
-                        'user_hk': session_result['user_hk'],
-                        'tenant_bk': session_result['tenant_bk'],
-                        'tenant_name': session_result['tenant_name'],
-                        'auth_method': 'session_token'
-                    }
+                    if session_result:
+                        return {
+                            'success': True,
+                            'tenant_hk': session_result['tenant_hk'],
+                            'user_hk': session_result['user_hk'],
+                            'tenant_bk': session_result['tenant_bk'],
+                            'tenant_name': session_result['tenant_name'],
+                            'auth_method': 'session_token'
+                        }
             
-            await conn.close()
-            return {'success': False, 'message': 'Invalid or expired authentication token'}
+                return {'success': False, 'message': 'Invalid or expired authentication token'}
             
         except Exception as e:
             logger.error(f"Tenant resolution error: {e}")
@@ -268,48 +265,46 @@ class ExistingInfrastructureZeroTrustMiddleware:
         This leverages all the existing behavioral analytics and risk assessment
         """
         try:
-            conn = await get_db_connection()
+            async with get_db_connection_context() as conn:
             
-            # Call existing Zero Trust validation function
-            result = await conn.fetchrow("""
-                SELECT * FROM ai_monitoring.validate_zero_trust_access(
-                    p_tenant_hk := $1,
-                    p_user_hk := $2,
-                    p_token_value := $3,
-                    p_ip_address := $4::inet,
-                    p_user_agent := $5,
-                    p_requested_resource := $6,
-                    p_endpoint := $7
+                # Call existing Zero Trust validation function
+                result = await conn.fetchrow("""
+                    SELECT * FROM ai_monitoring.validate_zero_trust_access(
+                        p_tenant_hk := $1,
+                        p_user_hk := $2,
+                        p_token_value := $3,
+                        p_ip_address := $4::inet,
+                        p_user_agent := $5,
+                        p_requested_resource := $6,
+                        p_endpoint := $7
+                    )
+                """, 
+                    tenant_hk,
+                    user_hk,
+                    context['api_key'] or context['session_token'],
+                    context['ip_address'],
+                    context['user_agent'],
+                    ','.join(context['resources']) if context['resources'] else None,
+                    context['endpoint']
                 )
-            """, 
-                tenant_hk,
-                user_hk,
-                context['api_key'] or context['session_token'],
-                context['ip_address'],
-                context['user_agent'],
-                ','.join(context['resources']) if context['resources'] else None,
-                context['endpoint']
-            )
-            
-            await conn.close()
             
-            if result:
-                return {
-                    'access_granted': result['p_access_granted'],
-                    'risk_score': result['p_risk_score'],
-                    'access_level': result['p_access_level'],
-                    'required_actions': result['p_required_actions'],
-                    'session_valid': result['p_session_valid'],
-                    'user_context': result['p_user_context'],
-                    'message': f"Risk score: {result['p_risk_score']}, Level: {result['p_access_level']}"
-                }
-            else:
-                return {
-                    'access_granted': False,
-                    'risk_score': 100,
-                    'access_level': 'DENIED',
-                    'message': 'Zero Trust validation failed'
-                }
+                if result:
+                    return {
+                        'access_granted': result['p_access_granted'],
+                        'risk_score': result['p_risk_score'],
+                        'access_level': result['p_access_level'],
+                        'required_actions': result['p_required_actions'],
+                        'session_valid': result['p_session_valid'],
+                        'user_context': result['p_user_context'],
+                        'message': f"Risk score: {result['p_risk_score']}, Level: {result['p_access_level']}"
+                    }
+                else:
+                    return {
+                        'access_granted': False,
+                        'risk_score': 100,
+                        'access_level': 'DENIED',
+                        'message': 'Zero Trust validation failed'
+                    }
                 
         except Exception as e:
             logger.error(f"Zero Trust validation error: {e}")
@@ -333,25 +328,23 @@ class ExistingInfrastructureZeroTrustMiddleware:
             return {'all_valid': True, 'invalid_resources': []}
         
         try:
-            conn = await get_db_connection()
-            invalid_resources = []
+            async with get_db_connection_context() as conn:
+                invalid_resources = []
             
-            # Check each resource against business schema tables
-            for resource_id in resource_ids:
-                is_valid = await self._check_resource_in_business_schema(
-                    conn, tenant_hk, resource_id
-                )
-                if not is_valid:
-                    invalid_resources.append(resource_id)
-            
-            await conn.close()
+                # Check each resource against business schema tables
+                for resource_id in resource_ids:
+                    is_valid = await self._check_resource_in_business_schema(
+                        conn, tenant_hk, resource_id
+                    )
+                    if not is_valid:
+                        invalid_resources.append(resource_id)
             
-            return {
-                'all_valid': len(invalid_resources) == 0,
-                'invalid_resources': invalid_resources,
-                'total_checked': len(resource_ids),
-                'valid_count': len(resource_ids) - len(invalid_resources)
-            }
+                return {
+                    'all_valid': len(invalid_resources) == 0,
+                    'invalid_resources': invalid_resources,
+                    'total_checked': len(resource_ids),
+                    'valid_count': len(resource_ids) - len(invalid_resources)
+                }
             
         except Exception as e:
             logger.error(f"Resource validation error: {e}")
@@ -412,36 +405,34 @@ class ExistingInfrastructureZeroTrustMiddleware:
     ):
         """Log security incident using existing audit infrastructure"""
         try:
-            conn = await get_db_connection()
+            async with get_db_connection_context() as conn:
             
-            # Use existing ai_monitoring.log_security_event function
-            await conn.execute("""
-                SELECT ai_monitoring.log_security_event(
-                    p_tenant_hk := $1,
-                    p_event_type := $2,
-                    p_severity := $3,
-                    p_description := $4,
-                    p_source_ip := $5::inet,
-                    p_user_agent := $6,
-                    p_event_metadata := $7::jsonb
+                # Use existing ai_monitoring.log_security_event function
+                await conn.execute("""
+                    SELECT ai_monitoring.log_security_event(
+                        p_tenant_hk := $1,
+                        p_event_type := $2,
+                        p_severity := $3,
+                        p_description := $4,
+                        p_source_ip := $5::inet,
+                        p_user_agent := $6,
+                        p_event_metadata := $7::jsonb
+                    )
+                """, 
+                    tenant_hk,
+                    incident_type,
+                    'HIGH' if 'BLOCKED' in incident_type else 'MEDIUM',
+                    description,
+                    context['ip_address'],
+                    context['user_agent'],
+                    json.dumps({
+                        'endpoint': context['endpoint'],
+                        'method': context['method'],
+                        'resources': context['resources'],
+                        'timestamp': context['timestamp'].isoformat(),
+                        'request_id': context['request_id']
+                    })
                 )
-            """, 
-                tenant_hk,
-                incident_type,
-                'HIGH' if 'BLOCKED' in incident_type else 'MEDIUM',
-                description,
-                context['ip_address'],
-                context['user_agent'],
-                json.dumps({
-                    'endpoint': context['endpoint'],
-                    'method': context['method'],
-                    'resources': context['resources'],
-                    'timestamp': context['timestamp'].isoformat(),
-                    'request_id': context['request_id']
-                })
-            )
-            
-            await conn.close()
             
         except Exception as e:
             logger.error(f"Failed to log security incident: {e}")
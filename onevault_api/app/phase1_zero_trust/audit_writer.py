@@ -0,0 +1,365 @@
+"""
+Phase 1 Batched Audit Writer
+Queues parallel validation results and writes them in batches from a background task
+
+- Bounded queue: records are never awaited by the request path; when the queue
+  is full the newest record is dropped and counted
+- One multi-row insert per table and one commit per batch (batch_size records
+  or flush_interval_seconds, whichever comes first)
+- Failed batches are retried with capped exponential backoff
+- stop() flushes whatever is still queued on shutdown
+
+Rows go straight into audit.parallel_validation_h/_s with the same values
+audit.log_parallel_validation() writes. The function derives its business key
+from CURRENT_TIMESTAMP, which is fixed for a transaction, so calling it for
+many rows in one commit would collide; each record carries its own key instead.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+import logging
+import psycopg2
+import psycopg2.extras
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import AuditWriterConfig, get_audit_writer_config, get_database_config
+
+logger = logging.getLogger(__name__)
+
+# Log the first drop and then every DROP_LOG_EVERY-th, not every request
+DROP_LOG_EVERY = 1000
+
+INSERT_HUB_SQL = """
+    INSERT INTO audit.parallel_validation_h (
+        validation_hk, validation_bk, tenant_hk, load_date, record_source
+    )
+    SELECT util.hash_binary(v.validation_bk), v.validation_bk, v.tenant_hk,
+           util.current_load_date(), 'phase1_parallel_validation'
+    FROM (VALUES %s) AS v(validation_bk, tenant_hk)
+"""
+HUB_TEMPLATE = "(%s, %s::bytea)"
+
+INSERT_SATELLITE_SQL = """
+    INSERT INTO audit.parallel_validation_s (
+        validation_hk, load_date, load_end_date, hash_diff,
+        api_endpoint, http_method, client_ip, user_agent,
+        current_method_success, current_method_duration_ms, current_method_response,
+        enhanced_method_success, enhanced_method_duration_ms, enhanced_method_response,
+        enhanced_token_extended, enhanced_cross_tenant_blocked,
+        performance_improvement_ms, cache_hit,
+        validation_timestamp, session_id, record_source
+    )
+    SELECT util.hash_binary(v.validation_bk), util.current_load_date(), NULL,
+           util.hash_binary(v.validation_bk || v.current_success::text || v.enhanced_success::text),
+           v.api_endpoint, 'POST', inet_client_addr(), current_setting('application_name', true),
+           v.current_success, v.current_duration_ms, NULL,
+           v.enhanced_success, v.enhanced_duration_ms, v.enhanced_response,
+           v.token_extended, v.cross_tenant_blocked,
+           v.current_duration_ms - v.enhanced_duration_ms, v.cache_hit,
+           v.validated_at, current_setting('session_id', true), 'phase1_parallel_validation'
+    FROM (VALUES %s) AS v(
+        validation_bk, api_endpoint, current_success, current_duration_ms,
+        enhanced_success, enhanced_duration_ms, enhanced_response,
+        token_extended, cross_tenant_blocked, cache_hit, validated_at
+    )
+"""
+SATELLITE_TEMPLATE = (
+    "(%s, %s, %s::boolean, %s::integer, %s::boolean, %s::integer, %s::jsonb, "
+    "%s::boolean, %s::boolean, %s::boolean, %s::timestamptz)"
+)
+
+@dataclass
+class AuditRecord:
+    """One parallel validation result, captured when it was produced"""
+    tenant_hk: Optional[bytes]
+    api_endpoint: str
+    current_success: bool
+    current_duration_ms: int
+    enhanced_success: bool
+    enhanced_duration_ms: int
+    enhanced_response: Optional[str] = None
+    token_extended: bool = False
+    cross_tenant_blocked: bool = False
+    cache_hit: bool = False
+    validated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    validation_bk: str = ''
+
+    def __post_init__(self):
+        if not self.validation_bk:
+            # Same prefix/format as audit.log_parallel_validation, plus a per-record suffix
+            self.validation_bk = f"PARALLEL_VAL_{self.validated_at:%Y%m%d_%H%M%S_%f}_{uuid.uuid4().hex[:12]}"
+
+    @classmethod
+    def from_result(cls, result: Any, api_endpoint: str, tenant_hk: Optional[bytes] = None) -> "AuditRecord":
+        """Build a record from a ParallelValidationResult"""
+        current, enhanced = result.current_result, result.enhanced_result
+        return cls(
+            tenant_hk=tenant_hk,
+            api_endpoint=api_endpoint,
+            current_success=current.success,
+            current_duration_ms=current.duration_ms,
+            enhanced_success=enhanced.success,
+            enhanced_duration_ms=enhanced.duration_ms,
+            enhanced_response=json.dumps(enhanced.response, default=str) if enhanced.response else None,
+            token_extended=enhanced.token_extended,
+            cross_tenant_blocked=enhanced.cross_tenant_blocked,
+            cache_hit=enhanced.cache_hit
+        )
+
+def write_audit_batch(conn, records: List[AuditRecord]):
+    """Insert one batch (hub then satellite) and commit it"""
+    cursor = conn.cursor()
+    try:
+        psycopg2.extras.execute_values(
+            cursor, INSERT_HUB_SQL,
+            [(record.validation_bk, record.tenant_hk) for record in records],
+            template=HUB_TEMPLATE, page_size=len(records)
+        )
+        psycopg2.extras.execute_values(
+            cursor, INSERT_SATELLITE_SQL,
+            [(
+                record.validation_bk, record.api_endpoint,
+                record.current_success, record.current_duration_ms,
+                record.enhanced_success, record.enhanced_duration_ms, record.enhanced_response,
+                record.token_extended, record.cross_tenant_blocked, record.cache_hit,
+                record.validated_at
+            ) for record in records],
+            template=SATELLITE_TEMPLATE, page_size=len(records)
+        )
+    finally:
+        cursor.close()
+    conn.commit()
+
+class AuditDatabaseSink:
+    """
+    Dedicated audit connection, only ever used from one worker thread
+
+    The connection is not shared with the validation pool, so a slow audit
+    flush never holds a connection a validation is waiting for.
+    """
+
+    def __init__(self, db_config=None):
+        self.db_config = db_config or get_database_config()
+        self._connection = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phase1-audit")
+
+    async def __call__(self, records: List[AuditRecord]):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_blocking, records)
+
+    def _write_blocking(self, records: List[AuditRecord]):
+        if self._connection is None or self._connection.closed:
+            self._connection = psycopg2.connect(
+                host=self.db_config.host,
+                port=self.db_config.port,
+                database=self.db_config.database,
+                user=self.db_config.user,
+                password=self.db_config.password,
+                connect_timeout=self.db_config.connection_timeout,
+                application_name=self.db_config.application_name
+            )
+        try:
+            write_audit_batch(self._connection, records)
+        except Exception:
+            if not self._connection.closed:
+                try:
+                    self._connection.rollback()
+                except Exception:
+                    self._connection.close()
+            raise
+
+    def close(self):
+        """Close the audit connection and stop the worker thread"""
+        self._executor.shutdown(wait=True)
+        if self._connection is not None and not self._connection.closed:
+            self._connection.close()
+        self._connection = None
+
+class AuditBatchWriter:
+    """
+    Bounded audit queue with a single background flusher task
+
+    submit() never blocks; the flusher starts on the first submit from a
+    running event loop.
+    """
+
+    def __init__(self, config: Optional[AuditWriterConfig] = None,
+                 flush: Optional[Callable[[List[AuditRecord]], Awaitable[Any]]] = None):
+        self.config = config or get_audit_writer_config()
+        self._flush = flush
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+
+        self._stats = {
+            'records_enqueued': 0,
+            'records_written': 0,
+            'records_dropped_full': 0,
+            'records_dropped_closed': 0,
+            'records_failed': 0,
+            'batches_written': 0,
+            'flush_failures': 0,
+            'flush_retries': 0,
+            'total_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'max_queue_depth': 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        if self._flush is None:
+            self._flush = AuditDatabaseSink()
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.config.max_queue_size)
+        self._closing = False
+        self._flusher = loop.create_task(self._run(), name="phase1-audit-writer")
+        logger.info(f"💾 Audit batch writer started: queue={self.config.max_queue_size}, "
+                    f"batch={self.config.batch_size}, interval={self.config.flush_interval_seconds}s")
+
+    def submit(self, record: AuditRecord) -> bool:
+        """
+        Queue a record for the next batch (call from the event loop)
+
+        Returns:
+            False if the record was dropped (queue full or writer stopping)
+            or audit writing is disabled
+        """
+        if not self.config.enabled:
+            return False
+        if self._closing:
+            self._stats['records_dropped_closed'] += 1
+            return False
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self._stats['records_dropped_full'] += 1
+            dropped = self._stats['records_dropped_full']
+            if dropped == 1 or dropped % DROP_LOG_EVERY == 0:
+                logger.warning(f"⚠️ Audit queue full ({self.config.max_queue_size}): "
+                               f"{dropped} validation records dropped so far")
+            return False
+
+        self._stats['records_enqueued'] += 1
+        depth = self._queue.qsize()
+        if depth > self._stats['max_queue_depth']:
+            self._stats['max_queue_depth'] = depth
+        return True
+
+    async def stop(self):
+        """Stop accepting records, flush everything queued, then stop the flusher"""
+        if not self.running:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.config.drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Audit writer drain timed out with {self._queue.qsize()} records unwritten")
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        close = getattr(self._flush, 'close', None)
+        if close is not None:
+            close()
+        logger.info(f"🛑 Audit batch writer stopped: {self._stats['records_written']} records written")
+
+    async def _run(self):
+        """Flusher loop: collect up to batch_size records or until the interval elapses"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.config.flush_interval_seconds
+            while len(batch) < self.config.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._closing:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush_batch(self, batch: List[AuditRecord]):
+        """Write one batch, retrying with capped backoff before giving up on it"""
+        for attempt in range(self.config.max_flush_retries + 1):
+            started = time.perf_counter()
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                self._stats['flush_failures'] += 1
+                if attempt < self.config.max_flush_retries and not self._closing:
+                    self._stats['flush_retries'] += 1
+                    backoff = min(self.config.retry_backoff_seconds * (2 ** attempt),
+                                  self.config.retry_backoff_max_seconds)
+                    logger.warning(f"⚠️ Audit batch write failed (attempt {attempt + 1}), "
+                                   f"retrying in {backoff}s: {e}")
+                    await asyncio.sleep(backoff)
+                    continue
+                self._stats['records_failed'] += len(batch)
+                logger.error(f"❌ Audit writer dropped {len(batch)} records after {attempt + 1} attempts: {e}")
+                return
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats['batches_written'] += 1
+            self._stats['records_written'] += len(batch)
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed_ms)
+            logger.debug(f"✅ Audit batch written: {len(batch)} records in {elapsed_ms:.1f}ms")
+            return
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue, drop and flush statistics for monitoring"""
+        batches = self._stats['batches_written']
+        return {
+            'enabled': self.config.enabled,
+            'running': self.running,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'max_queue_size': self.config.max_queue_size,
+            'batch_size': self.config.batch_size,
+            **{key: round(value, 2) if isinstance(value, float) else value
+               for key, value in self._stats.items() if key != 'total_flush_ms'},
+            'average_flush_ms': round(self._stats['total_flush_ms'] / batches, 2) if batches else 0.0,
+            'average_batch_size': round(self._stats['records_written'] / batches, 2) if batches else 0.0
+        }
+
+# Global audit writer instance
+_writer_instance: Optional[AuditBatchWriter] = None
+
+def get_audit_writer() -> AuditBatchWriter:
+    """Get global audit writer instance (singleton pattern)"""
+    global _writer_instance
+
+    if _writer_instance is None:
+        _writer_instance = AuditBatchWriter()
+
+    return _writer_instance
+
+async def close_audit_writer():
+    """Flush queued audit records on shutdown"""
+    if _writer_instance is not None:
+        await _writer_instance.stop()
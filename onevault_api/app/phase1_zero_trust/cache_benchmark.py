@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Phase 1 Cache Engine Microbenchmarks
+Measures per-operation cost of LRUTTLCache at increasing cache sizes
+
+Usage:
+    python cache_benchmark.py                      # 10k, 100k, 1M entries
+    python cache_benchmark.py --sizes 10000 50000 --ops 200000
+
+Per-op latency should stay flat as the cache grows; the previous
+InMemoryCache scanned every entry on each get/set.
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+from cache_engine import LRUTTLCache
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+SAMPLE_VALUE = {
+    'p_success': True,
+    'user_id': 'user_123',
+    'tenant_id': 'tenant_abc',
+    'roles': ['admin', 'viewer'],
+    'cached_at': '2025-01-01T00:00:00',
+}
+
+
+class ManualClock:
+    """Deterministic clock so expiry can be triggered on demand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _time_ops(label: str, ops: int, fn: Callable[[int], None]) -> Dict[str, float]:
+    started = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    return {'operation': label, 'ops': ops, 'us_per_op': elapsed / ops * 1e6, 'ops_per_sec': ops / elapsed}
+
+
+def _filled_cache(size: int, clock: ManualClock, max_bytes: int = 0) -> LRUTTLCache:
+    cache = LRUTTLCache(max_entries=size, default_ttl=300, max_bytes=max_bytes, clock=clock)
+    for i in range(size):
+        cache.set(f"key-{i}", SAMPLE_VALUE)
+    return cache
+
+
+def benchmark_size(size: int, ops: int) -> List[Dict[str, float]]:
+    """Run every scenario against a cache pre-filled with `size` entries"""
+    clock = ManualClock()
+    cache = _filled_cache(size, clock)
+    rng = random.Random(size)
+    keys = [f"key-{rng.randrange(size)}" for _ in range(ops)]
+    results = []
+
+    results.append(_time_ops('get_hit', ops, lambda i: cache.get(keys[i])))
+    results.append(_time_ops('get_miss', ops, lambda i: cache.get(f"missing-{i}")))
+    results.append(_time_ops('set_update', ops, lambda i: cache.set(keys[i], SAMPLE_VALUE)))
+    # Every insert at capacity evicts the LRU entry
+    results.append(_time_ops('set_evict_lru', ops, lambda i: cache.set(f"new-{i}", SAMPLE_VALUE)))
+
+    # Expire the whole cache, then measure gets that drain the heap incrementally
+    clock.now += 301
+    results.append(_time_ops('get_during_mass_expiry', ops, lambda i: cache.get(keys[i])))
+
+    byte_budget = size * 400
+    bounded = _filled_cache(size, clock, max_bytes=byte_budget)
+    results.append(_time_ops('set_evict_bytes', ops, lambda i: bounded.set(f"new-{i}", SAMPLE_VALUE)))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LRUTTLCache microbenchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--ops', type=int, default=100_000, help="operations per scenario")
+    args = parser.parse_args()
+
+    print("📊 LRUTTLCache microbenchmarks")
+    print(f"{'entries':>10}  {'operation':<24}{'us/op':>10}{'ops/sec':>14}")
+    for size in args.sizes:
+        for result in benchmark_size(size, args.ops):
+            print(f"{size:>10,}  {result['operation']:<24}{result['us_per_op']:>10.3f}{result['ops_per_sec']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
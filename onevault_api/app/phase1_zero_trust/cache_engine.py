@@ -0,0 +1,269 @@
+"""
+Phase 1 Cache Engine
+O(1) LRU/TTL storage behind InMemoryCache
+
+- LRU order kept in an OrderedDict (move_to_end on hit, popitem on evict)
+- TTL expiry driven by a min-heap of deadlines, drained a bounded number
+  of steps per operation instead of scanning every entry
+- Optional byte budget using a cheap shallow size estimate
+- Tag index (tag -> keys) so invalidating a tenant/user/token touches
+  only the entries carrying that tag
+
+The engine itself is not thread-safe; InMemoryCache wraps it in a lock.
+"""
+
+import sys
+import time
+import heapq
+import itertools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+# Heap entries drained per get/set; stragglers are caught lazily on access
+EXPIRY_STEPS_PER_OP = 64
+
+_SCALAR_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Cheap size estimate in bytes
+
+    Counts the object plus its direct keys/items (and one more level for
+    nested containers). Much cheaper than json.dumps and good enough for
+    a memory budget; it is not an exact deep size.
+    """
+    return _estimate(value, 2)
+
+
+def _estimate(value: Any, depth: int) -> int:
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, _SCALAR_TYPES):
+        return size
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + _estimate(item, depth - 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate(item, depth - 1)
+    return size
+
+
+class CacheEngineEntry:
+    """Stored value plus the bookkeeping the engine needs"""
+    __slots__ = ('value', 'created_at', 'expires_at', 'ttl_seconds',
+                 'size_bytes', 'access_count', 'last_access', 'seq', 'tags')
+
+    def __init__(self, value: Any, created_at: float, ttl_seconds: float,
+                 size_bytes: int, seq: int, tags: Tuple[str, ...] = ()):
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = created_at + ttl_seconds
+        self.ttl_seconds = ttl_seconds
+        self.size_bytes = size_bytes
+        self.access_count = 0
+        self.last_access = 0.0
+        self.seq = seq
+        self.tags = tags
+
+
+class LRUTTLCache:
+    """
+    Bounded LRU cache with per-entry TTL
+
+    get/set/delete are O(1) amortized (heap pushes are O(log n)); nothing
+    walks the whole cache on the request path.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: float, max_bytes: int = 0,
+                 clock: Callable[[], float] = time.monotonic,
+                 size_estimator: Callable[[Any], int] = estimate_size):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes or 0
+        self._clock = clock
+        self._estimate = size_estimator
+        self._data: "OrderedDict[str, CacheEngineEntry]" = OrderedDict()
+        self._expiry_heap: list = []  # (expires_at, seq, key)
+        self._seq = itertools.count()
+        self._tag_index: Dict[str, Set[str]] = {}
+        self.total_bytes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions_lru': 0,
+            'evictions_expired': 0,
+            'evictions_size': 0,
+            'invalidations': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry.expires_at > self._clock()
+
+    def items(self) -> Iterator[Tuple[str, CacheEngineEntry]]:
+        """Iterate (key, entry) pairs, least recently used first"""
+        return iter(list(self._data.items()))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value for key and mark it most recently used"""
+        now = self._clock()
+        self._expire(now, EXPIRY_STEPS_PER_OP)
+
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return default
+        if entry.expires_at <= now:
+            self._remove(key, entry)
+            self.stats['evictions_expired'] += 1
+            self.stats['misses'] += 1
+            return default
+
+        self._data.move_to_end(key)
+        entry.access_count += 1
+        entry.last_access = now
+        self.stats['hits'] += 1
+        return entry.value
+
+    def peek(self, key: str) -> Optional[CacheEngineEntry]:
+        """Return the live entry for key without touching LRU order or stats"""
+        entry = self._data.get(key)
+        if entry is None or entry.expires_at <= self._clock():
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            tags: Iterable[str] = ()) -> bool:
+        """
+        Insert or replace key, evicting expired, then LRU entries as needed
+
+        Tags are indexed so invalidate_tags() can drop every entry carrying
+        one of them without scanning the cache.
+
+        Returns:
+            False if the value alone exceeds max_bytes and was not stored
+        """
+        now = self._clock()
+        self._expire(now, EXPIRY_STEPS_PER_OP)
+
+        ttl = self.default_ttl if ttl is None else ttl
+        size_bytes = self._estimate(value)
+        if self.max_bytes and size_bytes > self.max_bytes:
+            return False
+
+        existing = self._data.get(key)
+        if existing is not None:
+            self._remove(key, existing)
+
+        entry = CacheEngineEntry(value, now, ttl, size_bytes, next(self._seq), tuple(tags))
+        self._data[key] = entry
+        self.total_bytes += size_bytes
+        for tag in entry.tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        heapq.heappush(self._expiry_heap, (entry.expires_at, entry.seq, key))
+        self.stats['sets'] += 1
+
+        while len(self._data) > self.max_entries:
+            self._evict_lru('evictions_lru')
+        while self.max_bytes and self.total_bytes > self.max_bytes:
+            self._evict_lru('evictions_size')
+
+        # Replaced and LRU-evicted keys leave dead heap items behind
+        if len(self._expiry_heap) > 2 * len(self._data) + 1024:
+            self._compact_heap()
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Remove key; returns False if it was not present"""
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        self._remove(key, entry)
+        return True
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Remove every entry carrying any of the tags; returns how many were removed"""
+        removed = 0
+        for tag in tags:
+            for key in list(self._tag_index.get(tag, ())):
+                entry = self._data.get(key)
+                if entry is not None:
+                    self._remove(key, entry)
+                    removed += 1
+        self.stats['invalidations'] += removed
+        return removed
+
+    def keys_for_tag(self, tag: str) -> Set[str]:
+        """Keys currently indexed under tag"""
+        return set(self._tag_index.get(tag, ()))
+
+    def clear(self):
+        """Drop every entry (statistics are kept)"""
+        self._data.clear()
+        self._expiry_heap.clear()
+        self._tag_index.clear()
+        self.total_bytes = 0
+
+    def purge_expired(self) -> int:
+        """Remove every expired entry now; returns how many were removed"""
+        return self._expire(self._clock(), None)
+
+    def _expire(self, now: float, max_steps: Optional[int]) -> int:
+        heap = self._expiry_heap
+        removed = 0
+        steps = 0
+        while heap and heap[0][0] <= now:
+            if max_steps is not None and steps >= max_steps:
+                break
+            steps += 1
+            _, seq, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key, entry)
+                self.stats['evictions_expired'] += 1
+                removed += 1
+        return removed
+
+    def _evict_lru(self, counter: str):
+        key, entry = self._data.popitem(last=False)
+        self.total_bytes -= entry.size_bytes
+        self._unindex(key, entry)
+        self.stats[counter] += 1
+
+    def _remove(self, key: str, entry: CacheEngineEntry):
+        del self._data[key]
+        self.total_bytes -= entry.size_bytes
+        self._unindex(key, entry)
+
+    def _unindex(self, key: str, entry: CacheEngineEntry):
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def _compact_heap(self):
+        self._expiry_heap = [(entry.expires_at, entry.seq, key) for key, entry in self._data.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Engine counters plus current occupancy"""
+        return {
+            **self.stats,
+            'evictions': (self.stats['evictions_lru'] + self.stats['evictions_expired']
+                          + self.stats['evictions_size']),
+            'size': len(self._data),
+            'max_entries': self.max_entries,
+            'total_size_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'expiry_heap_size': len(self._expiry_heap),
+            'indexed_tags': len(self._tag_index),
+        }
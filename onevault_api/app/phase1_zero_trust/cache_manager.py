@@ -4,72 +4,83 @@ Optimizes validation performance through intelligent caching
 """
 
 import time
+import random
 import hashlib
 import logging
 import asyncio
-import json
-from typing import Dict, Any, Optional, List, Union
-from dataclasses import dataclass, asdict
+import weakref
+from typing import Callable, Dict, Any, Optional, List, Union
 from datetime import datetime, timedelta
 from collections import defaultdict
 from threading import Lock
 
 from config import get_cache_config, get_database_config
+from cache_engine import LRUTTLCache
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class CacheEntry:
-    """Cache entry with metadata"""
-    value: Any
-    timestamp: float
-    ttl_seconds: int
-    access_count: int = 0
-    last_access: float = 0.0
-    size_bytes: int = 0
-    
-    def is_expired(self) -> bool:
-        """Check if cache entry has expired"""
-        return time.time() - self.timestamp > self.ttl_seconds
-    
-    def access(self):
-        """Mark cache entry as accessed"""
-        self.access_count += 1
-        self.last_access = time.time()
+def tenant_tag(tenant_id: str) -> str:
+    """Invalidation tag for everything cached on behalf of a tenant"""
+    return f"tenant:{tenant_id}"
 
-@dataclass
-class CacheStats:
-    """Cache performance statistics"""
-    hits: int = 0
-    misses: int = 0
-    sets: int = 0
-    evictions: int = 0
-    total_size_bytes: int = 0
-    average_ttl_seconds: float = 0.0
-    
-    @property
-    def hit_rate(self) -> float:
-        """Calculate cache hit rate percentage"""
-        total = self.hits + self.misses
-        return (self.hits / total * 100) if total > 0 else 0.0
-    
-    @property
-    def total_operations(self) -> int:
-        """Total cache operations"""
-        return self.hits + self.misses + self.sets
+def user_tag(user_id: str) -> str:
+    """Invalidation tag for everything cached on behalf of a user"""
+    return f"user:{user_id}"
+
+def token_tag(token_hash: str) -> str:
+    """Invalidation tag for results derived from one token (keyed by its hash)"""
+    return f"token:{token_hash}"
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+# Live negative caches, so token issuance can evict from every one of them
+_negative_caches: "weakref.WeakSet[NegativeResultCache]" = weakref.WeakSet()
+
+# Called with (token_hash, tenant_id, cached) for every rejected token, e.g. by a rate limiter
+_rejection_listeners: List[Callable[[str, str, bool], None]] = []
+
+def add_rejection_listener(listener: Callable[[str, str, bool], None]):
+    """Register a callback for rejected tokens (fresh rejections and negative cache hits)"""
+    if listener not in _rejection_listeners:
+        _rejection_listeners.append(listener)
+
+def remove_rejection_listener(listener: Callable[[str, str, bool], None]):
+    """Unregister a rejection callback"""
+    if listener in _rejection_listeners:
+        _rejection_listeners.remove(listener)
+
+def on_token_issued(token: str) -> int:
+    """
+    Evict cached rejections for a newly issued or re-activated token
+    
+    Call wherever tokens are created so a token that was probed before it
+    existed is not rejected from cache for the rest of the negative TTL.
+    """
+    return sum(cache.evict_token(token) for cache in list(_negative_caches))
 
 class InMemoryCache:
-    """High-performance in-memory cache with LRU eviction"""
+    """High-performance in-memory cache with O(1) LRU eviction and heap-driven TTL expiry"""
     
-    def __init__(self, max_entries: int, default_ttl: int, name: str = "cache"):
-        self.max_entries = max_entries
-        self.default_ttl = default_ttl
+    def __init__(self, max_entries: int, default_ttl: int, name: str = "cache", max_bytes: int = 0):
         self.name = name
-        self._cache: Dict[str, CacheEntry] = {}
-        self._stats = CacheStats()
+        self._cache = LRUTTLCache(max_entries=max_entries, default_ttl=default_ttl, max_bytes=max_bytes)
         self._lock = Lock()
         
-        logger.info(f"💾 {name} cache initialized: max_entries={max_entries}, ttl={default_ttl}s")
+        logger.info(f"💾 {name} cache initialized: max_entries={max_entries}, ttl={default_ttl}s"
+                    + (f", max_bytes={max_bytes}" if max_bytes else ""))
+    
+    @property
+    def max_entries(self) -> int:
+        return self._cache.max_entries
+    
+    @property
+    def default_ttl(self) -> float:
+        return self._cache.default_ttl
+    
+    @default_ttl.setter
+    def default_ttl(self, value: float):
+        self._cache.default_ttl = value
     
     def _generate_key(self, *args, prefix: str = "") -> str:
         """Generate cache key from arguments"""
@@ -77,120 +88,154 @@ class InMemoryCache:
         key_data = f"{prefix}:{':'.join(str(arg) for arg in args)}"
         return hashlib.sha256(key_data.encode()).hexdigest()[:32]
     
-    def _evict_expired(self):
-        """Remove expired entries"""
-        current_time = time.time()
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if current_time - entry.timestamp > entry.ttl_seconds
-        ]
-        
-        for key in expired_keys:
-            del self._cache[key]
-            self._stats.evictions += 1
-    
-    def _evict_lru(self):
-        """Evict least recently used entries when cache is full"""
-        if len(self._cache) >= self.max_entries:
-            # Sort by last access time (or timestamp if never accessed)
-            lru_key = min(
-                self._cache.keys(),
-                key=lambda k: self._cache[k].last_access or self._cache[k].timestamp
-            )
-            del self._cache[lru_key]
-            self._stats.evictions += 1
-    
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         with self._lock:
-            self._evict_expired()
-            
-            if key in self._cache:
-                entry = self._cache[key]
-                
-                if not entry.is_expired():
-                    entry.access()
-                    self._stats.hits += 1
-                    logger.debug(f"💾 Cache HIT [{self.name}]: {key[:8]}")
-                    return entry.value
-                else:
-                    # Expired entry
-                    del self._cache[key]
-                    self._stats.evictions += 1
-            
-            self._stats.misses += 1
+            value = self._cache.get(key)
+        
+        if value is not None:
+            logger.debug(f"💾 Cache HIT [{self.name}]: {key[:8]}")
+        else:
             logger.debug(f"💾 Cache MISS [{self.name}]: {key[:8]}")
-            return None
+        return value
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Set value in cache"""
+    def set(self, key: str, value: Any, ttl: Optional[int] = None,
+            tags: Optional[List[str]] = None) -> bool:
+        """Set value in cache, indexed under the given invalidation tags"""
         if not key or value is None:
             return False
             
         ttl = ttl or self.default_ttl
         
         with self._lock:
-            # Clean up expired entries
-            self._evict_expired()
-            
-            # Evict LRU if cache is full
-            self._evict_lru()
-            
-            # Calculate size
-            size_bytes = len(json.dumps(value, default=str).encode()) if value else 0
-            
-            # Create cache entry
-            entry = CacheEntry(
-                value=value,
-                timestamp=time.time(),
-                ttl_seconds=ttl,
-                size_bytes=size_bytes
-            )
-            
-            self._cache[key] = entry
-            self._stats.sets += 1
-            self._stats.total_size_bytes += size_bytes
-            
-            logger.debug(f"💾 Cache SET [{self.name}]: {key[:8]}, size={size_bytes}b, ttl={ttl}s")
-            return True
+            stored = self._cache.set(key, value, ttl, tags=tags or ())
+        
+        logger.debug(f"💾 Cache SET [{self.name}]: {key[:8]}, stored={stored}, ttl={ttl}s")
+        return stored
     
     def delete(self, key: str) -> bool:
         """Delete entry from cache"""
         with self._lock:
-            if key in self._cache:
-                entry = self._cache[key]
-                self._stats.total_size_bytes -= entry.size_bytes
-                del self._cache[key]
-                logger.debug(f"💾 Cache DELETE [{self.name}]: {key[:8]}")
-                return True
-            return False
+            deleted = self._cache.delete(key)
+        if deleted:
+            logger.debug(f"💾 Cache DELETE [{self.name}]: {key[:8]}")
+        return deleted
+    
+    def invalidate_tags(self, tags: List[str]) -> int:
+        """Delete every entry carrying any of the tags"""
+        with self._lock:
+            removed = self._cache.invalidate_tags(tags)
+        if removed:
+            logger.debug(f"💾 Cache INVALIDATE [{self.name}]: {removed} entries for {len(tags)} tags")
+        return removed
     
     def clear(self):
         """Clear all cache entries"""
         with self._lock:
-            self._cache.clear()
-            self._stats = CacheStats()
+            self._cache = LRUTTLCache(max_entries=self._cache.max_entries,
+                                      default_ttl=self._cache.default_ttl,
+                                      max_bytes=self._cache.max_bytes)
             logger.info(f"💾 Cache CLEARED [{self.name}]")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         with self._lock:
-            return {
-                'name': self.name,
-                'size': len(self._cache),
-                'max_entries': self.max_entries,
-                'hit_rate': round(self._stats.hit_rate, 2),
-                'hits': self._stats.hits,
-                'misses': self._stats.misses,
-                'sets': self._stats.sets,
-                'evictions': self._stats.evictions,
-                'total_operations': self._stats.total_operations,
-                'total_size_bytes': self._stats.total_size_bytes,
-                'average_entry_size': (
-                    self._stats.total_size_bytes / len(self._cache) 
-                    if len(self._cache) > 0 else 0
-                )
-            }
+            stats = self._cache.get_stats()
+        
+        hits, misses = stats['hits'], stats['misses']
+        total = hits + misses
+        return {
+            'name': self.name,
+            'hit_rate': round(hits / total * 100, 2) if total > 0 else 0.0,
+            'total_operations': total + stats['sets'],
+            'average_entry_size': (
+                stats['total_size_bytes'] / stats['size']
+                if stats['size'] > 0 else 0
+            ),
+            **stats
+        }
+
+class NegativeResultCache:
+    """
+    Short-lived cache of rejected tokens (invalid, expired, revoked)
+    
+    Keyed by token hash and tenant; never stores the token itself. TTLs are
+    jittered so a burst of rejections does not expire (and hit the database)
+    all at once. Only cache definitive rejections, never timeouts or errors.
+    """
+    
+    def __init__(self, ttl_seconds: int, max_entries: int, jitter: float = 0.2,
+                 name: str = "negative", rng: Callable[[], float] = random.random):
+        self.ttl_seconds = ttl_seconds
+        self.jitter = jitter
+        self._rng = rng
+        self.cache = InMemoryCache(max_entries=max_entries, default_ttl=ttl_seconds, name=name)
+        self._stats = {
+            'rejections_cached': 0,
+            'rejections_served': 0,
+            'evicted_on_issue': 0
+        }
+        _negative_caches.add(self)
+    
+    def _key(self, token_hash: str, tenant_id: str) -> str:
+        return self.cache._generate_key(token_hash, tenant_id, prefix="neg")
+    
+    def _jittered_ttl(self) -> float:
+        return self.ttl_seconds * (1 + self.jitter * (2 * self._rng() - 1))
+    
+    def get(self, token: str, tenant_id: str) -> Optional[Dict[str, Any]]:
+        """Cached rejection for a token, or None"""
+        token_hash = _hash_token(token)
+        entry = self.cache.get(self._key(token_hash, tenant_id))
+        if entry is None:
+            return None
+        
+        entry['rejections'] += 1
+        self._stats['rejections_served'] += 1
+        _notify_rejection(token_hash, tenant_id, cached=True)
+        return entry['result']
+    
+    def set(self, token: str, tenant_id: str, result: Optional[Dict[str, Any]]) -> bool:
+        """Cache a rejection"""
+        token_hash = _hash_token(token)
+        entry = {
+            'result': {**(result or {}), 'p_success': False},
+            'rejections': 1
+        }
+        stored = self.cache.set(self._key(token_hash, tenant_id), entry, self._jittered_ttl(),
+                                tags=[tenant_tag(tenant_id), token_tag(token_hash)])
+        if stored:
+            self._stats['rejections_cached'] += 1
+        _notify_rejection(token_hash, tenant_id, cached=False)
+        return stored
+    
+    def evict_token(self, token: str) -> int:
+        """Drop cached rejections for a token in every tenant"""
+        removed = self.cache.invalidate_tags([token_tag(_hash_token(token))])
+        self._stats['evicted_on_issue'] += removed
+        return removed
+    
+    def invalidate_tags(self, tags: List[str]) -> int:
+        return self.cache.invalidate_tags(tags)
+    
+    def clear(self):
+        self.cache.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Rejection counters plus the underlying cache statistics"""
+        return {
+            **self.cache.get_stats(),
+            **self._stats,
+            'ttl_seconds': self.ttl_seconds,
+            'ttl_jitter': self.jitter
+        }
+
+def _notify_rejection(token_hash: str, tenant_id: str, cached: bool):
+    for listener in list(_rejection_listeners):
+        try:
+            listener(token_hash, tenant_id, cached)
+        except Exception as e:
+            logger.warning(f"⚠️ Rejection listener failed: {e}")
 
 class ValidationCacheManager:
     """Manages validation-specific caching"""
@@ -202,19 +247,28 @@ class ValidationCacheManager:
         self.validation_cache = InMemoryCache(
             max_entries=config.validation_max_entries,
             default_ttl=config.validation_ttl_seconds,
-            name="validation"
+            name="validation",
+            max_bytes=config.validation_max_bytes
         )
         
         self.tenant_cache = InMemoryCache(
             max_entries=config.tenant_max_entries,
             default_ttl=config.tenant_ttl_seconds,
-            name="tenant"
+            name="tenant",
+            max_bytes=config.tenant_max_bytes
         )
         
         self.permission_cache = InMemoryCache(
             max_entries=config.permission_max_entries,
             default_ttl=config.permission_ttl_seconds,
-            name="permission"
+            name="permission",
+            max_bytes=config.permission_max_bytes
+        )
+        
+        self.negative_cache = NegativeResultCache(
+            ttl_seconds=config.negative_ttl_seconds,
+            max_entries=config.negative_max_entries,
+            jitter=config.negative_ttl_jitter
         )
         
         # Performance tracking
@@ -225,7 +279,7 @@ class ValidationCacheManager:
     def get_validation_key(self, token: str, tenant_id: str, operation: str = "validate") -> str:
         """Generate validation cache key"""
         # Use hash of token for privacy
-        token_hash = hashlib.sha256(token.encode()).hexdigest()[:16]
+        token_hash = _hash_token(token)
         return self.validation_cache._generate_key(token_hash, tenant_id, operation, prefix="val")
     
     def get_tenant_key(self, tenant_id: str, operation: str = "info") -> str:
@@ -238,13 +292,12 @@ class ValidationCacheManager:
     
     def cache_validation_result(self, token: str, tenant_id: str, result: Dict[str, Any], 
                                ttl: Optional[int] = None) -> bool:
-        """Cache validation result"""
+        """Cache validation result (rejections go to the short-lived negative cache)"""
         if not self.config.validation_enabled:
             return False
             
-        # Only cache successful validations
         if not result.get('p_success', False):
-            return False
+            return self.cache_rejection(token, tenant_id, result)
         
         key = self.get_validation_key(token, tenant_id)
         
@@ -255,16 +308,30 @@ class ValidationCacheManager:
             'cache_ttl': ttl or self.config.validation_ttl_seconds
         }
         
-        return self.validation_cache.set(key, cached_result, ttl)
+        tags = [tenant_tag(tenant_id), token_tag(_hash_token(token))]
+        user_id = result.get('user_id') or result.get('p_user_id')
+        if user_id:
+            tags.append(user_tag(user_id))
+        
+        return self.validation_cache.set(key, cached_result, ttl, tags=tags)
+    
+    def cache_rejection(self, token: str, tenant_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Cache a definitive token rejection (not a timeout or database error)"""
+        if not self.config.negative_enabled:
+            return False
+        return self.negative_cache.set(token, tenant_id, result)
     
     def get_cached_validation(self, token: str, tenant_id: str) -> Optional[Dict[str, Any]]:
-        """Get cached validation result"""
+        """Get cached validation result, including cached rejections"""
         if not self.config.validation_enabled:
             return None
             
         key = self.get_validation_key(token, tenant_id)
         result = self.validation_cache.get(key)
         
+        if result is None and self.config.negative_enabled:
+            result = self.negative_cache.get(token, tenant_id)
+        
         if result:
             # Add cache hit metadata
             result['cache_hit'] = True
@@ -285,7 +352,7 @@ class ValidationCacheManager:
             'cached_at': datetime.now().isoformat()
         }
         
-        return self.tenant_cache.set(key, cached_info, ttl)
+        return self.tenant_cache.set(key, cached_info, ttl, tags=[tenant_tag(tenant_id)])
     
     def get_cached_tenant_info(self, tenant_id: str) -> Optional[Dict[str, Any]]:
         """Get cached tenant information"""
@@ -311,7 +378,8 @@ class ValidationCacheManager:
             'resource': resource
         }
         
-        return self.permission_cache.set(key, permission_result, ttl)
+        return self.permission_cache.set(key, permission_result, ttl,
+                                         tags=[tenant_tag(tenant_id), user_tag(user_id)])
     
     def get_cached_permission(self, user_id: str, tenant_id: str, resource: str) -> Optional[bool]:
         """Get cached permission result"""
@@ -323,34 +391,35 @@ class ValidationCacheManager:
         
         return result.get('has_permission') if result else None
     
-    def invalidate_user_cache(self, user_id: str):
-        """Invalidate all cache entries for a user"""
-        # This is a simplified version - in production you'd want more efficient indexing
-        for cache in [self.validation_cache, self.permission_cache]:
-            keys_to_delete = []
-            with cache._lock:
-                for key, entry in cache._cache.items():
-                    if isinstance(entry.value, dict) and entry.value.get('user_id') == user_id:
-                        keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                cache.delete(key)
+    def invalidate_tags(self, tags: List[str]) -> int:
+        """
+        Bulk-invalidate every entry carrying any of the tags across all caches
         
-        logger.info(f"💾 Invalidated cache for user: {user_id}")
+        Cost is proportional to the number of matching entries, not cache size.
+        Build tags with tenant_tag(), user_tag() and token_tag().
+        """
+        removed = sum(
+            cache.invalidate_tags(tags)
+            for cache in [self.validation_cache, self.tenant_cache, self.permission_cache, self.negative_cache]
+        )
+        logger.info(f"💾 Invalidated {removed} cache entries for tags: {', '.join(tags)}")
+        return removed
+    
+    def invalidate_user_cache(self, user_id: str) -> int:
+        """Invalidate all cache entries for a user"""
+        return self.invalidate_tags([user_tag(user_id)])
     
-    def invalidate_tenant_cache(self, tenant_id: str):
+    def invalidate_tenant_cache(self, tenant_id: str) -> int:
         """Invalidate all cache entries for a tenant"""
-        for cache in [self.validation_cache, self.tenant_cache, self.permission_cache]:
-            keys_to_delete = []
-            with cache._lock:
-                for key, entry in cache._cache.items():
-                    if isinstance(entry.value, dict) and entry.value.get('tenant_id') == tenant_id:
-                        keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                cache.delete(key)
-        
-        logger.info(f"💾 Invalidated cache for tenant: {tenant_id}")
+        return self.invalidate_tags([tenant_tag(tenant_id)])
+    
+    def invalidate_token_cache(self, token: str) -> int:
+        """Invalidate cached validations for a revoked token"""
+        return self.invalidate_tags([token_tag(_hash_token(token))])
+    
+    def note_token_issued(self, token: str) -> int:
+        """Evict cached rejections for a token that was just issued"""
+        return self.negative_cache.evict_token(token)
     
     def record_performance_metric(self, operation: str, duration_ms: int, cache_hit: bool):
         """Record performance metric for analysis"""
@@ -411,12 +480,14 @@ class ValidationCacheManager:
             'caches': {
                 'validation': self.validation_cache.get_stats(),
                 'tenant': self.tenant_cache.get_stats(),
-                'permission': self.permission_cache.get_stats()
+                'permission': self.permission_cache.get_stats(),
+                'negative': self.negative_cache.get_stats()
             },
             'performance_summary': self.get_performance_summary(),
             'total_memory_usage_mb': sum([
                 cache.get_stats()['total_size_bytes'] 
-                for cache in [self.validation_cache, self.tenant_cache, self.permission_cache]
+                for cache in [self.validation_cache, self.tenant_cache, self.permission_cache,
+                              self.negative_cache.cache]
             ]) / 1024 / 1024
         }
     
@@ -426,6 +497,8 @@ class ValidationCacheManager:
         
         # Auto-adjust TTL based on hit rates
         for cache_name, cache_stats in stats['caches'].items():
+            if cache_name == 'negative':
+                continue  # rejections keep their short fixed TTL
             cache_obj = getattr(self, f"{cache_name}_cache")
             
             if cache_stats['hit_rate'] < 50:  # Low hit rate
@@ -492,6 +565,12 @@ class PerformanceCacheManager:
             return False
         return self.validation_manager.cache_validation_result(token, tenant_id, result, ttl)
     
+    def note_token_issued(self, token: str) -> int:
+        """Evict cached rejections for a newly issued token"""
+        if not self.is_enabled():
+            return 0
+        return self.validation_manager.note_token_issued(token)
+    
     def record_performance(self, operation: str, duration_ms: int, cache_hit: bool):
         """Record performance metric"""
         if not self.is_enabled():
@@ -505,6 +584,12 @@ class PerformanceCacheManager:
         
         return self.validation_manager.get_comprehensive_stats()
     
+    def invalidate_tags(self, tags: List[str]) -> int:
+        """Bulk-invalidate cache entries by tenant/user/token tag"""
+        if not self.is_enabled():
+            return 0
+        return self.validation_manager.invalidate_tags(tags)
+    
     def clear_all_caches(self):
         """Clear all caches"""
         if not self.is_enabled():
@@ -513,6 +598,7 @@ class PerformanceCacheManager:
         self.validation_manager.validation_cache.clear()
         self.validation_manager.tenant_cache.clear()
         self.validation_manager.permission_cache.clear()
+        self.validation_manager.negative_cache.clear()
         
         logger.info("💾 All caches cleared")
 
@@ -48,6 +48,25 @@ class ZeroTrustConfig:
     risk_scoring: bool = True
     audit_all_events: bool = True
 
+@dataclass
+class ShadowSamplingConfig:
+    """Shadow (enhanced) validation sampling in fail-safe mode"""
+    enabled: bool = True
+    default_rate: float = 0.1
+    tenant_rates: Dict[str, float] = field(default_factory=dict)
+    endpoint_rates: Dict[str, float] = field(default_factory=dict)  # path prefix -> rate
+    
+    # Adaptive cap: keep shadow validations under max_shadow_qps, but never below min_rate
+    max_shadow_qps: float = 20.0
+    min_rate: float = 0.01
+    
+    # Always sample: keys with a recent mismatch, and requests whose primary validation failed
+    mismatch_boost_seconds: int = 300
+    always_sample_failures: bool = True
+    
+    # Per-tenant outcome stats; tenants past the cap share one overflow bucket
+    max_tracked_tenants: int = 1000
+
 @dataclass
 class CacheConfig:
     """Cache configuration"""
@@ -58,15 +77,24 @@ class CacheConfig:
     # Cache type configurations
     validation_ttl_seconds: int = 300
     validation_max_entries: int = 1000
+    validation_max_bytes: int = 0  # 0 = bounded by entry count only
     validation_enabled: bool = True
     
     tenant_ttl_seconds: int = 600
     tenant_max_entries: int = 100
+    tenant_max_bytes: int = 0  # 0 = bounded by entry count only
     tenant_enabled: bool = True
     
     permission_ttl_seconds: int = 180
     permission_max_entries: int = 500
+    permission_max_bytes: int = 0  # 0 = bounded by entry count only
     permission_enabled: bool = True
+    
+    # Rejected tokens: short TTL and a separate budget so bad credentials can't evict good entries
+    negative_ttl_seconds: int = 30
+    negative_ttl_jitter: float = 0.2  # +/- fraction of the TTL, spreads expiry of a burst
+    negative_max_entries: int = 5000
+    negative_enabled: bool = True
 
 @dataclass
 class APIConfig:
@@ -110,6 +138,18 @@ class LoggingConfig:
     security_log: str = "logs/phase1_security.log"
     error_log: str = "logs/phase1_errors.log"
 
+@dataclass
+class AuditWriterConfig:
+    """Batched parallel validation audit writer"""
+    enabled: bool = True
+    max_queue_size: int = 10000          # records held in memory; newer records are dropped when full
+    batch_size: int = 200                # flush as soon as this many are queued
+    flush_interval_seconds: float = 1.0  # ... or when the oldest has waited this long
+    max_flush_retries: int = 3
+    retry_backoff_seconds: float = 0.5   # doubled per attempt, capped at retry_backoff_max_seconds
+    retry_backoff_max_seconds: float = 10.0
+    drain_timeout_seconds: float = 10.0
+
 @dataclass
 class TestingConfig:
     """Testing configuration"""
@@ -164,9 +204,11 @@ class Phase1Config:
         # Build typed configuration objects
         self.database = self._build_database_config()
         self.zero_trust = self._build_zero_trust_config()
+        self.shadow_sampling = self._build_shadow_sampling_config()
         self.cache = self._build_cache_config()
         self.api = self._build_api_config()
         self.logging = self._build_logging_config()
+        self.audit_writer = self._build_audit_writer_config()
         self.testing = self._build_testing_config()
         self.error_translation = self._build_error_translation_config()
         self.success_criteria = self._build_success_criteria()
@@ -282,12 +324,29 @@ class Phase1Config:
             audit_all_events=security_config.get('audit_all_events', True)
         )
     
+    def _build_shadow_sampling_config(self) -> ShadowSamplingConfig:
+        """Build shadow sampling configuration object"""
+        sampling_config = self.raw_config['zero_trust'].get('shadow_sampling', {})
+        
+        return ShadowSamplingConfig(
+            enabled=sampling_config.get('enabled', True),
+            default_rate=sampling_config.get('default_rate', 0.1),
+            tenant_rates=sampling_config.get('tenant_rates') or {},
+            endpoint_rates=sampling_config.get('endpoint_rates') or {},
+            max_shadow_qps=sampling_config.get('max_shadow_qps', 20.0),
+            min_rate=sampling_config.get('min_rate', 0.01),
+            mismatch_boost_seconds=sampling_config.get('mismatch_boost_seconds', 300),
+            always_sample_failures=sampling_config.get('always_sample_failures', True),
+            max_tracked_tenants=sampling_config.get('max_tracked_tenants', 1000)
+        )
+    
     def _build_cache_config(self) -> CacheConfig:
         """Build cache configuration object"""
         cache_config = self.raw_config['cache']
         validation_cache = cache_config.get('validation_cache', {})
         tenant_cache = cache_config.get('tenant_cache', {})
         permission_cache = cache_config.get('permission_cache', {})
+        negative_cache = cache_config.get('negative_cache', {})
         
         return CacheConfig(
             enabled=cache_config.get('enabled', True),
@@ -296,15 +355,23 @@ class Phase1Config:
             
             validation_ttl_seconds=validation_cache.get('ttl_seconds', 300),
             validation_max_entries=validation_cache.get('max_entries', 1000),
+            validation_max_bytes=validation_cache.get('max_bytes', 0),
             validation_enabled=validation_cache.get('enabled', True),
             
             tenant_ttl_seconds=tenant_cache.get('ttl_seconds', 600),
             tenant_max_entries=tenant_cache.get('max_entries', 100),
+            tenant_max_bytes=tenant_cache.get('max_bytes', 0),
             tenant_enabled=tenant_cache.get('enabled', True),
             
             permission_ttl_seconds=permission_cache.get('ttl_seconds', 180),
             permission_max_entries=permission_cache.get('max_entries', 500),
-            permission_enabled=permission_cache.get('enabled', True)
+            permission_max_bytes=permission_cache.get('max_bytes', 0),
+            permission_enabled=permission_cache.get('enabled', True),
+            
+            negative_ttl_seconds=negative_cache.get('ttl_seconds', 30),
+            negative_ttl_jitter=negative_cache.get('ttl_jitter', 0.2),
+            negative_max_entries=negative_cache.get('max_entries', 5000),
+            negative_enabled=negative_cache.get('enabled', True)
         )
     
     def _build_api_config(self) -> APIConfig:
@@ -354,6 +421,21 @@ class Phase1Config:
             error_log=files_config.get('error_log', 'logs/phase1_errors.log')
         )
     
+    def _build_audit_writer_config(self) -> AuditWriterConfig:
+        """Build audit writer configuration object"""
+        writer_config = self.raw_config['logging'].get('audit', {}).get('batch_writer', {})
+        
+        return AuditWriterConfig(
+            enabled=writer_config.get('enabled', True),
+            max_queue_size=writer_config.get('max_queue_size', 10000),
+            batch_size=writer_config.get('batch_size', 200),
+            flush_interval_seconds=writer_config.get('flush_interval_seconds', 1.0),
+            max_flush_retries=writer_config.get('max_flush_retries', 3),
+            retry_backoff_seconds=writer_config.get('retry_backoff_seconds', 0.5),
+            retry_backoff_max_seconds=writer_config.get('retry_backoff_max_seconds', 10.0),
+            drain_timeout_seconds=writer_config.get('drain_timeout_seconds', 10.0)
+        )
+    
     def _build_testing_config(self) -> TestingConfig:
         """Build testing configuration object"""
         test_config = self.raw_config.get('testing', {})
@@ -472,6 +554,14 @@ def get_zero_trust_config() -> ZeroTrustConfig:
     """Get zero trust configuration"""
     return get_config().zero_trust
 
+def get_shadow_sampling_config() -> ShadowSamplingConfig:
+    """Get shadow validation sampling configuration"""
+    return get_config().shadow_sampling
+
+def get_audit_writer_config() -> AuditWriterConfig:
+    """Get audit writer configuration"""
+    return get_config().audit_writer
+
 def get_cache_config() -> CacheConfig:
     """Get cache configuration"""
     return get_config().cache
@@ -5,16 +5,21 @@ Zero user disruption with complete logging
 """
 
 import asyncio
+import hashlib
 import time
 import logging
 import psycopg2
-import json
+import psycopg2.pool
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
-from contextlib import asynccontextmanager
 
 from config import get_config, get_database_config, get_zero_trust_config
+from single_flight import SingleFlight
+from cache_manager import NegativeResultCache
+from shadow_sampler import SampleDecision, get_shadow_sampler
+from audit_writer import AuditRecord, close_audit_writer, get_audit_writer
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -40,70 +45,119 @@ class ParallelValidationResult:
     enhanced_faster: bool
     cache_effectiveness: bool
     validation_hk: Optional[bytes] = None
+    wall_clock_ms: int = 0
+    timed_out: bool = False
+    shadow_sampled: bool = True
 
-class DatabaseConnectionManager:
-    """Manages database connections for validation logging"""
+class ValidationQueryRunner:
+    """
+    Runs blocking validation queries on pooled connections off the event loop
     
-    def __init__(self):
-        self.config = get_database_config()
-        self._connection = None
+    Each query gets statement_timeout = timeout_ms on the server, and a caller
+    that is cancelled (e.g. by the parallel validation timeout) cancels its
+    in-flight query with connection.cancel() so the slower path stops
+    holding a connection.
+    """
+    
+    def __init__(self, db_config=None):
+        self.db_config = db_config or get_database_config()
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.db_config.max_connections,
+            thread_name_prefix="phase1-validation"
+        )
+        self._stats = {
+            'queries': 0,
+            'failures': 0,
+            'cancelled': 0
+        }
+    
+    def _get_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        if self._pool is None:
+            self._pool = psycopg2.pool.ThreadedConnectionPool(
+                1, self.db_config.max_connections,
+                host=self.db_config.host,
+                port=self.db_config.port,
+                database=self.db_config.database,
+                user=self.db_config.user,
+                password=self.db_config.password,
+                connect_timeout=self.db_config.connection_timeout,
+                application_name=self.db_config.application_name
+            )
+            logger.info(f"🔌 Validation connection pool created: max={self.db_config.max_connections}")
+        return self._pool
     
-    @asynccontextmanager
-    async def get_connection(self):
-        """Get database connection with proper cleanup"""
+    async def fetch_value(self, sql: str, params: Tuple, timeout_ms: Optional[int] = None) -> Any:
+        """Run sql on a pooled connection in a worker thread and return the first column"""
+        loop = asyncio.get_running_loop()
+        active: Dict[str, Any] = {}
+        self._stats['queries'] += 1
         try:
-            if not self._connection or self._connection.closed:
-                self._connection = psycopg2.connect(
-                    host=self.config.host,
-                    port=self.config.port,
-                    database=self.config.database,
-                    user=self.config.user,
-                    password=self.config.password,
-                    connect_timeout=self.config.connection_timeout,
-                    application_name=self.config.application_name
-                )
-            
-            yield self._connection
-            
-        except Exception as e:
-            logger.error(f"❌ Database connection error: {e}")
-            if self._connection:
-                self._connection.rollback()
+            return await loop.run_in_executor(
+                self._executor, self._fetch_value_blocking, sql, params, timeout_ms, active
+            )
+        except asyncio.CancelledError:
+            conn = active.get('conn')
+            if conn is not None:
+                self._stats['cancelled'] += 1
+                try:
+                    conn.cancel()
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not cancel validation query: {e}")
+            raise
+        except Exception:
+            self._stats['failures'] += 1
             raise
     
-    async def log_validation_attempt(self, result: ParallelValidationResult, 
-                                   api_endpoint: str, tenant_hk: Optional[bytes] = None):
-        """Log parallel validation attempt to database"""
+    def _fetch_value_blocking(self, sql: str, params: Tuple, timeout_ms: Optional[int],
+                              active: Dict[str, Any]) -> Any:
+        pool = self._get_pool()
+        conn = pool.getconn()
+        active['conn'] = conn
         try:
-            async with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Call the logging function
-                cursor.execute("""
-                    SELECT audit.log_parallel_validation(
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    )
-                """, (
-                    tenant_hk,
-                    api_endpoint,
-                    result.current_result.success,
-                    result.current_result.duration_ms,
-                    result.enhanced_result.success,
-                    result.enhanced_result.duration_ms,
-                    json.dumps(result.enhanced_result.response) if result.enhanced_result.response else None,
-                    result.enhanced_result.token_extended,
-                    result.enhanced_result.cross_tenant_blocked,
-                    result.enhanced_result.cache_hit
-                ))
-                
-                validation_hk = cursor.fetchone()[0]
-                conn.commit()
-                
-                result.validation_hk = validation_hk
-                logger.debug(f"✅ Parallel validation logged: {validation_hk.hex()[:16]}")
-                
-        except Exception as e:
-            logger.error(f"❌ Failed to log validation attempt: {e}")
+            cursor = conn.cursor()
+            try:
+                if timeout_ms:
+                    cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(timeout_ms)),))
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+            conn.commit()
+            return row[0] if row else None
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            active.pop('conn', None)
+            pool.putconn(conn, close=bool(conn.closed))
+    
+    def close(self):
+        """Close pooled connections and stop the worker threads"""
+        self._executor.shutdown(wait=False)
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Query counters for monitoring"""
+        return {
+            **self._stats,
+            'max_connections': self.db_config.max_connections
+        }
+
+# Shared by both validators so they draw from one pool
+_query_runner: Optional[ValidationQueryRunner] = None
+
+def get_query_runner() -> ValidationQueryRunner:
+    """Get global validation query runner (singleton pattern)"""
+    global _query_runner
+    
+    if _query_runner is None:
+        _query_runner = ValidationQueryRunner()
+    
+    return _query_runner
 
 class CacheManager:
     """In-memory cache for validation results"""
@@ -113,6 +167,12 @@ class CacheManager:
         self._validation_cache = {}
         self._tenant_cache = {}
         self._permission_cache = {}
+        self._negative_cache = NegativeResultCache(
+            ttl_seconds=self.config.negative_ttl_seconds,
+            max_entries=self.config.negative_max_entries,
+            jitter=self.config.negative_ttl_jitter,
+            name="enhanced_negative"
+        )
         self._cache_stats = {
             'hits': 0,
             'misses': 0,
@@ -148,6 +208,18 @@ class CacheManager:
                 # Expired
                 del self._validation_cache[cache_key]
         
+        if self.config.negative_enabled:
+            rejection = self._negative_cache.get(token, tenant_id)
+            if rejection is not None:
+                self._cache_stats['hits'] += 1
+                return ValidationResult(
+                    success=False,
+                    duration_ms=0,
+                    response=rejection,
+                    cross_tenant_blocked=True,
+                    cache_hit=True
+                )
+        
         self._cache_stats['misses'] += 1
         return None
     
@@ -172,6 +244,12 @@ class CacheManager:
         self._cache_stats['sets'] += 1
         logger.debug(f"💾 Cached validation result: {cache_key[:8]}")
     
+    def set_rejection(self, token: str, tenant_id: str, response: Optional[Dict[str, Any]]):
+        """Cache a definitive rejection so repeats of a bad token skip the database"""
+        if not self.config.validation_enabled or not self.config.negative_enabled:
+            return
+        self._negative_cache.set(token, tenant_id, response)
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache performance statistics"""
         total_requests = self._cache_stats['hits'] + self._cache_stats['misses']
@@ -184,17 +262,20 @@ class CacheManager:
             'cache_hit_rate': round(hit_rate, 2),
             'total_hits': self._cache_stats['hits'],
             'total_misses': self._cache_stats['misses'],
-            'total_sets': self._cache_stats['sets']
+            'total_sets': self._cache_stats['sets'],
+            'negative_cache': self._negative_cache.get_stats()
         }
 
 class EnhancedZeroTrustValidator:
     """Enhanced zero trust validation with improved performance and security"""
     
-    def __init__(self):
+    def __init__(self, query_runner: Optional[ValidationQueryRunner] = None):
         self.config = get_zero_trust_config()
         self.db_config = get_database_config()
         self.cache = CacheManager()
-        self._connection_pool = []
+        self.query_runner = query_runner or get_query_runner()
+        # Concurrent cold-cache validations of one token share a single query
+        self._validation_flight = SingleFlight("enhanced_validation")
     
     async def validate_token_enhanced(self, token: str, tenant_id: str, 
                                     user_agent: str = "", ip_address: str = "") -> ValidationResult:
@@ -207,36 +288,14 @@ class EnhancedZeroTrustValidator:
             return cached_result
         
         try:
-            # Enhanced validation with additional security checks
-            conn = psycopg2.connect(
-                host=self.db_config.host,
-                port=self.db_config.port,
-                database=self.db_config.database,
-                user=self.db_config.user,
-                password=self.db_config.password,
-                connect_timeout=3,  # Faster timeout for enhanced validation
-                application_name="phase1_enhanced_validation"
+            token_hash = hashlib.sha256(token.encode()).hexdigest()
+            validation_result = await self._validation_flight.do(
+                (token_hash, tenant_id),
+                lambda: self._query_enhanced_validation(token, tenant_id)
             )
             
-            cursor = conn.cursor()
-            
-            # Call enhanced validation function with additional context
-            cursor.execute("""
-                SELECT 
-                    auth.validate_and_extend_production_token(%s, %s) as validation_result,
-                    CASE 
-                        WHEN %s != '' AND position('cross-tenant' in lower(%s)) > 0 
-                        THEN TRUE 
-                        ELSE FALSE 
-                    END as suspicious_request
-            """, (token, tenant_id, user_agent, user_agent))
-            
-            result_row = cursor.fetchone()
-            if not result_row:
-                raise ValueError("No validation result returned")
-            
-            validation_result = result_row[0] if result_row[0] else {}
-            suspicious_request = result_row[1] if len(result_row) > 1 else False
+            # Request-specific check stays per caller so coalesced waiters can share the query
+            suspicious_request = bool(user_agent) and 'cross-tenant' in user_agent.lower()
             
             # Parse validation result
             success = validation_result.get('p_success', False) if validation_result else False
@@ -254,9 +313,11 @@ class EnhancedZeroTrustValidator:
                 cache_hit=False
             )
             
-            # Cache successful results
+            # Cache successes; rejections go to the short-lived negative cache
             if success:
                 self.cache.set_validation_result(token, tenant_id, result)
+            else:
+                self.cache.set_rejection(token, tenant_id, validation_result)
             
             logger.debug(f"🛡️ Enhanced validation: success={success}, duration={duration_ms}ms")
             return result
@@ -271,38 +332,39 @@ class EnhancedZeroTrustValidator:
                 error_message=str(e),
                 cache_hit=False
             )
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
+    
+    async def _query_enhanced_validation(self, token: str, tenant_id: str) -> Dict[str, Any]:
+        """Run the enhanced validation function on a pooled connection"""
+        validation_result = await self.query_runner.fetch_value(
+            "SELECT auth.validate_and_extend_production_token(%s, %s) as validation_result",
+            (token, tenant_id),
+            timeout_ms=self.config.timeout_ms
+        )
+        return validation_result or {}
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Executed vs. coalesced validation queries"""
+        return self._validation_flight.get_stats()
 
 class CurrentZeroTrustValidator:
     """Current zero trust validation (placeholder for existing system)"""
     
+    def __init__(self, query_runner: Optional[ValidationQueryRunner] = None):
+        self.config = get_zero_trust_config()
+        self.query_runner = query_runner or get_query_runner()
+    
     async def validate_token_current(self, token: str, tenant_id: str, 
                                    user_agent: str = "", ip_address: str = "") -> ValidationResult:
         """Current token validation (simulating existing behavior)"""
         start_time = time.perf_counter()
         
         try:
-            # Simulate current validation behavior
-            db_config = get_database_config()
-            conn = psycopg2.connect(
-                host=db_config.host,
-                port=db_config.port,
-                database=db_config.database,
-                user=db_config.user,
-                password=db_config.password,
-                connect_timeout=db_config.connection_timeout,
-                application_name="phase1_current_validation"
-            )
-            
-            cursor = conn.cursor()
-            
             # Use existing validation function
-            cursor.execute("SELECT auth.validate_production_api_token(%s, %s)", (token, tenant_id))
-            validation_result = cursor.fetchone()[0]
+            validation_result = await self.query_runner.fetch_value(
+                "SELECT auth.validate_production_api_token(%s, %s)",
+                (token, tenant_id),
+                timeout_ms=self.config.timeout_ms
+            )
             
             success = validation_result.get('p_success', False) if validation_result else False
             duration_ms = int((time.perf_counter() - start_time) * 1000)
@@ -324,11 +386,6 @@ class CurrentZeroTrustValidator:
                 error_message=str(e),
                 cache_hit=False
             )
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
 class ParallelValidationMiddleware:
     """Main parallel validation middleware - runs both validations simultaneously"""
@@ -336,9 +393,12 @@ class ParallelValidationMiddleware:
     def __init__(self):
         self.config = get_config()
         self.zero_trust_config = get_zero_trust_config()
-        self.current_validator = CurrentZeroTrustValidator()
-        self.enhanced_validator = EnhancedZeroTrustValidator()
-        self.db_manager = DatabaseConnectionManager()
+        self.query_runner = get_query_runner()
+        self.current_validator = CurrentZeroTrustValidator(self.query_runner)
+        self.enhanced_validator = EnhancedZeroTrustValidator(self.query_runner)
+        self.audit_writer = get_audit_writer()
+        self.sampler = get_shadow_sampler()
+        self._shadow_tasks = set()
         
         logger.info(f"🛡️ Parallel Validation Middleware initialized: {self.config.implementation_name}")
     
@@ -365,11 +425,12 @@ class ParallelValidationMiddleware:
         if not token or not tenant_id:
             raise ValueError("❌ Token and tenant_id are required")
         
+        timeout_ms = self.zero_trust_config.timeout_ms
+        
         try:
-            # Run both validations simultaneously with timeout protection
+            # Both validators await pooled queries on worker threads, so they overlap for real
             start_time = time.perf_counter()
             
-            # Run validations in parallel with timeout
             current_task = asyncio.create_task(
                 self.current_validator.validate_token_current(token, tenant_id, user_agent, ip_address)
             )
@@ -377,17 +438,24 @@ class ParallelValidationMiddleware:
                 self.enhanced_validator.validate_token_enhanced(token, tenant_id, user_agent, ip_address)
             )
             
-            # Wait for both with timeout
-            timeout_seconds = self.zero_trust_config.timeout_ms / 1000
-            current_result, enhanced_result = await asyncio.wait_for(
-                asyncio.gather(current_task, enhanced_task),
-                timeout=timeout_seconds
+            # Hard timeout: whichever path has not finished is cancelled (its query too)
+            done, pending = await asyncio.wait({current_task, enhanced_task}, timeout=timeout_ms / 1000)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                logger.warning(f"⏰ Parallel validation timeout after {timeout_ms}ms: "
+                               f"cancelled {'current' if current_task in pending else 'enhanced'}"
+                               f"{' and enhanced' if len(pending) == 2 else ''} path")
+            
+            wall_clock_ms = int((time.perf_counter() - start_time) * 1000)
+            current_result = current_task.result() if current_task in done else self._timeout_result(timeout_ms)
+            enhanced_result = enhanced_task.result() if enhanced_task in done else self._timeout_result(timeout_ms)
+            
+            # Time saved by overlapping the two paths instead of running them back to back
+            performance_improvement_ms = max(
+                current_result.duration_ms + enhanced_result.duration_ms - wall_clock_ms, 0
             )
-            
-            total_duration_ms = int((time.perf_counter() - start_time) * 1000)
-            
-            # Calculate performance metrics
-            performance_improvement_ms = current_result.duration_ms - enhanced_result.duration_ms
             results_match = (current_result.success == enhanced_result.success)
             enhanced_faster = enhanced_result.duration_ms < current_result.duration_ms
             cache_effectiveness = enhanced_result.cache_hit
@@ -398,42 +466,25 @@ class ParallelValidationMiddleware:
                 performance_improvement_ms=performance_improvement_ms,
                 results_match=results_match,
                 enhanced_faster=enhanced_faster,
-                cache_effectiveness=cache_effectiveness
+                cache_effectiveness=cache_effectiveness,
+                wall_clock_ms=wall_clock_ms,
+                timed_out=bool(pending)
             )
             
-            # Log validation attempt (fire and forget)
-            asyncio.create_task(self._log_validation_safely(result, api_endpoint, tenant_id))
+            # Queue the audit record; the writer commits it with the next batch
+            self._log_validation_safely(result, api_endpoint, tenant_id)
             
             # Log performance metrics
             if self.config.logging.log_performance:
                 logger.info(f"⚡ Parallel validation completed: "
                           f"current={current_result.duration_ms}ms, "
                           f"enhanced={enhanced_result.duration_ms}ms, "
-                          f"improvement={performance_improvement_ms}ms, "
+                          f"wall={wall_clock_ms}ms, "
+                          f"overlap={performance_improvement_ms}ms, "
                           f"match={results_match}")
             
             return result
             
-        except asyncio.TimeoutError:
-            logger.error(f"⏰ Parallel validation timeout after {timeout_seconds}s")
-            
-            # Return timeout result
-            timeout_result = ValidationResult(
-                success=False,
-                duration_ms=int(timeout_seconds * 1000),
-                error_message="Validation timeout",
-                cache_hit=False
-            )
-            
-            return ParallelValidationResult(
-                current_result=timeout_result,
-                enhanced_result=timeout_result,
-                performance_improvement_ms=0,
-                results_match=True,
-                enhanced_faster=False,
-                cache_effectiveness=False
-            )
-            
         except Exception as e:
             logger.error(f"❌ Parallel validation error: {e}")
             
@@ -454,9 +505,85 @@ class ParallelValidationMiddleware:
                 cache_effectiveness=False
             )
     
-    async def _log_validation_safely(self, result: ParallelValidationResult, 
-                                   api_endpoint: str, tenant_id: str):
-        """Safely log validation attempt without affecting main flow"""
+    async def validate_sampled(self, token: str, tenant_id: str, api_endpoint: str = "",
+                               user_agent: str = "", ip_address: str = "") -> ParallelValidationResult:
+        """
+        Fail-safe validation with shadow sampling
+        
+        The current (primary) validator always runs. The enhanced (shadow)
+        validator and the audit write only run for sampled requests, plus,
+        off the request path, for requests the primary rejected.
+        """
+        decision = self.sampler.decide(tenant_id, api_endpoint)
+        
+        if decision.sampled:
+            result = await self.validate_parallel(token, tenant_id, api_endpoint, user_agent, ip_address)
+            self.sampler.record(decision, tenant_id, api_endpoint, result.results_match,
+                                primary_success=result.current_result.success)
+            return result
+        
+        current_result = await self.current_validator.validate_token_current(
+            token, tenant_id, user_agent, ip_address
+        )
+        
+        if not current_result.success and self.sampler.config.always_sample_failures:
+            task = asyncio.create_task(self._shadow_validate(
+                current_result, self.sampler.forced_decision(),
+                token, tenant_id, api_endpoint, user_agent, ip_address
+            ))
+            self._shadow_tasks.add(task)
+            task.add_done_callback(self._shadow_tasks.discard)
+        
+        return ParallelValidationResult(
+            current_result=current_result,
+            enhanced_result=current_result,
+            performance_improvement_ms=0,
+            results_match=True,
+            enhanced_faster=False,
+            cache_effectiveness=False,
+            wall_clock_ms=current_result.duration_ms,
+            shadow_sampled=False
+        )
+    
+    async def _shadow_validate(self, current_result: ValidationResult, decision: SampleDecision,
+                               token: str, tenant_id: str, api_endpoint: str,
+                               user_agent: str, ip_address: str):
+        """Run the enhanced validator after the response, compare and log"""
+        timeout_ms = self.zero_trust_config.timeout_ms
+        try:
+            enhanced_result = await asyncio.wait_for(
+                self.enhanced_validator.validate_token_enhanced(token, tenant_id, user_agent, ip_address),
+                timeout=timeout_ms / 1000
+            )
+        except asyncio.TimeoutError:
+            enhanced_result = self._timeout_result(timeout_ms)
+        
+        result = ParallelValidationResult(
+            current_result=current_result,
+            enhanced_result=enhanced_result,
+            performance_improvement_ms=0,
+            results_match=(current_result.success == enhanced_result.success),
+            enhanced_faster=enhanced_result.duration_ms < current_result.duration_ms,
+            cache_effectiveness=enhanced_result.cache_hit,
+            wall_clock_ms=current_result.duration_ms + enhanced_result.duration_ms
+        )
+        self.sampler.record(decision, tenant_id, api_endpoint, result.results_match,
+                            primary_success=current_result.success)
+        self._log_validation_safely(result, api_endpoint, tenant_id)
+    
+    @staticmethod
+    def _timeout_result(timeout_ms: int) -> ValidationResult:
+        """Result for a path cancelled by the parallel validation timeout"""
+        return ValidationResult(
+            success=False,
+            duration_ms=timeout_ms,
+            error_message="Validation timeout",
+            cache_hit=False
+        )
+    
+    def _log_validation_safely(self, result: ParallelValidationResult, 
+                             api_endpoint: str, tenant_id: str):
+        """Queue the validation attempt for the audit writer without affecting main flow"""
         try:
             # Convert tenant_id to bytes if needed
             tenant_hk = None
@@ -466,7 +593,7 @@ class ParallelValidationMiddleware:
                 else:
                     tenant_hk = tenant_id
             
-            await self.db_manager.log_validation_attempt(result, api_endpoint, tenant_hk)
+            self.audit_writer.submit(AuditRecord.from_result(result, api_endpoint, tenant_hk))
             
         except Exception as e:
             logger.error(f"❌ Failed to log validation (non-blocking): {e}")
@@ -486,6 +613,10 @@ class ParallelValidationMiddleware:
                 'cache_hit_target_pct': self.zero_trust_config.cache_hit_target_pct
             },
             'cache_performance': cache_stats,
+            'request_coalescing': self.enhanced_validator.get_coalescing_stats(),
+            'validation_queries': self.query_runner.get_stats(),
+            'shadow_sampling': self.sampler.get_stats(),
+            'audit_writer': self.audit_writer.get_stats(),
             'timestamp': datetime.now().isoformat()
         }
 
@@ -501,6 +632,12 @@ def get_middleware() -> ParallelValidationMiddleware:
     
     return _middleware_instance
 
+async def shutdown():
+    """Flush queued audit records and close validation connections"""
+    await close_audit_writer()
+    if _query_runner is not None:
+        _query_runner.close()
+
 async def validate_request(token: str, tenant_id: str, api_endpoint: str = "",
                          user_agent: str = "", ip_address: str = "") -> Dict[str, Any]:
     """
@@ -510,20 +647,26 @@ async def validate_request(token: str, tenant_id: str, api_endpoint: str = "",
     middleware = get_middleware()
     
     try:
-        # Run parallel validation
-        result = await middleware.validate_parallel(
-            token, tenant_id, api_endpoint, user_agent, ip_address
-        )
-        
         # In fail-safe mode, always return current validation result
         if middleware.zero_trust_config.fail_safe_mode:
+            # Enhanced validation is shadow traffic here, so only a sample pays for it
+            result = await middleware.validate_sampled(
+                token, tenant_id, api_endpoint, user_agent, ip_address
+            )
+            
             validation_response = result.current_result.response or {}
-            validation_response['phase1_enhanced_available'] = result.enhanced_result.success
+            validation_response['phase1_shadow_sampled'] = result.shadow_sampled
+            validation_response['phase1_enhanced_available'] = result.shadow_sampled and result.enhanced_result.success
             validation_response['phase1_performance_improvement_ms'] = result.performance_improvement_ms
             validation_response['phase1_cache_hit'] = result.enhanced_result.cache_hit
             
             return validation_response
         else:
+            # Enhanced result is authoritative, so both validators always run
+            result = await middleware.validate_parallel(
+                token, tenant_id, api_endpoint, user_agent, ip_address
+            )
+            
             # Use enhanced result if it's successful, otherwise fall back to current
             primary_result = result.enhanced_result if result.enhanced_result.success else result.current_result
             response = primary_result.response or {}
@@ -0,0 +1,210 @@
+"""
+Phase 1 Shadow Validation Sampler
+Decides which fail-safe requests also run the enhanced (shadow) validator
+
+- Per-tenant and per-endpoint sample rates over a default rate
+- Adaptive cap: the rate shrinks so shadow validations stay under max_shadow_qps
+- Always sample a tenant/endpoint for mismatch_boost_seconds after a mismatch,
+  and (optionally) every request the primary validator rejected
+
+Every decision carries the probability it was sampled with, so match/mismatch
+estimates use inverse-probability (1/p) weights and stay unbiased even though
+boosted and forced samples are over-represented.
+"""
+
+import random
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import ShadowSamplingConfig, get_shadow_sampling_config
+
+logger = logging.getLogger(__name__)
+
+# Mismatch boosts tracked before expired ones are pruned
+MAX_BOOSTED_KEYS = 1000
+
+# Stats bucket for tenants beyond max_tracked_tenants
+OVERFLOW_TENANT = '_other'
+
+@dataclass
+class SampleDecision:
+    """Whether to shadow-validate a request, and with what probability"""
+    sampled: bool
+    probability: float
+    reason: str
+
+class _OutcomeStats:
+    """Raw and 1/p-weighted match counters"""
+    __slots__ = ('requests', 'sampled', 'matches', 'mismatches', 'weighted_sampled', 'weighted_mismatches')
+
+    def __init__(self):
+        self.requests = 0
+        self.sampled = 0
+        self.matches = 0
+        self.mismatches = 0
+        self.weighted_sampled = 0.0
+        self.weighted_mismatches = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Weighted mismatches estimate the mismatch count across *all* requests
+        estimated_rate = self.weighted_mismatches / self.weighted_sampled if self.weighted_sampled else 0.0
+        return {
+            'requests': self.requests,
+            'sampled': self.sampled,
+            'sample_rate_observed': round(self.sampled / self.requests, 4) if self.requests else 0.0,
+            'matches': self.matches,
+            'mismatches': self.mismatches,
+            'estimated_mismatch_rate': round(estimated_rate, 6),
+            'estimated_mismatches': round(self.weighted_mismatches, 2)
+        }
+
+class ShadowSampler:
+    """Per-process shadow validation sampler"""
+
+    def __init__(self, config: Optional[ShadowSamplingConfig] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Callable[[], float] = random.random):
+        self.config = config or get_shadow_sampling_config()
+        self._clock = clock
+        self._rng = rng
+        self._boosted_until: Dict[Tuple[str, str], float] = {}
+
+        # QPS estimate from one-second windows
+        self._window_start = int(clock())
+        self._window_count = 0
+        self._qps = 0.0
+
+        self._totals = _OutcomeStats()
+        self._tenants: Dict[str, _OutcomeStats] = {}
+        self._overflow = _OutcomeStats()
+        self._reasons: Dict[str, int] = {}
+
+    def _observe_request(self, now: float) -> float:
+        """Count a request and return the current request rate estimate"""
+        second = int(now)
+        if second != self._window_start:
+            elapsed = max(second - self._window_start, 1)
+            self._qps = (self._qps + self._window_count / elapsed) / 2
+            self._window_start = second
+            self._window_count = 0
+        self._window_count += 1
+        # The partial current window is a lower bound on this second's rate
+        return max(self._qps, float(self._window_count))
+
+    def base_rate(self, tenant_id: str, endpoint: str) -> float:
+        """Configured rate for a tenant/endpoint before the adaptive cap"""
+        if tenant_id in self.config.tenant_rates:
+            return self.config.tenant_rates[tenant_id]
+
+        best_prefix = None
+        for prefix in self.config.endpoint_rates:
+            if endpoint.startswith(prefix) and (best_prefix is None or len(prefix) > len(best_prefix)):
+                best_prefix = prefix
+        if best_prefix is not None:
+            return self.config.endpoint_rates[best_prefix]
+
+        return self.config.default_rate
+
+    def decide(self, tenant_id: str, endpoint: str) -> SampleDecision:
+        """Decide whether this request runs the shadow validator"""
+        now = self._clock()
+        qps = self._observe_request(now)
+        self._stats_for(tenant_id).requests += 1
+        self._totals.requests += 1
+
+        if not self.config.enabled:
+            return self._decision(True, 1.0, 'sampling_disabled')
+
+        boosted_until = self._boosted_until.get((tenant_id, endpoint))
+        if boosted_until is not None:
+            if now < boosted_until:
+                return self._decision(True, 1.0, 'mismatch_boost')
+            del self._boosted_until[(tenant_id, endpoint)]
+
+        rate = self.base_rate(tenant_id, endpoint)
+        capped = min(rate, self.config.max_shadow_qps / qps) if qps > 0 else rate
+        probability = max(capped, min(rate, self.config.min_rate))
+
+        if probability >= 1.0:
+            return self._decision(True, 1.0, 'rate')
+        if probability <= 0.0:
+            return self._decision(False, 0.0, 'rate')
+        return self._decision(self._rng() < probability, probability,
+                              'rate' if probability == rate else 'rate_capped')
+
+    def forced_decision(self, reason: str = 'primary_failed') -> SampleDecision:
+        """Sample unconditionally (e.g. the primary validator rejected the request)"""
+        return self._decision(True, 1.0, reason)
+
+    def _decision(self, sampled: bool, probability: float, reason: str) -> SampleDecision:
+        if sampled:
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        return SampleDecision(sampled=sampled, probability=probability, reason=reason)
+
+    def record(self, decision: SampleDecision, tenant_id: str, endpoint: str, results_match: bool,
+               primary_success: bool = True):
+        """Record the outcome of a shadow validation"""
+        probability = decision.probability
+        if not primary_success and self.config.always_sample_failures:
+            # Rejected requests are always shadowed, whatever the coin said
+            probability = 1.0
+        weight = 1.0 / probability if probability > 0 else 0.0
+        for stats in (self._totals, self._stats_for(tenant_id)):
+            stats.sampled += 1
+            stats.weighted_sampled += weight
+            if results_match:
+                stats.matches += 1
+            else:
+                stats.mismatches += 1
+                stats.weighted_mismatches += weight
+
+        if not results_match and self.config.mismatch_boost_seconds > 0:
+            if len(self._boosted_until) >= MAX_BOOSTED_KEYS:
+                self._prune_boosts()
+            self._boosted_until[(tenant_id, endpoint)] = self._clock() + self.config.mismatch_boost_seconds
+            logger.warning(f"⚠️ Shadow validation mismatch for {tenant_id} {endpoint}: "
+                           f"sampling 100% for {self.config.mismatch_boost_seconds}s")
+
+    def _prune_boosts(self):
+        now = self._clock()
+        for key in [key for key, until in self._boosted_until.items() if until <= now]:
+            del self._boosted_until[key]
+
+    def _stats_for(self, tenant_id: str) -> _OutcomeStats:
+        """Per-tenant stats, for up to max_tracked_tenants tenants; the rest share OVERFLOW_TENANT"""
+        stats = self._tenants.get(tenant_id)
+        if stats is None:
+            if len(self._tenants) >= self.config.max_tracked_tenants:
+                return self._overflow
+            stats = self._tenants[tenant_id] = _OutcomeStats()
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Sampling and weighted match statistics"""
+        return {
+            'enabled': self.config.enabled,
+            'default_rate': self.config.default_rate,
+            'max_shadow_qps': self.config.max_shadow_qps,
+            'request_qps_estimate': round(max(self._qps, float(self._window_count)), 2),
+            'boosted_keys': len(self._boosted_until),
+            'sampled_by_reason': dict(self._reasons),
+            **self._totals.to_dict(),
+            'tenants': {
+                **{tenant_id: stats.to_dict() for tenant_id, stats in self._tenants.items()},
+                **({OVERFLOW_TENANT: self._overflow.to_dict()} if self._overflow.requests else {})
+            }
+        }
+
+# Global sampler instance
+_sampler_instance: Optional[ShadowSampler] = None
+
+def get_shadow_sampler() -> ShadowSampler:
+    """Get global shadow sampler instance (singleton pattern)"""
+    global _sampler_instance
+
+    if _sampler_instance is None:
+        _sampler_instance = ShadowSampler()
+
+    return _sampler_instance
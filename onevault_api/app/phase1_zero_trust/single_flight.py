@@ -0,0 +1,80 @@
+"""
+Phase 1 Single-Flight Request Coalescing
+Concurrent cache misses for the same key share one in-flight lookup
+
+When a dashboard fires 20 parallel requests with one Bearer token on a cold
+cache, only the first runs the validation query; the other 19 await the same
+task and receive the same result (or the same exception). When every waiter
+has been cancelled the shared task is cancelled too, so nobody keeps a query
+running for a result nobody will read.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key onto one asyncio task"""
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._stats = {
+            'executed': 0,
+            'coalesced': 0,
+            'failed': 0,
+            'abandoned': 0,
+        }
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn() for key, or join the call already in flight for key
+
+        The lookup runs in its own task, so a cancelled caller does not
+        cancel the work the other waiters are sharing. Cancelling the last
+        waiter cancels the lookup (and whatever query it is awaiting).
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._stats['executed'] += 1
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+        else:
+            self._stats['coalesced'] += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                self._stats['abandoned'] += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._stats['failed'] += 1
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Executed vs. coalesced lookup counters"""
+        total = self._stats['executed'] + self._stats['coalesced']
+        return {
+            'name': self.name,
+            **self._stats,
+            'inflight': len(self._inflight),
+            'coalesce_rate': round(self._stats['coalesced'] / total * 100, 2) if total else 0.0,
+        }
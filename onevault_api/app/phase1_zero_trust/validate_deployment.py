@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Tuple
 import json
 
 from config import get_config
-from parallel_validation import get_middleware
+from parallel_validation import get_middleware, shutdown
 from cache_manager import get_cache_manager
 from error_translation import get_error_service
 from test_phase1 import run_all_tests
@@ -378,6 +378,9 @@ Commands to start:
     else:
         print("\n❌ DEPLOYMENT BLOCKED - Review failed checks above")
     
+    # Flush audit records queued by the validation checks
+    await shutdown()
+    
     return readiness_result['ready']
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+"""
+Database Pool Monitoring Endpoints
+==================================
+
+Per-worker connection pool metrics for sizing pools under gunicorn/uvicorn
+"""
+
+from fastapi import APIRouter
+import logging
+import os
+from datetime import datetime, timezone
+
+from ..utils.connection_pool import get_all_pool_stats
+
+logger = logging.getLogger(__name__)
+
+# Create router for database monitoring
+database_router = APIRouter(prefix="/api/v1/database", tags=["Database"])
+
+@database_router.get("/pool")
+async def get_pool_metrics():
+    """
+    Get connection pool statistics for this worker process
+
+    Each worker owns its own pools, so sample this endpoint repeatedly to see
+    every worker; total connections = per-worker max_size x worker count.
+    """
+    try:
+        pools = get_all_pool_stats()
+
+        return {
+            "worker_pid": os.getpid(),
+            "pool_count": len(pools),
+            "pools": pools,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    except Exception as e:
+        logger.error(f"❌ Database pool metrics error: {e}")
+        return {
+            "error": str(e),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
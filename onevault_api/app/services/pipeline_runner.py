@@ -0,0 +1,430 @@
+"""
+Site Tracking Pipeline Runner
+=============================
+
+Standalone ETL runner that drains raw -> staging -> business outside the API
+process, so pipeline throughput no longer depends on tracking traffic.
+
+N worker threads take (stage, tenant) work items from a round-robin queue and
+run one batch each through the existing set-based functions:
+
+- raw -> staging:       staging.process_raw_events_batch(tenant_hk, batch_size)
+- staging -> business:  staging.process_staging_to_business(batch_size)
+
+Both claim rows with FOR UPDATE SKIP LOCKED, so workers never block on each
+other. An item goes back to the tail of the queue after a full batch, which
+gives every tenant with pending events a turn before any tenant gets another;
+max_inflight_per_tenant caps how many workers a single tenant can occupy.
+
+Usage:
+    python -m app.services.pipeline_runner --workers 4 --batch-size 500
+    python -m app.services.pipeline_runner --once   # drain the backlog and exit
+
+Set PIPELINE_SCHEDULER_ENABLED=false on the API when this runner is deployed.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from ..utils.connection_pool import ConnectionPool, PoolConfig
+
+logger = logging.getLogger(__name__)
+
+STAGE_RAW = 'raw_to_staging'
+STAGE_BUSINESS = 'staging_to_business'
+
+WorkItem = Tuple[str, Optional[bytes]]  # (stage, tenant_hk); business stage is not tenant-scoped
+
+_RAW_BACKLOG_SQL = """
+    SELECT tenant_hk, COUNT(*), EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(received_timestamp))
+    FROM raw.site_tracking_events_r
+    WHERE processing_status = 'PENDING'
+    GROUP BY tenant_hk
+"""
+
+_BUSINESS_BACKLOG_SQL = """
+    SELECT COUNT(*), EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(processed_timestamp))
+    FROM staging.site_tracking_events_s
+    WHERE validation_status = 'VALID'
+    AND processed_to_business IS NOT TRUE
+"""
+
+
+@dataclass
+class PipelineRunnerConfig:
+    """Pipeline runner settings"""
+    workers: int = 4
+    batch_size: int = 500
+    max_inflight_per_tenant: int = 2
+    report_interval_seconds: float = 5.0   # backlog refresh + report line
+    idle_poll_seconds: float = 1.0
+    error_backoff_seconds: float = 2.0
+    shutdown_timeout_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls, prefix: str = "PIPELINE_RUNNER_") -> "PipelineRunnerConfig":
+        """Build runner configuration from environment variables"""
+        defaults = cls()
+        return cls(
+            workers=int(os.getenv(f"{prefix}WORKERS", defaults.workers)),
+            batch_size=int(os.getenv(f"{prefix}BATCH_SIZE", defaults.batch_size)),
+            max_inflight_per_tenant=int(os.getenv(f"{prefix}MAX_INFLIGHT_PER_TENANT", defaults.max_inflight_per_tenant)),
+            report_interval_seconds=float(os.getenv(f"{prefix}REPORT_INTERVAL_SECONDS", defaults.report_interval_seconds)),
+            idle_poll_seconds=float(os.getenv(f"{prefix}IDLE_POLL_SECONDS", defaults.idle_poll_seconds)),
+            error_backoff_seconds=float(os.getenv(f"{prefix}ERROR_BACKOFF_SECONDS", defaults.error_backoff_seconds)),
+            shutdown_timeout_seconds=float(os.getenv(f"{prefix}SHUTDOWN_TIMEOUT_SECONDS", defaults.shutdown_timeout_seconds)),
+        )
+
+
+class WorkQueue:
+    """
+    Round-robin queue of pipeline work items
+
+    An item is queued at most once. Taking an item re-queues it at the tail
+    while fewer than max_inflight workers hold it, so one tenant's backlog
+    can use several workers without starving the others.
+    """
+
+    def __init__(self, max_inflight: int = 1):
+        self.max_inflight = max(1, max_inflight)
+        self._items: Deque[WorkItem] = deque()
+        self._queued: Set[WorkItem] = set()
+        self._inflight: Dict[WorkItem, int] = {}
+        self._cond = threading.Condition(threading.Lock())
+
+    def put(self, item: WorkItem) -> bool:
+        """Queue an item unless it is already waiting; returns True if queued"""
+        with self._cond:
+            return self._put(item)
+
+    def _put(self, item: WorkItem) -> bool:
+        if item in self._queued:
+            return False
+        self._items.append(item)
+        self._queued.add(item)
+        self._cond.notify()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[WorkItem]:
+        """Take the next item, or None if nothing arrives within timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                return None
+            item = self._items.popleft()
+            self._queued.discard(item)
+            inflight = self._inflight.get(item, 0) + 1
+            self._inflight[item] = inflight
+            if inflight < self.max_inflight:
+                self._put(item)
+            return item
+
+    def done(self, item: WorkItem, more_work: bool):
+        """Release an item; a full batch sends it back to the tail of the queue"""
+        with self._cond:
+            inflight = self._inflight.get(item, 0) - 1
+            if inflight > 0:
+                self._inflight[item] = inflight
+            else:
+                self._inflight.pop(item, None)
+            if more_work:
+                self._put(item)
+
+    def idle(self) -> bool:
+        """True when nothing is queued or in flight"""
+        with self._cond:
+            return not self._items and not self._inflight
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+def run_raw_batch(conn: psycopg2.extensions.connection, tenant_hk: Optional[bytes], batch_size: int) -> Tuple[int, int]:
+    """One raw -> staging batch for a tenant; returns (processed, errors)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT processed_count, error_count FROM staging.process_raw_events_batch(%s, %s)",
+            (psycopg2.Binary(tenant_hk) if tenant_hk is not None else None, batch_size)
+        )
+        processed, errors = cursor.fetchone()
+        conn.commit()
+        return processed or 0, errors or 0
+    finally:
+        cursor.close()
+
+
+def run_business_batch(conn: psycopg2.extensions.connection, batch_size: int) -> Tuple[int, int]:
+    """One staging -> business batch; returns (loaded, errors)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT success_count, error_count FROM staging.process_staging_to_business(%s)",
+            (batch_size,)
+        )
+        loaded, errors = cursor.fetchone()
+        conn.commit()
+        return loaded or 0, errors or 0
+    finally:
+        cursor.close()
+
+
+class PipelineRunner:
+    """Multi-worker raw -> staging -> business pipeline runner"""
+
+    def __init__(self, pool: ConnectionPool, config: Optional[PipelineRunnerConfig] = None):
+        self.pool = pool
+        self.config = config or PipelineRunnerConfig()
+        self.queue = WorkQueue(max_inflight=self.config.max_inflight_per_tenant)
+        self._stop = threading.Event()
+        self._workers: list = []
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._stats = {
+            'batches': 0,
+            'batch_failures': 0,
+            'raw_to_staging_events': 0,
+            'staging_to_business_events': 0,
+            'event_errors': 0,
+        }
+        self._backlog = {
+            'raw_pending': 0,
+            'raw_oldest_seconds': 0.0,
+            'raw_tenants': 0,
+            'business_pending': 0,
+            'business_oldest_seconds': 0.0,
+        }
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep until timeout or stop(); returns True if stopping"""
+        return self._stop.wait(timeout)
+
+    def start(self):
+        """Start the worker threads"""
+        self._started_at = time.monotonic()
+        for index in range(self.config.workers):
+            worker = threading.Thread(target=self._work, name=f"pipeline-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"🔄 Pipeline runner started: workers={self.config.workers}, "
+                    f"batch_size={self.config.batch_size}, max_inflight_per_tenant={self.config.max_inflight_per_tenant}")
+
+    def stop(self):
+        """Ask workers to finish their current batch and exit"""
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for workers to exit; returns False if any are still running"""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.config.shutdown_timeout_seconds)
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        return not any(worker.is_alive() for worker in self._workers)
+
+    def refresh_backlog(self) -> int:
+        """Read pending counts and queue work for every stage/tenant that has some"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(_RAW_BACKLOG_SQL)
+                raw_rows = cursor.fetchall()
+                cursor.execute(_BUSINESS_BACKLOG_SQL)
+                business_pending, business_oldest = cursor.fetchone()
+                conn.rollback()  # read-only; don't hold a snapshot open
+            finally:
+                cursor.close()
+
+        queued = 0
+        for tenant_hk, _, _ in raw_rows:
+            queued += self.queue.put((STAGE_RAW, bytes(tenant_hk)))
+        if business_pending:
+            queued += self.queue.put((STAGE_BUSINESS, None))
+
+        with self._lock:
+            self._backlog = {
+                'raw_pending': sum(row[1] for row in raw_rows),
+                'raw_oldest_seconds': float(max((row[2] or 0) for row in raw_rows)) if raw_rows else 0.0,
+                'raw_tenants': len(raw_rows),
+                'business_pending': business_pending or 0,
+                'business_oldest_seconds': float(business_oldest or 0),
+            }
+        return queued
+
+    def _work(self):
+        while not self._stop.is_set():
+            item = self.queue.get(timeout=self.config.idle_poll_seconds)
+            if item is None:
+                continue
+            more_work = False
+            try:
+                more_work = self._run_item(item)
+            except Exception as e:
+                with self._lock:
+                    self._stats['batch_failures'] += 1
+                logger.error(f"❌ Pipeline batch failed ({item[0]}): {e}")
+                self._stop.wait(self.config.error_backoff_seconds)
+            finally:
+                self.queue.done(item, more_work and not self._stop.is_set())
+
+    def _run_item(self, item: WorkItem) -> bool:
+        """Run one batch for a work item; returns True if the batch was full"""
+        stage, tenant_hk = item
+        batch_size = self.config.batch_size
+        with self.pool.connection() as conn:
+            try:
+                if stage == STAGE_RAW:
+                    done, errors = run_raw_batch(conn, tenant_hk, batch_size)
+                else:
+                    done, errors = run_business_batch(conn, batch_size)
+            except psycopg2.Error:
+                conn.rollback()
+                raise
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['event_errors'] += errors
+            self._stats[f'{stage}_events'] += done
+
+        # Staged rows feed the business stage; don't wait for the next refresh
+        if stage == STAGE_RAW and done:
+            self.queue.put((STAGE_BUSINESS, None))
+        return done + errors >= batch_size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Totals, throughput since start and the last backlog snapshot"""
+        with self._lock:
+            stats = dict(self._stats)
+            backlog = dict(self._backlog)
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            **stats,
+            **backlog,
+            'elapsed_seconds': round(elapsed, 1),
+            'queued_items': len(self.queue),
+            'workers_alive': sum(1 for worker in self._workers if worker.is_alive()),
+        }
+
+
+def format_report(current: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> str:
+    """One report line with throughput since the previous report"""
+    interval = current['elapsed_seconds'] - (previous['elapsed_seconds'] if previous else 0.0)
+
+    def rate(key: str) -> float:
+        delta = current[key] - (previous[key] if previous else 0)
+        return delta / interval if interval > 0 else 0.0
+
+    return (
+        f"📊 raw→staging {rate('raw_to_staging_events'):,.0f} ev/s | "
+        f"staging→business {rate('staging_to_business_events'):,.0f} ev/s | "
+        f"raw pending {current['raw_pending']:,} across {current['raw_tenants']} tenants "
+        f"(lag {current['raw_oldest_seconds']:.1f}s) | "
+        f"business pending {current['business_pending']:,} (lag {current['business_oldest_seconds']:.1f}s) | "
+        f"errors {current['event_errors']:,} | failed batches {current['batch_failures']}"
+    )
+
+
+def _moved(stats: Dict[str, Any]) -> int:
+    return stats['raw_to_staging_events'] + stats['staging_to_business_events'] + stats['event_errors']
+
+
+def run(runner: PipelineRunner, once: bool = False, report=print) -> Dict[str, Any]:
+    """Refresh the backlog and report until stopped (or drained, with once=True)"""
+    runner.start()
+    previous = None
+    try:
+        while not runner.stopping:
+            try:
+                runner.refresh_backlog()
+            except Exception as e:
+                logger.error(f"❌ Backlog refresh failed: {e}")
+
+            current = runner.get_stats()
+            report(format_report(current, previous))
+
+            if once:
+                idle = runner.queue.idle()
+                drained = idle and not current['raw_pending'] and not current['business_pending']
+                # Rows that keep failing stay pending, and batches fail while the database
+                # is down: stop once a whole round moves nothing
+                stalled = (
+                    previous is not None and _moved(previous) == _moved(current)
+                    and (idle or current['batch_failures'] > previous['batch_failures'])
+                )
+                if drained or stalled:
+                    break
+            previous = current
+            runner.wait(runner.config.report_interval_seconds)
+    finally:
+        runner.stop()
+        if not runner.join():
+            logger.warning("⚠️ Pipeline workers still running at shutdown timeout")
+    return runner.get_stats()
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Command-line entry point"""
+    defaults = PipelineRunnerConfig.from_env()
+    parser = argparse.ArgumentParser(description="Drain the site tracking pipeline with concurrent workers")
+    parser.add_argument('--workers', type=int, default=defaults.workers)
+    parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+    parser.add_argument('--max-inflight-per-tenant', type=int, default=defaults.max_inflight_per_tenant)
+    parser.add_argument('--report-interval', type=float, default=defaults.report_interval_seconds)
+    parser.add_argument('--once', action='store_true', help="exit once the backlog is drained")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    database_url = os.getenv('SYSTEM_DATABASE_URL')
+    if not database_url:
+        print("❌ SYSTEM_DATABASE_URL environment variable not set", file=sys.stderr)
+        return 2
+
+    config = PipelineRunnerConfig(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_inflight_per_tenant=args.max_inflight_per_tenant,
+        report_interval_seconds=args.report_interval,
+        idle_poll_seconds=defaults.idle_poll_seconds,
+        error_backoff_seconds=defaults.error_backoff_seconds,
+        shutdown_timeout_seconds=defaults.shutdown_timeout_seconds,
+    )
+    pool = ConnectionPool(
+        database_url,
+        config=PoolConfig(min_size=0, max_size=config.workers + 1, application_name="onevault_pipeline_runner"),
+        name="pipeline_runner"
+    )
+    runner = PipelineRunner(pool, config)
+
+    def _shutdown(signum, frame):
+        print(f"🛑 Received signal {signum}, finishing in-flight batches...", flush=True)
+        runner.stop()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    try:
+        stats = run(runner, once=args.once, report=lambda line: print(line, flush=True))
+    finally:
+        pool.close()
+
+    print(f"✅ Pipeline runner stopped: {stats['raw_to_staging_events']:,} staged, "
+          f"{stats['staging_to_business_events']:,} loaded, {stats['event_errors']:,} errors", flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Site Tracking Pipeline Scheduler
+================================
+
+Coalesces pipeline triggers from the tracking endpoints. Instead of one
+staging.auto_process_if_needed() call per ingested event, the pipeline gets:
+
+- at most one run in flight at a time
+- at most one run start per min_interval_seconds, unless
+- pending_threshold events have been signalled since the last run started
+
+staging.auto_process_if_needed() processes every tenant's pending rows, so
+there is one pipeline state for the whole process, whatever customer sent
+the events. Triggers that arrive while a run is in flight or already
+scheduled are counted as coalesced and folded into the next run. Per-customer
+trigger counters are kept for known customers only.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..core.config_simple import customer_config_manager
+from ..utils.database import get_db_connection_context
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineSchedulerConfig:
+    """Pipeline scheduler settings"""
+    scheduler_enabled: bool = True       # false when app/services/pipeline_runner.py drains the pipeline
+    min_interval_seconds: float = 5.0
+    pending_threshold: int = 500
+    stop_timeout_seconds: float = 30.0
+    max_tracked_customers: int = 100     # cap on per-customer trigger counters
+
+    @classmethod
+    def from_env(cls, prefix: str = "PIPELINE_") -> "PipelineSchedulerConfig":
+        """Build scheduler configuration from environment variables"""
+        defaults = cls()
+        return cls(
+            scheduler_enabled=os.getenv(f"{prefix}SCHEDULER_ENABLED", str(defaults.scheduler_enabled)).lower() == "true",
+            min_interval_seconds=float(os.getenv(f"{prefix}MIN_INTERVAL_SECONDS", defaults.min_interval_seconds)),
+            pending_threshold=int(os.getenv(f"{prefix}PENDING_THRESHOLD", defaults.pending_threshold)),
+            stop_timeout_seconds=float(os.getenv(f"{prefix}STOP_TIMEOUT_SECONDS", defaults.stop_timeout_seconds)),
+            max_tracked_customers=int(os.getenv(f"{prefix}MAX_TRACKED_CUSTOMERS", defaults.max_tracked_customers)),
+        )
+
+
+@dataclass
+class _PipelineState:
+    pending_events: int = 0
+    last_started: Optional[float] = None  # loop time
+    timer: Optional[asyncio.TimerHandle] = None
+    task: Optional[asyncio.Task] = None
+    runs: int = 0
+    failures: int = 0
+    total_duration_ms: float = 0.0
+    max_duration_ms: float = 0.0
+    last_duration_ms: Optional[float] = None
+    last_result: Any = None
+    last_run_at: Optional[float] = None  # wall clock
+
+
+async def process_site_tracking() -> Any:
+    """
+    Run the smart processing function once on a pooled connection
+
+    Borrowed through the async slot semaphore like any request, so a long
+    run never holds a database worker the slot count does not know about.
+    """
+    async with get_db_connection_context() as conn:
+        return await conn.fetchval("SELECT staging.auto_process_if_needed()")
+
+
+class PipelineScheduler:
+    """
+    Debounced trigger for the global site tracking pipeline
+
+    notify() is cheap and non-blocking; call it from the event loop after
+    events are committed.
+    """
+
+    def __init__(self, config: Optional[PipelineSchedulerConfig] = None,
+                 run_pipeline: Optional[Callable[[], Awaitable[Any]]] = None,
+                 is_known_customer: Optional[Callable[[str], bool]] = None):
+        self.config = config or PipelineSchedulerConfig()
+        self._run_pipeline = run_pipeline or process_site_tracking
+        self._is_known_customer = is_known_customer or customer_config_manager.is_valid_customer
+        self._state = _PipelineState()
+        self._customers: Dict[str, Dict[str, int]] = {}
+        self._stats = {
+            'triggers': 0,
+            'coalesced': 0,
+            'runs_started': 0,
+            'runs_completed': 0,
+            'runs_failed': 0,
+            'unknown_customer_triggers': 0,
+        }
+
+    def notify(self, customer_id: Optional[str] = None, event_count: int = 1) -> bool:
+        """
+        Signal that new events were committed
+
+        Args:
+            customer_id: Customer the events came from; only used for statistics
+            event_count: Number of events committed
+
+        Returns:
+            True if this trigger started or scheduled a run, False if it was coalesced
+        """
+        loop = asyncio.get_running_loop()
+        state = self._state
+        state.pending_events += event_count
+        self._stats['triggers'] += 1
+        self._count_customer(customer_id, event_count)
+
+        if not self.config.scheduler_enabled:
+            return False
+
+        if state.task is not None:
+            self._stats['coalesced'] += 1
+            return False
+
+        over_threshold = state.pending_events >= self.config.pending_threshold
+        if state.timer is not None and not over_threshold:
+            self._stats['coalesced'] += 1
+            return False
+
+        return self._schedule(loop, immediate=over_threshold)
+
+    def _count_customer(self, customer_id: Optional[str], event_count: int):
+        """Per-customer trigger counters, for known customers up to max_tracked_customers"""
+        if customer_id is None:
+            return
+        counters = self._customers.get(customer_id)
+        if counters is None:
+            if (len(self._customers) >= self.config.max_tracked_customers
+                    or not self._is_known_customer(customer_id)):
+                self._stats['unknown_customer_triggers'] += 1
+                return
+            counters = self._customers[customer_id] = {'triggers': 0, 'events': 0}
+        counters['triggers'] += 1
+        counters['events'] += event_count
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop, immediate: bool = False) -> bool:
+        """Start a run now or arm a timer for the end of the min interval"""
+        state = self._state
+        delay = 0.0
+        if not immediate and state.last_started is not None:
+            delay = state.last_started + self.config.min_interval_seconds - loop.time()
+
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+
+        if delay > 0:
+            state.timer = loop.call_later(delay, self._start_run)
+        else:
+            self._start_run()
+        return True
+
+    def _start_run(self):
+        state = self._state
+        state.timer = None
+        if state.task is not None:
+            return
+        state.task = asyncio.get_running_loop().create_task(self._run(), name="site-tracking-pipeline")
+
+    async def _run(self):
+        state = self._state
+        loop = asyncio.get_running_loop()
+        state.pending_events = 0
+        state.last_started = loop.time()
+        self._stats['runs_started'] += 1
+        started = time.perf_counter()
+        try:
+            state.last_result = await self._run_pipeline()
+            self._stats['runs_completed'] += 1
+            logger.info(f"✅ Pipeline run completed: {state.last_result}")
+        except Exception as e:
+            state.failures += 1
+            self._stats['runs_failed'] += 1
+            logger.error(f"❌ Pipeline run failed: {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            state.runs += 1
+            state.total_duration_ms += elapsed_ms
+            state.last_duration_ms = elapsed_ms
+            state.max_duration_ms = max(state.max_duration_ms, elapsed_ms)
+            state.last_run_at = time.time()
+            state.task = None
+
+        # Events committed while we were running need one more pass
+        if state.pending_events > 0:
+            self._schedule(loop, immediate=state.pending_events >= self.config.pending_threshold)
+
+    async def stop(self):
+        """Cancel a scheduled run and wait for an in-flight run to finish"""
+        state = self._state
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if state.task is not None:
+            done, pending = await asyncio.wait([state.task], timeout=self.config.stop_timeout_seconds)
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get trigger, coalescing and run duration statistics"""
+        state = self._state
+        triggers = self._stats['triggers']
+        return {
+            **self._stats,
+            'scheduler_enabled': self.config.scheduler_enabled,
+            'coalesce_ratio': round(self._stats['coalesced'] / triggers, 4) if triggers else 0.0,
+            'min_interval_seconds': self.config.min_interval_seconds,
+            'pending_threshold': self.config.pending_threshold,
+            'running': state.task is not None,
+            'scheduled': state.timer is not None,
+            'pending_events': state.pending_events,
+            'runs': state.runs,
+            'failures': state.failures,
+            'last_duration_ms': round(state.last_duration_ms, 2) if state.last_duration_ms is not None else None,
+            'average_duration_ms': round(state.total_duration_ms / state.runs, 2) if state.runs else None,
+            'max_duration_ms': round(state.max_duration_ms, 2),
+            'last_run_at': state.last_run_at,
+            'last_result': state.last_result if isinstance(state.last_result, (str, int, float, type(None))) else str(state.last_result),
+            'customers': {customer_id: dict(counters) for customer_id, counters in self._customers.items()},
+        }
+
+
+# Global pipeline scheduler instance
+_pipeline_scheduler = None
+
+def get_pipeline_scheduler() -> PipelineScheduler:
+    """Get the global pipeline scheduler"""
+    global _pipeline_scheduler
+    if _pipeline_scheduler is None:
+        _pipeline_scheduler = PipelineScheduler(PipelineSchedulerConfig.from_env())
+    return _pipeline_scheduler
@@ -11,17 +11,73 @@ SECURITY PRINCIPLE: Every business key must be verified against authenticated te
 - Transactions: transaction_bk must exist in tenant's transaction hub
 - Sessions: session_token must belong to tenant's users
 - All lookups use cryptographic hash verification
+
+bulk_validate_resources() checks every resource in a request with one
+UNION ALL query (one `= ANY(%s)` branch per resource type) on a pooled
+connection, so a request carrying 50 ids costs one round trip. The
+single-resource verify_*() methods are one-element bulk calls.
+
+Results are cached per (type, id, tenant) in a bounded LRU cache
+(RESOURCE_VALIDATION_CACHE_MAX_ENTRIES) whose TTLs expire from a heap on a
+monotonic clock; get_validation_stats() reports cache hits and misses.
 """
 
 import hashlib
 import logging
-from datetime import datetime, timezone
-from typing import Dict, Optional, List, Tuple, Any
+import os
+import time
+from typing import Callable, Dict, Optional, List, Set, Tuple, Any
 
-import psycopg2
+from ..phase1_zero_trust.cache_engine import LRUTTLCache
+from ..utils.database import get_db_connection_context
 
 logger = logging.getLogger(__name__)
 
+# Bulk ownership lookups: resource type -> (cache key prefix, cache TTL, UNION branch).
+# Each branch takes (business keys array, tenant_hk) and returns (type, owned key).
+BULK_OWNERSHIP_QUERIES = {
+    'user_bk': ('user', None, """
+        SELECT 'user_bk', uh.user_bk
+        FROM auth.user_h uh
+        WHERE uh.user_bk = ANY(%s)
+            AND uh.tenant_hk = %s"""),
+    'email': ('email', None, """
+        SELECT 'email', up.email
+        FROM auth.user_h uh
+        JOIN auth.user_profile_s up ON uh.user_hk = up.user_hk
+        WHERE up.email = ANY(%s)
+            AND uh.tenant_hk = %s
+            AND up.load_end_date IS NULL"""),
+    'asset_bk': ('asset', None, """
+        SELECT 'asset_bk', ah.asset_bk
+        FROM business.asset_h ah
+        WHERE ah.asset_bk = ANY(%s)
+            AND ah.tenant_hk = %s"""),
+    'transaction_bk': ('transaction', None, """
+        SELECT 'transaction_bk', th.transaction_bk
+        FROM business.transaction_h th
+        WHERE th.transaction_bk = ANY(%s)
+            AND th.tenant_hk = %s"""),
+    'session_token': ('session', 60, """
+        SELECT 'session_token', sh.session_bk
+        FROM auth.session_h sh
+        JOIN auth.session_state_s ss ON sh.session_hk = ss.session_hk
+        JOIN auth.user_session_l usl ON sh.session_hk = usl.session_hk
+        JOIN auth.user_h uh ON usl.user_hk = uh.user_hk
+        WHERE sh.session_bk = ANY(%s)
+            AND uh.tenant_hk = %s
+            AND ss.load_end_date IS NULL
+            AND ss.session_status = 'ACTIVE'"""),
+    'agent_bk': ('agent', None, """
+        SELECT 'agent_bk', ah.agent_bk
+        FROM ai_agents.agent_h ah
+        WHERE ah.agent_bk = ANY(%s)
+            AND ah.tenant_hk = %s"""),
+}
+
+# Resource types checked with another type's query
+RESOURCE_TYPE_ALIASES = {'username': 'user_bk'}
+
 class ResourceValidationService:
     """
     Cross-Tenant Resource Validation Service
@@ -34,9 +90,14 @@ class ResourceValidationService:
     5. Caching validation results for performance
     """
     
-    def __init__(self):
-        self._validation_cache = {}
+    def __init__(self, max_cache_entries: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
         self._cache_ttl_seconds = 300  # 5 minutes cache TTL
+        if max_cache_entries is None:
+            max_cache_entries = int(os.getenv('RESOURCE_VALIDATION_CACHE_MAX_ENTRIES', '50000'))
+        # Bounded LRU with heap-driven TTL expiry on a monotonic clock
+        self._validation_cache = LRUTTLCache(
+            max_entries=max_cache_entries, default_ttl=self._cache_ttl_seconds, clock=clock
+        )
     
     async def verify_user_belongs_to_tenant(self, user_bk: str, tenant_hk: bytes) -> bool:
         """
@@ -49,52 +110,7 @@ class ResourceValidationService:
         Returns:
             bool: True if user belongs to tenant, False otherwise
         """
-        cache_key = f"user:{user_bk}:{tenant_hk.hex()}"
-        
-        # Check cache first
-        if self._is_cached_and_valid(cache_key):
-            return self._validation_cache[cache_key]['result']
-        
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to verify user belongs to tenant
-            query = """
-            SELECT 
-                uh.user_hk,
-                uh.user_bk,
-                up.email,
-                up.first_name,
-                up.last_name
-            FROM auth.user_h uh
-            LEFT JOIN auth.user_profile_s up ON uh.user_hk = up.user_hk 
-                AND up.load_end_date IS NULL
-            WHERE uh.user_bk = %s 
-                AND uh.tenant_hk = %s
-            """
-            
-            cursor.execute(query, (user_bk, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            is_valid = bool(result)
-            
-            # Cache the result
-            self._cache_validation_result(cache_key, is_valid)
-            
-            if is_valid:
-                logger.debug(f"User validation SUCCESS: {user_bk} belongs to tenant")
-            else:
-                logger.warning(f"User validation FAILED: {user_bk} does not belong to tenant")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.error(f"User validation error for {user_bk}: {e}")
-            return False  # Fail secure
+        return await self._verify_one('user_bk', user_bk, tenant_hk)
     
     async def verify_user_email_belongs_to_tenant(self, email: str, tenant_hk: bytes) -> bool:
         """
@@ -107,50 +123,7 @@ class ResourceValidationService:
         Returns:
             bool: True if email belongs to tenant, False otherwise
         """
-        cache_key = f"email:{email}:{tenant_hk.hex()}"
-        
-        # Check cache first
-        if self._is_cached_and_valid(cache_key):
-            return self._validation_cache[cache_key]['result']
-        
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to verify email belongs to tenant
-            query = """
-            SELECT 
-                uh.user_hk,
-                uh.user_bk,
-                up.email
-            FROM auth.user_h uh
-            JOIN auth.user_profile_s up ON uh.user_hk = up.user_hk
-            WHERE up.email = %s 
-                AND uh.tenant_hk = %s
-                AND up.load_end_date IS NULL
-            """
-            
-            cursor.execute(query, (email, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            is_valid = bool(result)
-            
-            # Cache the result
-            self._cache_validation_result(cache_key, is_valid)
-            
-            if is_valid:
-                logger.debug(f"Email validation SUCCESS: {email} belongs to tenant")
-            else:
-                logger.warning(f"Email validation FAILED: {email} does not belong to tenant")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.error(f"Email validation error for {email}: {e}")
-            return False  # Fail secure
+        return await self._verify_one('email', email, tenant_hk)
     
     async def verify_asset_belongs_to_tenant(self, asset_bk: str, tenant_hk: bytes) -> bool:
         """
@@ -163,51 +136,7 @@ class ResourceValidationService:
         Returns:
             bool: True if asset belongs to tenant, False otherwise
         """
-        cache_key = f"asset:{asset_bk}:{tenant_hk.hex()}"
-        
-        # Check cache first
-        if self._is_cached_and_valid(cache_key):
-            return self._validation_cache[cache_key]['result']
-        
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to verify asset belongs to tenant
-            query = """
-            SELECT 
-                ah.asset_hk,
-                ah.asset_bk,
-                ads.asset_name,
-                ads.asset_type
-            FROM business.asset_h ah
-            LEFT JOIN business.asset_details_s ads ON ah.asset_hk = ads.asset_hk
-                AND ads.load_end_date IS NULL
-            WHERE ah.asset_bk = %s 
-                AND ah.tenant_hk = %s
-            """
-            
-            cursor.execute(query, (asset_bk, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            is_valid = bool(result)
-            
-            # Cache the result
-            self._cache_validation_result(cache_key, is_valid)
-            
-            if is_valid:
-                logger.debug(f"Asset validation SUCCESS: {asset_bk} belongs to tenant")
-            else:
-                logger.warning(f"Asset validation FAILED: {asset_bk} does not belong to tenant")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.error(f"Asset validation error for {asset_bk}: {e}")
-            return False  # Fail secure
+        return await self._verify_one('asset_bk', asset_bk, tenant_hk)
     
     async def verify_transaction_belongs_to_tenant(self, transaction_bk: str, tenant_hk: bytes) -> bool:
         """
@@ -220,51 +149,7 @@ class ResourceValidationService:
         Returns:
             bool: True if transaction belongs to tenant, False otherwise
         """
-        cache_key = f"transaction:{transaction_bk}:{tenant_hk.hex()}"
-        
-        # Check cache first
-        if self._is_cached_and_valid(cache_key):
-            return self._validation_cache[cache_key]['result']
-        
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to verify transaction belongs to tenant
-            query = """
-            SELECT 
-                th.transaction_hk,
-                th.transaction_bk,
-                tds.transaction_type,
-                tds.amount
-            FROM business.transaction_h th
-            LEFT JOIN business.transaction_details_s tds ON th.transaction_hk = tds.transaction_hk
-                AND tds.load_end_date IS NULL
-            WHERE th.transaction_bk = %s 
-                AND th.tenant_hk = %s
-            """
-            
-            cursor.execute(query, (transaction_bk, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            is_valid = bool(result)
-            
-            # Cache the result
-            self._cache_validation_result(cache_key, is_valid)
-            
-            if is_valid:
-                logger.debug(f"Transaction validation SUCCESS: {transaction_bk} belongs to tenant")
-            else:
-                logger.warning(f"Transaction validation FAILED: {transaction_bk} does not belong to tenant")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.error(f"Transaction validation error for {transaction_bk}: {e}")
-            return False  # Fail secure
+        return await self._verify_one('transaction_bk', transaction_bk, tenant_hk)
     
     async def verify_session_belongs_to_tenant(self, session_token: str, tenant_hk: bytes) -> bool:
         """
@@ -277,55 +162,7 @@ class ResourceValidationService:
         Returns:
             bool: True if session belongs to tenant user, False otherwise
         """
-        cache_key = f"session:{session_token}:{tenant_hk.hex()}"
-        
-        # Check cache first
-        if self._is_cached_and_valid(cache_key):
-            return self._validation_cache[cache_key]['result']
-        
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to verify session belongs to tenant user
-            query = """
-            SELECT 
-                sh.session_hk,
-                sh.session_bk,
-                uh.user_hk,
-                uh.user_bk,
-                ss.session_status
-            FROM auth.session_h sh
-            JOIN auth.session_state_s ss ON sh.session_hk = ss.session_hk
-            JOIN auth.user_session_l usl ON sh.session_hk = usl.session_hk
-            JOIN auth.user_h uh ON usl.user_hk = uh.user_hk
-            WHERE sh.session_bk = %s
-                AND uh.tenant_hk = %s
-                AND ss.load_end_date IS NULL
-                AND ss.session_status = 'ACTIVE'
-            """
-            
-            cursor.execute(query, (session_token, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            is_valid = bool(result)
-            
-            # Cache the result (shorter TTL for sessions)
-            self._cache_validation_result(cache_key, is_valid, ttl_seconds=60)
-            
-            if is_valid:
-                logger.debug(f"Session validation SUCCESS: {session_token} belongs to tenant")
-            else:
-                logger.warning(f"Session validation FAILED: {session_token} does not belong to tenant")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.error(f"Session validation error for {session_token}: {e}")
-            return False  # Fail secure
+        return await self._verify_one('session_token', session_token, tenant_hk)
     
     async def verify_ai_agent_belongs_to_tenant(self, agent_bk: str, tenant_hk: bytes) -> bool:
         """
@@ -338,55 +175,19 @@ class ResourceValidationService:
         Returns:
             bool: True if agent belongs to tenant, False otherwise
         """
-        cache_key = f"agent:{agent_bk}:{tenant_hk.hex()}"
-        
-        # Check cache first
-        if self._is_cached_and_valid(cache_key):
-            return self._validation_cache[cache_key]['result']
-        
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Query to verify AI agent belongs to tenant
-            query = """
-            SELECT 
-                ah.agent_hk,
-                ah.agent_bk,
-                ais.agent_name,
-                ais.agent_type
-            FROM ai_agents.agent_h ah
-            LEFT JOIN ai_agents.agent_identity_s ais ON ah.agent_hk = ais.agent_hk
-                AND ais.load_end_date IS NULL
-            WHERE ah.agent_bk = %s 
-                AND ah.tenant_hk = %s
-            """
-            
-            cursor.execute(query, (agent_bk, tenant_hk))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            is_valid = bool(result)
-            
-            # Cache the result
-            self._cache_validation_result(cache_key, is_valid)
-            
-            if is_valid:
-                logger.debug(f"AI Agent validation SUCCESS: {agent_bk} belongs to tenant")
-            else:
-                logger.warning(f"AI Agent validation FAILED: {agent_bk} does not belong to tenant")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.error(f"AI Agent validation error for {agent_bk}: {e}")
-            return False  # Fail secure
+        return await self._verify_one('agent_bk', agent_bk, tenant_hk)
+    
+    async def _verify_one(self, resource_type: str, resource_value: str, tenant_hk: bytes) -> bool:
+        """Single-resource check through the bulk path (shared cache, pooled connection)"""
+        results = await self.bulk_validate_resources([(resource_type, resource_value)], tenant_hk)
+        return results[f"{resource_type}:{resource_value}"]
     
     async def bulk_validate_resources(self, resources: List[Tuple[str, str]], tenant_hk: bytes) -> Dict[str, bool]:
         """
-        Bulk validate multiple resources for performance optimization
+        Bulk validate multiple resources in a single database round trip
+        
+        Cached results are used first; the remaining resources are grouped by
+        type and resolved by one UNION ALL query on a pooled connection.
         
         Args:
             resources: List of (resource_type, resource_value) tuples
@@ -396,90 +197,113 @@ class ResourceValidationService:
             Dict[str, bool]: Map of resource_type:resource_value -> validation_result
         """
         validation_results = {}
+        pending: Dict[str, Dict[str, List[str]]] = {}  # query type -> value -> result keys
+        tenant_hex = tenant_hk.hex()
         
         for resource_type, resource_value in resources:
-            try:
-                if resource_type == 'user_bk':
-                    result = await self.verify_user_belongs_to_tenant(resource_value, tenant_hk)
-                elif resource_type == 'email':
-                    result = await self.verify_user_email_belongs_to_tenant(resource_value, tenant_hk)
-                elif resource_type == 'asset_bk':
-                    result = await self.verify_asset_belongs_to_tenant(resource_value, tenant_hk)
-                elif resource_type == 'transaction_bk':
-                    result = await self.verify_transaction_belongs_to_tenant(resource_value, tenant_hk)
-                elif resource_type == 'session_token':
-                    result = await self.verify_session_belongs_to_tenant(resource_value, tenant_hk)
-                elif resource_type == 'agent_bk':
-                    result = await self.verify_ai_agent_belongs_to_tenant(resource_value, tenant_hk)
-                else:
-                    result = True  # Unknown types pass by default
-                
-                validation_results[f"{resource_type}:{resource_value}"] = result
-                
-            except Exception as e:
-                logger.error(f"Bulk validation error for {resource_type}:{resource_value}: {e}")
-                validation_results[f"{resource_type}:{resource_value}"] = False
+            result_key = f"{resource_type}:{resource_value}"
+            query_type = RESOURCE_TYPE_ALIASES.get(resource_type, resource_type)
+            if query_type not in BULK_OWNERSHIP_QUERIES:
+                validation_results[result_key] = True  # Unknown types pass by default
+                continue
+            
+            cache_key = f"{BULK_OWNERSHIP_QUERIES[query_type][0]}:{resource_value}:{tenant_hex}"
+            cached = self._get_cached_result(cache_key)
+            if cached is not None:
+                validation_results[result_key] = cached
+            else:
+                pending.setdefault(query_type, {}).setdefault(resource_value, []).append(result_key)
+        
+        if not pending:
+            return validation_results
+        
+        try:
+            groups = {query_type: list(values) for query_type, values in pending.items()}
+            async with get_db_connection_context() as conn:
+                owned = await conn.run(self._fetch_owned_resources, groups, tenant_hk)
+        except Exception as e:
+            logger.error(f"Bulk validation error for {sum(len(v) for v in pending.values())} resources: {e}")
+            for values in pending.values():
+                for result_keys in values.values():
+                    for result_key in result_keys:
+                        validation_results[result_key] = False  # Fail secure, not cached
+            return validation_results
+        
+        for query_type, values in pending.items():
+            cache_prefix, ttl_seconds, _ = BULK_OWNERSHIP_QUERIES[query_type]
+            for resource_value, result_keys in values.items():
+                is_valid = (query_type, resource_value) in owned
+                self._cache_validation_result(f"{cache_prefix}:{resource_value}:{tenant_hex}", is_valid,
+                                              ttl_seconds=ttl_seconds)
+                if not is_valid:
+                    logger.warning(f"{query_type} validation FAILED: {resource_value} does not belong to tenant")
+                for result_key in result_keys:
+                    validation_results[result_key] = is_valid
         
         return validation_results
     
+    def _fetch_owned_resources(self, conn, groups: Dict[str, List[str]], tenant_hk: bytes) -> Set[Tuple[str, str]]:
+        """Return the (resource_type, business_key) pairs in groups that belong to the tenant"""
+        branches = []
+        params: List[Any] = []
+        for query_type, values in groups.items():
+            branches.append(BULK_OWNERSHIP_QUERIES[query_type][2])
+            params.extend([values, tenant_hk])
+        query = "\nUNION ALL\n".join(branches)
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return {(row[0], row[1]) for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+    
+    def _get_cached_result(self, cache_key: str) -> Optional[bool]:
+        """Cached validation result, or None on a miss (counted in the cache stats)"""
+        return self._validation_cache.get(cache_key)
+    
     def _is_cached_and_valid(self, cache_key: str) -> bool:
         """Check if validation result is cached and still valid"""
-        if cache_key not in self._validation_cache:
-            return False
-        
-        cached_entry = self._validation_cache[cache_key]
-        age_seconds = (datetime.now(timezone.utc) - cached_entry['timestamp']).total_seconds()
-        
-        return age_seconds < cached_entry['ttl_seconds']
+        return cache_key in self._validation_cache
     
     def _cache_validation_result(self, cache_key: str, result: bool, ttl_seconds: Optional[int] = None):
-        """Cache validation result with TTL"""
-        self._validation_cache[cache_key] = {
-            'result': result,
-            'timestamp': datetime.now(timezone.utc),
-            'ttl_seconds': ttl_seconds or self._cache_ttl_seconds
-        }
-        
-        # Clean old cache entries to prevent memory growth
-        self._cleanup_expired_cache()
-    
-    def _cleanup_expired_cache(self):
-        """Remove expired cache entries"""
-        current_time = datetime.now(timezone.utc)
-        expired_keys = []
-        
-        for cache_key, entry in self._validation_cache.items():
-            age_seconds = (current_time - entry['timestamp']).total_seconds()
-            if age_seconds >= entry['ttl_seconds']:
-                expired_keys.append(cache_key)
-        
-        for key in expired_keys:
-            del self._validation_cache[key]
+        """Cache validation result with TTL (expired entries are drained a few at a time)"""
+        self._validation_cache.set(
+            cache_key, result, ttl=self._cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
     
-    def _get_db_connection(self):
-        """Get database connection"""
-        import os
-        database_url = os.getenv('SYSTEM_DATABASE_URL')
-        if not database_url:
-            raise ValueError("SYSTEM_DATABASE_URL environment variable not set")
-        return psycopg2.connect(database_url)
+    def _cleanup_expired_cache(self) -> int:
+        """Remove expired cache entries; returns how many were removed"""
+        return self._validation_cache.purge_expired()
     
     def get_validation_stats(self) -> Dict[str, Any]:
         """Get validation statistics for monitoring"""
-        current_time = datetime.now(timezone.utc)
-        valid_entries = 0
-        expired_entries = 0
-        
-        for entry in self._validation_cache.values():
-            age_seconds = (current_time - entry['timestamp']).total_seconds()
-            if age_seconds < entry['ttl_seconds']:
-                valid_entries += 1
-            else:
-                expired_entries += 1
+        # Each entry is purged once, so this stays cheap however often it is polled
+        expired_entries = self._cleanup_expired_cache()
+        valid_entries = len(self._validation_cache)
+        cache_stats = self._validation_cache.get_stats()
+        lookups = cache_stats['hits'] + cache_stats['misses']
         
         return {
             'cache_entries_valid': valid_entries,
             'cache_entries_expired': expired_entries,
+            'cache_max_entries': cache_stats['max_entries'],
+            'cache_hits': cache_stats['hits'],
+            'cache_misses': cache_stats['misses'],
+            'cache_hit_rate': f"{(cache_stats['hits'] / max(1, lookups)) * 100:.1f}%",
+            'cache_evictions_lru': cache_stats['evictions_lru'],
+            'cache_evictions_expired': cache_stats['evictions_expired'],
             'cache_hit_potential': f"{(valid_entries / max(1, valid_entries + expired_entries)) * 100:.1f}%",
             'cache_cleanup_recommended': expired_entries > 100
-        } 
\ No newline at end of file
+        }
+
+
+# Global validator instance (keeps the validation cache across requests)
+_resource_validator: Optional[ResourceValidationService] = None
+
+def get_resource_validator() -> ResourceValidationService:
+    """Get global resource validation service instance (singleton pattern)"""
+    global _resource_validator
+    if _resource_validator is None:
+        _resource_validator = ResourceValidationService()
+    return _resource_validator
@@ -0,0 +1,255 @@
+"""
+Site Tracking Write-Behind Buffer
+=================================
+
+Optional in-process buffer for /api/v1/track. Events are accepted into a
+bounded asyncio queue and the client gets a 202 with an event id at once;
+a single flusher task lands them in raw.site_tracking_events_r through
+insert_tracking_events() whenever flush_size events are waiting or the
+oldest has waited flush_interval_seconds (group commit).
+
+Enable with TRACKING_WRITE_BEHIND_ENABLED=true. Events still in memory are
+lost if the process dies without a graceful shutdown; stop() drains them.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .tracking_ingest import TrackingEvent, insert_tracking_events
+from ..utils.database import get_db_connection_context
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """Raised when the buffer stays full for longer than the enqueue timeout"""
+
+
+class BufferClosedError(Exception):
+    """Raised when submitting to a buffer that is stopping or stopped"""
+
+
+@dataclass
+class WriteBufferConfig:
+    """Write-behind buffer settings"""
+    enabled: bool = False
+    max_events: int = 10000              # bound on events held in memory
+    flush_size: int = 500                # flush as soon as this many are queued
+    flush_interval_seconds: float = 0.5  # ... or when the oldest has waited this long
+    enqueue_timeout_seconds: float = 0.05  # backpressure: wait this long for space, then reject
+    max_flush_retries: int = 3
+    retry_backoff_seconds: float = 0.5
+    drain_timeout_seconds: float = 10.0
+
+    @classmethod
+    def from_env(cls, prefix: str = "TRACKING_WRITE_BEHIND_") -> "WriteBufferConfig":
+        """Build buffer configuration from environment variables"""
+        defaults = cls()
+        return cls(
+            enabled=os.getenv(f"{prefix}ENABLED", str(defaults.enabled)).lower() == "true",
+            max_events=int(os.getenv(f"{prefix}MAX_EVENTS", defaults.max_events)),
+            flush_size=int(os.getenv(f"{prefix}FLUSH_SIZE", defaults.flush_size)),
+            flush_interval_seconds=float(os.getenv(f"{prefix}FLUSH_INTERVAL_SECONDS", defaults.flush_interval_seconds)),
+            enqueue_timeout_seconds=float(os.getenv(f"{prefix}ENQUEUE_TIMEOUT_SECONDS", defaults.enqueue_timeout_seconds)),
+            max_flush_retries=int(os.getenv(f"{prefix}MAX_FLUSH_RETRIES", defaults.max_flush_retries)),
+            retry_backoff_seconds=float(os.getenv(f"{prefix}RETRY_BACKOFF_SECONDS", defaults.retry_backoff_seconds)),
+            drain_timeout_seconds=float(os.getenv(f"{prefix}DRAIN_TIMEOUT_SECONDS", defaults.drain_timeout_seconds)),
+        )
+
+
+async def flush_tracking_events(events: List[TrackingEvent]) -> Dict[str, Any]:
+    """
+    Land one buffered batch on a pooled connection in one transaction
+
+    The connection comes from get_db_connection_context(), so a slow or
+    retried flush waits for an async slot instead of taking a db-worker
+    thread and a connection behind the request path's back.
+    """
+    async with get_db_connection_context() as conn:
+        return await conn.run(insert_tracking_events, events, endpoint='/api/track')
+
+
+class TrackingWriteBuffer:
+    """
+    Bounded write-behind queue with size/time triggered group commits
+
+    All methods must be called from the event loop that ran start().
+    """
+
+    def __init__(self, config: Optional[WriteBufferConfig] = None,
+                 flush: Optional[Callable[[List[TrackingEvent]], Awaitable[Dict[str, Any]]]] = None,
+                 after_flush: Optional[Callable[[List[TrackingEvent], Dict[str, Any]], None]] = None):
+        self.config = config or WriteBufferConfig()
+        self._flush = flush or flush_tracking_events
+        self.after_flush = after_flush
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self._stats = {
+            'events_enqueued': 0,
+            'events_rejected_full': 0,
+            'events_flushed': 0,
+            'events_blocked': 0,
+            'events_failed': 0,
+            'flushes': 0,
+            'flush_failures': 0,
+            'flush_retries': 0,
+            'total_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'last_flush_ms': 0.0,
+            'max_queue_depth': 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    async def start(self):
+        """Create the queue and start the flusher task"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.config.max_events)
+        self._closing = False
+        self._flusher = asyncio.create_task(self._run(), name="tracking-write-behind")
+        logger.info(f"💾 Tracking write-behind buffer started: max={self.config.max_events}, "
+                    f"flush_size={self.config.flush_size}, interval={self.config.flush_interval_seconds}s")
+
+    async def submit(self, event: TrackingEvent) -> str:
+        """
+        Queue an event for the next group commit
+
+        Returns:
+            The event id handed back to the client
+
+        Raises:
+            BufferFullError: the buffer stayed full for enqueue_timeout_seconds
+            BufferClosedError: the buffer is not accepting events
+        """
+        if self._closing or not self.running:
+            raise BufferClosedError("Tracking write-behind buffer is not running")
+
+        if event.event_id is None:
+            event.event_id = uuid.uuid4().hex
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(event), timeout=self.config.enqueue_timeout_seconds)
+            except asyncio.TimeoutError:
+                self._stats['events_rejected_full'] += 1
+                raise BufferFullError(f"Tracking buffer full ({self.config.max_events} events)")
+
+        self._stats['events_enqueued'] += 1
+        depth = self._queue.qsize()
+        if depth > self._stats['max_queue_depth']:
+            self._stats['max_queue_depth'] = depth
+        return event.event_id
+
+    async def stop(self):
+        """Stop accepting events, flush everything queued, then stop the flusher"""
+        if not self.running:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.config.drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Tracking buffer drain timed out with {self._queue.qsize()} events unflushed")
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        logger.info(f"💾 Tracking write-behind buffer stopped: {self._stats['events_flushed']} events flushed")
+
+    async def _run(self):
+        """Flusher loop: collect up to flush_size events or until the interval elapses"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.config.flush_interval_seconds
+            while len(batch) < self.config.flush_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._closing:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush_batch(self, batch: List[TrackingEvent]):
+        """Write one batch, retrying with backoff before giving up on it"""
+        for attempt in range(self.config.max_flush_retries + 1):
+            started = time.perf_counter()
+            try:
+                result = await self._flush(batch)
+            except Exception as e:
+                self._stats['flush_failures'] += 1
+                if attempt < self.config.max_flush_retries:
+                    self._stats['flush_retries'] += 1
+                    logger.warning(f"⚠️ Tracking buffer flush failed (attempt {attempt + 1}), retrying: {e}")
+                    await asyncio.sleep(self.config.retry_backoff_seconds * (2 ** attempt))
+                    continue
+                self._stats['events_failed'] += len(batch)
+                logger.error(f"❌ Tracking buffer dropped {len(batch)} events after {attempt + 1} attempts: {e}")
+                return
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            blocked = sum(1 for raw_event_id in result.get('raw_event_ids', []) if raw_event_id is None)
+            self._stats['flushes'] += 1
+            self._stats['events_flushed'] += len(batch) - blocked
+            self._stats['events_blocked'] += blocked
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed_ms)
+
+            if self.after_flush:
+                try:
+                    self.after_flush(batch, result)
+                except Exception as e:
+                    logger.warning(f"⚠️ Tracking buffer after-flush hook failed: {e}")
+            return
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer statistics for monitoring"""
+        flushes = self._stats['flushes']
+        return {
+            'enabled': self.config.enabled,
+            'running': self.running,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'max_events': self.config.max_events,
+            'flush_size': self.config.flush_size,
+            'flush_interval_seconds': self.config.flush_interval_seconds,
+            **{key: round(value, 2) if isinstance(value, float) else value
+               for key, value in self._stats.items() if key != 'total_flush_ms'},
+            'average_flush_ms': round(self._stats['total_flush_ms'] / flushes, 2) if flushes else 0.0,
+            'average_batch_size': round(self._stats['events_flushed'] / flushes, 2) if flushes else 0.0,
+        }
+
+
+# Global tracking buffer instance
+_tracking_buffer = None
+
+def get_tracking_buffer() -> TrackingWriteBuffer:
+    """Get the global tracking write-behind buffer"""
+    global _tracking_buffer
+    if _tracking_buffer is None:
+        _tracking_buffer = TrackingWriteBuffer(WriteBufferConfig.from_env())
+    return _tracking_buffer
@@ -0,0 +1,308 @@
+"""
+Site Tracking Batch Ingestion
+=============================
+
+Bulk landing of site tracking events into raw.site_tracking_events_r.
+
+A batch is parsed and validated in one pass, then written with a single
+multi-row INSERT ... RETURNING, so the per-event cost is one VALUES tuple
+instead of one api.track_site_event() round trip. Rate limiting is still
+charged once per event, so a batch consumes the same quota as the same
+events sent one at a time; audit logging runs once per batch.
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Tuple, Optional
+
+import psycopg2.extensions
+from psycopg2.extras import execute_values, Json
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_EVENTS = int(os.getenv('TRACKING_MAX_BATCH_EVENTS', '500'))
+MAX_PAGE_URL_LENGTH = 2048
+MAX_EVENT_TYPE_LENGTH = 50  # raw payload mirrors api.track_site_event's VARCHAR(50)
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+# One rate-limit charge per event, in order, in a single round trip
+_LOG_TRACKING_ATTEMPTS_SQL = """
+    SELECT api.log_tracking_attempt(%s::inet, %s, %s, %s::jsonb)
+    FROM generate_series(1, %s) AS attempt
+    ORDER BY attempt
+"""
+
+# Same row shape api.track_site_event() lands for a single event
+_INSERT_EVENTS_SQL = """
+    INSERT INTO raw.site_tracking_events_r (
+        tenant_hk,
+        api_key_hk,
+        received_timestamp,
+        client_ip,
+        user_agent,
+        raw_payload,
+        batch_id,
+        record_source
+    ) VALUES %s
+    RETURNING raw_event_id
+"""
+
+_INSERT_EVENT_TEMPLATE = """(
+    %(tenant_hk)s,
+    NULL,
+    CURRENT_TIMESTAMP,
+    %(client_ip)s::inet,
+    %(user_agent)s,
+    jsonb_build_object(
+        'event_type', %(event_type)s::text,
+        'page_url', %(page_url)s::text,
+        'event_data', %(event_data)s::jsonb,
+        'timestamp', CURRENT_TIMESTAMP
+    ) || jsonb_strip_nulls(jsonb_build_object('event_id', %(event_id)s::text)),
+    %(batch_id)s,
+    %(record_source)s
+)"""
+
+
+class TrackingBatchError(ValueError):
+    """Raised when a batch body cannot be parsed as a whole"""
+
+
+@dataclass
+class TrackingEvent:
+    """A validated tracking event and its position in the submitted batch"""
+    index: int
+    page_url: str
+    event_type: str = 'page_view'
+    event_data: Dict[str, Any] = field(default_factory=dict)
+    client_ip: Optional[str] = None   # per-event client, for buffered single events
+    user_agent: Optional[str] = None
+    event_id: Optional[str] = None    # id handed to the client before the row exists
+    customer_id: Optional[str] = None # X-Customer-ID, for per-customer pipeline scheduling
+
+
+def parse_tracking_batch(body: bytes, content_type: Optional[str] = None) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    Parse a batch body into raw event items
+
+    Accepts a JSON array, an object with an "events" array, or NDJSON
+    (one event per line). Malformed NDJSON lines are reported per line
+    instead of failing the whole batch.
+
+    Returns:
+        Tuple of (items, errors); an item is None where its line failed to parse
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    text = body.decode('utf-8') if isinstance(body, (bytes, bytearray)) else body
+
+    if media_type in NDJSON_CONTENT_TYPES:
+        items: List[Any] = []
+        errors: List[Dict[str, Any]] = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                errors.append({'index': len(items), 'error': f'Invalid JSON: {e.msg}'})
+                items.append(None)
+        return items, errors
+
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise TrackingBatchError(f"Invalid JSON body: {e.msg}")
+
+    if isinstance(payload, dict) and isinstance(payload.get('events'), list):
+        payload = payload['events']
+    if not isinstance(payload, list):
+        raise TrackingBatchError("Batch body must be a JSON array of events or NDJSON")
+    return payload, []
+
+
+def validate_tracking_events(items: List[Any], max_events: int = MAX_BATCH_EVENTS) -> Tuple[List[TrackingEvent], List[Dict[str, Any]]]:
+    """
+    Validate raw event items in a single pass
+
+    Returns:
+        Tuple of (valid events, per-index errors)
+    """
+    if len(items) > max_events:
+        raise TrackingBatchError(f"Batch contains {len(items)} events; the maximum is {max_events}")
+
+    events: List[TrackingEvent] = []
+    errors: List[Dict[str, Any]] = []
+
+    for index, item in enumerate(items):
+        if item is None:
+            continue  # already reported by the parser
+
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Event must be a JSON object'})
+            continue
+
+        page_url = item.get('page_url')
+        if not isinstance(page_url, str) or not page_url.strip():
+            errors.append({'index': index, 'error': 'page_url is required'})
+            continue
+        if len(page_url) > MAX_PAGE_URL_LENGTH:
+            errors.append({'index': index, 'error': f'page_url exceeds {MAX_PAGE_URL_LENGTH} characters'})
+            continue
+
+        event_type = item.get('event_type') or 'page_view'
+        if not isinstance(event_type, str) or len(event_type) > MAX_EVENT_TYPE_LENGTH:
+            errors.append({'index': index, 'error': f'event_type must be a string of at most {MAX_EVENT_TYPE_LENGTH} characters'})
+            continue
+
+        event_data = item.get('event_data')
+        if event_data is None:
+            event_data = {}
+        if not isinstance(event_data, dict):
+            errors.append({'index': index, 'error': 'event_data must be a JSON object'})
+            continue
+
+        events.append(TrackingEvent(index=index, page_url=page_url, event_type=event_type, event_data=event_data))
+
+    return events, errors
+
+
+def generate_batch_id() -> str:
+    """Batch correlation id, matching raw.ingest_tracking_events_batch()"""
+    return f"BATCH_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
+
+
+def insert_tracking_events(
+    conn: psycopg2.extensions.connection,
+    events: List[TrackingEvent],
+    client_ip: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    endpoint: str = '/api/track/batch'
+) -> Dict[str, Any]:
+    """
+    Land validated events in raw.site_tracking_events_r with one multi-row insert
+
+    client_ip/user_agent apply to events that do not carry their own. Each
+    event is charged one api.log_tracking_attempt() - one statement per
+    distinct client IP - and only events within the client's remaining quota
+    are stored. The audit log runs once per batch. The caller owns the
+    transaction (commit/rollback).
+
+    Returns:
+        Dict with success flag, batch_id and raw_event_ids aligned with events
+        (None for events over their client's rate limit)
+    """
+    batch_id = batch_id or generate_batch_id()
+    if not events:
+        return {'success': True, 'batch_id': batch_id, 'raw_event_ids': []}
+
+    cursor = conn.cursor()
+    try:
+        clients: Dict[str, List[Any]] = {}  # ip -> [event_count, user_agent]
+        for event in events:
+            ip = event.client_ip or client_ip
+            if ip in clients:
+                clients[ip][0] += 1
+            else:
+                clients[ip] = [1, event.user_agent or user_agent]
+
+        quotas: Dict[str, int] = {}  # ip -> events the rate limit allowed
+        tracking_result: Dict[str, Any] = {}
+        for ip, (event_count, ip_user_agent) in clients.items():
+            cursor.execute(
+                _LOG_TRACKING_ATTEMPTS_SQL,
+                (ip, endpoint, ip_user_agent, Json({'event_count': event_count, 'batch_id': batch_id}), event_count)
+            )
+            attempts = [row[0] or {} for row in cursor.fetchall()]
+            quotas[ip] = sum(1 for attempt in attempts if attempt.get('allowed', False))
+            if attempts:
+                tracking_result = attempts[-1]
+
+        admitted = []
+        for event in events:
+            ip = event.client_ip or client_ip
+            admitted.append(quotas[ip] > 0)
+            if quotas[ip] > 0:
+                quotas[ip] -= 1
+
+        allowed = [event for event, is_admitted in zip(events, admitted) if is_admitted]
+        if not allowed:
+            return {
+                'success': False,
+                'batch_id': batch_id,
+                'message': 'Request rate limited or blocked',
+                'tracking_result': tracking_result,
+                'raw_event_ids': [None] * len(events)
+            }
+
+        # Resolve per-batch constants once instead of per row
+        cursor.execute("""
+            SELECT
+                (SELECT tenant_hk FROM auth.tenant_h ORDER BY load_date ASC LIMIT 1),
+                util.get_record_source()
+        """)
+        tenant_hk, record_source = cursor.fetchone()
+
+        rows = [
+            {
+                'tenant_hk': tenant_hk,
+                'client_ip': event.client_ip or client_ip,
+                'user_agent': event.user_agent or user_agent,
+                'event_type': event.event_type,
+                'page_url': event.page_url,
+                'event_data': Json(event.event_data),
+                'event_id': event.event_id,
+                'batch_id': batch_id,
+                'record_source': record_source
+            }
+            for event in allowed
+        ]
+        returned = execute_values(
+            cursor, _INSERT_EVENTS_SQL, rows,
+            template=_INSERT_EVENT_TEMPLATE,
+            page_size=len(rows),
+            fetch=True
+        )
+        inserted_ids = iter(row[0] for row in returned)
+        raw_event_ids = [
+            next(inserted_ids) if is_admitted else None
+            for is_admitted in admitted
+        ]
+
+        cursor.execute(
+            "SELECT util.log_audit_event(%s, %s, %s, %s, %s)",
+            (
+                'SITE_EVENT_BATCH_STORED',
+                'SITE_TRACKING',
+                f'batch:{batch_id}',
+                'API_SYSTEM',
+                Json({
+                    'batch_id': batch_id,
+                    'event_count': len(rows),
+                    'client_count': len(clients),
+                    'rate_limited_events': len(events) - len(rows),
+                    'storage_tables': ['raw.site_tracking_events_r']
+                })
+            )
+        )
+
+        return {'success': True, 'batch_id': batch_id, 'raw_event_ids': raw_event_ids}
+    finally:
+        cursor.close()
+
+
+def build_batch_results(events: List[TrackingEvent], raw_event_ids: List[int], errors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge accepted and rejected events into one result list ordered by index"""
+    results = [
+        {'index': event.index, 'status': 'accepted', 'event_id': raw_event_id}
+        if raw_event_id is not None else
+        {'index': event.index, 'status': 'rejected', 'error': 'Request rate limited or blocked'}
+        for event, raw_event_id in zip(events, raw_event_ids)
+    ]
+    results.extend({'index': error['index'], 'status': 'rejected', 'error': error['error']} for error in errors)
+    results.sort(key=lambda result: result['index'])
+    return results
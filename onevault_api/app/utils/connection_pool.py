@@ -0,0 +1,421 @@
+"""
+Pooled PostgreSQL Connections
+=============================
+
+Process-wide psycopg2 connection pooling shared by every API handler,
+background task and middleware:
+- Bounded pool (min/max size) with acquire timeout
+- Health checks for connections that sat idle
+- Maximum connection lifetime and idle recycling
+- Per-pool statistics for sizing pools per gunicorn/uvicorn worker
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Generator, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(Exception):
+    """Base error for connection pool failures"""
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when no connection could be acquired within the acquire timeout"""
+
+
+class PoolClosedError(PoolError):
+    """Raised when acquiring from a pool that has been closed"""
+
+
+@dataclass
+class PoolConfig:
+    """Connection pool configuration"""
+    min_size: int = 1
+    max_size: int = 10
+    max_lifetime_seconds: float = 1800.0
+    max_idle_seconds: float = 300.0
+    acquire_timeout_seconds: float = 5.0
+    health_check_interval_seconds: float = 30.0
+    connect_timeout_seconds: int = 5
+    application_name: str = "onevault_api"
+
+    @classmethod
+    def from_env(cls, prefix: str = "DB_POOL_") -> "PoolConfig":
+        """Build pool configuration from environment variables"""
+        defaults = cls()
+        return cls(
+            min_size=int(os.getenv(f"{prefix}MIN_SIZE", defaults.min_size)),
+            max_size=int(os.getenv(f"{prefix}MAX_SIZE", defaults.max_size)),
+            max_lifetime_seconds=float(os.getenv(f"{prefix}MAX_LIFETIME_SECONDS", defaults.max_lifetime_seconds)),
+            max_idle_seconds=float(os.getenv(f"{prefix}MAX_IDLE_SECONDS", defaults.max_idle_seconds)),
+            acquire_timeout_seconds=float(os.getenv(f"{prefix}ACQUIRE_TIMEOUT_SECONDS", defaults.acquire_timeout_seconds)),
+            health_check_interval_seconds=float(
+                os.getenv(f"{prefix}HEALTH_CHECK_INTERVAL_SECONDS", defaults.health_check_interval_seconds)
+            ),
+            connect_timeout_seconds=int(os.getenv(f"{prefix}CONNECT_TIMEOUT_SECONDS", defaults.connect_timeout_seconds)),
+            application_name=os.getenv(f"{prefix}APPLICATION_NAME", defaults.application_name),
+        )
+
+
+@dataclass
+class PoolStats:
+    """Connection pool counters"""
+    acquires: int = 0
+    releases: int = 0
+    timeouts: int = 0
+    connections_created: int = 0
+    connections_closed: int = 0
+    connect_failures: int = 0
+    health_checks: int = 0
+    health_check_failures: int = 0
+    lifetime_recycles: int = 0
+    idle_recycles: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    total_hold_ms: float = 0.0
+
+
+class _PooledConnection:
+    """Connection plus the bookkeeping the pool needs"""
+
+    __slots__ = ('connection', 'created_at', 'last_used_at', 'checked_out_at')
+
+    def __init__(self, connection: psycopg2.extensions.connection):
+        now = time.monotonic()
+        self.connection = connection
+        self.created_at = now
+        self.last_used_at = now
+        self.checked_out_at = 0.0
+
+
+class ConnectionPool:
+    """
+    Thread-safe bounded psycopg2 connection pool
+
+    Connections are handed out LIFO so the warmest connection is reused first,
+    letting surplus connections age out through idle recycling.
+    """
+
+    def __init__(self, dsn: Optional[str] = None, config: Optional[PoolConfig] = None,
+                 name: str = "system",
+                 connection_factory: Optional[Callable[[], psycopg2.extensions.connection]] = None):
+        if dsn is None and connection_factory is None:
+            raise ValueError("Either dsn or connection_factory is required")
+
+        self.name = name
+        self.config = config or PoolConfig()
+        if self.config.min_size < 0 or self.config.max_size < 1 or self.config.min_size > self.config.max_size:
+            raise ValueError(f"Invalid pool size: min={self.config.min_size}, max={self.config.max_size}")
+
+        self._dsn = dsn
+        self._connection_factory = connection_factory or self._default_connection_factory
+        self._idle: Deque[_PooledConnection] = deque()
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._size = 0  # open connections, including ones being created
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = PoolStats()
+        self._created_at = time.time()
+
+        logger.info(f"🔌 Connection pool [{name}] initialized: "
+                    f"min={self.config.min_size}, max={self.config.max_size}")
+
+    def _default_connection_factory(self) -> psycopg2.extensions.connection:
+        return psycopg2.connect(
+            self._dsn,
+            connect_timeout=self.config.connect_timeout_seconds,
+            application_name=self.config.application_name
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def warm(self) -> int:
+        """Open connections until the pool holds min_size; returns connections opened"""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.config.min_size:
+                    return opened
+                self._size += 1
+            entry = self._open_reserved()
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+            opened += 1
+
+    def acquire(self, timeout: Optional[float] = None) -> psycopg2.extensions.connection:
+        """
+        Borrow a connection from the pool
+
+        Args:
+            timeout: Seconds to wait for a free connection (defaults to acquire_timeout_seconds)
+
+        Raises:
+            PoolTimeoutError: No connection became available in time
+            PoolClosedError: The pool has been closed
+        """
+        timeout = self.config.acquire_timeout_seconds if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            entry = self._checkout(deadline)
+            if entry is None:
+                entry = self._open_reserved()
+            elif not self._is_usable(entry):
+                self._discard(entry)
+                continue
+
+            now = time.monotonic()
+            entry.checked_out_at = now
+            wait_ms = (now - start) * 1000
+            with self._cond:
+                self._in_use[id(entry.connection)] = entry
+                self._stats.acquires += 1
+                self._stats.total_wait_ms += wait_ms
+                self._stats.max_wait_ms = max(self._stats.max_wait_ms, wait_ms)
+            return entry.connection
+
+    def release(self, connection: psycopg2.extensions.connection, discard: bool = False):
+        """
+        Return a connection to the pool
+
+        Open transactions are rolled back; broken, expired or discarded
+        connections are closed instead of being reused.
+        """
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is not None:
+                self._stats.releases += 1
+                self._stats.total_hold_ms += (time.monotonic() - entry.checked_out_at) * 1000
+
+        if entry is None:
+            logger.warning(f"⚠️ Connection released to pool [{self.name}] it was not borrowed from")
+            return
+
+        if discard or self._closed or connection.closed:
+            self._discard(entry)
+            return
+
+        if self._lifetime_exceeded(entry):
+            self._count('lifetime_recycles')
+            self._discard(entry)
+            return
+
+        try:
+            if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception as e:
+            logger.warning(f"⚠️ Discarding connection from pool [{self.name}] after failed reset: {e}")
+            self._discard(entry)
+            return
+
+        entry.last_used_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Generator[psycopg2.extensions.connection, None, None]:
+        """
+        Borrow a connection for the duration of a with-block
+
+        Usage:
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+        """
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close(self):
+        """Close idle connections and refuse further acquires"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for entry in idle:
+            self._discard(entry)
+
+        logger.info(f"🔌 Connection pool [{self.name}] closed "
+                    f"({len(self._in_use)} connections still borrowed)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics for monitoring"""
+        with self._cond:
+            stats = self._stats
+            releases = max(stats.releases, 1)
+            acquires = max(stats.acquires, 1)
+            return {
+                'name': self.name,
+                'pid': os.getpid(),
+                'closed': self._closed,
+                'min_size': self.config.min_size,
+                'max_size': self.config.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'utilization_pct': round(len(self._in_use) / self.config.max_size * 100, 2),
+                'acquires': stats.acquires,
+                'releases': stats.releases,
+                'timeouts': stats.timeouts,
+                'connections_created': stats.connections_created,
+                'connections_closed': stats.connections_closed,
+                'connect_failures': stats.connect_failures,
+                'health_checks': stats.health_checks,
+                'health_check_failures': stats.health_check_failures,
+                'lifetime_recycles': stats.lifetime_recycles,
+                'idle_recycles': stats.idle_recycles,
+                'average_wait_ms': round(stats.total_wait_ms / acquires, 3),
+                'max_wait_ms': round(stats.max_wait_ms, 3),
+                'average_hold_ms': round(stats.total_hold_ms / releases, 3),
+                'uptime_seconds': round(time.time() - self._created_at, 2)
+            }
+
+    def _checkout(self, deadline: float) -> Optional[_PooledConnection]:
+        """Pop an idle connection, or reserve a slot (returns None) for a new one"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError(f"Connection pool [{self.name}] is closed")
+
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._size < self.config.max_size:
+                    self._size += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats.timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Timed out acquiring connection from pool [{self.name}] "
+                        f"(max_size={self.config.max_size})"
+                    )
+
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _open_reserved(self) -> _PooledConnection:
+        """Open a connection for a slot already counted in _size"""
+        try:
+            connection = self._connection_factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats.connect_failures += 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats.connections_created += 1
+        return _PooledConnection(connection)
+
+    def _is_usable(self, entry: _PooledConnection) -> bool:
+        """Check an idle connection before handing it out"""
+        if entry.connection.closed:
+            return False
+
+        now = time.monotonic()
+        if self._lifetime_exceeded(entry, now):
+            self._count('lifetime_recycles')
+            return False
+
+        idle_seconds = now - entry.last_used_at
+        if idle_seconds > self.config.max_idle_seconds:
+            self._count('idle_recycles')
+            return False
+
+        if idle_seconds > self.config.health_check_interval_seconds:
+            self._count('health_checks')
+            try:
+                cursor = entry.connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+                entry.connection.rollback()
+            except Exception as e:
+                self._count('health_check_failures')
+                logger.warning(f"⚠️ Health check failed for pooled connection [{self.name}]: {e}")
+                return False
+
+        return True
+
+    def _count(self, counter: str):
+        with self._cond:
+            setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+
+    def _lifetime_exceeded(self, entry: _PooledConnection, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now - entry.created_at > self.config.max_lifetime_seconds
+
+    def _discard(self, entry: _PooledConnection):
+        """Close a connection and free its slot"""
+        try:
+            if not entry.connection.closed:
+                entry.connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection [{self.name}]: {e}")
+
+        with self._cond:
+            self._size -= 1
+            self._stats.connections_closed += 1
+            self._cond.notify()
+
+
+# Registry of named pools in this process
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def register_pool(pool: ConnectionPool) -> ConnectionPool:
+    """Register a pool so it shows up in monitoring and is closed on shutdown"""
+    with _pools_lock:
+        _pools[pool.name] = pool
+    return pool
+
+
+def get_registered_pool(name: str) -> Optional[ConnectionPool]:
+    """Get a registered pool by name"""
+    return _pools.get(name)
+
+
+def get_all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Get statistics for every registered pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.get_stats() for pool in pools}
+
+
+def close_all_pools():
+    """Close every registered pool (graceful shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -3,68 +3,313 @@ Database Connection Utilities for Phase 1 Integration
 ====================================================
 
 Provides database connection utilities for the Zero Trust Gateway Phase 1 integration.
+All connections are borrowed from the process-wide pool in connection_pool.py.
+
+Async code must not call psycopg2 on the event loop: it uses AsyncConnection
+(get_db_connection / get_async_db), which runs every statement on a bounded
+thread-pool executor and keeps the asyncpg call signatures the middleware
+was written against. Like asyncpg it runs in autocommit mode: every statement
+commits (or fails) on its own, and handlers that need atomicity use
+`async with conn.transaction():` or pass a function to `conn.run()`.
 """
 
 import asyncio
 # import asyncpg  # Removed - not compatible with Python 3.13
 import psycopg2
-from psycopg2.pool import ThreadedConnectionPool
+import psycopg2.extras
 import os
+import re
 import logging
-from typing import Optional, Dict, Any
-from contextlib import asynccontextmanager
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Callable, Generator, AsyncGenerator
+from contextlib import asynccontextmanager, contextmanager
+
+from fastapi import HTTPException
+
+from .connection_pool import (
+    ConnectionPool, PoolConfig, PoolTimeoutError,
+    register_pool, close_all_pools
+)
 
 logger = logging.getLogger(__name__)
 
+# asyncpg-style positional placeholders ($1, $2, ...)
+_POSITIONAL_PARAM = re.compile(r'\$(\d+)')
+
+def _to_psycopg2_query(query: str, args: Tuple[Any, ...]) -> Tuple[str, Optional[Tuple[Any, ...]]]:
+    """
+    Translate an asyncpg-style query into psycopg2 paramstyle
+    
+    Queries already written with %s placeholders pass through unchanged.
+    """
+    if not args:
+        return query, None
+    if not _POSITIONAL_PARAM.search(query):
+        return query, args
+    
+    order: List[int] = []
+    
+    def _placeholder(match: re.Match) -> str:
+        order.append(int(match.group(1)) - 1)
+        return '%s'
+    
+    converted = _POSITIONAL_PARAM.sub(_placeholder, query.replace('%', '%%'))
+    return converted, tuple(args[i] for i in order)
+
+class AsyncConnection:
+    """
+    Awaitable facade over a pooled psycopg2 connection
+    
+    Mirrors the asyncpg Connection API (fetch/fetchrow/fetchval/execute with
+    positional *args, transaction()). Rows support both index and column-name
+    access. Each call runs on the database executor so a slow query only
+    occupies its own worker thread, never the event loop.
+    
+    Outside transaction() the connection is in autocommit mode, as in asyncpg:
+    a failed statement doesn't leave the connection in an aborted
+    transaction, and writes are not rolled back when it returns to the pool.
+    """
+    
+    def __init__(self, connection: psycopg2.extensions.connection, manager: "DatabaseConnection"):
+        self._connection = connection
+        self._manager = manager
+        self._released = False
+        self._transaction_depth = 0
+        connection.autocommit = True
+    
+    @property
+    def raw(self) -> psycopg2.extensions.connection:
+        """Underlying psycopg2 connection (only touch it from run())"""
+        return self._connection
+    
+    async def _call(self, func: Callable[..., Any], *args) -> Any:
+        return await self._manager.run_in_executor(func, self._connection, *args)
+    
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(raw_connection, *args, **kwargs) on the database executor
+        
+        func runs in its own transaction, committed when it returns and
+        rolled back if it raises; inside transaction() it joins that one.
+        """
+        if self._transaction_depth:
+            return await self._manager.run_in_executor(func, self._connection, *args, **kwargs)
+        return await self._manager.run_in_executor(_run_atomically, self._connection, func, args, kwargs)
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncGenerator["AsyncConnection", None]:
+        """
+        Run the enclosed statements in one transaction (nested blocks join the outer one)
+        
+        Usage:
+            async with conn.transaction():
+                await conn.execute(...)
+                await conn.execute(...)
+        """
+        if self._transaction_depth:
+            self._transaction_depth += 1
+            try:
+                yield self
+            finally:
+                self._transaction_depth -= 1
+            return
+        
+        await self._call(_set_autocommit, False)
+        self._transaction_depth = 1
+        try:
+            yield self
+        except BaseException:
+            await self._call(_end_transaction, False)
+            raise
+        else:
+            await self._call(_end_transaction, True)
+        finally:
+            self._transaction_depth = 0
+    
+    async def fetch(self, query: str, *args) -> List[psycopg2.extras.DictRow]:
+        """Execute a query and return all rows"""
+        return await self._call(_fetch, query, args, 'all')
+    
+    async def fetchrow(self, query: str, *args) -> Optional[psycopg2.extras.DictRow]:
+        """Execute a query and return the first row"""
+        return await self._call(_fetch, query, args, 'one')
+    
+    async def fetchval(self, query: str, *args, column: int = 0) -> Any:
+        """Execute a query and return a single value from the first row"""
+        row = await self.fetchrow(query, *args)
+        return row[column] if row is not None else None
+    
+    async def execute(self, query: str, *args) -> str:
+        """Execute a statement and return its status message"""
+        return await self._call(_fetch, query, args, 'status')
+    
+    async def commit(self):
+        """Commit the current transaction (no-op outside transaction(): statements autocommit)"""
+        await self._call(lambda conn: conn.commit())
+    
+    async def rollback(self):
+        """Roll back the current transaction (no-op outside transaction())"""
+        await self._call(lambda conn: conn.rollback())
+    
+    async def close(self, discard: bool = False):
+        """Return the connection to the pool (asyncpg-compatible name)"""
+        if self._released:
+            return
+        self._released = True
+        await self._manager.release_async_connection(self._connection, discard=discard)
+
+def _set_autocommit(conn: psycopg2.extensions.connection, autocommit: bool):
+    conn.autocommit = autocommit
+
+def _end_transaction(conn: psycopg2.extensions.connection, commit: bool):
+    """Commit or roll back, then return to autocommit (executor side)"""
+    try:
+        if commit:
+            conn.commit()
+        else:
+            conn.rollback()
+    finally:
+        if not conn.closed:
+            conn.autocommit = True
+
+def _run_atomically(conn: psycopg2.extensions.connection, func: Callable[..., Any],
+                    args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Run func(conn, ...) in one transaction on an autocommit connection (executor side)"""
+    conn.autocommit = False
+    committed = False
+    try:
+        result = func(conn, *args, **kwargs)
+        conn.commit()
+        committed = True
+        return result
+    finally:
+        if not committed and not conn.closed:
+            conn.rollback()
+        if not conn.closed:
+            conn.autocommit = True
+
+def _fetch(conn: psycopg2.extensions.connection, query: str, args: Tuple[Any, ...], mode: str) -> Any:
+    """Run one statement on a psycopg2 connection (executor side)"""
+    sql, params = _to_psycopg2_query(query, args)
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    try:
+        cursor.execute(sql, params)
+        if mode == 'status':
+            return cursor.statusmessage
+        if cursor.description is None:
+            return [] if mode == 'all' else None
+        return cursor.fetchall() if mode == 'all' else cursor.fetchone()
+    finally:
+        cursor.close()
+
 class DatabaseConnection:
     """
-    Database connection manager that works with both sync and async connections
+    Database connection manager backed by a shared connection pool
     """
     
     def __init__(self):
         self.database_url = os.getenv('SYSTEM_DATABASE_URL')
-        self.pool = None
-        self.async_pool = None
         
         if not self.database_url:
             raise ValueError("SYSTEM_DATABASE_URL environment variable not set")
+        
+        self.pool = register_pool(ConnectionPool(
+            self.database_url,
+            config=PoolConfig.from_env(),
+            name="system"
+        ))
+        
+        # One worker per pooled connection: async callers never queue behind
+        # threads that are themselves waiting for a connection. That holds only
+        # while every job on this executor holds an async slot, so background
+        # tasks borrow through get_async_connection() too.
+        self.executor_workers = int(os.getenv('DB_EXECUTOR_MAX_WORKERS', self.pool.config.max_size))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.executor_workers,
+            thread_name_prefix="db-worker"
+        )
+        self._async_slots: Optional[asyncio.Semaphore] = None
+    
+    async def run_in_executor(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking database call on the bounded database executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    async def get_async_connection(self, timeout: Optional[float] = None) -> AsyncConnection:
+        """Borrow a pooled connection without blocking the event loop"""
+        timeout = self.pool.config.acquire_timeout_seconds if timeout is None else timeout
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.executor_workers)
+        
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                f"Timed out after {timeout}s waiting for an async database slot"
+            )
+        
+        loop = asyncio.get_running_loop()
+        checkout = loop.run_in_executor(self.executor, self.pool.acquire, timeout)
+        try:
+            connection = await asyncio.shield(checkout)
+        except asyncio.CancelledError:
+            # The worker may still hand us a connection after we stop waiting
+            checkout.add_done_callback(self._release_abandoned)
+            raise
+        except BaseException:
+            self._async_slots.release()
+            raise
+        return AsyncConnection(connection, self)
     
-    # DISABLED: asyncpg not compatible with Python 3.13
-    # async def get_async_connection(self) -> asyncpg.Connection:
-    #     """Get an async database connection"""
-    #     try:
-    #         if not self.async_pool:
-    #             self.async_pool = await asyncpg.create_pool(
-    #                 self.database_url,
-    #                 min_size=1,
-    #                 max_size=10,
-    #                 command_timeout=30
-    #             )
-    #         
-    #         return await self.async_pool.acquire()
-    #     except Exception as e:
-    #         logger.error(f"❌ Failed to get async database connection: {e}")
-    #         raise
-    # 
-    # async def release_async_connection(self, connection: asyncpg.Connection):
-    #     """Release an async database connection"""
-    #     if self.async_pool and connection:
-    #         await self.async_pool.release(connection)
+    def _release_abandoned(self, checkout: "asyncio.Future"):
+        """Return a connection whose requester was cancelled mid-checkout"""
+        self._async_slots.release()
+        if not checkout.cancelled() and checkout.exception() is None:
+            self.pool.release(checkout.result())
+    
+    async def release_async_connection(self, connection: psycopg2.extensions.connection, discard: bool = False):
+        """Return an async-borrowed connection to the pool"""
+        try:
+            await self.run_in_executor(self._release_to_pool, connection, discard)
+        finally:
+            self._async_slots.release()
+    
+    def _release_to_pool(self, connection: psycopg2.extensions.connection, discard: bool = False):
+        """Leave autocommit mode (sync callers expect explicit transactions) and release"""
+        if not discard and not connection.closed:
+            try:
+                if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                connection.autocommit = False
+            except Exception as e:
+                logger.warning(f"⚠️ Discarding async connection after failed reset: {e}")
+                discard = True
+        self.pool.release(connection, discard=discard)
     
     def get_sync_connection(self) -> psycopg2.extensions.connection:
-        """Get a sync database connection"""
+        """Borrow a sync database connection (return it with release_sync_connection)"""
         try:
-            return psycopg2.connect(self.database_url)
+            return self.pool.acquire()
         except Exception as e:
             logger.error(f"❌ Failed to get sync database connection: {e}")
             raise
     
-    async def close_pools(self):
-        """Close all connection pools"""
-        if self.async_pool:
-            await self.async_pool.close()
+    def release_sync_connection(self, connection: psycopg2.extensions.connection, discard: bool = False):
+        """Return a sync database connection to the pool"""
+        self.pool.release(connection, discard=discard)
+    
+    @contextmanager
+    def connection(self) -> Generator[psycopg2.extensions.connection, None, None]:
+        """Borrow a sync database connection for the duration of a with-block"""
+        with self.pool.connection() as conn:
+            yield conn
+    
+    def close_pools(self):
+        """Close all connection pools and stop the database executor"""
+        self.executor.shutdown(wait=False)
         if self.pool:
-            self.pool.closeall()
+            self.pool.close()
 
 # Global database connection manager
 _db_manager = None
@@ -76,126 +321,184 @@ def get_db_manager() -> DatabaseConnection:
         _db_manager = DatabaseConnection()
     return _db_manager
 
-# DISABLED: asyncpg not compatible with Python 3.13
-# async def get_db_connection() -> asyncpg.Connection:
-#     """
-#     Get an async database connection
-#     
-#     This is the main function used by the middleware
-#     """
-#     db_manager = get_db_manager()
-#     return await db_manager.get_async_connection()
-# 
-# async def release_db_connection(connection: asyncpg.Connection):
-#     """Release an async database connection"""
-#     db_manager = get_db_manager()
-#     await db_manager.release_async_connection(connection)
-# 
-# @asynccontextmanager
-# async def get_db_connection_context():
-#     """
-#     Context manager for database connections
-#     
-#     Usage:
-#         async with get_db_connection_context() as conn:
-#             result = await conn.fetch("SELECT * FROM table")
-#     """
-#     connection = None
-#     try:
-#         connection = await get_db_connection()
-#         yield connection
-#     finally:
-#         if connection:
-#             await release_db_connection(connection)
+def get_system_pool() -> ConnectionPool:
+    """Get the process-wide system database pool"""
+    return get_db_manager().pool
+
+@contextmanager
+def db_connection() -> Generator[psycopg2.extensions.connection, None, None]:
+    """
+    Borrow a pooled system database connection
+    
+    Usage:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+    """
+    with get_db_manager().connection() as conn:
+        yield conn
+
+def get_db() -> Generator[psycopg2.extensions.connection, None, None]:
+    """
+    FastAPI dependency yielding a pooled system database connection
+    
+    For sync (def) handlers only; async handlers use get_async_db.
+    The connection is returned to the pool when the request finishes.
+    """
+    try:
+        conn = get_system_pool().acquire()
+    except PoolTimeoutError as e:
+        logger.error(f"❌ Database pool exhausted: {e}")
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
+    
+    discard = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        get_system_pool().release(conn, discard=discard)
+
+async def get_async_db() -> AsyncGenerator[AsyncConnection, None]:
+    """
+    FastAPI dependency yielding a pooled AsyncConnection for async handlers
+    
+    The connection is returned to the pool when the request finishes.
+    """
+    try:
+        conn = await get_db_connection()
+    except PoolTimeoutError as e:
+        logger.error(f"❌ Database pool exhausted: {e}")
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
+    
+    discard = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        await conn.close(discard=discard)
+
+def cleanup_sync_database_connections():
+    """Close every pooled connection (graceful shutdown)"""
+    global _db_manager
+    if _db_manager:
+        _db_manager.close_pools()
+    close_all_pools()
+    _db_manager = None
+
+async def get_db_connection() -> AsyncConnection:
+    """
+    Get an async database connection
+    
+    This is the main function used by the middleware; release it with
+    `await conn.close()` or use get_db_connection_context().
+    """
+    db_manager = get_db_manager()
+    return await db_manager.get_async_connection()
+
+async def release_db_connection(connection: AsyncConnection):
+    """Release an async database connection"""
+    await connection.close()
+
+@asynccontextmanager
+async def get_db_connection_context() -> AsyncGenerator[AsyncConnection, None]:
+    """
+    Context manager for database connections
+    
+    Usage:
+        async with get_db_connection_context() as conn:
+            result = await conn.fetch("SELECT * FROM table")
+    """
+    connection = await get_db_connection()
+    discard = False
+    try:
+        yield connection
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        await connection.close(discard=discard)
 
 def get_sync_db_connection() -> psycopg2.extensions.connection:
     """
-    Get a sync database connection for compatibility with existing code
+    Borrow a sync database connection for compatibility with existing code
+    
+    Return it with get_db_manager().release_sync_connection(conn).
     """
     db_manager = get_db_manager()
     return db_manager.get_sync_connection()
 
-# DISABLED: asyncpg not compatible with Python 3.13
-# async def test_database_connection() -> bool:
-#     """Test if the database connection is working"""
-#     try:
-#         async with get_db_connection_context() as conn:
-#             result = await conn.fetchval("SELECT 1")
-#             return result == 1
-#     except Exception as e:
-#         logger.error(f"❌ Database connection test failed: {e}")
-#         return False
-# 
-# async def execute_query(query: str, params: Optional[tuple] = None) -> Optional[Any]:
-#     """
-#     Execute a query and return the result
-#     
-#     Args:
-#         query: SQL query to execute
-#         params: Optional parameters for the query
-#         
-#     Returns:
-#         Query result or None if failed
-#     """
-#     try:
-#         async with get_db_connection_context() as conn:
-#             if params:
-#                 result = await conn.fetch(query, *params)
-#             else:
-#                 result = await conn.fetch(query)
-#             return result
-#     except Exception as e:
-#         logger.error(f"❌ Query execution failed: {e}")
-#         return None
-# 
-# async def execute_fetchone(query: str, params: Optional[tuple] = None) -> Optional[Any]:
-#     """
-#     Execute a query and return the first row
-#     
-#     Args:
-#         query: SQL query to execute
-#         params: Optional parameters for the query
-#         
-#     Returns:
-#         First row of query result or None if failed
-#     """
-#     try:
-#         async with get_db_connection_context() as conn:
-#             if params:
-#                 result = await conn.fetchrow(query, *params)
-#             else:
-#                 result = await conn.fetchrow(query)
-#             return result
-#     except Exception as e:
-#         logger.error(f"❌ Query execution failed: {e}")
-#         return None
-# 
-# async def execute_fetchval(query: str, params: Optional[tuple] = None) -> Optional[Any]:
-#     """
-#     Execute a query and return a single value
-#     
-#     Args:
-#         query: SQL query to execute
-#         params: Optional parameters for the query
-#         
-#     Returns:
-#         Single value from query result or None if failed
-#     """
-#     try:
-#         async with get_db_connection_context() as conn:
-#             if params:
-#                 result = await conn.fetchval(query, *params)
-#             else:
-#                 result = await conn.fetchval(query)
-#             return result
-#     except Exception as e:
-#         logger.error(f"❌ Query execution failed: {e}")
-#         return None
-# 
-# # Cleanup function for graceful shutdown
-# async def cleanup_database_connections():
-#     """Cleanup database connections on shutdown"""
-#     global _db_manager
-#     if _db_manager:
-#         await _db_manager.close_pools()
-#         _db_manager = None 
\ No newline at end of file
+async def test_database_connection() -> bool:
+    """Test if the database connection is working"""
+    try:
+        async with get_db_connection_context() as conn:
+            result = await conn.fetchval("SELECT 1")
+            return result == 1
+    except Exception as e:
+        logger.error(f"❌ Database connection test failed: {e}")
+        return False
+
+async def execute_query(query: str, params: Optional[tuple] = None) -> Optional[Any]:
+    """
+    Execute a query and return the result
+    
+    Args:
+        query: SQL query to execute
+        params: Optional parameters for the query
+    
+    Returns:
+        Query result or None if failed
+    """
+    try:
+        async with get_db_connection_context() as conn:
+            return await conn.fetch(query, *(params or ()))
+    except Exception as e:
+        logger.error(f"❌ Query execution failed: {e}")
+        return None
+
+async def execute_fetchone(query: str, params: Optional[tuple] = None) -> Optional[Any]:
+    """
+    Execute a query and return the first row
+    
+    Args:
+        query: SQL query to execute
+        params: Optional parameters for the query
+    
+    Returns:
+        First row of query result or None if failed
+    """
+    try:
+        async with get_db_connection_context() as conn:
+            return await conn.fetchrow(query, *(params or ()))
+    except Exception as e:
+        logger.error(f"❌ Query execution failed: {e}")
+        return None
+
+async def execute_fetchval(query: str, params: Optional[tuple] = None) -> Optional[Any]:
+    """
+    Execute a query and return a single value
+    
+    Args:
+        query: SQL query to execute
+        params: Optional parameters for the query
+    
+    Returns:
+        Single value from query result or None if failed
+    """
+    try:
+        async with get_db_connection_context() as conn:
+            return await conn.fetchval(query, *(params or ()))
+    except Exception as e:
+        logger.error(f"❌ Query execution failed: {e}")
+        return None
+
+# Cleanup function for graceful shutdown
+async def cleanup_database_connections():
+    """Cleanup database connections on shutdown"""
+    cleanup_sync_database_connections()
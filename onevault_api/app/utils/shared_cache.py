@@ -0,0 +1,362 @@
+"""
+Shared Two-Tier Cache
+=====================
+
+Cross-worker cache for validation results. Each worker process keeps a
+small in-process L1 (LRUTTLCache) in front of a shared L2 that speaks the
+Redis protocol, so scaling uvicorn workers no longer divides the hit rate
+by the worker count.
+
+Invalidations delete from L2 and are broadcast on a pub/sub channel; every
+worker drops its L1 copies as soon as the message arrives. L1 entries also
+expire after l1_ttl_seconds, which bounds staleness if a message is missed.
+
+Configure with SHARED_CACHE_REDIS_URL. Without it (or without the redis
+package) caches run L1-only, which is the previous per-process behaviour.
+L2 errors are fail-safe: the cache falls back to L1 and retries L2 after
+l2_retry_seconds.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..phase1_zero_trust.cache_engine import LRUTTLCache
+
+try:
+    import redis
+except ImportError:  # optional: only needed when SHARED_CACHE_REDIS_URL is set
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SharedCacheConfig:
+    """Two-tier cache settings"""
+    redis_url: Optional[str] = None
+    key_prefix: str = "onevault:cache"
+    invalidation_channel: str = "onevault:cache:invalidate"
+    l1_max_entries: int = 10000
+    l1_ttl_seconds: float = 5.0          # L1 staleness bound when L2 is shared
+    default_ttl_seconds: float = 300.0
+    socket_timeout_seconds: float = 0.05
+    l2_retry_seconds: float = 5.0        # skip L2 for this long after an error
+
+    @classmethod
+    def from_env(cls, prefix: str = "SHARED_CACHE_") -> "SharedCacheConfig":
+        """Build shared cache configuration from environment variables"""
+        defaults = cls()
+        return cls(
+            redis_url=os.getenv(f"{prefix}REDIS_URL", defaults.redis_url) or None,
+            key_prefix=os.getenv(f"{prefix}KEY_PREFIX", defaults.key_prefix),
+            invalidation_channel=os.getenv(f"{prefix}INVALIDATION_CHANNEL", defaults.invalidation_channel),
+            l1_max_entries=int(os.getenv(f"{prefix}L1_MAX_ENTRIES", defaults.l1_max_entries)),
+            l1_ttl_seconds=float(os.getenv(f"{prefix}L1_TTL_SECONDS", defaults.l1_ttl_seconds)),
+            default_ttl_seconds=float(os.getenv(f"{prefix}DEFAULT_TTL_SECONDS", defaults.default_ttl_seconds)),
+            socket_timeout_seconds=float(os.getenv(f"{prefix}SOCKET_TIMEOUT_SECONDS", defaults.socket_timeout_seconds)),
+            l2_retry_seconds=float(os.getenv(f"{prefix}L2_RETRY_SECONDS", defaults.l2_retry_seconds)),
+        )
+
+
+class SharedCacheBackend:
+    """
+    Per-process L2 connection and invalidation subscriber
+
+    One backend serves every cache namespace in the process; use cache()
+    to get a namespace.
+    """
+
+    def __init__(self, config: Optional[SharedCacheConfig] = None, client: Any = None):
+        self.config = config or SharedCacheConfig()
+        self.instance_id = uuid.uuid4().hex
+        self._client = client
+        if self._client is None and self.config.redis_url:
+            if redis is None:
+                logger.warning("⚠️ SHARED_CACHE_REDIS_URL is set but the redis package is not installed; caches are L1-only")
+            else:
+                self._client = redis.Redis.from_url(
+                    self.config.redis_url,
+                    socket_timeout=self.config.socket_timeout_seconds,
+                    socket_connect_timeout=self.config.socket_timeout_seconds,
+                )
+        self._caches: Dict[str, "TwoTierCache"] = {}
+        self._lock = threading.Lock()
+        self._pubsub = None
+        self._listener = None
+        self._l2_down_until = 0.0
+        self._stats = {
+            'l2_errors': 0,
+            'invalidations_published': 0,
+            'invalidations_received': 0,
+        }
+
+    @property
+    def shared(self) -> bool:
+        """True when an L2 client is configured"""
+        return self._client is not None
+
+    def l2_available(self) -> bool:
+        return self._client is not None and time.monotonic() >= self._l2_down_until
+
+    def l2_failed(self, error: Exception):
+        """Record an L2 error and back off before trying L2 again"""
+        self._stats['l2_errors'] += 1
+        self._l2_down_until = time.monotonic() + self.config.l2_retry_seconds
+        logger.warning(f"⚠️ Shared cache L2 unavailable, using L1 only for {self.config.l2_retry_seconds}s: {error}")
+
+    @property
+    def client(self) -> Any:
+        return self._client
+
+    def cache(self, namespace: str, l1_max_entries: Optional[int] = None,
+              default_ttl_seconds: Optional[float] = None) -> "TwoTierCache":
+        """Get or create the cache for a namespace"""
+        with self._lock:
+            cache = self._caches.get(namespace)
+            if cache is None:
+                cache = TwoTierCache(namespace, self,
+                                     l1_max_entries=l1_max_entries or self.config.l1_max_entries,
+                                     default_ttl_seconds=default_ttl_seconds or self.config.default_ttl_seconds)
+                self._caches[namespace] = cache
+            self._start_listener()
+            return cache
+
+    def _start_listener(self):
+        if self._client is None or self._listener is not None:
+            return
+        try:
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self.config.invalidation_channel: self._on_message})
+            self._listener = self._pubsub.run_in_thread(
+                sleep_time=0.01, daemon=True, exception_handler=self._on_listener_error
+            )
+            logger.info(f"💾 Shared cache listening for invalidations on {self.config.invalidation_channel}")
+        except Exception as e:
+            self._pubsub = None
+            self._listener = None
+            self.l2_failed(e)
+
+    def _on_listener_error(self, error: Exception, pubsub: Any, thread: Any):
+        self._stats['l2_errors'] += 1
+        logger.warning(f"⚠️ Shared cache invalidation listener error: {error}")
+        time.sleep(self.config.l2_retry_seconds)
+
+    def publish_invalidation(self, namespace: str, keys: List[str], tags: List[str]):
+        """Tell the other workers to drop their L1 copies"""
+        message = json.dumps({'origin': self.instance_id, 'namespace': namespace, 'keys': keys, 'tags': tags})
+        self._client.publish(self.config.invalidation_channel, message)
+        self._stats['invalidations_published'] += 1
+
+    def _on_message(self, message: Dict[str, Any]):
+        try:
+            payload = json.loads(message['data'])
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring malformed cache invalidation message: {e}")
+            return
+        if payload.get('origin') == self.instance_id:
+            return
+        cache = self._caches.get(payload.get('namespace'))
+        if cache is not None:
+            self._stats['invalidations_received'] += 1
+            cache.drop_local(payload.get('keys') or [], payload.get('tags') or [])
+
+    def close(self):
+        """Stop the invalidation listener"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Error closing shared cache subscriber: {e}")
+            self._pubsub = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend and per-namespace statistics"""
+        return {
+            'shared': self.shared,
+            'l2_available': self.l2_available(),
+            'listening': self._listener is not None,
+            **self._stats,
+            'namespaces': {name: cache.get_stats() for name, cache in list(self._caches.items())},
+        }
+
+
+class TwoTierCache:
+    """
+    In-process L1 in front of the shared L2 for one namespace
+
+    Values must be JSON-serializable to be shared through L2.
+    """
+
+    def __init__(self, namespace: str, backend: SharedCacheBackend,
+                 l1_max_entries: int, default_ttl_seconds: float):
+        self.namespace = namespace
+        self.backend = backend
+        self.default_ttl_seconds = default_ttl_seconds
+        self._l1 = LRUTTLCache(max_entries=l1_max_entries, default_ttl=default_ttl_seconds)
+        self._lock = threading.Lock()
+        self._stats = {
+            'l1_hits': 0,
+            'l2_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'invalidations': 0,
+            'remote_invalidations': 0,
+        }
+
+    def _l2_key(self, key: str) -> str:
+        return f"{self.backend.config.key_prefix}:{self.namespace}:{key}"
+
+    def _l2_tag_key(self, tag: str) -> str:
+        return f"{self.backend.config.key_prefix}:{self.namespace}:tag:{tag}"
+
+    def _l1_ttl(self, ttl: float) -> float:
+        return min(ttl, self.backend.config.l1_ttl_seconds) if self.backend.shared else ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get from L1, falling back to L2 and refilling L1 on an L2 hit"""
+        with self._lock:
+            value = self._l1.get(key)
+        if value is not None:
+            self._stats['l1_hits'] += 1
+            return value
+
+        if self.backend.l2_available():
+            try:
+                raw = self.backend.client.get(self._l2_key(key))
+            except Exception as e:
+                self.backend.l2_failed(e)
+                raw = None
+            if raw is not None:
+                stored = json.loads(raw)
+                with self._lock:
+                    self._l1.set(key, stored['v'], ttl=self._l1_ttl(self.default_ttl_seconds), tags=stored['t'])
+                self._stats['l2_hits'] += 1
+                return stored['v']
+
+        self._stats['misses'] += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> bool:
+        """Write through to L1 and L2"""
+        if value is None:
+            return False
+        ttl = ttl or self.default_ttl_seconds
+        tags = list(tags)
+        with self._lock:
+            self._l1.set(key, value, ttl=self._l1_ttl(ttl), tags=tags)
+        self._stats['sets'] += 1
+
+        if self.backend.l2_available():
+            ttl_ms = int(ttl * 1000)
+            # Tag sets must outlive their members or tag invalidation misses keys
+            tag_ttl_ms = int(max(ttl, self.default_ttl_seconds) * 1000)
+            try:
+                pipe = self.backend.client.pipeline(transaction=False)
+                pipe.set(self._l2_key(key), json.dumps({'v': value, 't': tags}, default=str), px=ttl_ms)
+                for tag in tags:
+                    pipe.sadd(self._l2_tag_key(tag), key)
+                    pipe.pexpire(self._l2_tag_key(tag), tag_ttl_ms)
+                pipe.execute()
+            except Exception as e:
+                self.backend.l2_failed(e)
+        return True
+
+    def delete(self, key: str) -> int:
+        """Invalidate one key in every worker"""
+        return self.invalidate(keys=[key])
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Invalidate every entry carrying any of the tags in every worker"""
+        return self.invalidate(tags=tags)
+
+    def invalidate(self, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> int:
+        """
+        Drop keys and tagged entries locally, from L2, and in the other workers
+
+        Returns:
+            Number of entries removed (from L2 when shared, else from L1)
+        """
+        keys, tags = list(keys), list(tags)
+        removed = self.drop_local(keys, tags, remote=False)
+
+        if self.backend.shared:
+            try:
+                client = self.backend.client
+                l2_keys = [self._l2_key(key) for key in keys]
+                if tags:
+                    tag_keys = [self._l2_tag_key(tag) for tag in tags]
+                    pipe = client.pipeline(transaction=False)
+                    for tag_key in tag_keys:
+                        pipe.smembers(tag_key)
+                    for members in pipe.execute():
+                        l2_keys.extend(self._l2_key(member.decode() if isinstance(member, bytes) else member)
+                                       for member in members)
+                    client.delete(*tag_keys)
+                if l2_keys:
+                    removed = client.delete(*set(l2_keys))
+                self.backend.publish_invalidation(self.namespace, keys, tags)
+            except Exception as e:
+                self.backend.l2_failed(e)
+
+        self._stats['invalidations'] += 1
+        return removed
+
+    def drop_local(self, keys: List[str], tags: List[str], remote: bool = True) -> int:
+        """Remove keys and tagged entries from this worker's L1 only"""
+        with self._lock:
+            removed = sum(1 for key in keys if self._l1.delete(key))
+            removed += self._l1.invalidate_tags(tags)
+        if remote:
+            self._stats['remote_invalidations'] += 1
+        return removed
+
+    def clear_local(self):
+        """Drop this worker's L1 (L2 is left alone)"""
+        with self._lock:
+            self._l1.clear()
+
+    def __len__(self) -> int:
+        return len(self._l1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per tier"""
+        lookups = self._stats['l1_hits'] + self._stats['l2_hits'] + self._stats['misses']
+        hits = self._stats['l1_hits'] + self._stats['l2_hits']
+        with self._lock:
+            l1_stats = self._l1.get_stats()
+        return {
+            **self._stats,
+            'hit_rate': round(hits / lookups * 100, 2) if lookups else 0.0,
+            'l1_size': l1_stats['size'],
+            'l1_max_entries': l1_stats['max_entries'],
+            'l1_evictions': l1_stats['evictions'],
+        }
+
+
+# Global shared cache backend
+_shared_cache_backend = None
+
+def get_shared_cache_backend() -> SharedCacheBackend:
+    """Get the process-wide shared cache backend"""
+    global _shared_cache_backend
+    if _shared_cache_backend is None:
+        _shared_cache_backend = SharedCacheBackend(SharedCacheConfig.from_env())
+    return _shared_cache_backend
+
+def get_shared_cache(namespace: str, **kwargs) -> TwoTierCache:
+    """Get the two-tier cache for a namespace"""
+    return get_shared_cache_backend().cache(namespace, **kwargs)
+
+def close_shared_cache():
+    """Stop the invalidation listener on shutdown"""
+    if _shared_cache_backend is not None:
+        _shared_cache_backend.close()
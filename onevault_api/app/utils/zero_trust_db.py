@@ -11,21 +11,129 @@ SECURITY PRINCIPLE: Database access is always tenant-scoped
 - Cross-tenant queries are impossible by design
 - Audit trail for all database operations
 - Connection pooling with tenant context
+
+Wrappers borrow from the shared system pool. Each transaction on a borrowed
+connection starts with set_config('app.tenant_hk', ..., true) - the
+parameterized form of SET LOCAL - so tenant context never outlives the
+transaction and cannot leak to the next borrower. Query counts and latency
+histograms are kept per tenant, across wrappers.
+
+Large result sets stream through named server-side cursors (stream_query)
+and out of FastAPI as NDJSON or CSV (stream_query_response) with memory
+bounded by the cursor's itersize.
 """
 
+import bisect
+import csv
+import io
+import json
 import logging
+import os
+import re
+import threading
 import time
+import uuid
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple, Any, Generator
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Any, Generator
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from psycopg2.extras import NamedTupleCursor, RealDictCursor
 
-from ..middleware.query_rewriter import QueryRewriterMiddleware
+from ..middleware.query_rewriter import get_query_rewriter
+from .connection_pool import ConnectionPool, PoolTimeoutError
 
 logger = logging.getLogger(__name__)
 
+# Upper bounds (ms) of the per-tenant latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Transaction-scoped tenant context (equivalent to SET LOCAL, but takes parameters)
+TENANT_CONTEXT_QUERY = "SELECT set_config('app.tenant_hk', %s, true), set_config('app.user_hk', %s, true)"
+
+# validate_tenant_access() resource types -> resource_validator bulk types
+TENANT_RESOURCE_TYPES = {
+    'user': 'user_bk',
+    'asset': 'asset_bk',
+    'transaction': 'transaction_bk',
+    'session': 'session_token',
+}
+
+# INSERT ... VALUES (...) whose row tuple can be repeated for multi-row inserts
+_VALUES_TAIL = re.compile(r"^(.*\bVALUES\s*)(\((?:[^()'\"]|\([^()'\"]*\))*\))\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+
+class TenantQueryMetrics:
+    """
+    Query counts and latency histograms per tenant
+    
+    Shared by every wrapper in the process so a tenant's numbers don't reset
+    with each request's wrapper.
+    """
+    
+    def __init__(self, buckets_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._tenants: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, tenant_hk: bytes, execution_time_ms: float, failed: bool = False):
+        """Record one query execution for a tenant"""
+        key = tenant_hk.hex()
+        bucket = bisect.bisect_left(self.buckets_ms, execution_time_ms)
+        with self._lock:
+            entry = self._tenants.get(key)
+            if entry is None:
+                entry = self._tenants[key] = {
+                    'queries': 0,
+                    'failures': 0,
+                    'total_time_ms': 0.0,
+                    'max_time_ms': 0.0,
+                    'histogram': [0] * (len(self.buckets_ms) + 1),
+                }
+            entry['queries'] += 1
+            entry['failures'] += failed
+            entry['total_time_ms'] += execution_time_ms
+            entry['max_time_ms'] = max(entry['max_time_ms'], execution_time_ms)
+            entry['histogram'][bucket] += 1
+    
+    def get_stats(self, tenant_hk: Optional[bytes] = None) -> Dict[str, Any]:
+        """Statistics for one tenant, or for every tenant keyed by tenant_hk hex"""
+        with self._lock:
+            if tenant_hk is not None:
+                entry = self._tenants.get(tenant_hk.hex())
+                return self._format(entry) if entry else self._format(None)
+            return {key: self._format(entry) for key, entry in self._tenants.items()}
+    
+    def reset(self):
+        """Forget all recorded executions"""
+        with self._lock:
+            self._tenants.clear()
+    
+    def _format(self, entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        labels = [f"le_{bound:g}ms" for bound in self.buckets_ms] + ["le_inf"]
+        if entry is None:
+            return {'queries': 0, 'failures': 0, 'average_time_ms': 0.0, 'max_time_ms': 0.0,
+                    'latency_histogram': dict.fromkeys(labels, 0)}
+        return {
+            'queries': entry['queries'],
+            'failures': entry['failures'],
+            'average_time_ms': round(entry['total_time_ms'] / max(entry['queries'], 1), 3),
+            'max_time_ms': round(entry['max_time_ms'], 3),
+            'latency_histogram': dict(zip(labels, entry['histogram']))
+        }
+
+# Global tenant metrics (singleton pattern)
+_tenant_metrics = None
+
+def get_tenant_query_metrics() -> TenantQueryMetrics:
+    """Get the process-wide per-tenant query metrics"""
+    global _tenant_metrics
+    if _tenant_metrics is None:
+        _tenant_metrics = TenantQueryMetrics()
+    return _tenant_metrics
+
 class ZeroTrustDatabaseWrapper:
     """
     Zero Trust Database Connection Wrapper
@@ -37,31 +145,84 @@ class ZeroTrustDatabaseWrapper:
     4. Maintaining tenant context throughout connection lifecycle
     """
     
-    def __init__(self, tenant_hk: bytes, user_hk: Optional[bytes] = None):
+    def __init__(self, tenant_hk: bytes, user_hk: Optional[bytes] = None,
+                 pool: Optional[ConnectionPool] = None):
         self.tenant_hk = tenant_hk
         self.user_hk = user_hk
-        self.query_rewriter = QueryRewriterMiddleware()
-        self._connection = None
-        self._query_count = 0
+        self.query_rewriter = get_query_rewriter()
+        self.metrics = get_tenant_query_metrics()
+        self._pool = pool
+        self._connection = None      # borrowed connection while a checkout is open
+        self._checkout_depth = 0
         self._start_time = time.time()
+        # Statements sent per round trip in pipelined transactions
+        self.pipeline_page_size = int(os.getenv('ZERO_TRUST_PIPELINE_PAGE_SIZE', 100))
+        # Rows fetched per network round trip by streaming server-side cursors
+        self.stream_itersize = int(os.getenv('ZERO_TRUST_STREAM_ITERSIZE', 2000))
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        """Pool connections are borrowed from (the shared system pool by default)"""
+        if self._pool is None:
+            from .database import get_system_pool
+            self._pool = get_system_pool()
+        return self._pool
     
     @contextmanager
     def get_connection(self) -> Generator[psycopg2.extensions.connection, None, None]:
-        """Get database connection with automatic cleanup"""
+        """
+        Borrow a pooled connection with tenant context applied
+        
+        Nested checkouts share the outer connection. The outermost checkout
+        commits on success, rolls back on error and returns the connection
+        to the pool.
+        """
+        outermost = self._checkout_depth == 0
+        if outermost:
+            self._connection = self.pool.acquire()
+        self._checkout_depth += 1
+        discard = False
+        
         try:
-            if not self._connection or self._connection.closed:
-                self._connection = self._create_connection()
+            if self._connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._apply_tenant_context(self._connection)
             
             yield self._connection
             
+            if outermost and self._connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._connection.commit()
+            
         except Exception as e:
-            if self._connection:
+            discard = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not self._connection.closed:
                 self._connection.rollback()
             logger.error(f"Database operation failed: {e}")
             raise
         finally:
-            # Connection is kept alive for reuse
-            pass
+            self._checkout_depth -= 1
+            if outermost:
+                connection, self._connection = self._connection, None
+                self.pool.release(connection, discard=discard)
+    
+    @contextmanager
+    def session(self) -> Generator["ZeroTrustDatabaseWrapper", None, None]:
+        """
+        Hold one pooled connection across several calls
+        
+        Usage:
+            with db.session():
+                db.execute_query(...)
+                db.execute_query(...)
+        """
+        with self.get_connection():
+            yield self
+    
+    def _apply_tenant_context(self, conn: psycopg2.extensions.connection):
+        """Start the transaction with app.tenant_hk / app.user_hk set locally"""
+        with conn.cursor() as cursor:
+            cursor.execute(TENANT_CONTEXT_QUERY, (
+                self.tenant_hk.hex(), self.user_hk.hex() if self.user_hk else ''
+            ))
     
     def execute_query(self, query: str, params: Optional[Tuple] = None, 
                      fetch_results: bool = True) -> Optional[List[Dict]]:
@@ -89,14 +250,14 @@ class ZeroTrustDatabaseWrapper:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute(rewritten_query, new_params)
                     
-                    self._query_count += 1
-                    execution_time = (time.time() - start_time) * 1000
-                    
                     # Step 3: Fetch results if requested
                     results = None
                     if fetch_results:
                         results = [dict(row) for row in cursor.fetchall()]
                     
+                    execution_time = (time.time() - start_time) * 1000
+                    self.metrics.record(self.tenant_hk, execution_time)
+                    
                     # Step 4: Log execution for audit
                     self.query_rewriter.log_query_execution(
                         query, rewritten_query, self.tenant_hk, execution_time
@@ -107,10 +268,72 @@ class ZeroTrustDatabaseWrapper:
                     
         except Exception as e:
             execution_time = (time.time() - start_time) * 1000
+            self.metrics.record(self.tenant_hk, execution_time, failed=True)
             logger.error(f"Query execution failed after {execution_time:.2f}ms: {e}")
             self._log_failed_query(query, params, str(e), execution_time)
             raise
     
+    def stream_query(self, query: str, params: Optional[Tuple] = None,
+                     itersize: Optional[int] = None, named_rows: bool = False,
+                     columns: Optional[List[str]] = None) -> Generator[Tuple, None, None]:
+        """
+        Stream rows of a tenant-filtered query through a server-side cursor
+        
+        Rows are fetched itersize at a time, so memory stays bounded no matter
+        how large the result is. The connection stays borrowed until the
+        generator is exhausted or closed.
+        
+        Args:
+            query: SQL query to execute
+            params: Query parameters
+            itersize: Rows per fetch (defaults to stream_itersize)
+            named_rows: Yield namedtuples instead of plain tuples
+            columns: List that receives the column names once the first batch is fetched
+            
+        Yields:
+            One tuple (or namedtuple) per row
+        """
+        start_time = time.time()
+        row_count = 0
+        
+        try:
+            # Step 1: Rewrite query with tenant filtering
+            rewritten_query, new_params = self.query_rewriter.rewrite_query_with_tenant_filter(
+                query, self.tenant_hk, params
+            )
+            
+            # Step 2: Declare a server-side cursor inside the tenant-scoped transaction
+            with self.get_connection() as conn:
+                cursor_factory = NamedTupleCursor if named_rows else None
+                with conn.cursor(name=f"zt_stream_{uuid.uuid4().hex}", cursor_factory=cursor_factory) as cursor:
+                    cursor.itersize = itersize or self.stream_itersize
+                    cursor.execute(rewritten_query, new_params)
+                    
+                    # Step 3: Yield rows one fetch at a time
+                    for row in cursor:
+                        if row_count == 0 and columns is not None:
+                            columns.extend(column[0] for column in cursor.description)
+                        row_count += 1
+                        yield row
+                    
+                    if row_count == 0 and columns is not None and cursor.description:
+                        columns.extend(column[0] for column in cursor.description)
+            
+            # Step 4: Log execution for audit
+            execution_time = (time.time() - start_time) * 1000
+            self.metrics.record(self.tenant_hk, execution_time)
+            self.query_rewriter.log_query_execution(
+                query, rewritten_query, self.tenant_hk, execution_time
+            )
+            logger.debug(f"Streamed {row_count} rows in {execution_time:.2f}ms")
+            
+        except Exception as e:
+            execution_time = (time.time() - start_time) * 1000
+            self.metrics.record(self.tenant_hk, execution_time, failed=True)
+            logger.error(f"Streaming query failed after {row_count} rows and {execution_time:.2f}ms: {e}")
+            self._log_failed_query(query, params, str(e), execution_time)
+            raise
+    
     def execute_function(self, function_name: str, params: Optional[Tuple] = None) -> Optional[Any]:
         """
         Execute database function with tenant context
@@ -136,26 +359,34 @@ class ZeroTrustDatabaseWrapper:
                     
                     result = cursor.fetchone()
                     execution_time = (time.time() - start_time) * 1000
+                    self.metrics.record(self.tenant_hk, execution_time)
                     
                     logger.debug(f"Function {function_name} executed in {execution_time:.2f}ms")
                     return result[0] if result else None
                     
         except Exception as e:
             execution_time = (time.time() - start_time) * 1000
+            self.metrics.record(self.tenant_hk, execution_time, failed=True)
             logger.error(f"Function {function_name} failed after {execution_time:.2f}ms: {e}")
             self._log_failed_query(f"SELECT {function_name}(...)", params, str(e), execution_time)
             raise
     
-    def execute_transaction(self, queries: List[Tuple[str, Optional[Tuple]]]) -> List[Optional[List[Dict]]]:
+    def execute_transaction(self, queries: List[Tuple[str, Optional[Tuple]]],
+                            pipeline: bool = False) -> List[Optional[Any]]:
         """
         Execute multiple queries in a transaction with tenant filtering
         
         Args:
             queries: List of (query, params) tuples
+            pipeline: Send statements back to back in as few round trips as
+                possible; SELECT results come back as lazy row iterators
             
         Returns:
             List of query results
         """
+        if pipeline:
+            return self._execute_pipelined(queries)
+        
         start_time = time.time()
         results = []
         
@@ -179,12 +410,14 @@ class ZeroTrustDatabaseWrapper:
                     # Commit transaction
                     conn.commit()
                     execution_time = (time.time() - start_time) * 1000
+                    self.metrics.record(self.tenant_hk, execution_time)
                     
                     logger.info(f"Transaction with {len(queries)} queries completed in {execution_time:.2f}ms")
                     return results
                     
         except Exception as e:
             execution_time = (time.time() - start_time) * 1000
+            self.metrics.record(self.tenant_hk, execution_time, failed=True)
             logger.error(f"Transaction failed after {execution_time:.2f}ms: {e}")
             
             # Log each query in the failed transaction
@@ -193,50 +426,128 @@ class ZeroTrustDatabaseWrapper:
             
             raise
     
-    def validate_tenant_access(self, resource_type: str, resource_id: str) -> bool:
+    def _execute_pipelined(self, queries: List[Tuple[str, Optional[Tuple]]]) -> List[Optional[Iterator[Dict]]]:
+        """
+        Pipelined execute_transaction
+        
+        psycopg2 has no libpq pipeline mode, so statements are rendered
+        client-side (as execute_batch does) and joined into one execute:
+        - Writes are buffered and sent with the next SELECT, or in pages of
+          pipeline_page_size statements
+        - Runs of the same INSERT ... VALUES statement become one multi-row
+          INSERT (as execute_values does)
+        - SELECT rows are fetched as tuples and turned into dicts lazily
+        
+        A transaction of writes ending in a SELECT costs one round trip plus
+        the commit.
+        """
+        start_time = time.time()
+        results: List[Optional[Iterator[Dict]]] = []
+        round_trips = 0
+        
+        try:
+            rewritten = [
+                self.query_rewriter.rewrite_query_with_tenant_filter(query, self.tenant_hk, params)
+                for query, params in queries
+            ]
+            
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    pending: List[bytes] = []
+                    i = 0
+                    while i < len(queries):
+                        rewritten_query, new_params = rewritten[i]
+                        
+                        if queries[i][0].strip().upper().startswith('SELECT'):
+                            # Flush buffered writes together with the SELECT; its rows are the last result
+                            pending.append(cursor.mogrify(rewritten_query, new_params))
+                            cursor.execute(b';'.join(pending))
+                            pending = []
+                            round_trips += 1
+                            results.append(self._iter_rows(cursor.description, cursor.fetchall()))
+                            i += 1
+                            continue
+                        
+                        run_end = i + 1
+                        while run_end < len(queries) and rewritten[run_end][0] == rewritten_query:
+                            run_end += 1
+                        
+                        values = _VALUES_TAIL.match(rewritten_query) if run_end - i > 1 else None
+                        if values:
+                            rows = b','.join(cursor.mogrify(values.group(2), rewritten[j][1]) for j in range(i, run_end))
+                            pending.append(cursor.mogrify(values.group(1)) + rows)
+                        else:
+                            pending.extend(cursor.mogrify(*rewritten[j]) for j in range(i, run_end))
+                        results.extend([None] * (run_end - i))
+                        i = run_end
+                        
+                        while len(pending) >= self.pipeline_page_size:
+                            cursor.execute(b';'.join(pending[:self.pipeline_page_size]))
+                            pending = pending[self.pipeline_page_size:]
+                            round_trips += 1
+                    
+                    if pending:
+                        cursor.execute(b';'.join(pending))
+                        round_trips += 1
+                    
+                    # Commit transaction
+                    conn.commit()
+                    execution_time = (time.time() - start_time) * 1000
+                    self.metrics.record(self.tenant_hk, execution_time)
+                    
+                    logger.info(f"Pipelined transaction with {len(queries)} queries completed in "
+                                f"{execution_time:.2f}ms ({round_trips} round trips)")
+                    return results
+                    
+        except Exception as e:
+            execution_time = (time.time() - start_time) * 1000
+            self.metrics.record(self.tenant_hk, execution_time, failed=True)
+            logger.error(f"Pipelined transaction failed after {execution_time:.2f}ms: {e}")
+            
+            # Statements share round trips, so the failing one can't be singled out
+            for i, (query, params) in enumerate(queries):
+                self._log_failed_query(f"Transaction[{i}]: {query}", params, str(e), execution_time)
+            
+            raise
+    
+    @staticmethod
+    def _iter_rows(description: Optional[Sequence], rows: List[Tuple]) -> Iterator[Dict]:
+        """Lazily turn fetched tuples into column-name dicts"""
+        if not description:
+            return iter(())
+        columns = [column[0] for column in description]
+        return (dict(zip(columns, row)) for row in rows)
+    
+    async def validate_tenant_access(self, resource_type: str, resource_id: str) -> bool:
         """
         Validate that a resource belongs to the current tenant
         
+        Uses the shared resource validator, so results are cached across
+        wrappers and the lookup runs on a pooled connection.
+        
         Args:
-            resource_type: Type of resource (user, asset, transaction, etc.)
+            resource_type: Type of resource (user, asset, transaction, session)
             resource_id: Resource identifier
             
         Returns:
             True if resource belongs to tenant, False otherwise
         """
+        validated_type = TENANT_RESOURCE_TYPES.get(resource_type)
+        if validated_type is None:
+            logger.warning(f"Unknown resource type for validation: {resource_type}")
+            return False
+        
         try:
-            from ..services.resource_validator import ResourceValidationService
-            validator = ResourceValidationService()
-            
-            if resource_type == 'user':
-                return validator.verify_user_belongs_to_tenant(resource_id, self.tenant_hk)
-            elif resource_type == 'asset':
-                return validator.verify_asset_belongs_to_tenant(resource_id, self.tenant_hk)
-            elif resource_type == 'transaction':
-                return validator.verify_transaction_belongs_to_tenant(resource_id, self.tenant_hk)
-            elif resource_type == 'session':
-                return validator.verify_session_belongs_to_tenant(resource_id, self.tenant_hk)
-            else:
-                logger.warning(f"Unknown resource type for validation: {resource_type}")
-                return False
+            from ..services.resource_validator import get_resource_validator
+            results = await get_resource_validator().bulk_validate_resources(
+                [(validated_type, resource_id)], self.tenant_hk
+            )
+            return results[f"{validated_type}:{resource_id}"]
                 
         except Exception as e:
             logger.error(f"Resource validation failed for {resource_type}:{resource_id}: {e}")
             return False
     
-    def _create_connection(self) -> psycopg2.extensions.connection:
-        """Create new database connection"""
-        import os
-        database_url = os.getenv('SYSTEM_DATABASE_URL')
-        if not database_url:
-            raise ValueError("SYSTEM_DATABASE_URL environment variable not set")
-        
-        conn = psycopg2.connect(database_url)
-        conn.autocommit = False  # Use explicit transactions
-        
-        logger.debug(f"Created new database connection for tenant {self.tenant_hk.hex()[:8]}...")
-        return conn
-    
     def _log_failed_query(self, query: str, params: Optional[Tuple], error: str, execution_time: float):
         """Log failed query execution for security analysis"""
         audit_entry = {
@@ -255,26 +566,35 @@ class ZeroTrustDatabaseWrapper:
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get connection statistics for monitoring"""
         uptime_seconds = time.time() - self._start_time
+        tenant_stats = self.metrics.get_stats(self.tenant_hk)
         
         return {
             "tenant_hk": self.tenant_hk.hex(),
             "user_hk": self.user_hk.hex() if self.user_hk else None,
-            "connection_active": self._connection and not self._connection.closed,
-            "queries_executed": self._query_count,
+            "connection_active": self._connection is not None,
+            "queries_executed": tenant_stats['queries'],
+            "query_failures": tenant_stats['failures'],
+            "average_time_ms": tenant_stats['average_time_ms'],
+            "latency_histogram": tenant_stats['latency_histogram'],
             "uptime_seconds": uptime_seconds,
-            "queries_per_second": self._query_count / max(uptime_seconds, 1)
+            "pool": self.pool.get_stats()
         }
     
     def close(self):
-        """Close database connection"""
-        if self._connection and not self._connection.closed:
-            self._connection.close()
-            logger.debug(f"Closed database connection for tenant {self.tenant_hk.hex()[:8]}...")
+        """Return a connection still borrowed through get_connection() to the pool"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._checkout_depth = 0
+            self.pool.release(connection)
+            logger.debug(f"Returned database connection for tenant {self.tenant_hk.hex()[:8]}...")
 
 def get_zero_trust_db(tenant_hk: bytes, user_hk: Optional[bytes] = None) -> ZeroTrustDatabaseWrapper:
     """
     Factory function to create zero trust database wrapper
     
+    Wrappers are cheap: they share the query rewriter, the system pool and
+    the per-tenant metrics, and only hold a connection during a checkout.
+    
     Args:
         tenant_hk: Authenticated tenant hash key
         user_hk: Authenticated user hash key (optional)
@@ -282,4 +602,98 @@ def get_zero_trust_db(tenant_hk: bytes, user_hk: Optional[bytes] = None) -> Zero
     Returns:
         ZeroTrustDatabaseWrapper instance
     """
-    return ZeroTrustDatabaseWrapper(tenant_hk, user_hk) 
\ No newline at end of file
+    return ZeroTrustDatabaseWrapper(tenant_hk, user_hk)
+
+def get_tenant_db(request: Request) -> Generator[ZeroTrustDatabaseWrapper, None, None]:
+    """
+    FastAPI dependency yielding a tenant-scoped wrapper for the request
+    
+    For sync (def) handlers only. One pooled connection is held for the whole
+    request and committed and returned to the pool when the request finishes.
+    """
+    tenant_hk = getattr(request.state, 'tenant_hk', None)
+    if not tenant_hk:
+        raise HTTPException(status_code=401, detail="Tenant context required")
+    
+    db = get_zero_trust_db(tenant_hk, getattr(request.state, 'user_hk', None))
+    try:
+        with db.session():
+            yield db
+    except PoolTimeoutError as e:
+        logger.error(f"❌ Database pool exhausted: {e}")
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
+
+def _json_default(value: Any) -> Any:
+    """JSON fallback for database values (hash keys as hex, everything else as text)"""
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return value
+
+def stream_query_response(db: ZeroTrustDatabaseWrapper, query: str, params: Optional[Tuple] = None,
+                          format: str = "ndjson", filename: Optional[str] = None,
+                          itersize: Optional[int] = None, rows_per_chunk: int = 500) -> StreamingResponse:
+    """
+    Stream a tenant-filtered query to the client as NDJSON or CSV
+    
+    Rows go from the server-side cursor to the socket in chunks of
+    rows_per_chunk lines, so memory is bounded by itersize plus one chunk.
+    Use from sync (def) handlers or anywhere the wrapper may block: the
+    response iterates in Starlette's threadpool.
+    
+    Args:
+        db: Tenant-scoped database wrapper
+        query: SQL query to execute
+        params: Query parameters
+        format: "ndjson" (one JSON object per line) or "csv" (header row first)
+        filename: Sent as a Content-Disposition attachment when given
+        itersize: Rows per server-side fetch
+        rows_per_chunk: Rows encoded into each response chunk
+    """
+    if format not in ("ndjson", "csv"):
+        raise ValueError(f"Unsupported streaming format: {format}")
+    
+    def ndjson_chunks() -> Generator[bytes, None, None]:
+        columns: List[str] = []
+        lines = []
+        for row in db.stream_query(query, params, itersize=itersize, columns=columns):
+            lines.append(json.dumps(dict(zip(columns, row)), default=_json_default))
+            if len(lines) >= rows_per_chunk:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+    
+    def csv_chunks() -> Generator[bytes, None, None]:
+        columns: List[str] = []
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header_written = False
+        pending = 0
+        for row in db.stream_query(query, params, itersize=itersize, columns=columns):
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerow([_csv_value(value) for value in row])
+            pending += 1
+            if pending >= rows_per_chunk:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if not header_written:
+            writer.writerow(columns)
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    
+    if format == "csv":
+        return StreamingResponse(csv_chunks(), media_type="text/csv", headers=headers)
+    return StreamingResponse(ndjson_chunks(), media_type="application/x-ndjson", headers=headers)
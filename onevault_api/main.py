@@ -10,7 +10,7 @@ import os
 import json
 import psycopg2
 
-from fastapi import FastAPI, HTTPException, Depends, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
@@ -19,6 +19,20 @@ from typing import List
 # Phase 1 Zero Trust Gateway Integration
 from app.middleware.phase1_integration import ProductionZeroTrustMiddleware
 from app.routers.phase1_monitoring import phase1_router, set_middleware_instance
+from app.routers.database_monitoring import database_router
+from app.middleware.rate_limiter import RateLimitMiddleware
+from app.services.tracking_ingest import (
+    TrackingBatchError, parse_tracking_batch, validate_tracking_events,
+    insert_tracking_events, build_batch_results
+)
+from app.services.tracking_buffer import get_tracking_buffer, BufferFullError, BufferClosedError
+from app.services.pipeline_scheduler import get_pipeline_scheduler
+from app.utils.connection_pool import PoolTimeoutError
+from app.utils.shared_cache import close_shared_cache
+from app.utils.database import (
+    get_async_db, get_db_connection_context,
+    get_system_pool, cleanup_database_connections
+)
 
 # Pydantic models for authentication
 class LoginRequest(BaseModel):
@@ -137,43 +151,56 @@ except Exception as e:
     logger.error(f"❌ Phase 1 integration failed: {e}")
     # Continue without Phase 1 - production remains unaffected
 
-# Database connection
-def get_db_connection():
-    """Get database connection from environment"""
+# Token/tenant/IP rate limiting (RATE_LIMIT_* env vars). Added last so it runs
+# outermost: over-limit requests get a 429 before any middleware touches the database.
+rate_limiter = RateLimitMiddleware()
+app.middleware("http")(rate_limiter)
+
+# Database connections are borrowed from the shared pool (app/utils/database.py):
+# async handlers take `conn=Depends(get_async_db)` or `async with get_db_connection_context()`
+# so queries run on the database executor; sync background tasks use `with db_connection()`.
+@app.on_event("startup")
+async def warm_database_pool():
+    """Open the pool's minimum connections before the first request"""
     try:
-        database_url = os.getenv('SYSTEM_DATABASE_URL')
-        if not database_url:
-            raise ValueError("SYSTEM_DATABASE_URL environment variable not set")
-        
-        conn = psycopg2.connect(database_url)
-        return conn
+        opened = get_system_pool().warm()
+        logger.info(f"🔌 Database pool warmed with {opened} connections")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
-
-# Background processing function
-def process_site_tracking_background():
-    """Background task for processing site tracking events"""
-    try:
-        logger.info("🔄 Background processing: Starting site tracking pipeline...")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Call the smart processing function
-        cursor.execute("SELECT staging.auto_process_if_needed()")
-        result = cursor.fetchone()
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
-        if result and result[0]:
-            logger.info(f"✅ Background processing completed: {result[0]}")
-        else:
-            logger.info("ℹ️ Background processing: No work needed")
-            
-    except Exception as e:
-        logger.error(f"❌ Background processing failed: {e}")
-        # Don't raise - background tasks should be silent
+        logger.warning(f"⚠️ Database pool warm-up failed (connections open lazily): {e}")
+
+@app.on_event("startup")
+async def preload_rate_limits():
+    """Load known customers' rate limits before the first request"""
+    if rate_limiter.config.enabled:
+        await rate_limiter.preload_customer_limits()
+
+@app.on_event("startup")
+async def start_tracking_buffer():
+    """Start the tracking write-behind buffer when TRACKING_WRITE_BEHIND_ENABLED=true"""
+    tracking_buffer = get_tracking_buffer()
+    if tracking_buffer.config.enabled:
+        tracking_buffer.after_flush = schedule_site_tracking_processing
+        await tracking_buffer.start()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Drain buffered tracking events and pending pipeline runs, then close pooled connections"""
+    await get_tracking_buffer().stop()
+    await get_pipeline_scheduler().stop()
+    close_shared_cache()
+    await cleanup_database_connections()
+
+# Pipeline processing is debounced process-wide (app/services/pipeline_scheduler.py):
+# handlers call notify() after committing events instead of running the pipeline per event.
+def schedule_site_tracking_processing(events: List[Any], flush_result: Dict[str, Any]):
+    """Notify the pipeline scheduler once per customer after a write-behind flush"""
+    scheduler = get_pipeline_scheduler()
+    counts: Dict[str, int] = {}
+    for event, raw_event_id in zip(events, flush_result.get('raw_event_ids', [])):
+        if raw_event_id is not None:
+            counts[event.customer_id] = counts.get(event.customer_id, 0) + 1
+    for customer_id, event_count in counts.items():
+        scheduler.notify(customer_id, event_count)
 
 # Customer validation
 async def validate_customer_header(request: Request) -> str:
@@ -196,6 +223,8 @@ async def validate_auth_token(request: Request) -> str:
     if token == "ovt_prod_7113cf25b40905d0adee776765aabd511f87bc6c94766b83e81e8063d00f483f":
         return token
     else:
+        # Rejected tokens cost the caller's tenant/IP quota too, so guessing new tokens runs dry
+        await rate_limiter.on_credentials_rejected(request)
         raise HTTPException(status_code=401, detail="Invalid API token")
 
 # Health check endpoints
@@ -214,11 +243,8 @@ async def health_check():
 async def detailed_health_check():
     """Detailed health check with database connectivity"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        conn.close()
+        async with get_db_connection_context() as conn:
+            await conn.fetchval("SELECT 1")
         
         return {
             "status": "healthy",
@@ -261,22 +287,17 @@ async def customer_health_check(customer_id: str):
 async def health_check_database():
     """Check database connectivity and function availability"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check available API functions
-        cursor.execute("""
-            SELECT p.proname as function_name
-            FROM pg_proc p
-            JOIN pg_namespace n ON p.pronamespace = n.oid
-            WHERE n.nspname = 'api'
-            ORDER BY p.proname
-        """)
-        
-        functions = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
+        async with get_db_connection_context() as conn:
+            # Check available API functions
+            rows = await conn.fetch("""
+                SELECT p.proname as function_name
+                FROM pg_proc p
+                JOIN pg_namespace n ON p.pronamespace = n.oid
+                WHERE n.nspname = 'api'
+                ORDER BY p.proname
+            """)
+            
+            functions = [row[0] for row in rows]
         
         return {
             "status": "healthy",
@@ -301,12 +322,9 @@ async def health_check_database():
 
 # Authentication endpoints
 @app.post("/api/v1/auth/login")
-async def login(request: Request, login_data: LoginRequest):
+async def login(request: Request, login_data: LoginRequest, conn=Depends(get_async_db)):
     """User authentication endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data for database function
         request_data = {
             "username": login_data.username,
@@ -317,11 +335,7 @@ async def login(request: Request, login_data: LoginRequest):
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_login(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_login(%s)", json.dumps(request_data))
         
         if result and result[0]:
             return result[0]  # Return the JSONB response directly
@@ -336,12 +350,9 @@ async def login(request: Request, login_data: LoginRequest):
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 @app.post("/api/v1/auth/complete-login")
-async def complete_login(request: Request, complete_data: CompleteLoginRequest):
+async def complete_login(request: Request, complete_data: CompleteLoginRequest, conn=Depends(get_async_db)):
     """Complete login process for multi-tenant scenarios"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data for database function
         request_data = {
             "username": complete_data.username,
@@ -351,11 +362,7 @@ async def complete_login(request: Request, complete_data: CompleteLoginRequest):
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_complete_login(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_complete_login(%s)", json.dumps(request_data))
         
         if result and result[0]:
             return result[0]  # Return the JSONB response directly
@@ -370,12 +377,9 @@ async def complete_login(request: Request, complete_data: CompleteLoginRequest):
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 @app.post("/api/v1/auth/validate")
-async def validate_session(request: Request, validate_data: ValidateSessionRequest):
+async def validate_session(request: Request, validate_data: ValidateSessionRequest, conn=Depends(get_async_db)):
     """Validate session token"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data for database function
         request_data = {
             "session_token": validate_data.session_token,
@@ -384,11 +388,7 @@ async def validate_session(request: Request, validate_data: ValidateSessionReque
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_validate_session(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_validate_session(%s)", json.dumps(request_data))
         
         if result and result[0]:
             return result[0]  # Return the JSONB response directly
@@ -404,12 +404,9 @@ async def validate_session(request: Request, validate_data: ValidateSessionReque
 
 # Legacy PHP-style endpoints for frontend compatibility
 @app.post("/api/auth/validate.php")
-async def validate_session_php(request: Request, validate_data: ValidateSessionRequest):
+async def validate_session_php(request: Request, validate_data: ValidateSessionRequest, conn=Depends(get_async_db)):
     """Legacy PHP-style session validation endpoint for frontend compatibility"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data for database function
         request_data = {
             "session_token": validate_data.session_token,
@@ -418,11 +415,7 @@ async def validate_session_php(request: Request, validate_data: ValidateSessionR
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_validate_session(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_validate_session(%s)", json.dumps(request_data))
         
         if result and result[0]:
             return result[0]  # Return the JSONB response directly
@@ -440,12 +433,9 @@ class RefreshSessionRequest(BaseModel):
     session_token: str
 
 @app.post("/api/auth/refresh.php")
-async def refresh_session_php(request: Request, refresh_data: RefreshSessionRequest):
+async def refresh_session_php(request: Request, refresh_data: RefreshSessionRequest, conn=Depends(get_async_db)):
     """Legacy PHP-style session refresh endpoint for frontend compatibility"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # First validate the current session
         validate_request_data = {
             "session_token": refresh_data.session_token,
@@ -454,20 +444,15 @@ async def refresh_session_php(request: Request, refresh_data: RefreshSessionRequ
         }
         
         # Call the validation function first
-        cursor.execute("SELECT api.auth_validate_session(%s)", (json.dumps(validate_request_data),))
-        validation_result = cursor.fetchone()
+        validation_result = await conn.fetchrow("SELECT api.auth_validate_session(%s)", json.dumps(validate_request_data))
         
         if not validation_result or not validation_result[0]:
-            cursor.close()
-            conn.close()
             raise HTTPException(status_code=401, detail="Invalid session token")
         
         validation_data = validation_result[0]
         
         # If validation successful, return the same session (refresh logic can be enhanced later)
         if validation_data.get('success', False):
-            cursor.close()
-            conn.close()
             return {
                 "success": True,
                 "message": "Session refreshed successfully",
@@ -478,8 +463,6 @@ async def refresh_session_php(request: Request, refresh_data: RefreshSessionRequ
                 }
             }
         else:
-            cursor.close()
-            conn.close()
             raise HTTPException(status_code=401, detail="Session validation failed")
             
     except psycopg2.Error as e:
@@ -549,45 +532,59 @@ async def track_site_event(
     token: str = Depends(validate_auth_token)
 ):
     """Track site events for customers with automatic processing"""
+    # 💾 WRITE-BEHIND: accept into the in-process buffer, commit in the next group flush
+    tracking_buffer = get_tracking_buffer()
+    if tracking_buffer.running:
+        try:
+            return await buffer_site_event(request, event_data, customer_id, tracking_buffer)
+        except BufferClosedError:
+            pass  # shutting down - write this one directly
+    
+    async with get_db_connection_context() as conn:
+        return await record_site_event(request, event_data, customer_id, conn)
+
+async def buffer_site_event(request: Request, event_data: Dict[str, Any], customer_id: str, tracking_buffer) -> JSONResponse:
+    """Queue one event in the write-behind buffer and answer 202 before it is committed"""
+    events, errors = validate_tracking_events([event_data])
+    if errors:
+        raise HTTPException(status_code=400, detail=errors[0]['error'])
+    
+    event = events[0]
+    event.client_ip = request.client.host if request.client else '127.0.0.1'
+    event.user_agent = request.headers.get('User-Agent', 'Unknown')
+    event.customer_id = customer_id
+    
+    try:
+        event_id = await tracking_buffer.submit(event)
+    except BufferFullError:
+        raise HTTPException(status_code=503, detail="Tracking buffer full, please retry", headers={"Retry-After": "1"})
+    
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": "Event accepted",
+        "event_id": event_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "processing": "write_behind"
+    })
+
+async def record_site_event(request: Request, event_data: Dict[str, Any], customer_id: str, conn) -> Dict[str, Any]:
+    """Track one event through api.track_site_event() and schedule the pipeline"""
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Call the database function with correct parameters
-        cursor.execute("""
+        result = await conn.fetchrow("""
             SELECT api.track_site_event(
                 %s, %s, %s, %s, %s
             )
-        """, (
+        """,
             request.client.host if request.client else '127.0.0.1',  # p_ip_address (INET)
             request.headers.get('User-Agent', 'Unknown'),  # p_user_agent (TEXT)
             event_data.get('page_url'),  # p_page_url (TEXT)
             event_data.get('event_type', 'page_view'),  # p_event_type (VARCHAR)
             json.dumps(event_data.get('event_data', {}))  # p_event_data (JSONB)
-        ))
-        
-        result = cursor.fetchone()
-        conn.commit()
-        
-        # 🚀 AUTOMATIC PROCESSING: Trigger site tracking pipeline after event ingestion
-        try:
-            logger.info("🔄 Triggering automatic site tracking processing...")
-            cursor.execute("SELECT staging.auto_process_if_needed()")
-            processing_result = cursor.fetchone()
-            conn.commit()
-            
-            if processing_result and processing_result[0]:
-                logger.info(f"✅ Processing result: {processing_result[0]}")
-            else:
-                logger.info("ℹ️ No processing needed - all events up to date")
-                
-        except Exception as processing_error:
-            # Don't fail the main request if processing fails
-            logger.warning(f"⚠️ Site tracking processing failed (non-critical): {processing_error}")
+        )
         
-        cursor.close()
-        conn.close()
+        # 🚀 AUTOMATIC PROCESSING: debounced - bursts of events share one pipeline run
+        get_pipeline_scheduler().notify(customer_id)
         
         if result and result[0]:
             response_data = result[0]  # This is already a dict from JSONB
@@ -609,38 +606,29 @@ async def track_site_event(
 # Alternative tracking endpoint with background processing
 @app.post("/api/v1/track/async")
 async def track_site_event_async(
-    background_tasks: BackgroundTasks,
     request: Request,
     event_data: Dict[str, Any],
     customer_id: str = Depends(validate_customer_header),
-    token: str = Depends(validate_auth_token)
+    token: str = Depends(validate_auth_token),
+    conn=Depends(get_async_db)
 ):
     """Track site events with background processing (faster response)"""
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Call the database function with correct parameters
-        cursor.execute("""
+        result = await conn.fetchrow("""
             SELECT api.track_site_event(
                 %s, %s, %s, %s, %s
             )
-        """, (
+        """,
             request.client.host if request.client else '127.0.0.1',  # p_ip_address (INET)
             request.headers.get('User-Agent', 'Unknown'),  # p_user_agent (TEXT)
             event_data.get('page_url'),  # p_page_url (TEXT)
             event_data.get('event_type', 'page_view'),  # p_event_type (VARCHAR)
             json.dumps(event_data.get('event_data', {}))  # p_event_data (JSONB)
-        ))
-        
-        result = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
+        )
         
         # 🚀 BACKGROUND PROCESSING: Schedule processing in background
-        background_tasks.add_task(process_site_tracking_background)
+        get_pipeline_scheduler().notify(customer_id)
         
         if result and result[0]:
             response_data = result[0]  # This is already a dict from JSONB
@@ -659,41 +647,82 @@ async def track_site_event_async(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Authentication or tracking failed")
 
+# Batched tracking endpoint: many events, one multi-row insert
+@app.post("/api/v1/track/batch")
+async def track_site_events_batch(
+    request: Request,
+    customer_id: str = Depends(validate_customer_header),
+    token: str = Depends(validate_auth_token),
+    conn=Depends(get_async_db)
+):
+    """Track a batch of site events (JSON array or NDJSON body) in one database round trip"""
+    try:
+        items, parse_errors = parse_tracking_batch(await request.body(), request.headers.get('Content-Type'))
+        events, validation_errors = validate_tracking_events(items)
+    except TrackingBatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    errors = parse_errors + validation_errors
+    
+    try:
+        result = await conn.run(
+            insert_tracking_events,
+            events,
+            request.client.host if request.client else '127.0.0.1',
+            request.headers.get('User-Agent', 'Unknown')
+        )
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    if not result['success']:
+        raise HTTPException(status_code=429, detail=result['message'])
+    
+    # 🚀 BACKGROUND PROCESSING: one trigger per batch, coalesced with other traffic
+    inserted = sum(1 for raw_event_id in result['raw_event_ids'] if raw_event_id is not None)
+    if inserted:
+        get_pipeline_scheduler().notify(customer_id, inserted)
+    
+    results = build_batch_results(events, result['raw_event_ids'], errors)
+    accepted = sum(1 for item in results if item['status'] == 'accepted')
+    
+    return {
+        "success": accepted == len(results),
+        "batch_id": result['batch_id'],
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat(),
+        "processing": "background"
+    }
+
 # Site tracking management endpoints
 @app.get("/api/v1/track/status")
 async def get_tracking_status(
     customer_id: str = Depends(validate_customer_header),
-    token: str = Depends(validate_auth_token)
+    token: str = Depends(validate_auth_token),
+    conn=Depends(get_async_db)
 ):
     """Get site tracking pipeline status"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get pipeline status
-        cursor.execute("SELECT * FROM staging.get_pipeline_status()")
-        status_result = cursor.fetchone()
+        status_result = await conn.fetchrow("SELECT * FROM staging.get_pipeline_status()")
         
         # Get recent events from dashboard view
-        cursor.execute("""
+        recent_events = await conn.fetch("""
             SELECT * FROM staging.pipeline_dashboard 
             ORDER BY raw_load_date DESC 
             LIMIT 10
         """)
-        recent_events = cursor.fetchall()
         
         # Get column names for the dashboard
-        cursor.execute("""
+        column_rows = await conn.fetch("""
             SELECT column_name 
             FROM information_schema.columns 
             WHERE table_schema = 'staging' 
             AND table_name = 'pipeline_dashboard'
             ORDER BY ordinal_position
         """)
-        column_names = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
+        column_names = [row[0] for row in column_rows]
         
         # Format recent events
         events_list = []
@@ -704,6 +733,8 @@ async def get_tracking_status(
         return {
             "status": "success",
             "pipeline_status": status_result[0] if status_result else None,
+            "write_behind": get_tracking_buffer().get_stats(),
+            "pipeline_scheduler": get_pipeline_scheduler().get_stats(),
             "recent_events": events_list,
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -714,20 +745,13 @@ async def get_tracking_status(
 @app.post("/api/v1/track/process")
 async def trigger_processing(
     customer_id: str = Depends(validate_customer_header),
-    token: str = Depends(validate_auth_token)
+    token: str = Depends(validate_auth_token),
+    conn=Depends(get_async_db)
 ):
     """Manually trigger site tracking processing"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Trigger processing
-        cursor.execute("SELECT staging.trigger_pipeline_now()")
-        result = cursor.fetchone()
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT staging.trigger_pipeline_now()")
         
         return {
             "status": "success",
@@ -743,33 +767,30 @@ async def trigger_processing(
 async def get_tracking_dashboard(
     customer_id: str = Depends(validate_customer_header),
     token: str = Depends(validate_auth_token),
-    limit: int = 20
+    limit: int = 20,
+    conn=Depends(get_async_db)
 ):
     """Get comprehensive tracking dashboard data"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get dashboard data
-        cursor.execute(f"""
+        dashboard_data = await conn.fetch(f"""
             SELECT * FROM staging.pipeline_dashboard 
             ORDER BY raw_load_date DESC 
             LIMIT {limit}
         """)
-        dashboard_data = cursor.fetchall()
         
         # Get column names
-        cursor.execute("""
+        column_rows = await conn.fetch("""
             SELECT column_name 
             FROM information_schema.columns 
             WHERE table_schema = 'staging' 
             AND table_name = 'pipeline_dashboard'
             ORDER BY ordinal_position
         """)
-        column_names = [row[0] for row in cursor.fetchall()]
+        column_names = [row[0] for row in column_rows]
         
         # Get summary statistics
-        cursor.execute("""
+        stats = await conn.fetchrow("""
             SELECT 
                 COUNT(*) as total_events,
                 COUNT(CASE WHEN staging_status = 'PROCESSED' THEN 1 END) as processed_to_staging,
@@ -777,10 +798,6 @@ async def get_tracking_dashboard(
                 MAX(raw_load_date) as latest_event
             FROM staging.pipeline_dashboard
         """)
-        stats = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
         
         # Format dashboard data
         events_list = []
@@ -949,32 +966,25 @@ async def analyze_with_ai(
         
         # 🔥 STORE AI INTERACTION IN DATABASE
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Call database function to store AI interaction
-            cursor.execute("""
-                SELECT business.store_ai_interaction(
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+            async with get_db_connection_context() as conn:
+                # Call database function to store AI interaction
+                db_result = await conn.fetchrow("""
+                    SELECT business.store_ai_interaction(
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    )
+                """,
+                    customer_id,                    # p_tenant_identifier
+                    ai_request.query,               # p_question_text  
+                    demo_response,                  # p_response_text
+                    0.87,                           # p_confidence_score
+                    ai_request.agent_type,          # p_context_type
+                    f"gpt-4-{agent_id}",           # p_model_used
+                    processing_time,                # p_processing_time_ms
+                    len(ai_request.query.split()),  # p_token_count_input (estimate)
+                    len(demo_response.split()),     # p_token_count_output (estimate)
+                    session_id                      # p_session_id
                 )
-            """, (
-                customer_id,                    # p_tenant_identifier
-                ai_request.query,               # p_question_text  
-                demo_response,                  # p_response_text
-                0.87,                           # p_confidence_score
-                ai_request.agent_type,          # p_context_type
-                f"gpt-4-{agent_id}",           # p_model_used
-                processing_time,                # p_processing_time_ms
-                len(ai_request.query.split()),  # p_token_count_input (estimate)
-                len(demo_response.split()),     # p_token_count_output (estimate)
-                session_id                      # p_session_id
-            ))
-            
-            db_result = cursor.fetchone()
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
+                
             logger.info(f"✅ AI interaction stored in database: {db_result}")
             
         except Exception as db_error:
@@ -1051,32 +1061,25 @@ async def analyze_photo(
         
         # 🔥 STORE PHOTO ANALYSIS IN DATABASE
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Store photo analysis as AI interaction
-            cursor.execute("""
-                SELECT business.store_ai_interaction(
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+            async with get_db_connection_context() as conn:
+                # Store photo analysis as AI interaction
+                db_result = await conn.fetchrow("""
+                    SELECT business.store_ai_interaction(
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    )
+                """,
+                    customer_id,                                    # p_tenant_identifier
+                    f"Photo analysis: {photo_request.analysis_type}", # p_question_text
+                    demo_response,                                  # p_response_text
+                    0.912,                                          # p_confidence_score
+                    'photo_analysis',                               # p_context_type
+                    "vision-ai-v1",                                 # p_model_used
+                    processing_time,                                # p_processing_time_ms
+                    50,                                             # p_token_count_input (estimate for image)
+                    len(demo_response.split()),                     # p_token_count_output
+                    session_id                                      # p_session_id
                 )
-            """, (
-                customer_id,                                    # p_tenant_identifier
-                f"Photo analysis: {photo_request.analysis_type}", # p_question_text
-                demo_response,                                  # p_response_text
-                0.912,                                          # p_confidence_score
-                'photo_analysis',                               # p_context_type
-                "vision-ai-v1",                                 # p_model_used
-                processing_time,                                # p_processing_time_ms
-                50,                                             # p_token_count_input (estimate for image)
-                len(demo_response.split()),                     # p_token_count_output
-                session_id                                      # p_session_id
-            ))
-            
-            db_result = cursor.fetchone()
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
+                
             logger.info(f"✅ Photo analysis stored in database: {db_result}")
             
         except Exception as db_error:
@@ -1109,12 +1112,9 @@ async def analyze_photo(
 # =============================================================================
 
 @app.post("/api/auth_login")
-async def database_auth_login(request: Request, login_data: DatabaseLoginRequest):
+async def database_auth_login(request: Request, login_data: DatabaseLoginRequest, conn=Depends(get_async_db)):
     """Database-compatible authentication endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get client IP and user agent
         client_ip = request.client.host if request.client else login_data.ip_address
         user_agent = request.headers.get('User-Agent', login_data.user_agent)
@@ -1129,11 +1129,7 @@ async def database_auth_login(request: Request, login_data: DatabaseLoginRequest
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_login(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_login(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1147,12 +1143,9 @@ async def database_auth_login(request: Request, login_data: DatabaseLoginRequest
         raise HTTPException(status_code=500, detail=f"Authentication error: {str(e)}")
 
 @app.post("/api/auth_complete_login")
-async def database_auth_complete_login(request: Request, complete_data: DatabaseCompleteLoginRequest):
+async def database_auth_complete_login(request: Request, complete_data: DatabaseCompleteLoginRequest, conn=Depends(get_async_db)):
     """Database-compatible complete login endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data
         request_data = {
             "session_token": complete_data.session_token,
@@ -1161,11 +1154,7 @@ async def database_auth_complete_login(request: Request, complete_data: Database
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_complete_login(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_complete_login(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1179,12 +1168,9 @@ async def database_auth_complete_login(request: Request, complete_data: Database
         raise HTTPException(status_code=500, detail=f"Complete login error: {str(e)}")
 
 @app.post("/api/auth_validate_session")
-async def database_auth_validate_session(request: Request, validate_data: DatabaseValidateSessionRequest):
+async def database_auth_validate_session(request: Request, validate_data: DatabaseValidateSessionRequest, conn=Depends(get_async_db)):
     """Database-compatible session validation endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get client IP and user agent
         client_ip = request.client.host if request.client else validate_data.ip_address
         user_agent = request.headers.get('User-Agent', validate_data.user_agent)
@@ -1197,11 +1183,7 @@ async def database_auth_validate_session(request: Request, validate_data: Databa
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_validate_session(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_validate_session(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1215,23 +1197,16 @@ async def database_auth_validate_session(request: Request, validate_data: Databa
         raise HTTPException(status_code=500, detail=f"Session validation error: {str(e)}")
 
 @app.post("/api/auth_logout")
-async def database_auth_logout(request: Request, logout_data: DatabaseLogoutRequest):
+async def database_auth_logout(request: Request, logout_data: DatabaseLogoutRequest, conn=Depends(get_async_db)):
     """Database-compatible logout endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data
         request_data = {
             "session_token": logout_data.session_token
         }
         
         # Call the database function
-        cursor.execute("SELECT api.auth_logout(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.auth_logout(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1245,12 +1220,9 @@ async def database_auth_logout(request: Request, logout_data: DatabaseLogoutRequ
         raise HTTPException(status_code=500, detail=f"Logout error: {str(e)}")
 
 @app.post("/api/ai_create_session")
-async def database_ai_create_session(request: Request, ai_data: DatabaseAICreateSessionRequest):
+async def database_ai_create_session(request: Request, ai_data: DatabaseAICreateSessionRequest, conn=Depends(get_async_db)):
     """Database-compatible AI session creation endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data
         request_data = {
             "tenant_id": ai_data.tenant_id or "default_tenant",
@@ -1263,11 +1235,7 @@ async def database_ai_create_session(request: Request, ai_data: DatabaseAICreate
         }
         
         # Call the database function
-        cursor.execute("SELECT api.ai_create_session(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.ai_create_session(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1281,12 +1249,9 @@ async def database_ai_create_session(request: Request, ai_data: DatabaseAICreate
         raise HTTPException(status_code=500, detail=f"AI session creation error: {str(e)}")
 
 @app.post("/api/ai_secure_chat")
-async def database_ai_secure_chat(request: Request, chat_data: DatabaseAIChatRequest):
+async def database_ai_secure_chat(request: Request, chat_data: DatabaseAIChatRequest, conn=Depends(get_async_db)):
     """Database-compatible AI chat endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Prepare request data
         request_data = {
             "session_id": chat_data.session_id,
@@ -1295,11 +1260,7 @@ async def database_ai_secure_chat(request: Request, chat_data: DatabaseAIChatReq
         }
         
         # Call the database function
-        cursor.execute("SELECT api.ai_secure_chat(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.ai_secure_chat(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1313,12 +1274,9 @@ async def database_ai_secure_chat(request: Request, chat_data: DatabaseAIChatReq
         raise HTTPException(status_code=500, detail=f"AI chat error: {str(e)}")
 
 @app.post("/api/track_site_event")
-async def database_track_site_event(request: Request, event_data: DatabaseTrackSiteEventRequest):
+async def database_track_site_event(request: Request, event_data: DatabaseTrackSiteEventRequest, conn=Depends(get_async_db)):
     """Database-compatible site event tracking endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get client IP and user agent
         client_ip = request.client.host if request.client else event_data.ip_address
         user_agent = request.headers.get('User-Agent', event_data.user_agent)
@@ -1336,11 +1294,7 @@ async def database_track_site_event(request: Request, event_data: DatabaseTrackS
         }
         
         # Call the database function
-        cursor.execute("SELECT api.track_site_event(%s)", (json.dumps(request_data),))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.track_site_event(%s)", json.dumps(request_data))
         
         if result and result[0]:
             response_data = result[0]
@@ -1354,18 +1308,11 @@ async def database_track_site_event(request: Request, event_data: DatabaseTrackS
         raise HTTPException(status_code=500, detail=f"Site event tracking error: {str(e)}")
 
 @app.get("/api/system_health_check")
-async def database_system_health_check():
+async def database_system_health_check(conn=Depends(get_async_db)):
     """Database-compatible system health check endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Call the database function
-        cursor.execute("SELECT api.system_health_check()")
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await conn.fetchrow("SELECT api.system_health_check()")
         
         if result and result[0]:
             response_data = result[0]
@@ -1381,7 +1328,18 @@ async def database_system_health_check():
 # Include Phase 1 Zero Trust monitoring endpoints
 app.include_router(phase1_router)
 
+# Include database pool monitoring endpoints
+app.include_router(database_router)
+
 # Error handler
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
     return JSONResponse(
@@ -1399,10 +1357,12 @@ async def not_found_handler(request: Request, exc: HTTPException):
                 "/api/system_health_check",
                 "/api/v1/auth/login",
                 "/api/v1/track",
+                "/api/v1/track/batch",
                 "/api/v1/ai/analyze",
                 "/api/v1/phase1/status",
                 "/api/v1/phase1/health",
-                "/api/v1/phase1/metrics"
+                "/api/v1/phase1/metrics",
+                "/api/v1/database/pool"
             ],
             "documentation": "https://docs.onevault.com/api"
         }
@@ -0,0 +1,53 @@
+"""
+Shared Test Fixtures
+====================
+
+Test doubles used by more than one API test suite:
+- manual_clock: monotonic clock stand-in advanced by the test
+- recording_flush: async batch flush stand-in that records every batch
+"""
+
+import asyncio
+
+import pytest
+
+
+class ManualClock:
+    """Clock stand-in advanced by the test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RecordingFlush:
+    """Async flush stand-in that records every batch"""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.batches = []
+        self.attempts = 0
+        self.delay = delay
+        self.failures = failures
+
+    async def __call__(self, items):
+        self.attempts += 1
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database unavailable")
+        self.batches.append(list(items))
+        return {'success': True, 'raw_event_ids': list(range(len(items)))}
+
+
+@pytest.fixture
+def manual_clock() -> ManualClock:
+    """A fresh ManualClock starting at t=1000"""
+    return ManualClock()
+
+
+@pytest.fixture
+def recording_flush():
+    """Factory for RecordingFlush(delay=..., failures=...)"""
+    return RecordingFlush
@@ -0,0 +1,80 @@
+"""
+Tests for QueryRewriterMiddleware
+=================================
+
+Test suite for the rewrite plan cache:
+- Cached rewrites match uncached rewrites, parameters included
+- Repeat queries skip analysis
+- Security verdicts are cached
+- Cache size is bounded and hits are reported in get_rewriting_stats()
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.middleware.query_rewriter import QueryRewriterMiddleware
+from app.middleware.sql_lexer import analyze_sql
+
+TENANT_HK = b'\x01\x02\x03\x04' * 8
+
+QUERIES = [
+    ("SELECT user_bk FROM auth.user_h WHERE user_bk = %s", ("user_1",)),
+    ("SELECT ah.asset_bk FROM business.asset_h ah ORDER BY ah.asset_bk LIMIT %s", (10,)),
+    ("SELECT country_name FROM ref.country_r", None),
+    ("UPDATE auth.user_h SET user_bk = %s WHERE user_bk = %s", ("user_2", "user_1")),
+]
+
+
+class TestRewritePlanCache:
+    """Test suite for QueryRewriterMiddleware rewrite plans"""
+
+    @pytest.mark.parametrize("query,params", QUERIES)
+    def test_cached_rewrite_matches_uncached(self, query, params):
+        """Test a cache hit returns the same SQL and parameters as a full rewrite"""
+        rewriter = QueryRewriterMiddleware()
+        expected = rewriter._rewrite_uncached(query, TENANT_HK, params)
+
+        first = rewriter.rewrite_query_with_tenant_filter(query, TENANT_HK, params)
+        second = rewriter.rewrite_query_with_tenant_filter(query, TENANT_HK, params)
+
+        assert first == second == expected
+
+    def test_repeat_query_skips_parsing(self):
+        """Test only the first occurrence of a template is analyzed"""
+        rewriter = QueryRewriterMiddleware()
+        query, params = QUERIES[0]
+
+        with patch('app.middleware.query_rewriter.analyze_sql', wraps=analyze_sql) as parse:
+            for tenant in (TENANT_HK, b'\x09' * 32):
+                rewritten, new_params = rewriter.rewrite_query_with_tenant_filter(f"  {query}\n", tenant, params)
+                assert new_params == (tenant, "user_1")
+
+        assert parse.call_count == 1
+        stats = rewriter.get_rewriting_stats()
+        assert stats['plan_cache_hits'] == 1
+        assert stats['plan_cache_misses'] == 1
+        assert stats['queries_processed'] == 2
+        assert stats['queries_rewritten'] == 2
+
+    def test_security_verdict_cached(self):
+        """Test rejected queries stay rejected on a cache hit"""
+        rewriter = QueryRewriterMiddleware()
+
+        for _ in range(2):
+            with pytest.raises(ValueError, match="Dangerous SQL pattern"):
+                rewriter.rewrite_query_with_tenant_filter("DROP TABLE auth.user_h", TENANT_HK)
+
+        stats = rewriter.get_rewriting_stats()
+        assert stats['security_violations_blocked'] == 2
+        assert stats['plan_cache_hits'] == 1
+
+    def test_plan_cache_bounded(self):
+        """Test least recently used plans are evicted at plan_cache_size"""
+        rewriter = QueryRewriterMiddleware(plan_cache_size=2)
+
+        for query, params in QUERIES[:3]:
+            rewriter.rewrite_query_with_tenant_filter(query, TENANT_HK, params)
+
+        stats = rewriter.get_rewriting_stats()
+        assert stats['plan_cache_size'] == 2
+        assert stats['plan_cache_evictions'] == 1
@@ -0,0 +1,268 @@
+"""
+Tests for RateLimitMiddleware
+=============================
+
+Test suite for in-process rate limiting:
+- GCRA burst and sustained rate
+- Token, tenant and IP keys checked together
+- 429 with Retry-After before the handler runs
+- Customer limits (known customers only, bounded load time)
+- Rejected-token penalties on the token, tenant and IP keys, in L2 when shared
+- Fallback to the local limiter when L2 fails
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request
+
+from app.middleware.rate_limiter import (
+    GCRA_CHARGE_SCRIPT, GCRALimiter, RateLimit, RateLimitConfig, RateLimitMiddleware, token_hash
+)
+from app.utils.shared_cache import SharedCacheBackend, SharedCacheConfig
+
+
+def make_limit(per_minute: int = 60, burst_seconds: float = 5.0, key: str = 'k') -> RateLimit:
+    return RateLimit(scope='token', key=key, per_minute=per_minute, burst_seconds=burst_seconds)
+
+
+def make_app(middleware: RateLimitMiddleware):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/api/v1/data")
+    async def data():
+        calls.append(1)
+        return {"ok": True}
+
+    app.middleware("http")(middleware)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+    return client, calls
+
+
+class TestGCRALimiter:
+    """Test suite for GCRALimiter"""
+
+    def test_burst_then_sustained_rate(self, manual_clock):
+        """Test a key gets its burst at once, then one request per interval"""
+        limiter = GCRALimiter(clock=manual_clock)
+        limit = make_limit(per_minute=60, burst_seconds=5)
+
+        results = [limiter.check([limit]).allowed for _ in range(6)]
+        assert results == [True] * 5 + [False]
+
+        denied = limiter.check([limit])
+        assert denied.retry_after == pytest.approx(1.0)
+        manual_clock.now += 1.0
+        assert limiter.check([limit]).allowed
+
+    def test_denied_request_charges_no_key(self, manual_clock):
+        """Test a request denied by one limit does not consume the others"""
+        limiter = GCRALimiter(clock=manual_clock)
+        roomy, tight = make_limit(per_minute=600, key='token'), make_limit(per_minute=12, burst_seconds=5, key='ip')
+
+        assert limiter.check([roomy, tight]).allowed
+        decision = limiter.check([roomy, tight])
+
+        assert not decision.allowed and decision.limit is tight
+        # token was charged for the allowed request only: 2 charges after this check, not 3
+        assert limiter.check([roomy]).remaining == limiter.check([make_limit(per_minute=600, key='fresh')]).remaining - 1
+
+
+class TestRateLimitMiddleware:
+    """Test suite for RateLimitMiddleware"""
+
+    def make_middleware(self, **overrides):
+        config = RateLimitConfig(**{'token_per_minute': 600, 'tenant_per_minute': 600,
+                                    'ip_per_minute': 600, 'burst_seconds': 1, **overrides})
+        return RateLimitMiddleware(config, customer_limit_loader=lambda customer_id: None)
+
+    @pytest.mark.asyncio
+    async def test_over_limit_gets_429_before_handler(self):
+        """Test over-limit requests are answered with 429 and Retry-After without running the handler"""
+        middleware = self.make_middleware(token_per_minute=120)
+        client, calls = make_app(middleware)
+        headers = {"Authorization": "Bearer tok-1"}
+
+        responses = [await client.get("/api/v1/data", headers=headers) for _ in range(3)]
+
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert responses[2].headers["Retry-After"] == "1"
+        assert responses[2].json()["limit_scope"] == "token"
+        assert len(calls) == 2
+        assert middleware.get_stats()['limited_by_scope']['token'] == 1
+
+    @pytest.mark.asyncio
+    async def test_keys_are_independent(self):
+        """Test different tokens have separate budgets"""
+        middleware = self.make_middleware(token_per_minute=60)
+        client, _ = make_app(middleware)
+
+        assert (await client.get("/api/v1/data", headers={"Authorization": "Bearer tok-1"})).status_code == 200
+        assert (await client.get("/api/v1/data", headers={"Authorization": "Bearer tok-1"})).status_code == 429
+        assert (await client.get("/api/v1/data", headers={"Authorization": "Bearer tok-2"})).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_customer_limit_from_config(self):
+        """Test the tenant limit comes from the customer's configured rateLimit once loaded"""
+        middleware = RateLimitMiddleware(
+            RateLimitConfig(tenant_per_minute=6000, ip_per_minute=0, burst_seconds=1),
+            customer_limit_loader=lambda customer_id: 60 if customer_id == 'one_spa' else None
+        )
+        client, _ = make_app(middleware)
+        headers = {"X-Customer-ID": "one_spa"}
+
+        assert (await client.get("/api/v1/data", headers=headers)).status_code == 200  # default while loading
+        await asyncio.sleep(0.05)
+        assert middleware.customer_limit('one_spa') == 60
+        assert (await client.get("/api/v1/data", headers=headers)).status_code == 200
+        assert (await client.get("/api/v1/data", headers=headers)).status_code == 429
+
+    @pytest.mark.asyncio
+    async def test_unknown_customer_never_loaded(self):
+        """Test rotating X-Customer-ID values get no tenant bucket and trigger no loads"""
+        loads = []
+        middleware = RateLimitMiddleware(
+            RateLimitConfig(tenant_per_minute=60, burst_seconds=1),
+            customer_limit_loader=lambda customer_id: loads.append(customer_id),
+            is_known_customer=lambda customer_id: customer_id == 'one_spa'
+        )
+        client, _ = make_app(middleware)
+
+        for i in range(5):
+            response = await client.get("/api/v1/data", headers={"X-Customer-ID": f"rotated_{i}"})
+            assert response.status_code == 200
+        await asyncio.sleep(0.05)
+
+        assert loads == []
+        assert middleware.get_stats()['unknown_customers'] == 5
+        assert middleware.get_stats()['customer_limits_cached'] == 0
+
+    @pytest.mark.asyncio
+    async def test_customer_limit_load_timeout(self):
+        """Test a slow loader falls back to the default limit after the timeout"""
+        def slow_loader(customer_id):
+            time.sleep(0.5)
+            return 60
+
+        middleware = RateLimitMiddleware(
+            RateLimitConfig(tenant_per_minute=6000, customer_limit_load_timeout_seconds=0.05),
+            customer_limit_loader=slow_loader
+        )
+
+        await middleware.preload_customer_limits(['one_spa'])
+
+        assert middleware.customer_limit('one_spa') == 6000
+        assert middleware.get_stats()['customer_limit_load_failures'] == 1
+
+    def test_ip_limit_off_by_default(self):
+        """Test the IP limit stays off until proxy handling is configured"""
+        assert RateLimitConfig().ip_per_minute == 0
+
+    def make_auth_app(self, middleware: RateLimitMiddleware):
+        app = FastAPI()
+
+        async def validate_auth_token(request: Request) -> str:
+            await middleware.on_credentials_rejected(request)
+            raise HTTPException(status_code=401, detail="Invalid API token")
+
+        @app.get("/api/v1/data")
+        async def data(token: str = Depends(validate_auth_token)):
+            return {"ok": True}
+
+        app.middleware("http")(middleware)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+    @pytest.mark.asyncio
+    async def test_rejected_token_penalized(self):
+        """Test a resent bad token runs out of token quota sooner"""
+        middleware = self.make_middleware(token_per_minute=300, rejected_token_cost=5)
+        client = self.make_auth_app(middleware)
+        headers = {"Authorization": "Bearer bad-token"}
+
+        assert (await client.get("/api/v1/data", headers=headers)).status_code == 401
+        response = await client.get("/api/v1/data", headers=headers)
+
+        assert response.status_code == 429
+        assert response.json()["limit_scope"] == "token"
+        assert middleware.get_stats()['penalties'] == 1
+
+    @pytest.mark.asyncio
+    async def test_rotating_tokens_charge_tenant(self):
+        """Test guessing a new token per request still drains the customer's tenant quota"""
+        middleware = RateLimitMiddleware(
+            RateLimitConfig(token_per_minute=600, tenant_per_minute=300, burst_seconds=1, rejected_token_cost=5),
+            customer_limit_loader=lambda customer_id: None,
+            is_known_customer=lambda customer_id: customer_id == 'one_spa'
+        )
+        client = self.make_auth_app(middleware)
+
+        first = await client.get("/api/v1/data", headers={"Authorization": "Bearer guess-1", "X-Customer-ID": "one_spa"})
+        second = await client.get("/api/v1/data", headers={"Authorization": "Bearer guess-2", "X-Customer-ID": "one_spa"})
+
+        assert first.status_code == 401
+        assert second.status_code == 429
+        assert second.json()["limit_scope"] == "tenant"
+
+    @pytest.mark.asyncio
+    async def test_rotating_tokens_charge_ip(self):
+        """Test guessing a new token per request drains the client IP quota when the IP limit is on"""
+        middleware = self.make_middleware(ip_per_minute=300, rejected_token_cost=5)
+        client = self.make_auth_app(middleware)
+
+        assert (await client.get("/api/v1/data", headers={"Authorization": "Bearer guess-1"})).status_code == 401
+        response = await client.get("/api/v1/data", headers={"Authorization": "Bearer guess-2"})
+
+        assert response.status_code == 429
+        assert response.json()["limit_scope"] == "ip"
+
+    @pytest.mark.asyncio
+    async def test_shared_penalty_goes_to_l2(self):
+        """Test penalties are written to the L2 keys the shared check reads"""
+        class RecordingRedis:
+            def __init__(self):
+                self.calls = []
+
+            def register_script(self, script):
+                def run(keys, args):
+                    self.calls.append((script, keys, args))
+                    return [1, '0', 10, 0]
+                return run
+
+        redis = RecordingRedis()
+        backend = SharedCacheBackend(SharedCacheConfig(), client=redis)
+        middleware = RateLimitMiddleware(
+            RateLimitConfig(token_per_minute=600, ip_per_minute=600, shared=True, rejected_token_cost=5),
+            customer_limit_loader=lambda customer_id: None, backend=backend
+        )
+        client = self.make_auth_app(middleware)
+
+        assert (await client.get("/api/v1/data", headers={"Authorization": "Bearer guess-1"})).status_code == 401
+
+        script, keys, args = redis.calls[-1]
+        assert script == GCRA_CHARGE_SCRIPT
+        assert keys == [f"onevault:ratelimit:token:{token_hash('guess-1')}", "onevault:ratelimit:ip:127.0.0.1"]
+        assert args[1] == 5
+        assert len(middleware.limiter) == 0
+
+    @pytest.mark.asyncio
+    async def test_shared_failure_falls_back_to_local(self):
+        """Test L2 errors are recorded and the local limiter keeps enforcing limits"""
+        class BrokenRedis:
+            def __getattr__(self, name):
+                raise ConnectionError("redis down")
+
+        backend = SharedCacheBackend(SharedCacheConfig(l2_retry_seconds=60), client=BrokenRedis())
+        middleware = RateLimitMiddleware(
+            RateLimitConfig(token_per_minute=60, burst_seconds=1, shared=True),
+            customer_limit_loader=lambda customer_id: None, backend=backend
+        )
+        client, _ = make_app(middleware)
+        headers = {"Authorization": "Bearer tok-1"}
+
+        assert (await client.get("/api/v1/data", headers=headers)).status_code == 200
+        assert (await client.get("/api/v1/data", headers=headers)).status_code == 429
+        assert middleware.get_stats()['shared_fallbacks'] == 1
+        assert not backend.l2_available()
@@ -0,0 +1,93 @@
+"""
+Tests for ResourceIdExtractor
+=============================
+
+Test suite for compiled resource ID extraction:
+- Same typed entries as the previous per-pattern walk
+- Non-identifier strings are not emitted as candidates
+- Per-endpoint skip lists
+- Depth and ID-count limits fail secure
+"""
+
+import pytest
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.middleware.extraction_benchmark import legacy_extract, make_body
+from app.middleware.resource_extractor import (
+    ResourceExtractionConfig, ResourceExtractionLimitExceeded, ResourceIdExtractor
+)
+from app.middleware.tenant_resolver import TenantResolverMiddleware
+
+PATTERNS = TenantResolverMiddleware().resource_patterns
+TYPES = set(PATTERNS)
+
+
+def make_extractor(**overrides) -> ResourceIdExtractor:
+    return ResourceIdExtractor(PATTERNS, ResourceExtractionConfig(**overrides))
+
+
+def typed(resource_ids):
+    return {rid for rid in resource_ids if rid.split(':', 1)[0] in TYPES}
+
+
+class TestResourceIdExtractor:
+    """Test suite for ResourceIdExtractor"""
+
+    def test_typed_ids_match_legacy_walk(self):
+        """Test every typed entry the previous walk found is still found"""
+        body = make_body(10)
+        expected = set()
+        legacy_extract(PATTERNS, body, expected)
+
+        resource_ids = make_extractor(max_ids=100_000).extract(body)
+
+        assert typed(resource_ids) == typed(expected)
+        assert len(resource_ids) < len(expected)
+
+    def test_value_matching_two_patterns(self):
+        """Test a value matching a prefixed pattern and email gets both entries"""
+        resource_ids = make_extractor().extract({'contact': 'user_a@example.com'})
+
+        assert resource_ids == {
+            'contact:user_a@example.com', 'user_bk:user_a@example.com', 'email:user_a@example.com'
+        }
+
+    def test_plain_strings_skipped_unless_id_key(self):
+        """Test free text is dropped but keys that name a resource type are kept"""
+        resource_ids = make_extractor().extract({'name': 'Trail saddle', 'username': 'bob'})
+
+        assert resource_ids == {'username:bob'}
+
+    def test_endpoint_skip_keys(self):
+        """Test skip lists apply to the longest matching endpoint prefix only"""
+        extractor = make_extractor(endpoint_skip_keys={'/api/v1/track': frozenset({'visitor'})})
+        body = {'visitor': {'user_bk': 'user_1'}}
+
+        assert extractor.extract(body, path='/api/v1/track') == set()
+        assert 'user_bk:user_1' in extractor.extract(body, path='/api/v1/users')
+
+    def test_depth_limit(self):
+        """Test bodies nested past max_depth are rejected, not truncated"""
+        body = {'user_bk': 'user_deep'}
+        for _ in range(5):
+            body = {'child': body}
+
+        make_extractor(max_depth=5).extract(body)
+        with pytest.raises(ResourceExtractionLimitExceeded):
+            make_extractor(max_depth=4).extract(body)
+
+    @pytest.mark.asyncio
+    async def test_id_limit_rejects_request(self):
+        """Test the tenant resolver turns too many identifiers into a 400"""
+        middleware = TenantResolverMiddleware()
+        middleware.resource_extractor = make_extractor(max_ids=10)
+        request = Mock()
+        request.path_params = {}
+        request.query_params = {}
+        request.url.path = '/api/v1/users'
+
+        with pytest.raises(HTTPException) as exc_info:
+            await middleware._extract_all_resource_ids(request, {'ids': [f"asset_{i}" for i in range(20)]})
+
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,231 @@
+"""
+Tests for the SQL Lexer Fast Path
+=================================
+
+Test suite for analyze_sql and the rewriter fast path:
+- Statement type, tables, target and WHERE location over a corpus of repo queries
+- Literals, comments and quoted identifiers never match keywords
+- Queries outside the subset return None and use the sqlparse fallback
+- Fast path agrees with sqlparse where sqlparse is correct, and fixes
+  aliased tables, UPDATE targets, subquery WHEREs and tenant parameter position
+"""
+
+import pytest
+
+from app.middleware.query_rewriter import QueryRewriterMiddleware, SELECT_TENANT_FILTER
+from app.middleware.rewrite_benchmark import QUERIES as BENCHMARK_QUERIES
+from app.middleware.sql_lexer import analyze_sql, count_placeholders, normalize_identifier
+from app.services.resource_validator import BULK_OWNERSHIP_QUERIES
+
+TENANT_HK = b'\x01\x02\x03\x04' * 8
+
+API_KEY_QUERY = """
+            SELECT
+                th.tenant_hk,
+                th.tenant_bk,
+                ats.expires_at,
+                ats.is_active,
+                ats.created_date
+            FROM auth.api_token_s ats
+            JOIN auth.tenant_h th ON ats.tenant_hk = th.tenant_hk
+            WHERE ats.api_key_hash = %s
+                AND ats.is_active = true
+                AND ats.expires_at > CURRENT_TIMESTAMP
+                AND ats.load_end_date IS NULL
+            """
+
+SESSION_QUERY = """
+                SELECT
+                    uh.user_hk,
+                    uh.user_bk,
+                    ss.session_status,
+                    ss.expires_at,
+                    ss.last_activity
+                FROM auth.session_h sh
+                JOIN auth.session_state_s ss ON sh.session_hk = ss.session_hk
+                JOIN auth.user_session_l usl ON sh.session_hk = usl.session_hk
+                JOIN auth.user_h uh ON usl.user_hk = uh.user_hk
+                WHERE sh.session_bk = %s
+                    AND uh.tenant_hk = %s
+                    AND ss.session_status = 'ACTIVE'
+                    AND ss.expires_at > CURRENT_TIMESTAMP
+                    AND ss.load_end_date IS NULL
+                """
+
+# (query, query_type, tables, target_table, target_alias, has_where)
+CORPUS = [
+    (API_KEY_QUERY, 'SELECT', ['auth.api_token_s', 'auth.tenant_h'], None, None, True),
+    (SESSION_QUERY, 'SELECT',
+     ['auth.session_h', 'auth.session_state_s', 'auth.user_session_l', 'auth.user_h'], None, None, True),
+    ("SELECT country_code, country_name FROM ref.country_r", 'SELECT', ['ref.country_r'], None, None, False),
+    ("SELECT api.track_site_event(%s, %s, %s)", 'SELECT', [], None, None, False),
+    ("SELECT a.x, b.y FROM auth.user_h a, business.asset_h AS b WHERE a.user_hk = b.user_hk",
+     'SELECT', ['auth.user_h', 'business.asset_h'], None, None, True),
+    ("WITH recent AS (SELECT user_hk FROM auth.user_session_l WHERE load_date > %s) "
+     "SELECT uh.user_bk FROM auth.user_h uh JOIN recent r ON r.user_hk = uh.user_hk",
+     'SELECT', ['auth.user_session_l', 'auth.user_h', 'recent'], None, None, False),
+    ("SELECT * FROM (SELECT user_hk FROM auth.user_h WHERE user_bk = %s) sub ORDER BY 1",
+     'SELECT', ['auth.user_h'], None, None, False),
+    ("SELECT * FROM generate_series(1, 3) g JOIN business.asset_h ah ON TRUE",
+     'SELECT', ['business.asset_h'], None, None, False),
+    ('SELECT "Name" FROM "Auth"."User_H" u WHERE u.id = %s', 'SELECT', ['Auth.User_H'], None, None, True),
+    ("UPDATE auth.user_profile_s ups SET first_name = %s WHERE ups.user_hk = %s",
+     'UPDATE', ['auth.user_profile_s'], 'auth.user_profile_s', 'ups', True),
+    ("UPDATE ONLY business.asset_h SET status = 'x' FROM auth.user_h uh WHERE uh.user_hk = asset_h.user_hk",
+     'UPDATE', ['business.asset_h', 'auth.user_h'], 'business.asset_h', None, True),
+    ("DELETE FROM auth.session_h sh USING auth.user_h uh WHERE sh.user_hk = uh.user_hk RETURNING sh.session_bk",
+     'DELETE', ['auth.session_h', 'auth.user_h'], 'auth.session_h', 'sh', True),
+    ("INSERT INTO auth.user_h (user_hk, user_bk, tenant_hk) VALUES (%s, %s, %s)",
+     'INSERT', ['auth.user_h'], 'auth.user_h', None, False),
+    ("INSERT INTO business.asset_h SELECT * FROM staging.asset_h WHERE batch = %s",
+     'INSERT', ['business.asset_h', 'staging.asset_h'], 'business.asset_h', None, True),
+] + [
+    (branch, 'SELECT', None, None, None, True) for _, _, branch in BULK_OWNERSHIP_QUERIES.values()
+]
+
+
+class TestAnalyzeSql:
+    """Test suite for analyze_sql"""
+
+    @pytest.mark.parametrize("query,query_type,tables,target_table,target_alias,has_where", CORPUS)
+    def test_corpus(self, query, query_type, tables, target_table, target_alias, has_where):
+        """Test statement type, tables, target and WHERE over real queries"""
+        shape = analyze_sql(query.strip())
+
+        assert shape is not None
+        assert shape.query_type == query_type
+        if tables is not None:
+            assert shape.tables == tables
+        assert shape.target_table == target_table
+        assert shape.target_alias == target_alias
+        assert (shape.where_end is not None) == has_where
+        assert len(shape.placeholder_offsets) == count_placeholders(query)
+
+    def test_where_and_tail_offsets(self):
+        """Test offsets point at the top-level WHERE and the first trailing clause"""
+        query = "SELECT x FROM auth.user_h WHERE x IN (SELECT y FROM t WHERE z = %s) ORDER BY x LIMIT %s"
+        shape = analyze_sql(query)
+
+        assert query[shape.where_start:shape.where_end] == 'WHERE'
+        assert query.index('WHERE') == shape.where_start
+        assert query[shape.tail_start:].startswith('ORDER BY')
+        assert shape.placeholders_before(shape.where_end) == 0
+        assert shape.placeholders_before(shape.tail_start) == 1
+
+    def test_literals_and_comments_ignored(self):
+        """Test keywords and placeholders inside literals and comments are skipped"""
+        query = ("SELECT 'FROM auth.user_h WHERE %s' AS s, $$ JOIN x $$ AS d -- FROM auth.tenant_h\n"
+                 "/* WHERE */ FROM ref.country_r WHERE name = 'it''s' AND pct LIKE '50%%' AND v = %s")
+        shape = analyze_sql(query)
+
+        assert shape.tables == ['ref.country_r']
+        assert query[shape.where_start:].startswith("WHERE name")
+        assert shape.placeholder_offsets == [query.rindex('%s')]
+
+    @pytest.mark.parametrize("query", [
+        "SELECT 1 FROM auth.user_h UNION SELECT 2 FROM business.asset_h",
+        "SELECT 1 FROM auth.user_h; SELECT 2",
+        "WITH d AS (DELETE FROM auth.session_h RETURNING *) SELECT * FROM d",
+        "SELECT * FROM auth.user_h WHERE user_bk = %(user_bk)s",
+        "SELECT 'unterminated FROM auth.user_h",
+        "SELECT (1 FROM auth.user_h",
+    ])
+    def test_outside_subset_returns_none(self, query):
+        """Test unsupported statements are left to the sqlparse fallback"""
+        assert analyze_sql(query) is None
+
+    def test_trailing_semicolon_and_comment(self):
+        """Test a single statement may end with a semicolon and comments"""
+        shape = analyze_sql("SELECT 1 FROM auth.user_h; -- done")
+
+        assert shape is not None
+        assert shape.tables == ['auth.user_h']
+
+    def test_normalize_identifier(self):
+        """Test unquoted parts are lower-cased and quoted parts kept verbatim"""
+        assert normalize_identifier('AUTH.User_H') == 'auth.user_h'
+        assert normalize_identifier('"Auth"."a""b"') == 'Auth.a"b'
+
+
+class TestRewriteFastPath:
+    """Test suite for the QueryRewriterMiddleware fast path"""
+
+    @pytest.mark.parametrize("query,params", [
+        ("SELECT user_bk FROM auth.user_h WHERE user_bk = %s", ("user_1",)),
+        ("SELECT user_bk FROM auth.user_h", ()),
+        ("SELECT user_bk FROM auth.user_h GROUP BY user_bk", ()),
+        ("SELECT asset_bk FROM business.asset_h ORDER BY asset_bk LIMIT %s", (10,)),
+        ("SELECT country_name FROM ref.country_r WHERE country_code = %s", ("US",)),
+        ("INSERT INTO auth.user_h (user_hk, user_bk) VALUES (%s, %s)", (b'hk', "user_1")),
+    ])
+    def test_matches_sqlparse(self, query, params):
+        """Test the fast path gives the sqlparse result where sqlparse is correct"""
+        rewriter = QueryRewriterMiddleware()
+
+        assert (rewriter._rewrite_uncached(query, TENANT_HK, params)
+                == rewriter._rewrite_with_sqlparse(query, TENANT_HK, params))
+        assert rewriter.get_rewriting_stats()['fast_path_rewrites'] == 1
+
+    def test_aliased_table_filtered(self):
+        """Test aliased tenant tables are filtered"""
+        rewriter = QueryRewriterMiddleware()
+        query = "SELECT uh.user_bk FROM auth.user_h uh WHERE uh.user_bk = %s"
+
+        rewritten, params = rewriter._rewrite_uncached(query, TENANT_HK, ("user_1",))
+
+        assert rewritten == f"SELECT uh.user_bk FROM auth.user_h uh WHERE {SELECT_TENANT_FILTER} AND uh.user_bk = %s"
+        assert params == (TENANT_HK, "user_1")
+
+    def test_subquery_where_untouched(self):
+        """Test only the top-level WHERE gets the filter, so placeholders stay aligned"""
+        rewriter = QueryRewriterMiddleware()
+        query = ("SELECT ah.asset_bk FROM business.asset_h ah "
+                 "WHERE ah.user_hk IN (SELECT user_hk FROM auth.user_h WHERE user_bk = %s)")
+
+        rewritten, params = rewriter._rewrite_uncached(query, TENANT_HK, ("user_1",))
+
+        assert rewritten.count('%s') == len(params) == 2
+        assert rewritten.count('tenant_h th') == 1
+        assert params == (TENANT_HK, "user_1")
+
+    def test_update_tenant_param_position(self):
+        """Test UPDATE targets are filtered with tenant_hk after the SET parameters"""
+        rewriter = QueryRewriterMiddleware()
+        query = "UPDATE auth.user_profile_s ups SET first_name = %s WHERE ups.user_hk = %s"
+
+        rewritten, params = rewriter.rewrite_query_with_tenant_filter(query, TENANT_HK, ("Ann", b'hk'))
+
+        assert rewritten == ("UPDATE auth.user_profile_s ups SET first_name = %s "
+                             "WHERE ups.tenant_hk = %s AND ups.user_hk = %s")
+        assert params == ("Ann", TENANT_HK, b'hk')
+
+    def test_delete_tenant_param_position(self):
+        """Test the DELETE filter's parameter precedes the caller's WHERE parameters"""
+        rewriter = QueryRewriterMiddleware()
+        query = "DELETE FROM auth.session_h WHERE session_bk = %s"
+
+        rewritten, params = rewriter.rewrite_query_with_tenant_filter(query, TENANT_HK, ("s_1",))
+
+        assert rewritten == "DELETE FROM auth.session_h WHERE auth.session_h.tenant_hk = %s AND session_bk = %s"
+        assert params == (TENANT_HK, "s_1")
+
+    def test_delete_without_where_rejected(self):
+        """Test DELETE without WHERE on a tenant table fails secure"""
+        rewriter = QueryRewriterMiddleware()
+
+        with pytest.raises(ValueError, match="explicit WHERE"):
+            rewriter.rewrite_query_with_tenant_filter("DELETE FROM auth.session_h", TENANT_HK)
+
+    def test_outside_subset_uses_sqlparse(self):
+        """Test statements the lexer declines are rewritten by sqlparse"""
+        rewriter = QueryRewriterMiddleware()
+        query = "SELECT asset_bk FROM business.asset_h UNION SELECT asset_bk FROM business.asset_h"
+
+        assert (rewriter._rewrite_uncached(query, TENANT_HK, ())
+                == rewriter._rewrite_with_sqlparse(query, TENANT_HK, ()))
+        assert rewriter.get_rewriting_stats()['sqlparse_fallbacks'] == 1
+
+    def test_benchmark_queries_take_fast_path(self):
+        """Test every benchmark template is handled without sqlparse"""
+        for query, _ in BENCHMARK_QUERIES:
+            assert analyze_sql(query) is not None
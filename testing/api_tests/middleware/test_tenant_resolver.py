@@ -184,43 +184,38 @@ class TestTenantResolverMiddleware:
         assert any("assets[0].asset_bk:asset_array_1" in rid for rid in resource_ids)
         assert any("assets[1].asset_bk:asset_array_2" in rid for rid in resource_ids)
     
-    @patch('app.middleware.tenant_resolver.psycopg2.connect')
+    @patch('app.middleware.tenant_resolver.get_db_connection_context')
     @pytest.mark.asyncio
     async def test_resolve_tenant_from_api_key_success(self, mock_connect):
         """Test successful tenant resolution from API key"""
         # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
+        mock_conn = Mock()
+        mock_conn.fetchrow = AsyncMock(return_value=(
             self.mock_tenant_hk,  # tenant_hk
             "tenant_test_123",    # tenant_bk
             "2024-12-31 23:59:59+00:00",  # expires_at (future)
             True,                 # is_active
             "2024-01-01 00:00:00+00:00"   # created_date
-        )
+        ))
         
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        mock_connect.return_value.__aenter__.return_value = mock_conn
         
         api_key = "test_api_key_123"
         tenant_hk = await self.middleware._resolve_tenant_from_api_key(api_key)
         
         assert tenant_hk == self.mock_tenant_hk
-        mock_cursor.execute.assert_called_once()
-        mock_cursor.close.assert_called_once()
-        mock_conn.close.assert_called_once()
+        mock_conn.fetchrow.assert_awaited_once()
+        mock_connect.return_value.__aexit__.assert_awaited_once()  # returned to pool
     
-    @patch('app.middleware.tenant_resolver.psycopg2.connect')
+    @patch('app.middleware.tenant_resolver.get_db_connection_context')
     @pytest.mark.asyncio
     async def test_resolve_tenant_from_api_key_not_found(self, mock_connect):
         """Test tenant resolution failure when API key not found"""
         # Mock database response - no result
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = None
-        
         mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        mock_conn.fetchrow = AsyncMock(return_value=None)
+        
+        mock_connect.return_value.__aenter__.return_value = mock_conn
         
         api_key = "invalid_api_key"
         
@@ -230,23 +225,21 @@ class TestTenantResolverMiddleware:
         assert exc_info.value.status_code == 401
         assert "Invalid, expired, or inactive API key" in str(exc_info.value.detail)
     
-    @patch('app.middleware.tenant_resolver.psycopg2.connect')
+    @patch('app.middleware.tenant_resolver.get_db_connection_context')
     @pytest.mark.asyncio
     async def test_resolve_tenant_from_api_key_inactive(self, mock_connect):
         """Test tenant resolution failure when API key is inactive"""
         # Mock database response - inactive key
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
+        mock_conn = Mock()
+        mock_conn.fetchrow = AsyncMock(return_value=(
             self.mock_tenant_hk,
             "tenant_test_123",
             "2024-12-31 23:59:59+00:00",
             False,  # is_active = False
             "2024-01-01 00:00:00+00:00"
-        )
+        ))
         
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        mock_connect.return_value.__aenter__.return_value = mock_conn
         
         api_key = "inactive_api_key"
         
@@ -256,43 +249,63 @@ class TestTenantResolverMiddleware:
         assert exc_info.value.status_code == 401
         assert "API key is deactivated" in str(exc_info.value.detail)
     
-    @patch('app.middleware.tenant_resolver.psycopg2.connect')
+    @patch('app.middleware.tenant_resolver.get_db_connection_context')
+    @pytest.mark.asyncio
+    async def test_resolve_tenant_concurrent_lookups_coalesced(self, mock_connect):
+        """Test concurrent resolutions of one API key share a single query"""
+        import asyncio
+        
+        async def slow_fetchrow(query, api_key_hash):
+            await asyncio.sleep(0.05)
+            return None
+        
+        mock_conn = Mock()
+        mock_conn.fetchrow = AsyncMock(side_effect=slow_fetchrow)
+        mock_connect.return_value.__aenter__.return_value = mock_conn
+        
+        results = await asyncio.gather(
+            *[self.middleware._resolve_tenant_from_api_key("shared_key") for _ in range(20)],
+            return_exceptions=True
+        )
+        
+        assert all(isinstance(r, HTTPException) and r.status_code == 401 for r in results)
+        assert mock_conn.fetchrow.await_count == 1
+        stats = self.middleware.get_coalescing_stats()
+        assert stats['executed'] == 1
+        assert stats['coalesced'] == 19
+    
+    @patch('app.middleware.tenant_resolver.get_db_connection_context')
     @pytest.mark.asyncio
     async def test_resolve_user_from_session_success(self, mock_connect):
         """Test successful user resolution from session token"""
         # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
+        mock_conn = Mock()
+        mock_conn.fetchrow = AsyncMock(return_value=(
             self.mock_user_hk,      # user_hk
             "user_test_123",        # user_bk
             "ACTIVE",               # session_status
             "2024-12-31 23:59:59+00:00",  # expires_at
             "2024-07-05 10:00:00+00:00"   # last_activity
-        )
+        ))
         
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        mock_connect.return_value.__aenter__.return_value = mock_conn
         
         session_token = "sess_test_123"
         user_hk = await self.middleware._resolve_user_from_session(session_token, self.mock_tenant_hk)
         
         assert user_hk == self.mock_user_hk
-        mock_cursor.execute.assert_called_once()
-        mock_cursor.close.assert_called_once()
-        mock_conn.close.assert_called_once()
+        mock_conn.fetchrow.assert_awaited_once()
+        mock_connect.return_value.__aexit__.assert_awaited_once()  # returned to pool
     
-    @patch('app.middleware.tenant_resolver.psycopg2.connect')
+    @patch('app.middleware.tenant_resolver.get_db_connection_context')
     @pytest.mark.asyncio
     async def test_resolve_user_from_session_cross_tenant_blocked(self, mock_connect):
         """Test user resolution blocks cross-tenant session access"""
         # Mock database response - no result (session doesn't belong to tenant)
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = None
-        
         mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        mock_conn.fetchrow = AsyncMock(return_value=None)
+        
+        mock_connect.return_value.__aenter__.return_value = mock_conn
         
         session_token = "sess_cross_tenant_attack"
         
@@ -302,22 +315,17 @@ class TestTenantResolverMiddleware:
         assert exc_info.value.status_code == 401
         assert "does not belong to authenticated tenant" in str(exc_info.value.detail)
     
-    @patch('app.services.resource_validator.ResourceValidationService')
+    @patch('app.services.resource_validator.get_resource_validator')
     @pytest.mark.asyncio
-    async def test_validate_all_resources_against_tenant_success(self, mock_validator_class):
+    async def test_validate_all_resources_against_tenant_success(self, mock_get_validator):
         """Test successful resource validation against tenant"""
-        # Mock validator instance
+        # Mock bulk validation to accept every resource
         mock_validator = Mock()
-        mock_validator_class.return_value = mock_validator
-        
-        # Mock validation methods to return True
-        async def mock_verify_user(user_bk, tenant_hk):
-            return True
-        async def mock_verify_asset(asset_bk, tenant_hk):
-            return True
-        
-        mock_validator.verify_user_belongs_to_tenant = mock_verify_user
-        mock_validator.verify_asset_belongs_to_tenant = mock_verify_asset
+        mock_validator.bulk_validate_resources = AsyncMock(return_value={
+            "user_bk:user_test_123": True,
+            "asset_bk:asset_test_456": True
+        })
+        mock_get_validator.return_value = mock_validator
         
         # Resource IDs to validate
         resource_ids = {
@@ -328,20 +336,20 @@ class TestTenantResolverMiddleware:
         
         # Should not raise exception
         await self.middleware._validate_all_resources_against_tenant(resource_ids, self.mock_tenant_hk)
+        
+        # All resources checked in one bulk call
+        mock_validator.bulk_validate_resources.assert_awaited_once()
+        resources = mock_validator.bulk_validate_resources.await_args[0][0]
+        assert sorted(resources) == [("asset_bk", "asset_test_456"), ("user_bk", "user_test_123")]
     
-    @patch('app.services.resource_validator.ResourceValidationService')
+    @patch('app.services.resource_validator.get_resource_validator')
     @pytest.mark.asyncio
-    async def test_validate_all_resources_cross_tenant_blocked(self, mock_validator_class):
+    async def test_validate_all_resources_cross_tenant_blocked(self, mock_get_validator):
         """Test resource validation blocks cross-tenant access"""
-        # Mock validator instance
-        mock_validator = Mock()
-        mock_validator_class.return_value = mock_validator
-        
         # Mock validation to return False (cross-tenant access)
-        async def mock_verify_user(user_bk, tenant_hk):
-            return False  # Cross-tenant access attempt
-        
-        mock_validator.verify_user_belongs_to_tenant = mock_verify_user
+        mock_validator = Mock()
+        mock_validator.bulk_validate_resources = AsyncMock(return_value={"user_bk:cross_tenant_user": False})
+        mock_get_validator.return_value = mock_validator
         
         # Resource IDs to validate
         resource_ids = {"user_bk:cross_tenant_user"}
@@ -352,35 +360,33 @@ class TestTenantResolverMiddleware:
         assert exc_info.value.status_code == 403
         assert "not accessible by authenticated tenant" in str(exc_info.value.detail)
     
+    @patch('app.services.resource_validator.get_resource_validator')
     @pytest.mark.asyncio
-    async def test_validate_single_resource_unknown_type(self):
+    async def test_validate_all_resources_unknown_type(self, mock_get_validator):
         """Test validation of unknown resource types"""
-        mock_validator = Mock()
+        resource_ids = {"unknown_type:test_value", "nested.path:user_test_123"}
         
-        result = await self.middleware._validate_single_resource(
-            mock_validator, "unknown_type", "test_value", self.mock_tenant_hk
-        )
+        await self.middleware._validate_all_resources_against_tenant(resource_ids, self.mock_tenant_hk)
         
-        # Unknown types should default to allowing with warning
-        assert result == True
+        # Unknown types should default to allowing without a database lookup
+        mock_get_validator.assert_not_called()
     
+    @patch('app.services.resource_validator.get_resource_validator')
     @pytest.mark.asyncio
-    async def test_validate_single_resource_exception_handling(self):
+    async def test_validate_all_resources_exception_handling(self, mock_get_validator):
         """Test validation handles exceptions securely"""
-        mock_validator = Mock()
-        
         # Mock validator to raise exception
-        async def mock_verify_error(user_bk, tenant_hk):
-            raise Exception("Database error")
-        
-        mock_validator.verify_user_belongs_to_tenant = mock_verify_error
+        mock_validator = Mock()
+        mock_validator.bulk_validate_resources = AsyncMock(side_effect=Exception("Database error"))
+        mock_get_validator.return_value = mock_validator
         
-        result = await self.middleware._validate_single_resource(
-            mock_validator, "user_bk", "test_user", self.mock_tenant_hk
-        )
+        # Should fail secure (block the request)
+        with pytest.raises(HTTPException) as exc_info:
+            await self.middleware._validate_all_resources_against_tenant(
+                {"user_bk:test_user"}, self.mock_tenant_hk
+            )
         
-        # Should fail secure (return False)
-        assert result == False
+        assert exc_info.value.status_code == 403
     
     def test_add_security_headers(self):
         """Test security headers are added to response"""
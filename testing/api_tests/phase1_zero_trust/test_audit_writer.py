@@ -0,0 +1,119 @@
+"""
+Tests for AuditBatchWriter
+==========================
+
+Test suite for the batched parallel validation audit writer:
+- Size and time triggered batches
+- Drops counted when the queue is full
+- Retry with backoff, then give up on the batch
+- Flush on shutdown
+"""
+
+import asyncio
+import os
+import sys
+import pytest
+
+# audit_writer imports its siblings as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'onevault_api', 'app', 'phase1_zero_trust'))
+
+audit_writer = pytest.importorskip('audit_writer')
+from config import AuditWriterConfig
+
+
+def make_record(i: int):
+    return audit_writer.AuditRecord(
+        tenant_hk=None, api_endpoint=f'/api/{i}',
+        current_success=True, current_duration_ms=10,
+        enhanced_success=True, enhanced_duration_ms=5
+    )
+
+
+class TestAuditBatchWriter:
+    """Test suite for AuditBatchWriter"""
+
+    @pytest.mark.asyncio
+    async def test_batches_by_size_and_interval(self, recording_flush):
+        """Test a full batch flushes at once and the remainder after the interval"""
+        flush = recording_flush()
+        writer = audit_writer.AuditBatchWriter(
+            AuditWriterConfig(batch_size=10, flush_interval_seconds=0.05), flush=flush
+        )
+
+        for i in range(13):
+            assert writer.submit(make_record(i))
+        await asyncio.sleep(0.15)
+
+        assert [len(batch) for batch in flush.batches] == [10, 3]
+        assert writer.get_stats()['records_written'] == 13
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_drops_when_queue_full(self, recording_flush):
+        """Test submit never blocks and counts the records it drops"""
+        flush = recording_flush(delay=0.1)
+        writer = audit_writer.AuditBatchWriter(
+            AuditWriterConfig(max_queue_size=5, batch_size=100, flush_interval_seconds=60), flush=flush
+        )
+
+        accepted = [writer.submit(make_record(i)) for i in range(8)]
+
+        assert accepted.count(False) == 3
+        assert writer.get_stats()['records_dropped_full'] == 3
+        await writer.stop()
+        assert sum(len(batch) for batch in flush.batches) == 5
+
+    @pytest.mark.asyncio
+    async def test_retries_with_backoff(self, recording_flush):
+        """Test a failed batch is retried and written once the database recovers"""
+        flush = recording_flush(failures=2)
+        writer = audit_writer.AuditBatchWriter(
+            AuditWriterConfig(flush_interval_seconds=0.01, retry_backoff_seconds=0.01), flush=flush
+        )
+
+        writer.submit(make_record(1))
+        await asyncio.sleep(0.15)
+
+        stats = writer.get_stats()
+        assert flush.attempts == 3
+        assert stats['flush_retries'] == 2 and stats['records_written'] == 1
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self, recording_flush):
+        """Test a batch that keeps failing is dropped and counted"""
+        flush = recording_flush(failures=10)
+        writer = audit_writer.AuditBatchWriter(
+            AuditWriterConfig(flush_interval_seconds=0.01, max_flush_retries=1, retry_backoff_seconds=0.01),
+            flush=flush
+        )
+
+        writer.submit(make_record(1))
+        await asyncio.sleep(0.1)
+
+        assert flush.attempts == 2
+        assert writer.get_stats()['records_failed'] == 1
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_queued_records(self, recording_flush):
+        """Test shutdown writes records still waiting for the interval and rejects new ones"""
+        flush = recording_flush()
+        writer = audit_writer.AuditBatchWriter(
+            AuditWriterConfig(batch_size=100, flush_interval_seconds=60), flush=flush
+        )
+        for i in range(3):
+            writer.submit(make_record(i))
+
+        await writer.stop()
+
+        assert [len(batch) for batch in flush.batches] == [3]
+        assert not writer.submit(make_record(4))
+        assert writer.get_stats()['records_dropped_closed'] == 1
+
+    def test_records_get_unique_business_keys(self):
+        """Test records created in the same instant do not share a validation key"""
+        keys = {make_record(i).validation_bk for i in range(100)}
+
+        assert len(keys) == 100
+        assert all(key.startswith('PARALLEL_VAL_') for key in keys)
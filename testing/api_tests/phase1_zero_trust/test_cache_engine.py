@@ -0,0 +1,224 @@
+"""
+Tests for LRUTTLCache
+=====================
+
+Test suite for the Phase 1 cache engine:
+- LRU eviction order at capacity
+- Heap-driven TTL expiry without full scans
+- Byte-budget eviction and size estimation
+- Tag indexes for tenant/user/token invalidation
+- InMemoryCache wrapper statistics
+- Negative caching of rejected tokens
+"""
+
+import os
+import sys
+import pytest
+
+from app.phase1_zero_trust.cache_engine import LRUTTLCache, estimate_size, EXPIRY_STEPS_PER_OP
+
+# cache_manager imports its siblings as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'onevault_api', 'app', 'phase1_zero_trust'))
+
+
+class TestLRUTTLCache:
+    """Test suite for LRUTTLCache"""
+
+    def test_evicts_least_recently_used(self, manual_clock):
+        """Test the least recently read entry is evicted first"""
+        cache = LRUTTLCache(max_entries=3, default_ttl=60, clock=manual_clock)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+
+        cache.get('a')
+        cache.set('d', 'd')
+
+        assert 'b' not in cache
+        assert [key for key, _ in cache.items()] == ['c', 'a', 'd']
+        assert cache.get_stats()['evictions_lru'] == 1
+
+    def test_entry_expires_after_ttl(self, manual_clock):
+        """Test expired entries miss and are removed"""
+        cache = LRUTTLCache(max_entries=10, default_ttl=60, clock=manual_clock)
+        cache.set('short', 1, ttl=5)
+        cache.set('long', 2)
+
+        manual_clock.now += 10
+
+        assert cache.get('short') is None
+        assert cache.get('long') == 2
+        assert len(cache) == 1
+        assert cache.get_stats()['evictions_expired'] == 1
+
+    def test_expiry_drained_incrementally(self, manual_clock):
+        """Test a mass expiry is spread over operations instead of one scan"""
+        cache = LRUTTLCache(max_entries=1000, default_ttl=1, clock=manual_clock)
+        for i in range(500):
+            cache.set(f"k{i}", i)
+
+        manual_clock.now += 2
+        cache.get('missing')
+
+        assert len(cache) == 500 - EXPIRY_STEPS_PER_OP
+        assert cache.purge_expired() == 500 - EXPIRY_STEPS_PER_OP
+        assert len(cache) == 0
+
+    def test_overwrite_resets_ttl(self, manual_clock):
+        """Test a replaced entry is not expired by its old deadline"""
+        cache = LRUTTLCache(max_entries=10, default_ttl=10, clock=manual_clock)
+        cache.set('k', 'old')
+        manual_clock.now += 8
+        cache.set('k', 'new')
+        manual_clock.now += 5
+
+        assert cache.purge_expired() == 0
+        assert cache.get('k') == 'new'
+
+    def test_byte_budget_evicts(self, manual_clock):
+        """Test max_bytes evicts LRU entries and rejects oversized values"""
+        cache = LRUTTLCache(max_entries=100, default_ttl=60, max_bytes=300,
+                            clock=manual_clock, size_estimator=len)
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'x' * 100)
+        cache.set('c', 'x' * 150)
+
+        assert 'a' not in cache
+        assert cache.total_bytes == 250
+        assert cache.get_stats()['evictions_size'] == 1
+        assert cache.set('huge', 'x' * 301) is False
+
+    def test_heap_compacted_after_overwrites(self, manual_clock):
+        """Test repeated overwrites do not grow the expiry heap without bound"""
+        cache = LRUTTLCache(max_entries=10, default_ttl=60, clock=manual_clock)
+        for i in range(5000):
+            cache.set('same', i)
+
+        assert cache.get_stats()['expiry_heap_size'] <= 2 * len(cache) + 1024
+
+    def test_invalidate_tags_removes_only_tagged(self, manual_clock):
+        """Test tag invalidation drops tagged entries and keeps the rest"""
+        cache = LRUTTLCache(max_entries=10, default_ttl=60, clock=manual_clock)
+        cache.set('t1-u1', 1, tags=['tenant:t1', 'user:u1'])
+        cache.set('t1-u2', 2, tags=['tenant:t1', 'user:u2'])
+        cache.set('t2-u3', 3, tags=['tenant:t2', 'user:u3'])
+
+        assert cache.invalidate_tags(['user:u1', 'tenant:t2']) == 2
+
+        assert [key for key, _ in cache.items()] == ['t1-u2']
+        assert cache.keys_for_tag('tenant:t1') == {'t1-u2'}
+        assert cache.get_stats()['invalidations'] == 2
+
+    def test_tag_index_follows_eviction(self, manual_clock):
+        """Test evicted, expired and overwritten entries leave the tag index"""
+        cache = LRUTTLCache(max_entries=2, default_ttl=60, clock=manual_clock)
+        cache.set('a', 1, tags=['tenant:t1'])
+        cache.set('b', 2, tags=['tenant:t1'], ttl=1)
+        cache.set('c', 3, tags=['tenant:t2'])
+        cache.set('c', 4, tags=['tenant:t3'])
+        manual_clock.now += 5
+        cache.purge_expired()
+
+        assert cache.keys_for_tag('tenant:t1') == set()
+        assert cache.keys_for_tag('tenant:t2') == set()
+        assert cache.keys_for_tag('tenant:t3') == {'c'}
+        assert cache.get_stats()['indexed_tags'] == 1
+
+    def test_estimate_size_counts_contents(self):
+        """Test nested values estimate larger than an empty container"""
+        assert estimate_size({'roles': ['admin', 'viewer'], 'user_id': 'u1'}) > estimate_size({})
+
+
+class TestInMemoryCache:
+    """Test suite for the InMemoryCache wrapper"""
+
+    @pytest.fixture
+    def cache_manager(self):
+        return pytest.importorskip('cache_manager')
+
+    def test_stats_and_ttl_passthrough(self, cache_manager):
+        """Test stats keep their keys and TTL tuning reaches the engine"""
+        cache = cache_manager.InMemoryCache(max_entries=2, default_ttl=60, name="test")
+        cache.set('a', {'v': 1})
+        cache.get('a')
+        cache.get('b')
+        cache.default_ttl = 120
+
+        stats = cache.get_stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 50.0
+        assert stats['size'] == 1 and stats['total_size_bytes'] > 0
+        assert cache._cache.default_ttl == 120
+
+    def test_invalidation_by_tenant_user_token(self, cache_manager):
+        """Test ValidationCacheManager invalidates through the tag indexes"""
+        from config import CacheConfig
+        manager = cache_manager.ValidationCacheManager(CacheConfig())
+        manager.cache_validation_result('tok-1', 't1', {'p_success': True, 'user_id': 'u1'})
+        manager.cache_validation_result('tok-2', 't1', {'p_success': True, 'user_id': 'u2'})
+        manager.cache_permission_result('u1', 't1', '/api/patients', True)
+        manager.cache_tenant_info('t1', {'name': 'Tenant One'})
+        manager.cache_tenant_info('t2', {'name': 'Tenant Two'})
+
+        assert manager.invalidate_token_cache('tok-2') == 1
+        assert manager.invalidate_user_cache('u1') == 2
+        assert manager.get_cached_validation('tok-1', 't1') is None
+        assert manager.get_cached_permission('u1', 't1', '/api/patients') is None
+
+        assert manager.invalidate_tenant_cache('t1') == 1
+        assert manager.get_cached_tenant_info('t2') is not None
+
+
+class TestNegativeResultCache:
+    """Test suite for NegativeResultCache"""
+
+    @pytest.fixture
+    def cache_manager(self):
+        return pytest.importorskip('cache_manager')
+
+    def test_rejections_cached_separately(self, cache_manager):
+        """Test rejections are served from their own budget and counted"""
+        from config import CacheConfig
+        manager = cache_manager.ValidationCacheManager(CacheConfig(negative_max_entries=2))
+
+        assert manager.cache_validation_result('bad-token', 't1', {'p_success': False, 'p_message': 'Invalid token'})
+        cached = manager.get_cached_validation('bad-token', 't1')
+        manager.get_cached_validation('bad-token', 't1')
+
+        assert cached['p_success'] is False and cached['cache_hit']
+        assert manager.get_cached_validation('bad-token', 't2') is None
+        assert len(manager.validation_cache._cache) == 0
+        assert manager.negative_cache.get_stats()['rejections_served'] == 2
+
+    def test_ttl_jitter_bounds(self, cache_manager):
+        """Test jittered TTLs stay within +/- jitter of the configured TTL"""
+        low = cache_manager.NegativeResultCache(ttl_seconds=30, max_entries=10, jitter=0.2, rng=lambda: 0.0)
+        high = cache_manager.NegativeResultCache(ttl_seconds=30, max_entries=10, jitter=0.2, rng=lambda: 1.0)
+
+        assert low._jittered_ttl() == pytest.approx(24)
+        assert high._jittered_ttl() == pytest.approx(36)
+
+    def test_token_issue_evicts_rejection(self, cache_manager):
+        """Test issuing a token drops its cached rejection in every negative cache"""
+        first = cache_manager.NegativeResultCache(ttl_seconds=30, max_entries=10)
+        second = cache_manager.NegativeResultCache(ttl_seconds=30, max_entries=10)
+        first.set('new-token', 't1', {'p_message': 'Token not found'})
+        second.set('new-token', 't1', {'p_message': 'Token not found'})
+        first.set('other-token', 't1', None)
+
+        assert cache_manager.on_token_issued('new-token') == 2
+        assert first.get('new-token', 't1') is None and second.get('new-token', 't1') is None
+        assert first.get('other-token', 't1') is not None
+
+    def test_rejection_listeners_notified(self, cache_manager):
+        """Test fresh and cached rejections reach registered listeners with the token hash only"""
+        seen = []
+        listener = lambda token_hash, tenant_id, cached: seen.append((token_hash, tenant_id, cached))
+        cache_manager.add_rejection_listener(listener)
+        try:
+            cache = cache_manager.NegativeResultCache(ttl_seconds=30, max_entries=10)
+            cache.set('bad-token', 't1', None)
+            cache.get('bad-token', 't1')
+        finally:
+            cache_manager.remove_rejection_listener(listener)
+
+        assert [cached for _, _, cached in seen] == [False, True]
+        assert all(token_hash != 'bad-token' and tenant_id == 't1' for token_hash, tenant_id, _ in seen)
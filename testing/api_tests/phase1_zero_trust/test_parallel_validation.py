@@ -0,0 +1,160 @@
+"""
+Tests for ParallelValidationMiddleware
+======================================
+
+Test suite for Phase 1 parallel validation:
+- Current and enhanced paths overlap on the event loop
+- Hard timeout cancels the slower path, enhanced query included
+- Query runner cancels the in-flight query of a cancelled caller
+- Rejected tokens are served from the negative cache
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+# parallel_validation imports its siblings as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'onevault_api', 'app', 'phase1_zero_trust'))
+
+parallel_validation = pytest.importorskip('parallel_validation')
+
+
+class FakeQueryRunner:
+    """Query runner stand-in with per-function latency"""
+
+    def __init__(self, current_delay: float, enhanced_delay: float):
+        self.delays = {
+            'validate_production_api_token': current_delay,
+            'validate_and_extend_production_token': enhanced_delay,
+        }
+        self.cancelled = []
+
+    async def fetch_value(self, sql, params, timeout_ms=None):
+        function = next(name for name in self.delays if name in sql)
+        try:
+            await asyncio.sleep(self.delays[function])
+        except asyncio.CancelledError:
+            self.cancelled.append(function)
+            raise
+        return {'p_success': True}
+
+
+@pytest.fixture
+def make_middleware(monkeypatch):
+    """Build the middleware against fake queries (config loading needs DB_PASSWORD)"""
+    monkeypatch.setenv('DB_PASSWORD', 'test')
+    return _make_middleware
+
+
+def _make_middleware(runner: FakeQueryRunner):
+    middleware = parallel_validation.ParallelValidationMiddleware()
+    middleware.current_validator.query_runner = runner
+    middleware.enhanced_validator.query_runner = runner
+    middleware._log_validation_safely = Mock()
+    return middleware
+
+
+class TestParallelValidation:
+    """Test suite for ParallelValidationMiddleware.validate_parallel"""
+
+    @pytest.mark.asyncio
+    async def test_paths_run_concurrently(self, make_middleware):
+        """Test wall-clock time is close to the slower path, not the sum"""
+        middleware = make_middleware(FakeQueryRunner(current_delay=0.1, enhanced_delay=0.1))
+
+        result = await middleware.validate_parallel("token-concurrent", "tenant-1")
+
+        assert result.current_result.success and result.enhanced_result.success
+        assert result.wall_clock_ms < 180
+        assert result.performance_improvement_ms >= 50
+        assert not result.timed_out
+
+    @pytest.mark.asyncio
+    async def test_timeout_cancels_slower_path(self, make_middleware, monkeypatch):
+        """Test the path still running at timeout_ms is cancelled and reported as a timeout"""
+        runner = FakeQueryRunner(current_delay=1.0, enhanced_delay=0.01)
+        middleware = make_middleware(runner)
+        monkeypatch.setattr(middleware.zero_trust_config, 'timeout_ms', 50)
+
+        started = time.perf_counter()
+        result = await middleware.validate_parallel("token-timeout", "tenant-1")
+
+        assert time.perf_counter() - started < 0.5
+        assert result.timed_out
+        assert result.current_result.error_message == "Validation timeout"
+        assert result.enhanced_result.success
+        assert runner.cancelled == ['validate_production_api_token']
+
+
+    @pytest.mark.asyncio
+    async def test_timeout_cancels_enhanced_query(self, make_middleware, monkeypatch):
+        """Test a timed-out enhanced path cancels its query through the single-flight task"""
+        runner = FakeQueryRunner(current_delay=0.01, enhanced_delay=1.0)
+        middleware = make_middleware(runner)
+        monkeypatch.setattr(middleware.zero_trust_config, 'timeout_ms', 50)
+
+        result = await middleware.validate_parallel("token-enhanced-timeout", "tenant-1")
+        await asyncio.sleep(0)
+
+        assert result.enhanced_result.error_message == "Validation timeout"
+        assert runner.cancelled == ['validate_and_extend_production_token']
+        assert middleware.enhanced_validator._validation_flight.get_stats()['abandoned'] == 1
+
+class TestEnhancedNegativeCache:
+    """Test suite for negative caching in EnhancedZeroTrustValidator"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_bad_token_queries_once(self, monkeypatch):
+        """Test a rejected token is answered from cache until its entry expires"""
+        monkeypatch.setenv('DB_PASSWORD', 'test')
+        runner = Mock()
+        runner.fetch_value = AsyncMock(return_value={'p_success': False, 'p_message': 'Invalid token'})
+        validator = parallel_validation.EnhancedZeroTrustValidator(runner)
+
+        results = [await validator.validate_token_enhanced('bad-token', 'tenant-1') for _ in range(5)]
+
+        assert runner.fetch_value.await_count == 1
+        assert not any(result.success for result in results)
+        assert [result.cache_hit for result in results] == [False, True, True, True, True]
+
+
+class TestValidationQueryRunner:
+    """Test suite for ValidationQueryRunner"""
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_cancels_query(self):
+        """Test cancelling the awaiting task calls connection.cancel() and returns the connection"""
+        released = threading.Event()
+        conn = Mock()
+        conn.closed = 0
+        conn.cancel.side_effect = released.set
+
+        def blocking_execute(sql, params=None):
+            if 'slow' in sql:
+                if not released.wait(2):
+                    raise AssertionError("query was never cancelled")
+                raise RuntimeError("canceling statement due to user request")
+
+        conn.cursor.return_value.execute.side_effect = blocking_execute
+        pool = Mock()
+        pool.getconn.return_value = conn
+
+        db_config = Mock(max_connections=2)
+        runner = parallel_validation.ValidationQueryRunner(db_config)
+        runner._pool = pool
+
+        task = asyncio.ensure_future(runner.fetch_value("SELECT slow()", (), timeout_ms=1000))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.sleep(0.05)
+        conn.cancel.assert_called_once()
+        pool.putconn.assert_called_once_with(conn, close=False)
+        assert runner.get_stats()['cancelled'] == 1
+        runner.close()
@@ -0,0 +1,135 @@
+"""
+Tests for ShadowSampler
+=======================
+
+Test suite for fail-safe shadow validation sampling:
+- Tenant and endpoint rate overrides
+- Adaptive cap by request rate
+- Always-sample after a mismatch
+- Inverse-probability weighted mismatch estimates
+- Per-tenant stats capped at max_tracked_tenants
+- Unsampled requests run only the primary validator
+"""
+
+import os
+import sys
+import pytest
+from unittest.mock import AsyncMock
+
+# shadow_sampler imports its siblings as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'onevault_api', 'app', 'phase1_zero_trust'))
+
+shadow_sampler = pytest.importorskip('shadow_sampler')
+from config import ShadowSamplingConfig
+
+
+@pytest.fixture
+def make_sampler(manual_clock):
+    """Factory for samplers on the test's manual clock with a fixed random draw"""
+    def make(rng_value: float = 0.5, **overrides):
+        config = ShadowSamplingConfig(**overrides)
+        return shadow_sampler.ShadowSampler(config, clock=manual_clock, rng=lambda: rng_value)
+    return make
+
+
+class TestShadowSampler:
+    """Test suite for ShadowSampler"""
+
+    def test_tenant_and_endpoint_overrides(self, make_sampler):
+        """Test tenant rates win over the longest endpoint prefix, then the default"""
+        sampler = make_sampler(default_rate=0.1, tenant_rates={'vip': 1.0},
+                                  endpoint_rates={'/api/': 0.2, '/api/auth': 0.5})
+
+        assert sampler.base_rate('vip', '/api/auth/login') == 1.0
+        assert sampler.base_rate('t1', '/api/auth/login') == 0.5
+        assert sampler.base_rate('t1', '/api/users') == 0.2
+        assert sampler.base_rate('t1', '/health') == 0.1
+
+    def test_rate_capped_by_qps(self, make_sampler):
+        """Test the effective rate shrinks as request rate exceeds max_shadow_qps"""
+        sampler = make_sampler(default_rate=1.0, max_shadow_qps=10, min_rate=0.01)
+
+        decisions = [sampler.decide('t1', '/api/users') for _ in range(100)]
+
+        assert decisions[0].probability == 1.0
+        assert decisions[-1].probability == pytest.approx(0.1)
+        assert decisions[-1].reason == 'rate_capped'
+
+    def test_min_rate_floor(self, make_sampler):
+        """Test the cap never pushes the rate below min_rate"""
+        sampler = make_sampler(default_rate=0.5, max_shadow_qps=1, min_rate=0.05)
+
+        for _ in range(1000):
+            decision = sampler.decide('t1', '/api/users')
+
+        assert decision.probability == 0.05
+
+    def test_mismatch_boosts_key(self, make_sampler, manual_clock):
+        """Test a mismatch samples that tenant/endpoint at 100% until the boost expires"""
+        sampler = make_sampler(rng_value=0.99, default_rate=0.1, mismatch_boost_seconds=60)
+        first = sampler.decide('t1', '/api/users')
+        sampler.record(first, 't1', '/api/users', results_match=False)
+
+        boosted = sampler.decide('t1', '/api/users')
+        other = sampler.decide('t1', '/api/assets')
+        manual_clock.now += 61
+        expired = sampler.decide('t1', '/api/users')
+
+        assert boosted.sampled and boosted.reason == 'mismatch_boost'
+        assert not other.sampled
+        assert not expired.sampled
+
+    def test_weighted_mismatch_estimate(self, make_sampler):
+        """Test mismatches are weighted by 1/p and forced samples by 1"""
+        sampler = make_sampler(default_rate=0.1, mismatch_boost_seconds=0)
+        sampled = shadow_sampler.SampleDecision(sampled=True, probability=0.1, reason='rate')
+
+        for _ in range(9):
+            sampler.record(sampled, 't1', '/api/users', results_match=True)
+        sampler.record(sampled, 't1', '/api/users', results_match=False)
+        sampler.record(sampler.forced_decision(), 't1', '/api/users', results_match=False, primary_success=False)
+
+        stats = sampler.get_stats()
+        assert stats['mismatches'] == 2
+        assert stats['estimated_mismatches'] == 11.0
+        assert stats['estimated_mismatch_rate'] == pytest.approx(11 / 101, abs=1e-6)
+
+    def test_tenant_stats_capped(self, make_sampler):
+        """Test tenants beyond max_tracked_tenants are counted under one overflow bucket"""
+        sampler = make_sampler(max_tracked_tenants=2, mismatch_boost_seconds=0)
+
+        for tenant_id in ('t1', 't2', 't3', 't4', 't1'):
+            sampler.record(sampler.decide(tenant_id, '/api/users'), tenant_id, '/api/users', results_match=True)
+
+        tenants = sampler.get_stats()['tenants']
+        assert set(tenants) == {'t1', 't2', shadow_sampler.OVERFLOW_TENANT}
+        assert tenants['t1']['requests'] == 2
+        assert tenants[shadow_sampler.OVERFLOW_TENANT]['requests'] == 2
+        assert sampler.get_stats()['requests'] == 5
+
+
+class TestValidateSampled:
+    """Test suite for ParallelValidationMiddleware.validate_sampled"""
+
+    @pytest.fixture
+    def middleware(self, monkeypatch, make_sampler):
+        monkeypatch.setenv('DB_PASSWORD', 'test')
+        parallel_validation = pytest.importorskip('parallel_validation')
+        middleware = parallel_validation.ParallelValidationMiddleware()
+        middleware.sampler = make_sampler(rng_value=0.99, default_rate=0.1)
+        middleware.current_validator.validate_token_current = AsyncMock(
+            return_value=parallel_validation.ValidationResult(success=True, duration_ms=5, response={'p_success': True})
+        )
+        middleware.enhanced_validator.validate_token_enhanced = AsyncMock()
+        middleware.validate_parallel = AsyncMock()
+        return middleware
+
+    @pytest.mark.asyncio
+    async def test_unsampled_runs_primary_only(self, middleware):
+        """Test an unsampled request skips the shadow validator and the audit write"""
+        result = await middleware.validate_sampled('token', 'tenant', '/api/users')
+
+        assert not result.shadow_sampled
+        assert result.current_result.success
+        middleware.validate_parallel.assert_not_awaited()
+        middleware.enhanced_validator.validate_token_enhanced.assert_not_awaited()
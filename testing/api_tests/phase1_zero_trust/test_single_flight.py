@@ -0,0 +1,113 @@
+"""
+Tests for SingleFlight
+======================
+
+Test suite for concurrent request coalescing:
+- One execution per key for concurrent callers
+- Shared exceptions
+- Independent keys and sequential calls
+- Caller cancellation does not cancel shared work until the last waiter leaves
+"""
+
+import asyncio
+import pytest
+
+from app.phase1_zero_trust.single_flight import SingleFlight
+
+
+class CountingLookup:
+    """Async lookup stand-in that counts executions"""
+
+    def __init__(self, delay: float = 0.02, error: Exception = None):
+        self.calls = 0
+        self.cancelled = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self, value):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return {'value': value}
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test 20 concurrent misses run the lookup once and get the same result"""
+        flight = SingleFlight("test")
+        lookup = CountingLookup()
+
+        results = await asyncio.gather(*[flight.do(('tok', 't1'), lambda: lookup('x')) for _ in range(20)])
+
+        assert lookup.calls == 1
+        assert all(result is results[0] for result in results)
+        stats = flight.get_stats()
+        assert stats['executed'] == 1 and stats['coalesced'] == 19 and stats['inflight'] == 0
+
+    @pytest.mark.asyncio
+    async def test_exception_shared_by_waiters(self):
+        """Test every waiter sees the lookup's exception"""
+        flight = SingleFlight("test")
+        lookup = CountingLookup(error=ValueError("db down"))
+
+        results = await asyncio.gather(*[flight.do('k', lambda: lookup('x')) for _ in range(5)],
+                                       return_exceptions=True)
+
+        assert lookup.calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.get_stats()['failed'] == 1
+
+    @pytest.mark.asyncio
+    async def test_distinct_keys_and_sequential_calls_execute(self):
+        """Test coalescing applies only to concurrent calls with the same key"""
+        flight = SingleFlight("test")
+        lookup = CountingLookup()
+
+        await asyncio.gather(flight.do('a', lambda: lookup('a')), flight.do('b', lambda: lookup('b')))
+        await flight.do('a', lambda: lookup('a'))
+
+        assert lookup.calls == 3
+        assert flight.get_stats()['coalesced'] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_waiters(self):
+        """Test cancelling the first caller leaves the shared lookup running"""
+        flight = SingleFlight("test")
+        lookup = CountingLookup(delay=0.05)
+
+        first = asyncio.ensure_future(flight.do('k', lambda: lookup('x')))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do('k', lambda: lookup('x')))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == {'value': 'x'}
+        assert lookup.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_cancelled_cancels_lookup(self):
+        """Test the shared lookup is cancelled once no caller is waiting for it"""
+        flight = SingleFlight("test")
+        lookup = CountingLookup(delay=1.0)
+
+        waiters = [asyncio.ensure_future(flight.do('k', lambda: lookup('x'))) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert lookup.cancelled == 0
+
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert lookup.cancelled == 1
+        assert flight.get_stats()['abandoned'] == 1
+        assert flight.inflight == 0
@@ -0,0 +1,156 @@
+"""
+Tests for PipelineRunner
+========================
+
+Test suite for the standalone site tracking pipeline runner:
+- Round-robin work queue with per-tenant in-flight caps
+- Workers drain raw -> staging -> business in batches
+- Graceful stop and throughput report
+"""
+
+import threading
+from contextlib import contextmanager
+from unittest.mock import Mock
+
+from app.services.pipeline_runner import (
+    WorkQueue, PipelineRunner, PipelineRunnerConfig, STAGE_RAW, STAGE_BUSINESS,
+    format_report, run
+)
+
+TENANT_A = b'\x0a' * 32
+TENANT_B = b'\x0b' * 32
+
+
+class FakePipelineDatabase:
+    """Pool stand-in holding per-tenant raw backlogs and a staging backlog"""
+
+    def __init__(self, raw_pending):
+        self.raw_pending = dict(raw_pending)
+        self.business_pending = 0
+        self.calls = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = Mock()
+        conn.cursor.side_effect = lambda: self._cursor()
+        yield conn
+
+    def _cursor(self):
+        cursor = Mock()
+        result = {}
+
+        def execute(query, params=None):
+            with self.lock:
+                if 'process_raw_events_batch' in query:
+                    tenant_hk, batch_size = params[0].adapted, params[1]
+                    taken = min(batch_size, self.raw_pending.get(tenant_hk, 0))
+                    self.raw_pending[tenant_hk] -= taken
+                    self.business_pending += taken
+                    self.calls.append((STAGE_RAW, tenant_hk))
+                    result['one'] = (taken, 0)
+                elif 'process_staging_to_business' in query:
+                    taken = min(params[0], self.business_pending)
+                    self.business_pending -= taken
+                    self.calls.append((STAGE_BUSINESS, None))
+                    result['one'] = (taken, 0)
+                elif 'raw.site_tracking_events_r' in query:
+                    result['all'] = [(tenant, count, 1.0) for tenant, count in self.raw_pending.items() if count]
+                else:
+                    result['one'] = (self.business_pending, 0.5)
+
+        cursor.execute.side_effect = execute
+        cursor.fetchone.side_effect = lambda: result['one']
+        cursor.fetchall.side_effect = lambda: result['all']
+        return cursor
+
+
+class TestWorkQueue:
+    """Test suite for the round-robin work queue"""
+
+    def test_items_deduplicated(self):
+        """Test an item waits in the queue at most once"""
+        queue = WorkQueue()
+
+        assert queue.put((STAGE_RAW, TENANT_A)) is True
+        assert queue.put((STAGE_RAW, TENANT_A)) is False
+        assert len(queue) == 1
+
+    def test_full_batch_goes_to_tail(self):
+        """Test a tenant with more work waits behind other tenants"""
+        queue = WorkQueue(max_inflight=1)
+        queue.put((STAGE_RAW, TENANT_A))
+        queue.put((STAGE_RAW, TENANT_B))
+
+        item = queue.get(timeout=0)
+        queue.done(item, more_work=True)
+
+        assert queue.get(timeout=0) == (STAGE_RAW, TENANT_B)
+        assert queue.get(timeout=0) == (STAGE_RAW, TENANT_A)
+
+    def test_inflight_cap(self):
+        """Test one tenant can occupy at most max_inflight workers"""
+        queue = WorkQueue(max_inflight=2)
+        queue.put((STAGE_RAW, TENANT_A))
+
+        assert queue.get(timeout=0) == (STAGE_RAW, TENANT_A)
+        assert queue.get(timeout=0) == (STAGE_RAW, TENANT_A)
+        assert queue.get(timeout=0) is None
+        assert queue.idle() is False
+
+
+class TestPipelineRunner:
+    """Test suite for PipelineRunner"""
+
+    def test_drains_backlog_once(self):
+        """Test --once drains every tenant through both stages and stops"""
+        database = FakePipelineDatabase({TENANT_A: 950, TENANT_B: 120})
+        config = PipelineRunnerConfig(workers=3, batch_size=100, report_interval_seconds=0.05, idle_poll_seconds=0.01)
+        runner = PipelineRunner(database, config)
+        lines = []
+
+        stats = run(runner, once=True, report=lines.append)
+
+        assert database.raw_pending == {TENANT_A: 0, TENANT_B: 0}
+        assert database.business_pending == 0
+        assert stats['raw_to_staging_events'] == 1070
+        assert stats['staging_to_business_events'] == 1070
+        assert stats['workers_alive'] == 0
+        assert lines and lines[0].startswith('📊')
+
+    def test_tenants_interleaved(self):
+        """Test a large backlog does not hold up a small tenant"""
+        database = FakePipelineDatabase({TENANT_A: 1000, TENANT_B: 100})
+        config = PipelineRunnerConfig(workers=1, batch_size=100, max_inflight_per_tenant=1,
+                                      report_interval_seconds=0.05, idle_poll_seconds=0.01)
+        runner = PipelineRunner(database, config)
+
+        run(runner, once=True, report=lambda line: None)
+
+        raw_calls = [tenant for stage, tenant in database.calls if stage == STAGE_RAW]
+        assert raw_calls.index(TENANT_B) <= 2
+
+    def test_stop_is_graceful(self):
+        """Test stop() lets workers exit without a backlog refresh"""
+        runner = PipelineRunner(FakePipelineDatabase({}), PipelineRunnerConfig(workers=2, idle_poll_seconds=0.01))
+        runner.start()
+
+        runner.stop()
+
+        assert runner.join(timeout=1) is True
+
+    def test_report_rates(self):
+        """Test the report shows per-interval throughput and lag"""
+        previous = {'elapsed_seconds': 10.0, 'raw_to_staging_events': 1000, 'staging_to_business_events': 500}
+        current = {
+            'elapsed_seconds': 15.0, 'raw_to_staging_events': 6000, 'staging_to_business_events': 3000,
+            'raw_pending': 1234, 'raw_tenants': 2, 'raw_oldest_seconds': 3.5,
+            'business_pending': 10, 'business_oldest_seconds': 0.2,
+            'event_errors': 0, 'batch_failures': 0,
+        }
+
+        line = format_report(current, previous)
+
+        assert 'raw→staging 1,000 ev/s' in line
+        assert 'staging→business 500 ev/s' in line
+        assert 'lag 3.5s' in line
@@ -0,0 +1,137 @@
+"""
+Tests for PipelineScheduler
+===========================
+
+Test suite for the debounced site tracking pipeline trigger:
+- One run in flight for the whole process, whatever the customer
+- Minimum interval between runs
+- Pending-event threshold
+- Trigger, coalescing and duration statistics
+- Per-customer counters for known customers only, bounded
+"""
+
+import asyncio
+import pytest
+
+from app.services.pipeline_scheduler import PipelineScheduler, PipelineSchedulerConfig
+
+
+class RecordingPipeline:
+    """Async pipeline stand-in that records every run"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.runs = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.runs.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("pipeline failed")
+        return 'Processing completed'
+
+
+class TestPipelineScheduler:
+    """Test suite for PipelineScheduler"""
+
+    @pytest.mark.asyncio
+    async def test_burst_coalesced_into_one_run(self):
+        """Test a burst of triggers during a run costs one follow-up run"""
+        pipeline = RecordingPipeline(delay=0.05)
+        scheduler = PipelineScheduler(PipelineSchedulerConfig(min_interval_seconds=0), run_pipeline=pipeline)
+
+        assert scheduler.notify('one_spa') is True
+        await asyncio.sleep(0)
+        for _ in range(20):
+            assert scheduler.notify('one_spa') is False
+        await asyncio.sleep(0.2)
+
+        assert len(pipeline.runs) == 2
+        stats = scheduler.get_stats()
+        assert stats['triggers'] == 21
+        assert stats['coalesced'] == 20
+        assert stats['runs_completed'] == 2
+        assert stats['average_duration_ms'] >= 50
+        assert stats['customers'] == {'one_spa': {'triggers': 21, 'events': 21}}
+
+    @pytest.mark.asyncio
+    async def test_min_interval_delays_next_run(self):
+        """Test a trigger right after a run waits for the interval"""
+        pipeline = RecordingPipeline()
+        scheduler = PipelineScheduler(PipelineSchedulerConfig(min_interval_seconds=0.1), run_pipeline=pipeline)
+
+        scheduler.notify('one_spa')
+        await asyncio.sleep(0.01)
+        scheduler.notify('one_spa')
+        scheduler.notify('one_spa')
+        await asyncio.sleep(0.03)
+
+        assert len(pipeline.runs) == 1
+        assert scheduler.get_stats()['scheduled'] is True
+
+        await asyncio.sleep(0.12)
+        assert len(pipeline.runs) == 2
+
+    @pytest.mark.asyncio
+    async def test_threshold_skips_interval(self):
+        """Test enough pending events start a run without waiting"""
+        pipeline = RecordingPipeline()
+        config = PipelineSchedulerConfig(min_interval_seconds=60, pending_threshold=100)
+        scheduler = PipelineScheduler(config, run_pipeline=pipeline)
+
+        scheduler.notify('one_spa')
+        await asyncio.sleep(0.01)
+        scheduler.notify('one_spa', 10)
+        await asyncio.sleep(0.01)
+        assert len(pipeline.runs) == 1
+
+        scheduler.notify('one_spa', 100)
+        await asyncio.sleep(0.01)
+        assert len(pipeline.runs) == 2
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_customers_share_one_run(self):
+        """Test triggers from different customers never run the global pipeline concurrently"""
+        pipeline = RecordingPipeline(delay=0.05)
+        scheduler = PipelineScheduler(PipelineSchedulerConfig(min_interval_seconds=0), run_pipeline=pipeline)
+
+        scheduler.notify('one_spa')
+        for i in range(50):
+            assert scheduler.notify(f'rotated_{i}') is False
+        await asyncio.sleep(0.01)
+
+        assert len(pipeline.runs) == 1
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_customer_counters_known_and_bounded(self):
+        """Test unknown customer ids are not tracked and tracked ids are capped"""
+        config = PipelineSchedulerConfig(max_tracked_customers=2)
+        scheduler = PipelineScheduler(config, run_pipeline=RecordingPipeline(),
+                                      is_known_customer=lambda customer_id: customer_id.startswith('known_'))
+
+        for customer_id in ('known_a', 'unknown', 'known_b', 'known_c', 'known_a'):
+            scheduler.notify(customer_id, 2)
+        await scheduler.stop()
+
+        stats = scheduler.get_stats()
+        assert stats['customers'] == {
+            'known_a': {'triggers': 2, 'events': 4},
+            'known_b': {'triggers': 1, 'events': 2},
+        }
+        assert stats['unknown_customer_triggers'] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_run_counted(self):
+        """Test pipeline failures are recorded, not raised"""
+        scheduler = PipelineScheduler(PipelineSchedulerConfig(), run_pipeline=RecordingPipeline(fail=True))
+
+        scheduler.notify('one_spa')
+        await scheduler.stop()
+
+        stats = scheduler.get_stats()
+        assert stats['runs_failed'] == 1
+        assert stats['failures'] == 1
+        assert stats['running'] is False
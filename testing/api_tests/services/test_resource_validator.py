@@ -12,12 +12,39 @@ Comprehensive test suite for cross-tenant resource validation:
 """
 
 import pytest
-from unittest.mock import Mock, patch
+from contextlib import asynccontextmanager
+from unittest.mock import ANY, Mock, patch
 from datetime import datetime, timezone
 
 from app.services.resource_validator import ResourceValidationService
 
 
+class InlineAsyncConnection:
+    """AsyncConnection stand-in that runs conn.run() work inline on a mock connection"""
+    
+    def __init__(self, raw):
+        self.raw = raw
+    
+    async def run(self, func, *args, **kwargs):
+        return func(self.raw, *args, **kwargs)
+
+
+def mock_database(rows=(), error=None):
+    """Patch the validator's pooled connection; returns (patcher, cursor)"""
+    cursor = Mock()
+    cursor.fetchall.return_value = list(rows)
+    raw = Mock()
+    raw.cursor.return_value = cursor
+    
+    @asynccontextmanager
+    async def connection_context():
+        if error is not None:
+            raise error
+        yield InlineAsyncConnection(raw)
+    
+    return patch('app.services.resource_validator.get_db_connection_context', connection_context), cursor
+
+
 class TestResourceValidationService:
     """Test suite for ResourceValidationService"""
     
@@ -32,221 +59,84 @@ class TestResourceValidationService:
         # Clear validation cache
         self.service._validation_cache.clear()
     
-    @patch('app.services.resource_validator.psycopg2.connect')
     @pytest.mark.asyncio
-    async def test_verify_user_belongs_to_tenant_success(self, mock_connect):
+    async def test_verify_user_belongs_to_tenant_success(self):
         """Test successful user validation"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            self.mock_user_hk,      # user_hk
-            "user_test_123",        # user_bk
-            "test@example.com",     # email
-            "John",                 # first_name
-            "Doe"                   # last_name
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        patcher, mock_cursor = mock_database([("user_bk", "user_test_123")])
         
-        user_bk = "user_test_123"
-        result = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
+        with patcher:
+            result = await self.service.verify_user_belongs_to_tenant("user_test_123", self.mock_tenant_hk)
         
         assert result == True
         mock_cursor.execute.assert_called_once()
         mock_cursor.close.assert_called_once()
-        mock_conn.close.assert_called_once()
     
-    @patch('app.services.resource_validator.psycopg2.connect')
     @pytest.mark.asyncio
-    async def test_verify_user_belongs_to_tenant_not_found(self, mock_connect):
+    async def test_verify_user_belongs_to_tenant_not_found(self):
         """Test user validation when user not found"""
-        # Mock database response - no result
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = None
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        patcher, _ = mock_database([])
         
-        user_bk = "nonexistent_user"
-        result = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
+        with patcher:
+            result = await self.service.verify_user_belongs_to_tenant("nonexistent_user", self.mock_tenant_hk)
         
         assert result == False
     
-    @patch('app.services.resource_validator.psycopg2.connect')
     @pytest.mark.asyncio
-    async def test_verify_user_belongs_to_tenant_database_error(self, mock_connect):
+    async def test_verify_user_belongs_to_tenant_database_error(self):
         """Test user validation handles database errors securely"""
-        # Mock database error
-        mock_connect.side_effect = Exception("Database connection failed")
+        patcher, _ = mock_database(error=Exception("Database connection failed"))
         
-        user_bk = "user_test_123"
-        result = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
+        with patcher:
+            result = await self.service.verify_user_belongs_to_tenant("user_test_123", self.mock_tenant_hk)
         
         # Should fail secure
         assert result == False
     
-    @patch('app.services.resource_validator.psycopg2.connect')
     @pytest.mark.asyncio
-    async def test_verify_user_email_belongs_to_tenant_success(self, mock_connect):
+    async def test_verify_user_email_belongs_to_tenant_success(self):
         """Test successful email validation"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            self.mock_user_hk,      # user_hk
-            "user_test_123",        # user_bk
-            "test@example.com"      # email
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
-        
         email = "test@example.com"
-        result = await self.service.verify_user_email_belongs_to_tenant(email, self.mock_tenant_hk)
+        patcher, mock_cursor = mock_database([("email", email)])
+        
+        with patcher:
+            result = await self.service.verify_user_email_belongs_to_tenant(email, self.mock_tenant_hk)
         
         assert result == True
         
         # Verify correct SQL query structure
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        params = call_args[1]
-        
-        assert "up.email = %s" in query
+        query, params = mock_cursor.execute.call_args[0]
+        assert "up.email = ANY(%s)" in query
         assert "uh.tenant_hk = %s" in query
-        assert params == (email, self.mock_tenant_hk)
-    
-    @patch('app.services.resource_validator.psycopg2.connect')
-    @pytest.mark.asyncio
-    async def test_verify_asset_belongs_to_tenant_success(self, mock_connect):
-        """Test successful asset validation"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            b'\x09\x0a\x0b\x0c' * 8,  # asset_hk
-            "asset_test_456",         # asset_bk
-            "Test Asset",             # asset_name
-            "Equipment"               # asset_type
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
-        
-        asset_bk = "asset_test_456"
-        result = await self.service.verify_asset_belongs_to_tenant(asset_bk, self.mock_tenant_hk)
-        
-        assert result == True
-        
-        # Verify asset-specific query
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        assert "business.asset_h" in query
-        assert "business.asset_details_s" in query
-    
-    @patch('app.services.resource_validator.psycopg2.connect')
-    @pytest.mark.asyncio
-    async def test_verify_transaction_belongs_to_tenant_success(self, mock_connect):
-        """Test successful transaction validation"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            b'\x0d\x0e\x0f\x10' * 8,  # transaction_hk
-            "transaction_test_789",    # transaction_bk
-            "Sale",                    # transaction_type
-            1000.00                    # amount
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
-        
-        transaction_bk = "transaction_test_789"
-        result = await self.service.verify_transaction_belongs_to_tenant(transaction_bk, self.mock_tenant_hk)
-        
-        assert result == True
-        
-        # Verify transaction-specific query
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        assert "business.transaction_h" in query
-        assert "business.transaction_details_s" in query
-    
-    @patch('app.services.resource_validator.psycopg2.connect')
-    @pytest.mark.asyncio
-    async def test_verify_session_belongs_to_tenant_success(self, mock_connect):
-        """Test successful session validation"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            b'\x11\x12\x13\x14' * 8,  # session_hk
-            "sess_test_111",           # session_bk
-            self.mock_user_hk,         # user_hk
-            "user_test_123",           # user_bk
-            "ACTIVE"                   # session_status
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
-        
-        session_token = "sess_test_111"
-        result = await self.service.verify_session_belongs_to_tenant(session_token, self.mock_tenant_hk)
-        
-        assert result == True
-        
-        # Verify session-specific query with joins
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        assert "auth.session_h" in query
-        assert "auth.session_state_s" in query
-        assert "auth.user_session_l" in query
-        assert "auth.user_h" in query
+        assert params == [[email], self.mock_tenant_hk]
     
-    @patch('app.services.resource_validator.psycopg2.connect')
+    @pytest.mark.parametrize("method,resource_type,tables", [
+        ("verify_asset_belongs_to_tenant", "asset_bk", ["business.asset_h"]),
+        ("verify_transaction_belongs_to_tenant", "transaction_bk", ["business.transaction_h"]),
+        ("verify_session_belongs_to_tenant", "session_token",
+         ["auth.session_h", "auth.session_state_s", "auth.user_session_l", "auth.user_h"]),
+        ("verify_ai_agent_belongs_to_tenant", "agent_bk", ["ai_agents.agent_h"]),
+    ])
     @pytest.mark.asyncio
-    async def test_verify_ai_agent_belongs_to_tenant_success(self, mock_connect):
-        """Test successful AI agent validation"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            b'\x15\x16\x17\x18' * 8,  # agent_hk
-            "agent_test_222",          # agent_bk
-            "Business Analyst",        # agent_name
-            "analysis"                 # agent_type
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+    async def test_verify_resource_belongs_to_tenant_success(self, method, resource_type, tables):
+        """Test each single-resource check uses its type's ownership query"""
+        patcher, mock_cursor = mock_database([(resource_type, "resource_1")])
         
-        agent_bk = "agent_test_222"
-        result = await self.service.verify_ai_agent_belongs_to_tenant(agent_bk, self.mock_tenant_hk)
+        with patcher:
+            result = await getattr(self.service, method)("resource_1", self.mock_tenant_hk)
         
         assert result == True
-        
-        # Verify AI agent-specific query
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        assert "ai_agents.agent_h" in query
-        assert "ai_agents.agent_identity_s" in query
+        query = mock_cursor.execute.call_args[0][0]
+        for table in tables:
+            assert table in query
     
     @pytest.mark.asyncio
     async def test_bulk_validate_resources_success(self):
         """Test bulk validation with mixed resource types"""
-        # Mock individual validation methods
-        async def mock_verify_user(user_bk, tenant_hk):
-            return True
-        async def mock_verify_asset(asset_bk, tenant_hk):
-            return True
-        async def mock_verify_transaction(transaction_bk, tenant_hk):
-            return False  # One failure
-        
-        self.service.verify_user_belongs_to_tenant = mock_verify_user
-        self.service.verify_asset_belongs_to_tenant = mock_verify_asset
-        self.service.verify_transaction_belongs_to_tenant = mock_verify_transaction
+        # Mock the bulk lookup: transaction is not owned by the tenant
+        self.service._fetch_owned_resources = Mock(return_value={
+            ("user_bk", "user_test_123"),
+            ("asset_bk", "asset_test_456")
+        })
         
         resources = [
             ("user_bk", "user_test_123"),
@@ -255,28 +145,70 @@ class TestResourceValidationService:
             ("unknown_type", "unknown_value")  # Should default to True
         ]
         
-        results = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
+        patcher, _ = mock_database()
+        with patcher:
+            results = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
         
         assert results["user_bk:user_test_123"] == True
         assert results["asset_bk:asset_test_456"] == True
         assert results["transaction_bk:transaction_test_789"] == False
         assert results["unknown_type:unknown_value"] == True
+        
+        # One lookup, grouped by resource type
+        self.service._fetch_owned_resources.assert_called_once_with(ANY, {
+            "user_bk": ["user_test_123"],
+            "asset_bk": ["asset_test_456"],
+            "transaction_bk": ["transaction_test_789"]
+        }, self.mock_tenant_hk)
     
     @pytest.mark.asyncio
     async def test_bulk_validate_resources_with_exceptions(self):
         """Test bulk validation handles exceptions gracefully"""
-        # Mock validation method to raise exception
-        async def mock_verify_user_error(user_bk, tenant_hk):
-            raise Exception("Database error")
-        
-        self.service.verify_user_belongs_to_tenant = mock_verify_user_error
+        # Mock the bulk lookup to raise exception
+        self.service._fetch_owned_resources = Mock(side_effect=Exception("Database error"))
         
         resources = [("user_bk", "user_test_123")]
         
-        results = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
+        patcher, _ = mock_database()
+        with patcher:
+            results = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
         
-        # Should handle exception and return False
+        # Should handle exception and return False, without caching the failure
         assert results["user_bk:user_test_123"] == False
+        assert len(self.service._validation_cache) == 0
+    
+    @pytest.mark.asyncio
+    async def test_bulk_validate_resources_uses_cache(self):
+        """Test cached results per (tenant, type, id) skip the database"""
+        self.service._fetch_owned_resources = Mock(return_value={("user_bk", "user_1")})
+        resources = [("user_bk", "user_1"), ("username", "user_1"), ("user_bk", "user_2")]
+        
+        patcher, _ = mock_database()
+        with patcher:
+            first = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
+            second = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
+        
+        assert first == second == {"user_bk:user_1": True, "username:user_1": True, "user_bk:user_2": False}
+        self.service._fetch_owned_resources.assert_called_once_with(
+            ANY, {"user_bk": ["user_1", "user_2"]}, self.mock_tenant_hk
+        )
+    
+    def test_fetch_owned_resources_single_query(self):
+        """Test every resource type is resolved by one UNION ALL query"""
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [("user_bk", "user_1"), ("asset_bk", "asset_2")]
+        mock_conn = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        
+        owned = self.service._fetch_owned_resources(
+            mock_conn, {"user_bk": ["user_1", "user_3"], "asset_bk": ["asset_2"]}, self.mock_tenant_hk
+        )
+        
+        assert owned == {("user_bk", "user_1"), ("asset_bk", "asset_2")}
+        mock_cursor.execute.assert_called_once()
+        query, params = mock_cursor.execute.call_args[0]
+        assert query.count("= ANY(%s)") == 2 and "UNION ALL" in query
+        assert params == [["user_1", "user_3"], self.mock_tenant_hk, ["asset_2"], self.mock_tenant_hk]
     
     def test_cache_functionality(self):
         """Test validation result caching"""
@@ -287,7 +219,7 @@ class TestResourceValidationService:
         
         # Check cache hit
         assert self.service._is_cached_and_valid(cache_key) == True
-        assert self.service._validation_cache[cache_key]['result'] == True
+        assert self.service._get_cached_result(cache_key) == True
     
     def test_cache_expiration(self):
         """Test cache expiration functionality"""
@@ -333,59 +265,70 @@ class TestResourceValidationService:
         assert stats['cache_entries_valid'] == 1
         assert stats['cache_entries_expired'] == 1
     
-    @patch('app.services.resource_validator.psycopg2.connect')
+    def test_cache_bounded_lru(self):
+        """Test the cache never exceeds max entries and evicts least recently used"""
+        service = ResourceValidationService(max_cache_entries=3)
+        for key in ("user:a:t", "user:b:t", "user:c:t"):
+            service._cache_validation_result(key, True)
+        service._get_cached_result("user:a:t")  # a is now most recently used
+        
+        service._cache_validation_result("user:d:t", True)
+        
+        assert len(service._validation_cache) == 3
+        assert not service._is_cached_and_valid("user:b:t")
+        assert service._is_cached_and_valid("user:a:t")
+    
+    def test_cache_monotonic_expiry_and_counters(self):
+        """Test TTL expiry follows the injected monotonic clock and lookups are counted"""
+        clock = Mock(return_value=1000.0)
+        service = ResourceValidationService(clock=clock)
+        service._cache_validation_result("session:s1:t", True, ttl_seconds=60)
+        service._cache_validation_result("user:u1:t", False)
+        
+        assert service._get_cached_result("session:s1:t") == True
+        assert service._get_cached_result("user:u1:t") == False  # cached rejection is a hit
+        assert service._get_cached_result("user:missing:t") is None
+        
+        clock.return_value = 1061.0
+        assert service._get_cached_result("session:s1:t") is None
+        assert service._get_cached_result("user:u1:t") == False
+        
+        stats = service.get_validation_stats()
+        assert stats['cache_hits'] == 3
+        assert stats['cache_misses'] == 2
+        assert stats['cache_entries_valid'] == 1
+    
     @pytest.mark.asyncio
-    async def test_caching_improves_performance(self, mock_connect):
+    async def test_caching_improves_performance(self):
         """Test that caching improves performance on repeated calls"""
-        # Mock database response
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = (
-            self.mock_user_hk,
-            "user_test_123",
-            "test@example.com",
-            "John",
-            "Doe"
-        )
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
-        
         user_bk = "user_performance_test"
-        
-        # First call - should hit database
-        result1 = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
-        assert result1 == True
-        assert mock_cursor.execute.call_count == 1
-        
-        # Second call - should hit cache
-        result2 = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
-        assert result2 == True
-        # Database should not be called again
-        assert mock_cursor.execute.call_count == 1
+        patcher, mock_cursor = mock_database([("user_bk", user_bk)])
+        
+        with patcher:
+            # First call - should hit database
+            result1 = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
+            assert result1 == True
+            assert mock_cursor.execute.call_count == 1
+            
+            # Second call - should hit cache
+            result2 = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
+            assert result2 == True
+            # Database should not be called again
+            assert mock_cursor.execute.call_count == 1
     
-    @patch('app.services.resource_validator.psycopg2.connect')
     @pytest.mark.asyncio
-    async def test_cross_tenant_validation_blocked(self, mock_connect):
+    async def test_cross_tenant_validation_blocked(self):
         """Test that cross-tenant resource access is properly blocked"""
-        # Mock database response - no result (resource belongs to different tenant)
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = None
+        # No result: the resource belongs to a different tenant
+        patcher, mock_cursor = mock_database([])
         
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
-        
-        user_bk = "cross_tenant_user"
-        result = await self.service.verify_user_belongs_to_tenant(user_bk, self.mock_tenant_hk)
+        with patcher:
+            result = await self.service.verify_user_belongs_to_tenant("cross_tenant_user", self.mock_tenant_hk)
         
         assert result == False
         
         # Verify the query includes tenant filtering
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        params = call_args[1]
-        
+        query, params = mock_cursor.execute.call_args[0]
         assert "uh.tenant_hk = %s" in query
         assert self.mock_tenant_hk in params
 
@@ -402,13 +345,6 @@ class TestResourceValidationPerformance:
     @pytest.mark.asyncio
     async def test_bulk_validation_performance(self):
         """Test bulk validation performance with large resource sets"""
-        # Mock validation methods for performance testing
-        async def mock_verify_fast(resource_id, tenant_hk):
-            return True
-        
-        self.service.verify_user_belongs_to_tenant = mock_verify_fast
-        self.service.verify_asset_belongs_to_tenant = mock_verify_fast
-        
         # Create large resource set
         resources = []
         for i in range(100):
@@ -417,11 +353,16 @@ class TestResourceValidationPerformance:
             else:
                 resources.append(("asset_bk", f"asset_{i}"))
         
+        # Mock the bulk lookup: every resource is owned
+        self.service._fetch_owned_resources = Mock(return_value=set(resources))
+        
         # Time the bulk validation
         import time
         start_time = time.time()
         
-        results = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
+        patcher, _ = mock_database()
+        with patcher:
+            results = await self.service.bulk_validate_resources(resources, self.mock_tenant_hk)
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -430,6 +371,9 @@ class TestResourceValidationPerformance:
         assert execution_time < 1.0
         assert len(results) == 100
         assert all(result == True for result in results.values())
+        
+        # 100 resources, one database round trip
+        assert self.service._fetch_owned_resources.call_count == 1
 
 
 # Security tests
@@ -442,34 +386,27 @@ class TestResourceValidationSecurity:
         self.mock_tenant_hk = b'\x01\x02\x03\x04' * 8
         self.malicious_tenant_hk = b'\x99\x99\x99\x99' * 8
     
-    @patch('app.services.resource_validator.psycopg2.connect')
     @pytest.mark.asyncio
-    async def test_sql_injection_protection(self, mock_connect):
+    async def test_sql_injection_protection(self):
         """Test protection against SQL injection in resource IDs"""
-        # Mock database connection
-        mock_cursor = Mock()
-        mock_cursor.fetchone.return_value = None
-        
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connect.return_value = mock_conn
+        patcher, mock_cursor = mock_database([])
         
         # Attempt SQL injection
         malicious_user_bk = "user'; DROP TABLE auth.user_h; --"
         
-        result = await self.service.verify_user_belongs_to_tenant(malicious_user_bk, self.mock_tenant_hk)
+        with patcher:
+            result = await self.service.verify_user_belongs_to_tenant(malicious_user_bk, self.mock_tenant_hk)
         
         # Should safely handle malicious input
         assert result == False
         
         # Verify parameterized query was used
-        call_args = mock_cursor.execute.call_args[0]
-        query = call_args[0]
-        params = call_args[1]
+        query, params = mock_cursor.execute.call_args[0]
         
         # Should use parameters, not string concatenation
         assert "%s" in query
-        assert malicious_user_bk in params
+        assert malicious_user_bk not in query
+        assert [malicious_user_bk] in params
     
     @pytest.mark.asyncio
     async def test_timing_attack_resistance(self):
@@ -0,0 +1,117 @@
+"""
+Tests for TrackingWriteBuffer
+=============================
+
+Test suite for the tracking write-behind buffer:
+- Size and time triggered group commits
+- Backpressure when the buffer is full
+- Drain on shutdown
+- Retry and flush statistics
+"""
+
+import asyncio
+import pytest
+
+from app.services.tracking_buffer import (
+    TrackingWriteBuffer, WriteBufferConfig, BufferFullError, BufferClosedError
+)
+from app.services.tracking_ingest import TrackingEvent
+
+
+def make_event(i: int) -> TrackingEvent:
+    return TrackingEvent(index=0, page_url=f'/page/{i}', client_ip='10.0.0.1', user_agent='pytest')
+
+
+class TestTrackingWriteBuffer:
+    """Test suite for TrackingWriteBuffer"""
+
+    @pytest.mark.asyncio
+    async def test_flush_on_size(self, recording_flush):
+        """Test a full batch flushes without waiting for the interval"""
+        flush = recording_flush()
+        buffer = TrackingWriteBuffer(WriteBufferConfig(flush_size=10, flush_interval_seconds=60), flush=flush)
+        await buffer.start()
+
+        for i in range(10):
+            await buffer.submit(make_event(i))
+        await asyncio.sleep(0.05)
+
+        assert [len(batch) for batch in flush.batches] == [10]
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_flush_on_interval(self, recording_flush):
+        """Test a partial batch flushes once the interval elapses"""
+        flush = recording_flush()
+        buffer = TrackingWriteBuffer(WriteBufferConfig(flush_size=100, flush_interval_seconds=0.05), flush=flush)
+        await buffer.start()
+
+        await buffer.submit(make_event(1))
+        await buffer.submit(make_event(2))
+        await asyncio.sleep(0.15)
+
+        assert [len(batch) for batch in flush.batches] == [2]
+        assert buffer.get_stats()['events_flushed'] == 2
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_submit_returns_event_id(self, recording_flush):
+        """Test clients get an id before the event is committed"""
+        buffer = TrackingWriteBuffer(WriteBufferConfig(), flush=recording_flush())
+        await buffer.start()
+
+        event_id = await buffer.submit(make_event(1))
+
+        assert len(event_id) == 32
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_backpressure_when_full(self, recording_flush):
+        """Test submissions are rejected once the buffer stays full"""
+        flush = recording_flush(delay=0.5)
+        config = WriteBufferConfig(max_events=2, flush_size=1, flush_interval_seconds=0, enqueue_timeout_seconds=0.01)
+        buffer = TrackingWriteBuffer(config, flush=flush)
+        await buffer.start()
+
+        await buffer.submit(make_event(1))
+        await asyncio.sleep(0.01)  # flusher takes event 1 and blocks in flush
+        await buffer.submit(make_event(2))
+        await buffer.submit(make_event(3))
+
+        with pytest.raises(BufferFullError):
+            await buffer.submit(make_event(4))
+        assert buffer.get_stats()['events_rejected_full'] == 1
+
+        buffer.config.drain_timeout_seconds = 5
+        await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_drains_queue(self, recording_flush):
+        """Test graceful shutdown flushes everything still queued"""
+        flush = recording_flush()
+        buffer = TrackingWriteBuffer(WriteBufferConfig(flush_size=100, flush_interval_seconds=60), flush=flush)
+        await buffer.start()
+
+        for i in range(25):
+            await buffer.submit(make_event(i))
+        await buffer.stop()
+
+        assert sum(len(batch) for batch in flush.batches) == 25
+        with pytest.raises(BufferClosedError):
+            await buffer.submit(make_event(26))
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_retried(self, recording_flush):
+        """Test a transient flush failure is retried instead of dropping events"""
+        flush = recording_flush(failures=1)
+        config = WriteBufferConfig(flush_size=1, retry_backoff_seconds=0.01)
+        buffer = TrackingWriteBuffer(config, flush=flush)
+        await buffer.start()
+
+        await buffer.submit(make_event(1))
+        await buffer.stop()
+
+        stats = buffer.get_stats()
+        assert stats['flush_retries'] == 1
+        assert stats['events_flushed'] == 1
+        assert stats['events_failed'] == 0
@@ -0,0 +1,137 @@
+"""
+Tests for Site Tracking Batch Ingestion
+=======================================
+
+Test suite for /api/v1/track/batch support code:
+- JSON array and NDJSON parsing
+- Single-pass validation with per-event errors
+- One multi-row insert per batch
+- Rate limit charged per event, not per batch
+"""
+
+import json
+import pytest
+from unittest.mock import Mock, patch
+
+from app.services.tracking_ingest import (
+    TrackingBatchError, TrackingEvent, parse_tracking_batch,
+    validate_tracking_events, insert_tracking_events, build_batch_results
+)
+
+
+class TestParseTrackingBatch:
+    """Test suite for batch body parsing"""
+
+    def test_json_array(self):
+        """Test a JSON array body"""
+        items, errors = parse_tracking_batch(b'[{"page_url": "/a"}, {"page_url": "/b"}]', 'application/json')
+
+        assert len(items) == 2
+        assert errors == []
+
+    def test_events_envelope(self):
+        """Test an {"events": [...]} body"""
+        items, _ = parse_tracking_batch(b'{"events": [{"page_url": "/a"}]}', 'application/json')
+
+        assert items == [{'page_url': '/a'}]
+
+    def test_ndjson_reports_bad_lines(self):
+        """Test NDJSON lines parse independently"""
+        body = b'{"page_url": "/a"}\n\n{not json}\n{"page_url": "/c"}\n'
+        items, errors = parse_tracking_batch(body, 'application/x-ndjson; charset=utf-8')
+
+        assert items[0] == {'page_url': '/a'}
+        assert items[1] is None
+        assert items[2] == {'page_url': '/c'}
+        assert errors[0]['index'] == 1
+
+    def test_non_array_rejected(self):
+        """Test a body that is not a batch fails as a whole"""
+        with pytest.raises(TrackingBatchError):
+            parse_tracking_batch(b'{"page_url": "/a"}', 'application/json')
+
+
+class TestValidateTrackingEvents:
+    """Test suite for single-pass event validation"""
+
+    def test_valid_and_invalid_events(self):
+        """Test each event is accepted or rejected independently"""
+        items = [
+            {'page_url': '/a', 'event_type': 'click', 'event_data': {'x': 1}},
+            {'event_type': 'click'},
+            'not an object',
+            {'page_url': '/d', 'event_data': []},
+            {'page_url': '/e'}
+        ]
+
+        events, errors = validate_tracking_events(items)
+
+        assert [event.index for event in events] == [0, 4]
+        assert events[1].event_type == 'page_view'
+        assert [error['index'] for error in errors] == [1, 2, 3]
+
+    def test_batch_size_limit(self):
+        """Test oversized batches are refused"""
+        with pytest.raises(TrackingBatchError):
+            validate_tracking_events([{'page_url': '/a'}] * 3, max_events=2)
+
+    def test_results_merged_in_order(self):
+        """Test accepted ids and errors come back in submission order"""
+        events = [TrackingEvent(index=0, page_url='/a'), TrackingEvent(index=2, page_url='/c')]
+        results = build_batch_results(events, [101, 102], [{'index': 1, 'error': 'page_url is required'}])
+
+        assert [result['status'] for result in results] == ['accepted', 'rejected', 'accepted']
+        assert results[2]['event_id'] == 102
+
+
+class TestInsertTrackingEvents:
+    """Test suite for the bulk insert"""
+
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.cursor = Mock()
+        self.conn = Mock()
+        self.conn.cursor.return_value = self.cursor
+        self.events = [TrackingEvent(index=i, page_url=f'/page/{i}') for i in range(50)]
+
+    @patch('app.services.tracking_ingest.execute_values')
+    def test_single_insert_for_whole_batch(self, mock_execute_values):
+        """Test the batch lands with one INSERT regardless of size"""
+        self.cursor.fetchall.return_value = [({'allowed': True},)] * 50
+        self.cursor.fetchone.return_value = (b'\x01' * 32, 'site_tracker')
+        mock_execute_values.return_value = [(i,) for i in range(1000, 1050)]
+
+        result = insert_tracking_events(self.conn, self.events, '10.0.0.1', 'pytest')
+
+        assert result['success'] is True
+        assert result['raw_event_ids'] == list(range(1000, 1050))
+        mock_execute_values.assert_called_once()
+        rows = mock_execute_values.call_args[0][2]
+        assert len(rows) == 50
+        assert mock_execute_values.call_args[1]['page_size'] == 50
+        # rate limit, constants, audit - independent of batch size
+        assert self.cursor.execute.call_count == 3
+
+    @patch('app.services.tracking_ingest.execute_values')
+    def test_rate_limited_batch_not_inserted(self, mock_execute_values):
+        """Test a blocked batch writes nothing"""
+        self.cursor.fetchall.return_value = [({'allowed': False},)] * 50
+
+        result = insert_tracking_events(self.conn, self.events, '10.0.0.1', 'pytest')
+
+        assert result['success'] is False
+        mock_execute_values.assert_not_called()
+
+    @patch('app.services.tracking_ingest.execute_values')
+    def test_rate_limit_charged_per_event(self, mock_execute_values):
+        """Test a batch is charged one attempt per event and only the remaining quota is stored"""
+        self.cursor.fetchall.return_value = [({'allowed': True},)] * 10 + [({'allowed': False},)] * 40
+        self.cursor.fetchone.return_value = (b'\x01' * 32, 'site_tracker')
+        mock_execute_values.return_value = [(i,) for i in range(1000, 1010)]
+
+        result = insert_tracking_events(self.conn, self.events, '10.0.0.1', 'pytest')
+
+        rate_limit_params = self.cursor.execute.call_args_list[0][0][1]
+        assert rate_limit_params[-1] == 50
+        assert len(mock_execute_values.call_args[0][2]) == 10
+        assert result['raw_event_ids'] == list(range(1000, 1010)) + [None] * 40
@@ -0,0 +1,265 @@
+"""
+Tests for async database access
+===============================
+
+Test suite for the executor-backed AsyncConnection:
+- asyncpg-style placeholder translation
+- Queries run off the event loop
+- Connections return to the shared pool
+- Bounded concurrency with acquire timeouts, background jobs included
+- asyncpg transaction semantics: autocommit statements, explicit transaction()
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock
+
+import psycopg2.extensions
+
+from app.utils.connection_pool import PoolTimeoutError
+from app.utils.database import DatabaseConnection, _to_psycopg2_query
+
+
+def make_connection(row=(1,), delay=0.0):
+    """Create a mock psycopg2 connection whose queries take `delay` seconds"""
+    cursor = Mock()
+    cursor.description = [('value',)]
+    cursor.fetchone.return_value = row
+    cursor.execute.side_effect = lambda sql, params: time.sleep(delay)
+
+    conn = Mock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    conn.cursor.return_value = cursor
+    return conn
+
+
+class TransactionalConnection:
+    """psycopg2 connection stand-in that models implicit and aborted transactions"""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.in_transaction = False
+        self.aborted = False
+        self.pending = []
+        self.committed = []
+
+    def cursor(self, cursor_factory=None):
+        conn = self
+        cursor = Mock()
+        cursor.description = [('value',)]
+        cursor.fetchone.return_value = (1,)
+
+        def execute(sql, params=None):
+            if conn.aborted:
+                raise psycopg2.InternalError("current transaction is aborted")
+            if not conn.autocommit:
+                conn.in_transaction = True
+            if 'missing_table' in sql:
+                conn.aborted = not conn.autocommit
+                raise psycopg2.ProgrammingError("relation does not exist")
+            conn.pending.append(sql)
+            if conn.autocommit:
+                conn.commit()
+        cursor.execute.side_effect = execute
+        return cursor
+
+    def get_transaction_status(self):
+        if self.aborted:
+            return psycopg2.extensions.TRANSACTION_STATUS_INERROR
+        if self.in_transaction:
+            return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending, self.in_transaction, self.aborted = [], False, False
+
+    def rollback(self):
+        self.pending, self.in_transaction, self.aborted = [], False, False
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """Database manager with a two-connection pool of mock connections"""
+    monkeypatch.setenv('SYSTEM_DATABASE_URL', 'postgresql://test@localhost/test')
+    monkeypatch.setenv('DB_POOL_MAX_SIZE', '2')
+    db_manager = DatabaseConnection()
+    db_manager.pool._connection_factory = Mock(side_effect=lambda: make_connection(delay=0.2))
+    yield db_manager
+    db_manager.close_pools()
+
+
+class TestPlaceholderTranslation:
+    """Test suite for asyncpg to psycopg2 query translation"""
+
+    def test_positional_params_reordered(self):
+        """Test $n placeholders map to %s in order of appearance"""
+        sql, params = _to_psycopg2_query("SELECT $2, $1 WHERE x = $2", ('a', 'b'))
+
+        assert sql == "SELECT %s, %s WHERE x = %s"
+        assert params == ('b', 'a', 'b')
+
+    def test_literal_percent_escaped(self):
+        """Test literal % survives translation"""
+        sql, _ = _to_psycopg2_query("SELECT 1 WHERE name LIKE 'a%' AND id = $1", (5,))
+
+        assert sql == "SELECT 1 WHERE name LIKE 'a%%' AND id = %s"
+
+    def test_psycopg2_style_passthrough(self):
+        """Test %s queries are left untouched"""
+        assert _to_psycopg2_query("SELECT api.auth_login(%s)", ('{}',)) == ("SELECT api.auth_login(%s)", ('{}',))
+        assert _to_psycopg2_query("SELECT 1", ()) == ("SELECT 1", None)
+
+
+class TestAsyncConnection:
+    """Test suite for AsyncConnection"""
+
+    @pytest.mark.asyncio
+    async def test_fetchval_and_release(self, manager):
+        """Test a query result is returned and the connection goes back to the pool"""
+        conn = await manager.get_async_connection()
+        assert await conn.fetchval("SELECT $1", 1) == 1
+        await conn.close()
+
+        stats = manager.pool.get_stats()
+        assert stats['in_use'] == 0
+        assert stats['idle'] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_query_does_not_block_event_loop(self, manager):
+        """Test other coroutines keep running while a query is in flight"""
+        conn = await manager.get_async_connection()
+        query = asyncio.create_task(conn.fetchrow("SELECT pg_sleep(0.2)"))
+
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        await query
+        await conn.close()
+        assert elapsed < 0.1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_overlap(self, manager):
+        """Test queries on separate connections run in parallel"""
+        async def run_query():
+            conn = await manager.get_async_connection()
+            try:
+                return await conn.fetchval("SELECT 1")
+            finally:
+                await conn.close()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(run_query(), run_query())
+
+        assert results == [1, 1]
+        assert time.perf_counter() - started < 0.35
+
+    @pytest.mark.asyncio
+    async def test_acquire_timeout_when_all_slots_busy(self, manager):
+        """Test callers beyond pool capacity fail fast instead of queueing forever"""
+        held = [await manager.get_async_connection() for _ in range(2)]
+
+        with pytest.raises(PoolTimeoutError):
+            await manager.get_async_connection(timeout=0.05)
+
+        for conn in held:
+            await conn.close()
+        assert manager.pool.get_stats()['in_use'] == 0
+
+
+    @pytest.mark.asyncio
+    async def test_background_jobs_take_async_slots(self, manager, monkeypatch):
+        """Test the pipeline and write-behind flush wait for an async slot like requests do"""
+        from app.services.pipeline_scheduler import process_site_tracking
+        from app.services.tracking_buffer import flush_tracking_events
+        monkeypatch.setattr('app.utils.database._db_manager', manager)
+        held = [await manager.get_async_connection() for _ in range(2)]
+
+        for job in (process_site_tracking(), flush_tracking_events([])):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(job, timeout=0.05)
+
+        await held[0].close()
+        assert await process_site_tracking() == 1
+        await held[1].close()
+        assert manager.pool.get_stats()['in_use'] == 0
+
+
+class TestAsyncTransactions:
+    """Test suite for AsyncConnection transaction semantics"""
+
+    @pytest.fixture
+    def connections(self, manager):
+        connections = []
+
+        def factory():
+            connections.append(TransactionalConnection())
+            return connections[-1]
+        manager.pool._connection_factory = factory
+        return connections
+
+    @pytest.mark.asyncio
+    async def test_failed_statement_does_not_poison_connection(self, manager, connections):
+        """Test later statements still run after one fails, as with asyncpg"""
+        conn = await manager.get_async_connection()
+
+        with pytest.raises(psycopg2.ProgrammingError):
+            await conn.fetchval("SELECT 1 FROM missing_table")
+        assert await conn.fetchval("SELECT 1 FROM business.asset_h") == 1
+        await conn.close()
+
+    @pytest.mark.asyncio
+    async def test_writes_survive_release(self, manager, connections):
+        """Test statements commit on their own and the pooled connection is reset for sync callers"""
+        conn = await manager.get_async_connection()
+        await conn.execute("INSERT INTO audit.event_h VALUES (1)")
+        await conn.close()
+
+        raw, = connections
+        assert raw.committed == ["INSERT INTO audit.event_h VALUES (1)"]
+        assert raw.autocommit is False
+
+    @pytest.mark.asyncio
+    async def test_transaction_commits_or_rolls_back(self, manager, connections):
+        """Test transaction() groups statements and rolls them all back on error"""
+        conn = await manager.get_async_connection()
+
+        async with conn.transaction():
+            await conn.execute("INSERT INTO a VALUES (1)")
+            async with conn.transaction():
+                await conn.execute("INSERT INTO b VALUES (1)")
+
+        with pytest.raises(RuntimeError):
+            async with conn.transaction():
+                await conn.execute("INSERT INTO c VALUES (1)")
+                raise RuntimeError("handler failed")
+
+        raw, = connections
+        assert raw.committed == ["INSERT INTO a VALUES (1)", "INSERT INTO b VALUES (1)"]
+        assert raw.autocommit is True
+        await conn.close()
+
+    @pytest.mark.asyncio
+    async def test_run_is_atomic(self, manager, connections):
+        """Test conn.run() commits the function's statements together or not at all"""
+        def write_two(raw, fail):
+            cursor = raw.cursor()
+            cursor.execute("INSERT INTO a VALUES (1)")
+            cursor.execute("INSERT INTO missing_table VALUES (1)" if fail else "INSERT INTO b VALUES (1)")
+            return 'done'
+
+        conn = await manager.get_async_connection()
+        with pytest.raises(psycopg2.ProgrammingError):
+            await conn.run(write_two, True)
+        assert await conn.run(write_two, False) == 'done'
+        await conn.close()
+
+        raw, = connections
+        assert raw.committed == ["INSERT INTO a VALUES (1)", "INSERT INTO b VALUES (1)"]
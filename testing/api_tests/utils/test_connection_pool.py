@@ -0,0 +1,165 @@
+"""
+Tests for ConnectionPool
+========================
+
+Test suite for the shared psycopg2 connection pool:
+- Connection reuse and bounded size
+- Acquire timeout under exhaustion
+- Lifetime recycling and health checks
+- Transaction reset on release
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+
+import psycopg2.extensions
+
+from app.utils.connection_pool import (
+    ConnectionPool, PoolConfig, PoolTimeoutError, PoolClosedError,
+    register_pool, get_all_pool_stats, close_all_pools
+)
+
+
+def make_connection():
+    """Create a mock psycopg2 connection"""
+    conn = Mock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close():
+        conn.closed = 1
+    conn.close.side_effect = close
+    return conn
+
+
+class TestConnectionPool:
+    """Test suite for ConnectionPool"""
+
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.factory = Mock(side_effect=make_connection)
+        self.config = PoolConfig(min_size=1, max_size=2, acquire_timeout_seconds=0.05)
+        self.pool = ConnectionPool(config=self.config, name="test", connection_factory=self.factory)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        self.pool.close()
+
+    def test_connection_is_reused(self):
+        """Test released connections are handed out again"""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+
+        assert self.pool.acquire() is conn
+        assert self.factory.call_count == 1
+
+    def test_warm_opens_min_size(self):
+        """Test warm() opens the minimum number of connections"""
+        assert self.pool.warm() == 1
+        assert self.pool.get_stats()['idle'] == 1
+        assert self.pool.warm() == 0
+
+    def test_acquire_timeout_when_exhausted(self):
+        """Test acquire raises once max_size connections are borrowed"""
+        self.pool.acquire()
+        self.pool.acquire()
+
+        with pytest.raises(PoolTimeoutError):
+            self.pool.acquire()
+
+        stats = self.pool.get_stats()
+        assert stats['in_use'] == 2
+        assert stats['timeouts'] == 1
+
+    def test_waiter_receives_released_connection(self):
+        """Test a blocked acquire wakes up when a connection is released"""
+        first = self.pool.acquire()
+        self.pool.acquire()
+        acquired = []
+
+        waiter = threading.Thread(target=lambda: acquired.append(self.pool.acquire(timeout=1)))
+        waiter.start()
+        time.sleep(0.02)
+        self.pool.release(first)
+        waiter.join(timeout=1)
+
+        assert acquired == [first]
+
+    def test_open_transaction_rolled_back_on_release(self):
+        """Test release resets connections left inside a transaction"""
+        conn = self.pool.acquire()
+        conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+        self.pool.release(conn)
+
+        conn.rollback.assert_called_once()
+
+    def test_broken_connection_discarded(self):
+        """Test discarded connections are closed and not reused"""
+        conn = self.pool.acquire()
+        self.pool.release(conn, discard=True)
+
+        assert conn.closed
+        assert self.pool.acquire() is not conn
+        assert self.pool.get_stats()['connections_closed'] == 1
+
+    def test_lifetime_exceeded_connection_recycled(self):
+        """Test connections older than max_lifetime_seconds are replaced"""
+        self.config.max_lifetime_seconds = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+
+        assert conn.closed
+        assert self.pool.get_stats()['lifetime_recycles'] == 1
+
+    def test_failed_health_check_replaces_connection(self):
+        """Test idle connections failing the health check are replaced"""
+        self.config.health_check_interval_seconds = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.cursor.side_effect = psycopg2.OperationalError("server closed the connection")
+
+        replacement = self.pool.acquire()
+
+        assert replacement is not conn
+        assert self.pool.get_stats()['health_check_failures'] == 1
+
+    def test_context_manager_discards_on_operational_error(self):
+        """Test connection() discards connections after connection-level errors"""
+        with pytest.raises(psycopg2.OperationalError):
+            with self.pool.connection() as conn:
+                raise psycopg2.OperationalError("terminating connection")
+
+        assert conn.closed
+        assert self.pool.get_stats()['in_use'] == 0
+
+    def test_connect_failure_frees_slot(self):
+        """Test a failed connect does not leak pool capacity"""
+        self.factory.side_effect = [psycopg2.OperationalError("refused"), make_connection(), make_connection()]
+
+        with pytest.raises(psycopg2.OperationalError):
+            self.pool.acquire()
+
+        self.pool.acquire()
+        self.pool.acquire()
+        assert self.pool.get_stats()['connect_failures'] == 1
+
+    def test_closed_pool_refuses_acquire(self):
+        """Test acquiring from a closed pool fails fast"""
+        self.pool.close()
+
+        with pytest.raises(PoolClosedError):
+            self.pool.acquire()
+
+    def test_registry_reports_stats(self):
+        """Test registered pools appear in monitoring stats"""
+        register_pool(self.pool)
+
+        stats = get_all_pool_stats()
+        assert stats['test']['max_size'] == 2
+
+        close_all_pools()
+        assert get_all_pool_stats() == {}
+        assert self.pool.closed
@@ -0,0 +1,96 @@
+"""
+Tests for the Shared Two-Tier Cache
+===================================
+
+Test suite for the cross-worker validation cache:
+- L1 only operation without a Redis URL
+- L2 hits shared between workers
+- Pub/sub invalidation of other workers' L1
+- Fail-safe fallback when L2 errors
+"""
+
+import time
+import pytest
+
+from app.utils.shared_cache import SharedCacheBackend, SharedCacheConfig
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def wait_for(condition, timeout: float = 1.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture
+def workers():
+    """Two backends sharing one fake Redis server, like two uvicorn workers"""
+    server = fakeredis.FakeServer()
+    config = SharedCacheConfig(l1_ttl_seconds=60)
+    backends = [
+        SharedCacheBackend(config, client=fakeredis.FakeRedis(server=server)),
+        SharedCacheBackend(config, client=fakeredis.FakeRedis(server=server)),
+    ]
+    yield backends
+    for backend in backends:
+        backend.close()
+
+
+class TestTwoTierCache:
+    """Test suite for TwoTierCache"""
+
+    def test_l1_only_without_redis(self):
+        """Test the cache works per-process when no Redis URL is configured"""
+        backend = SharedCacheBackend(SharedCacheConfig())
+        cache = backend.cache("test")
+
+        cache.set("k", {"ok": True}, tags=["token:abc"])
+
+        assert not backend.shared
+        assert cache.get("k") == {"ok": True}
+        assert cache.invalidate_tags(["token:abc"]) == 1
+        assert cache.get("k") is None
+
+    def test_l2_hit_in_other_worker(self, workers):
+        """Test a value cached by one worker is served to another from L2"""
+        first, second = workers[0].cache("validation"), workers[1].cache("validation")
+
+        first.set("k", {"user_id": "u1"})
+
+        assert second.get("k") == {"user_id": "u1"}
+        assert second.get("k") == {"user_id": "u1"}
+        stats = second.get_stats()
+        assert stats["l2_hits"] == 1 and stats["l1_hits"] == 1
+
+    def test_invalidation_reaches_other_worker_l1(self, workers):
+        """Test a tag invalidation drops the entry from every worker's L1 and from L2"""
+        first, second = workers[0].cache("validation"), workers[1].cache("validation")
+        first.set("k1", {"v": 1}, tags=["token:abc"])
+        first.set("k2", {"v": 2}, tags=["token:def"])
+        assert second.get("k1") == {"v": 1}  # now in second's L1
+
+        assert first.invalidate_tags(["token:abc"]) == 1
+
+        assert wait_for(lambda: second.get_stats()["remote_invalidations"] == 1)
+        assert second.get("k1") is None
+        assert second.get("k2") == {"v": 2}
+
+    def test_l2_errors_fall_back_to_l1(self):
+        """Test L2 failures are counted and the cache keeps working from L1"""
+        class BrokenRedis:
+            def __getattr__(self, name):
+                raise ConnectionError("redis down")
+
+        backend = SharedCacheBackend(SharedCacheConfig(l2_retry_seconds=60), client=BrokenRedis())
+        cache = backend.cache("test")
+
+        cache.set("k", {"v": 1})
+
+        assert cache.get("k") == {"v": 1}
+        assert cache.get("missing") is None
+        assert backend.get_stats()["l2_errors"] >= 1
+        assert not backend.l2_available()
@@ -0,0 +1,344 @@
+"""
+Tests for ZeroTrustDatabaseWrapper
+==================================
+
+Test suite for pooled, tenant-scoped database access:
+- Connections are borrowed from the pool and returned after each checkout
+- Tenant context is set locally at the start of every transaction
+- Nested checkouts and sessions share one connection
+- Query counts and latency histograms are kept per tenant
+- Pipelined transactions batch statements into few round trips
+- Server-side cursor streaming and NDJSON/CSV responses
+- Resource ownership checks through the shared resource validator
+"""
+
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import psycopg2.extensions
+
+from app.utils.connection_pool import ConnectionPool, PoolConfig
+from app.utils.zero_trust_db import (
+    TENANT_CONTEXT_QUERY, TenantQueryMetrics, ZeroTrustDatabaseWrapper, get_tenant_db,
+    stream_query_response
+)
+
+TENANT_A = b'\xaa' * 32
+TENANT_B = b'\xbb' * 32
+
+
+class FakeConnection:
+    """psycopg2 connection stand-in that tracks transaction status"""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_on = None
+        self.named_cursors = []
+        self.stream_rows = [('user_1', b'\x01\x02'), ('user_2', b'\x03\x04')]
+
+    def cursor(self, name=None, cursor_factory=None):
+        cursor = MagicMock()
+        cursor.__enter__.return_value = cursor
+        if name:
+            self.named_cursors.append(cursor)
+            cursor.__iter__.side_effect = lambda: iter(self.stream_rows)
+
+        def execute(query, params=None):
+            if isinstance(query, bytes):
+                query = query.decode()
+            cursor.description = [('user_bk',)] if 'SELECT' in query.split(';')[-1] else None
+            if name:
+                cursor.description = [('user_bk',), ('user_hk',)]
+            if self.fail_on and self.fail_on in query:
+                raise psycopg2.ProgrammingError("boom")
+            self.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+            self.executed.append((query, params))
+        cursor.execute.side_effect = execute
+        cursor.mogrify.side_effect = lambda query, params=None: (
+            query % tuple(repr(param) for param in params) if params else query
+        ).encode()
+        cursor.fetchall.return_value = [{'user_bk': 'user_1'}] if cursor_factory else [('user_1',)]
+        return cursor
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.commits += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class TestZeroTrustDatabaseWrapper:
+    """Test suite for ZeroTrustDatabaseWrapper"""
+
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.connections = []
+
+        def factory():
+            conn = FakeConnection()
+            self.connections.append(conn)
+            return conn
+        self.pool = ConnectionPool(config=PoolConfig(min_size=0, max_size=2), name="zero_trust_test",
+                                   connection_factory=factory)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        self.pool.close()
+
+    def make_db(self, tenant_hk=TENANT_A, user_hk=None):
+        db = ZeroTrustDatabaseWrapper(tenant_hk, user_hk, pool=self.pool)
+        db.metrics = TenantQueryMetrics()
+        return db
+
+    def test_connection_returned_after_query(self):
+        """Test each query borrows, commits and returns a pooled connection"""
+        db = self.make_db()
+
+        db.execute_query("SELECT country_name FROM ref.country_r")
+        db.execute_query("SELECT country_name FROM ref.country_r")
+
+        conn, = self.connections
+        assert conn.commits == 2
+        assert self.pool.get_stats()['in_use'] == 0
+        assert db.get_connection_stats()['connection_active'] is False
+
+    def test_tenant_context_set_per_transaction(self):
+        """Test set_config(..., true) opens every transaction on the borrowed connection"""
+        db = self.make_db(user_hk=b'\x01' * 32)
+
+        db.execute_query("SELECT country_name FROM ref.country_r")
+        other = self.make_db(TENANT_B)
+        other.execute_query("SELECT country_name FROM ref.country_r")
+
+        conn, = self.connections
+        contexts = [params for query, params in conn.executed if query == TENANT_CONTEXT_QUERY]
+        assert contexts == [(TENANT_A.hex(), ('01' * 32)), (TENANT_B.hex(), '')]
+        assert conn.executed[0][0] == TENANT_CONTEXT_QUERY
+
+    def test_session_shares_connection(self):
+        """Test calls inside a session reuse one checkout and commit once"""
+        db = self.make_db()
+
+        with db.session():
+            db.execute_query("SELECT country_name FROM ref.country_r")
+            db.execute_query("SELECT country_name FROM ref.country_r")
+            assert self.pool.get_stats()['in_use'] == 1
+
+        conn, = self.connections
+        assert conn.commits == 1
+        assert [q for q, _ in conn.executed].count(TENANT_CONTEXT_QUERY) == 1
+        assert self.pool.get_stats()['in_use'] == 0
+
+    def test_failed_query_rolls_back_and_releases(self):
+        """Test errors roll back, are counted per tenant and still return the connection"""
+        db = self.make_db()
+        db.execute_query("SELECT 1")
+        self.connections[0].fail_on = "bad_table"
+
+        with pytest.raises(psycopg2.ProgrammingError):
+            db.execute_query("SELECT x FROM bad_table")
+
+        assert self.connections[0].rollbacks == 1
+        assert self.pool.get_stats()['in_use'] == 0
+        assert db.metrics.get_stats(TENANT_A)['failures'] == 1
+
+    def test_metrics_per_tenant_across_wrappers(self):
+        """Test query counts accumulate per tenant, not per wrapper"""
+        metrics = TenantQueryMetrics()
+        for tenant_hk in (TENANT_A, TENANT_A, TENANT_B):
+            db = self.make_db(tenant_hk)
+            db.metrics = metrics
+            db.execute_query("SELECT country_name FROM ref.country_r")
+
+        assert metrics.get_stats(TENANT_A)['queries'] == 2
+        assert metrics.get_stats(TENANT_B)['queries'] == 1
+        assert set(metrics.get_stats()) == {TENANT_A.hex(), TENANT_B.hex()}
+
+    def test_tenant_db_dependency(self):
+        """Test the request dependency holds one connection for the request"""
+        request = MagicMock()
+        request.state.tenant_hk = TENANT_A
+        request.state.user_hk = None
+
+        with patch('app.utils.database.get_system_pool', return_value=self.pool):
+            dependency = get_tenant_db(request)
+            db = next(dependency)
+            db.execute_query("SELECT country_name FROM ref.country_r")
+            db.execute_query("SELECT country_name FROM ref.country_r")
+            assert self.pool.get_stats()['in_use'] == 1
+
+            with pytest.raises(StopIteration):
+                next(dependency)
+
+        assert self.connections[0].commits == 1
+        assert self.pool.get_stats()['in_use'] == 0
+
+    def statements(self):
+        """Statements sent to the server, excluding tenant context"""
+        return [query for query, _ in self.connections[0].executed if query != TENANT_CONTEXT_QUERY]
+
+    def test_pipelined_transaction_single_round_trip(self):
+        """Test 49 writes and a SELECT go out in one execute with lazy SELECT rows"""
+        db = self.make_db()
+        queries = [("UPDATE ref.counter_r SET value = %s WHERE name = %s", (i, f"c{i}")) for i in range(49)]
+        queries.append(("SELECT user_bk FROM ref.user_r", None))
+
+        results = db.execute_transaction(queries, pipeline=True)
+
+        statements = self.statements()
+        assert len(statements) == 1
+        assert statements[0].count(';') == 49
+        assert results[:49] == [None] * 49
+        assert not isinstance(results[49], list)
+        assert list(results[49]) == [{'user_bk': 'user_1'}]
+        assert self.connections[0].commits == 1
+
+    def test_pipelined_inserts_grouped(self):
+        """Test a run of the same INSERT ... VALUES becomes one multi-row INSERT"""
+        db = self.make_db()
+        queries = [("INSERT INTO ref.tag_r (name, rank) VALUES (%s, %s)", (f"t{i}", i)) for i in range(3)]
+
+        db.execute_transaction(queries, pipeline=True)
+
+        assert self.statements() == [
+            "INSERT INTO ref.tag_r (name, rank) VALUES ('t0', 0),('t1', 1),('t2', 2)"
+        ]
+
+    def test_pipelined_page_size(self):
+        """Test buffered writes are flushed every pipeline_page_size statements"""
+        db = self.make_db()
+        db.pipeline_page_size = 2
+        queries = [(f"DELETE FROM ref.tag_{i}_r WHERE name = %s", ("x",)) for i in range(5)]
+
+        assert db.execute_transaction(queries, pipeline=True) == [None] * 5
+        assert len(self.statements()) == 3
+
+    def test_pipelined_failure_rolls_back(self):
+        """Test a failing pipelined batch rolls back the whole transaction"""
+        db = self.make_db()
+        db.execute_query("SELECT 1")
+        self.connections[0].fail_on = "bad_table"
+
+        with pytest.raises(psycopg2.ProgrammingError):
+            db.execute_transaction([
+                ("UPDATE ref.tag_r SET rank = %s", (1,)),
+                ("SELECT x FROM bad_table", None),
+            ], pipeline=True)
+
+        assert self.connections[0].rollbacks == 1
+        assert self.pool.get_stats()['in_use'] == 0
+
+    def test_stream_query_server_side_cursor(self):
+        """Test rows stream through a named cursor with itersize and are audited"""
+        db = self.make_db()
+        columns = []
+
+        with patch.object(db.query_rewriter, 'log_query_execution') as audit:
+            rows = db.stream_query("SELECT user_bk, user_hk FROM ref.user_r", itersize=50, columns=columns)
+            assert self.pool.get_stats()['in_use'] == 0
+            assert next(rows) == ('user_1', b'\x01\x02')
+            assert self.pool.get_stats()['in_use'] == 1
+            assert list(rows) == [('user_2', b'\x03\x04')]
+
+        cursor, = self.connections[0].named_cursors
+        assert cursor.itersize == 50
+        assert columns == ['user_bk', 'user_hk']
+        assert audit.call_count == 1
+        assert self.pool.get_stats()['in_use'] == 0
+        assert db.metrics.get_stats(TENANT_A)['queries'] == 1
+
+    def test_stream_query_closed_early_releases_connection(self):
+        """Test abandoning a stream returns the connection to the pool"""
+        db = self.make_db()
+
+        rows = db.stream_query("SELECT user_bk, user_hk FROM ref.user_r")
+        next(rows)
+        rows.close()
+
+        assert self.pool.get_stats()['in_use'] == 0
+        assert self.connections[0].commits == 0
+
+    @pytest.mark.asyncio
+    async def test_validate_tenant_access_uses_shared_validator(self):
+        """Test resource checks await the shared validator's bulk call"""
+        class RecordingValidator:
+            def __init__(self):
+                self.calls = []
+
+            async def bulk_validate_resources(self, resources, tenant_hk):
+                self.calls.append((resources, tenant_hk))
+                return {f"{resource_type}:{value}": value == 'asset_1' for resource_type, value in resources}
+
+        validator = RecordingValidator()
+        db = self.make_db()
+
+        with patch('app.services.resource_validator.get_resource_validator', return_value=validator):
+            assert await db.validate_tenant_access('asset', 'asset_1') is True
+            assert await db.validate_tenant_access('session', 'sess_9') is False
+            assert await db.validate_tenant_access('invoice', 'inv_1') is False
+
+        assert validator.calls == [([('asset_bk', 'asset_1')], TENANT_A), ([('session_token', 'sess_9')], TENANT_A)]
+
+    @pytest.mark.asyncio
+    async def test_stream_query_response_ndjson(self):
+        """Test NDJSON responses emit one JSON object per row with hash keys as hex"""
+        db = self.make_db()
+
+        response = stream_query_response(db, "SELECT user_bk, user_hk FROM ref.user_r", rows_per_chunk=1)
+        chunks = [chunk async for chunk in response.body_iterator]
+
+        assert response.media_type == "application/x-ndjson"
+        assert len(chunks) == 2
+        assert [json.loads(line) for line in b"".join(chunks).splitlines()] == [
+            {'user_bk': 'user_1', 'user_hk': '0102'},
+            {'user_bk': 'user_2', 'user_hk': '0304'},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stream_query_response_csv(self):
+        """Test CSV responses start with a header row, even for empty results"""
+        db = self.make_db()
+
+        response = stream_query_response(db, "SELECT user_bk, user_hk FROM ref.user_r",
+                                         format="csv", filename="users.csv")
+        body = b"".join([chunk async for chunk in response.body_iterator])
+
+        assert body.decode().splitlines() == ['user_bk,user_hk', 'user_1,0102', 'user_2,0304']
+        assert response.headers['content-disposition'] == 'attachment; filename="users.csv"'
+
+        self.connections[0].stream_rows = []
+        response = stream_query_response(db, "SELECT user_bk, user_hk FROM ref.user_r", format="csv")
+        assert b"".join([chunk async for chunk in response.body_iterator]) == b"user_bk,user_hk\r\n"
+
+
+class TestTenantQueryMetrics:
+    """Test suite for TenantQueryMetrics"""
+
+    def test_latency_histogram(self):
+        """Test executions land in the first bucket at or above their latency"""
+        metrics = TenantQueryMetrics(buckets_ms=(1, 10))
+        for elapsed in (0.5, 1, 3, 50):
+            metrics.record(TENANT_A, elapsed)
+
+        stats = metrics.get_stats(TENANT_A)
+        assert stats['latency_histogram'] == {'le_1ms': 2, 'le_10ms': 1, 'le_inf': 1}
+        assert stats['max_time_ms'] == 50
+
+    def test_unknown_tenant(self):
+        """Test a tenant without executions reports zeros"""
+        assert TenantQueryMetrics().get_stats(TENANT_B)['queries'] == 0